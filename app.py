@@ -6,6 +6,7 @@ AI Chatbot with RAG capabilities
 import streamlit as st
 from datetime import datetime
 import sys
+import uuid
 from pathlib import Path
 
 # Add src to path
@@ -36,34 +37,94 @@ def initialize_session_state():
     if 'initialized' not in st.session_state:
         st.session_state.initialized = True
         st.session_state.messages = []
+        st.session_state.session_id = uuid.uuid4().hex
         logger.info("Session state initialized")
 
 
+@st.cache_resource(show_spinner="Initializing RAG system...")
+def get_rag_manager() -> RAGManager:
+    """
+    Get the process-wide RAG manager.
+    
+    Cached across sessions and reruns so every browser session shares one
+    vector store and embeddings client instead of opening its own.
+    """
+    rag_manager = RAGManager()
+    logger.info("RAG Manager initialized")
+    return rag_manager
+
+
+@st.cache_resource(show_spinner="Loading agents...")
+def get_agent_manager(_rag_manager: RAGManager) -> AgentManager:
+    """
+    Get the process-wide agent manager.
+    
+    Agents are stateless across sessions: each session's history is kept
+    in the conversation store under st.session_state.session_id.
+    """
+    retriever = None
+    if _rag_manager and _rag_manager.enabled:
+        retriever = _rag_manager.get_retriever()
+    
+    # Cached answers are invalidated whenever the index changes
+    kb_version = (lambda: _rag_manager.index_generation) if _rag_manager else None
+    agent_manager = AgentManager(rag_retriever=retriever, kb_version=kb_version)
+    logger.info("Agent Manager initialized")
+    return agent_manager
+
+
 def initialize_components():
     """Initialize RAG and Agent components."""
     if 'rag_manager' not in st.session_state:
-        with st.spinner("Initializing RAG system..."):
-            try:
-                st.session_state.rag_manager = RAGManager()
-                logger.info("RAG Manager initialized")
-            except Exception as e:
-                logger.error(f"Error initializing RAG: {e}")
-                st.error(f"Failed to initialize RAG system: {e}")
-                st.session_state.rag_manager = None
+        try:
+            st.session_state.rag_manager = get_rag_manager()
+        except Exception as e:
+            logger.error(f"Error initializing RAG: {e}")
+            st.error(f"Failed to initialize RAG system: {e}")
+            st.session_state.rag_manager = None
     
     if 'agent_manager' not in st.session_state:
-        with st.spinner("Loading agents..."):
-            try:
-                retriever = None
-                if st.session_state.rag_manager and st.session_state.rag_manager.enabled:
-                    retriever = st.session_state.rag_manager.get_retriever()
-                
-                st.session_state.agent_manager = AgentManager(rag_retriever=retriever)
-                logger.info("Agent Manager initialized")
-            except Exception as e:
-                logger.error(f"Error initializing agents: {e}")
-                st.error(f"Failed to initialize agents: {e}")
-                st.stop()
+        try:
+            st.session_state.agent_manager = get_agent_manager(st.session_state.rag_manager)
+        except Exception as e:
+            logger.error(f"Error initializing agents: {e}")
+            st.error(f"Failed to initialize agents: {e}")
+            st.stop()
+
+
+def render_stream(events, status, placeholder) -> str:
+    """
+    Render agent stream events as the response is generated.
+    
+    Tool calls are shown in the status container while the answer streams
+    into the placeholder below it. Text the agent retracts (a step that
+    went on to call tools) is cleared again.
+    
+    Args:
+        events: StreamEvent iterator from AgentManager.stream_chat
+        status: st.status container for tool activity
+        placeholder: st.empty container for the answer
+        
+    Returns:
+        Response text
+    """
+    parts = []
+    for event in events:
+        if event.type == 'token':
+            parts.append(event.content)
+            placeholder.markdown(''.join(parts) + "▌")
+        elif event.type == 'retract':
+            parts.clear()
+            placeholder.empty()
+        elif event.type == 'tool_start':
+            status.update(label=f"Using {event.content}...", state="running")
+            status.write(f"🔧 `{event.content}` {event.metadata.get('args', {})}")
+        elif event.type == 'tool_end':
+            status.update(label="Thinking...")
+    
+    response = ''.join(parts)
+    placeholder.markdown(response)
+    return response
 
 
 def main():
@@ -149,28 +210,33 @@ def main():
         
         # Generate response
         with st.chat_message("assistant", avatar="🤖"):
-            with st.spinner("Thinking..."):
-                try:
-                    response = agent_manager.chat(user_input)
-                    timestamp = datetime.now()
-                    
-                    # Display response
-                    st.markdown(response)
-                    st.caption(f"_{timestamp.strftime('%H:%M:%S')}_")
-                    
-                    # Add to history
-                    st.session_state.messages.append({
-                        'role': 'assistant',
-                        'content': response,
-                        'timestamp': timestamp
-                    })
-                    
-                    logger.info(f"User: {user_input[:50]}... | Response length: {len(response)}")
+            try:
+                status = st.status("Thinking...", expanded=False)
+                events = agent_manager.stream_chat(
+                    user_input,
+                    agent_name=st.session_state.get('agent_name'),
+                    session_id=st.session_state.session_id
+                )
+                
+                # Display response as it is generated
+                response = render_stream(events, status, st.empty())
+                timestamp = datetime.now()
+                status.update(label="Done", state="complete")
+                st.caption(f"_{timestamp.strftime('%H:%M:%S')}_")
                 
-                except Exception as e:
-                    error_msg = f"Sorry, I encountered an error: {str(e)}"
-                    st.error(error_msg)
-                    logger.error(f"Error generating response: {e}")
+                # Add to history
+                st.session_state.messages.append({
+                    'role': 'assistant',
+                    'content': response,
+                    'timestamp': timestamp
+                })
+                
+                logger.info(f"User: {user_input[:50]}... | Response length: {len(response)}")
+            
+            except Exception as e:
+                error_msg = f"Sorry, I encountered an error: {str(e)}"
+                st.error(error_msg)
+                logger.error(f"Error generating response: {e}")
         
         # Rerun to update chat display
         st.rerun()
@@ -0,0 +1,393 @@
+"""
+Benchmark script for performance-sensitive parts of the chatbot.
+Each subcommand times one component and prints a short report.
+
+Usage:
+    python scripts/benchmark.py loader --files 200 --workers 4
+    python scripts/benchmark.py graph --turns 200
+    python scripts/benchmark.py faiss --vectors 100000 --dim 128
+    python scripts/benchmark.py mmr --vectors 20000 --fetch-k 20
+    python scripts/benchmark.py quantization --vectors 20000 --dim 1536
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import setup_logger
+
+logger = setup_logger(name="benchmark", level="WARNING")
+
+
+def _write_text_pdf(path: Path, pages: int, lines_per_page: int = 40):
+    """
+    Write a small text-only PDF without third-party dependencies.
+    
+    Args:
+        path: Output path
+        pages: Number of pages
+        lines_per_page: Number of text lines per page
+    """
+    objects = []
+    page_ids = []
+    font_id = 3 + 2 * pages
+    
+    for page in range(pages):
+        lines = [
+            f"({path.stem} page {page} line {line}: Satish has experience with Python, AWS and LangChain.) Tj T*"
+            for line in range(lines_per_page)
+        ]
+        stream = "BT /F1 9 Tf 11 TL 40 780 Td\n" + "\n".join(lines) + "\nET"
+        content_id = 3 + 2 * page
+        page_id = content_id + 1
+        page_ids.append(page_id)
+        objects.append((content_id, f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"))
+        objects.append((
+            page_id,
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {content_id} 0 R /Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        ))
+    
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.insert(0, (2, f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>"))
+    objects.insert(0, (1, "<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.append((font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in objects:
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    
+    xref_offset = len(out)
+    out += f"xref\n0 {font_id + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for obj_id in range(1, font_id + 1):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {font_id + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    
+    path.write_bytes(bytes(out))
+
+
+def benchmark_loader(args):
+    """Compare serial and process-pool document loading."""
+    from src.rag import DocumentLoader
+    
+    work_dir = Path(tempfile.mkdtemp(prefix="loader_bench_"))
+    try:
+        file_paths = []
+        for i in range(args.files):
+            path = work_dir / f"doc_{i:05d}.pdf"
+            _write_text_pdf(path, pages=args.pages)
+            file_paths.append(str(path))
+        
+        loader = DocumentLoader()
+        
+        start = time.perf_counter()
+        serial_docs = loader.load_documents(file_paths, workers=1)
+        serial_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        parallel_docs = loader.load_documents(file_paths, workers=args.workers)
+        parallel_time = time.perf_counter() - start
+        
+        same_order = [d.page_content for d in serial_docs] == [d.page_content for d in parallel_docs]
+        
+        print(f"Files: {args.files} PDFs x {args.pages} pages ({len(serial_docs)} documents)")
+        print(f"{'Serial':<22}{serial_time:8.2f}s")
+        print(f"{f'{args.workers} worker processes':<22}{parallel_time:8.2f}s")
+        print(f"{'Speedup':<22}{serial_time / parallel_time:8.2f}x")
+        print(f"{'Identical output':<22}{same_order}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class _InstantChatModel:
+    """Chat model stand-in that answers instantly, requesting a tool when asked to."""
+    
+    def invoke(self, messages):
+        from langchain_core.messages import AIMessage, HumanMessage
+        
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and "use a tool" in last.content:
+            return AIMessage(content="", tool_calls=[{"name": "echo", "args": {"text": "hi"}, "id": "call_1"}])
+        return AIMessage(content=f"Answer {len(messages)}")
+
+
+def _direct_turn(agent, message: str, session_id: str):
+    """One turn the way chat() ran before the graph: rebuild history, loop, store."""
+    from langchain_core.messages import HumanMessage
+    
+    messages = agent._build_messages_for_history(session_id)
+    messages.append(HumanMessage(content=message))
+    tools_made = []
+    for _ in range(agent.max_iterations):
+        response = agent.llm_with_tools.invoke(messages)
+        if not response.tool_calls:
+            break
+        messages.append(response)
+        results = sorted(agent._run_tool_calls(response.tool_calls), key=lambda item: item[0])
+        messages.extend(tool_message for _, tool_message, _ in results)
+        tools_made.extend(executed for _, _, executed in results if executed)
+    agent.record_turn(session_id, message, response.content, tools_made)
+
+
+def benchmark_graph(args):
+    """Compare per-turn overhead of the compiled LangGraph with the hand-rolled loop."""
+    from langchain_core.tools import Tool
+    from src.agents import BaseAgent, InMemoryConversationStore, create_checkpointer
+    
+    # The LLM is replaced below; the key only satisfies client construction
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    
+    work_dir = Path(tempfile.mkdtemp(prefix="graph_bench_"))
+    try:
+        config = {"system_prompt": "You are a benchmark agent.", "use_tools": False, "max_history": args.history}
+        checkpointers = {
+            "memory": {"checkpointer": "memory"},
+            "sqlite": {"checkpointer": "sqlite", "checkpoint_path": str(work_dir / "checkpoints.sqlite")},
+        }
+        
+        def make_agent(checkpointer_config):
+            agent = BaseAgent(
+                "bench",
+                dict(config),
+                conversation_store=InMemoryConversationStore(),
+                checkpointer=create_checkpointer(checkpointer_config)
+            )
+            agent.set_tools([Tool(name="echo", func=lambda text: text, description="Echo text")])
+            agent.llm_with_tools = _InstantChatModel()
+            return agent
+        
+        def messages():
+            for turn in range(args.turns):
+                if args.tool_every and turn % args.tool_every == 0:
+                    yield f"Turn {turn}: use a tool"
+                else:
+                    yield f"Turn {turn}: just answer"
+        
+        runs = [("Direct loop", lambda agent, text: _direct_turn(agent, text, "s"), "memory")]
+        runs += [
+            (f"Graph ({name} checkpoints)", lambda agent, text: agent.chat(text, session_id="s"), name)
+            for name in checkpointers
+        ]
+        
+        print(f"Turns: {args.turns} (tool round every {args.tool_every or 'never'}), max_history {args.history}")
+        for label, run_turn, checkpointer_name in runs:
+            agent = make_agent(checkpointers[checkpointer_name])
+            start = time.perf_counter()
+            for text in messages():
+                run_turn(agent, text)
+            elapsed = time.perf_counter() - start
+            print(f"{label:<28}{elapsed / args.turns * 1000:8.2f} ms/turn")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def benchmark_faiss(args):
+    """Compare build time, query latency and recall of the FAISS index types."""
+    import numpy as np
+    from src.rag.vectordb import FAISSStore
+    from src.utils import get_config
+    
+    # Clustered data like real embeddings (uniform random vectors have no neighbourhoods)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(args.vectors // 100, 1), args.dim))
+    vectors = centers[rng.integers(len(centers), size=args.vectors)]
+    vectors = (vectors + 0.5 * rng.standard_normal(vectors.shape)).astype(np.float32)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    
+    work_dir = Path(tempfile.mkdtemp(prefix="faiss_bench_"))
+    rag_config = get_config().get_rag_config()
+    try:
+        print(f"Vectors: {args.vectors} x {args.dim}, {args.queries} queries, recall@{args.k} against FlatL2")
+        truth = None
+        for index_type in ("FlatL2", "HNSW", "IVF", "IVFPQ"):
+            rag_config["faiss"] = {
+                "index_path": str(work_dir / "index"),
+                "index_type": index_type,
+                "ivf": {"nlist": args.nlist, "nprobe": args.nprobe}
+            }
+            # Only the index is exercised, so no embeddings are needed
+            store = FAISSStore(embeddings=None)
+            
+            start = time.perf_counter()
+            index = store._build_index(vectors, np.arange(len(vectors), dtype=np.int64))
+            build_time = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query[np.newaxis, :], args.k)
+            query_time = (time.perf_counter() - start) / args.queries
+            
+            _, found = index.search(queries, args.k)
+            if truth is None:
+                truth = found
+            recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, truth)])
+            print(f"{index_type:<10}build {build_time:7.2f}s   query {query_time * 1000:7.3f} ms   recall {recall:.3f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def benchmark_mmr(args):
+    """Compare plain top-k with top-k plus MMR selection over fetch_k candidates."""
+    import numpy as np
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance as reference_mmr
+    from src.rag.mmr import maximal_marginal_relevance
+    
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.vectors, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    
+    def top(query, k):
+        scores = vectors @ query
+        rows = np.argpartition(-scores, k - 1)[:k]
+        return rows[np.argsort(-scores[rows])]
+    
+    def run(label, search):
+        start = time.perf_counter()
+        for query in queries:
+            search(query)
+        elapsed = (time.perf_counter() - start) / args.queries
+        print(f"{label:<34}{elapsed * 1000:8.3f} ms/query")
+        return elapsed
+    
+    print(f"Vectors: {args.vectors} x {args.dim}, k={args.k}, fetch_k={args.fetch_k}, {args.queries} queries")
+    base = run("top-k", lambda query: top(query, args.k))
+    mmr = run(
+        "top-fetch_k + MMR (vectorized)",
+        lambda query: maximal_marginal_relevance(query, vectors[top(query, args.fetch_k)], args.k, 0.5)
+    )
+    run(
+        "top-fetch_k + MMR (langchain)",
+        lambda query: reference_mmr(query, vectors[top(query, args.fetch_k)], 0.5, args.k)
+    )
+    print(f"MMR overhead over top-k: {(mmr - base) * 1000:.3f} ms/query")
+
+
+def benchmark_quantization(args):
+    """Compare recall@k, latency and memory of quantized storage against float32."""
+    import numpy as np
+    from src.rag.quantization import DTYPES, bytes_per_vector
+    from src.rag.vectordb import FAISSStore, NumpyVectorStore
+    from src.utils import get_config
+    
+    # Clustered unit vectors like real embeddings
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(args.vectors // 100, 1), args.dim))
+    vectors = centers[rng.integers(len(centers), size=args.vectors)]
+    vectors = (vectors + 0.5 * rng.standard_normal(vectors.shape)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    
+    class PrecomputedEmbeddings:
+        """Embeds the text "i" as the i-th benchmark vector."""
+        
+        def embed_documents(self, texts):
+            return vectors[[int(text) for text in texts]]
+    
+    truth = np.argsort(-(queries @ vectors.T), axis=1)[:, :args.k]
+    
+    def report(label, dtype, search):
+        start = time.perf_counter()
+        found = [search(query) for query in queries]
+        elapsed = (time.perf_counter() - start) / args.queries
+        recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, truth)])
+        size = bytes_per_vector(dtype, args.dim)
+        print(f"{label:<16}{size:8.0f} B/vector   query {elapsed * 1000:7.3f} ms   recall@{args.k} {recall:.3f}")
+    
+    work_dir = Path(tempfile.mkdtemp(prefix="quantization_bench_"))
+    rag_config = get_config().get_rag_config()
+    try:
+        print(f"Vectors: {args.vectors} x {args.dim}, {args.queries} queries, rescore factor {args.rescore_factor}")
+        ids = [str(i) for i in range(args.vectors)]
+        for dtype in DTYPES:
+            store = NumpyVectorStore(
+                PrecomputedEmbeddings(),
+                persist_directory=str(work_dir / f"numpy_{dtype}"),
+                dtype=dtype,
+                rescore_factor=args.rescore_factor
+            )
+            store.add_texts(ids, ids=ids)
+            report(
+                f"numpy {dtype}",
+                dtype,
+                lambda query: [int(row) for row in store._top_rows(query, args.k)[0]]
+            )
+        
+        for dtype in DTYPES:
+            rag_config["faiss"] = {
+                "index_path": str(work_dir / f"faiss_{dtype}"),
+                "index_type": "FlatIP",
+                "dtype": dtype,
+                "int8_min_points": 0,
+                "rescore_factor": args.rescore_factor
+            }
+            index = FAISSStore(embeddings=None)._build_index(vectors, np.arange(len(vectors), dtype=np.int64))
+            report(
+                f"faiss {dtype}",
+                dtype,
+                lambda query: index.search(query[np.newaxis, :], args.k)[1][0].tolist()
+            )
+        print("binary keeps float32 vectors for rescoring (on disk for numpy, in memory for faiss)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """Parse arguments and run the selected benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark chatbot components")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    loader_parser = subparsers.add_parser("loader", help="Serial vs parallel document loading")
+    loader_parser.add_argument("--files", type=int, default=200, help="Number of synthetic PDFs")
+    loader_parser.add_argument("--pages", type=int, default=5, help="Pages per PDF")
+    loader_parser.add_argument("--workers", type=int, default=4, help="Worker processes for the parallel run")
+    loader_parser.set_defaults(func=benchmark_loader)
+    
+    graph_parser = subparsers.add_parser("graph", help="Per-turn overhead of the LangGraph agent")
+    graph_parser.add_argument("--turns", type=int, default=200, help="Number of chat turns")
+    graph_parser.add_argument("--history", type=int, default=10, help="max_history of the agent")
+    graph_parser.add_argument("--tool-every", type=int, default=2, help="Request a tool every N turns (0 = never)")
+    graph_parser.set_defaults(func=benchmark_graph)
+    
+    faiss_parser = subparsers.add_parser("faiss", help="FAISS index types: build time, latency, recall")
+    faiss_parser.add_argument("--vectors", type=int, default=100000, help="Number of random vectors")
+    faiss_parser.add_argument("--dim", type=int, default=128, help="Vector dimension")
+    faiss_parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    faiss_parser.add_argument("--k", type=int, default=10, help="Results per query")
+    faiss_parser.add_argument("--nlist", type=int, default=1024, help="IVF clusters")
+    faiss_parser.add_argument("--nprobe", type=int, default=16, help="IVF clusters searched per query")
+    faiss_parser.set_defaults(func=benchmark_faiss)
+    
+    mmr_parser = subparsers.add_parser("mmr", help="Cost of MMR selection relative to plain top-k")
+    mmr_parser.add_argument("--vectors", type=int, default=20000, help="Number of random vectors")
+    mmr_parser.add_argument("--dim", type=int, default=384, help="Vector dimension")
+    mmr_parser.add_argument("--queries", type=int, default=500, help="Number of queries")
+    mmr_parser.add_argument("--k", type=int, default=5, help="Results per query")
+    mmr_parser.add_argument("--fetch-k", type=int, default=20, help="Candidates MMR selects from")
+    mmr_parser.set_defaults(func=benchmark_mmr)
+    
+    quantization_parser = subparsers.add_parser("quantization", help="Quantized vector storage: recall, latency, memory")
+    quantization_parser.add_argument("--vectors", type=int, default=20000, help="Number of random vectors")
+    quantization_parser.add_argument("--dim", type=int, default=1536, help="Vector dimension")
+    quantization_parser.add_argument("--queries", type=int, default=200, help="Number of queries")
+    quantization_parser.add_argument("--k", type=int, default=10, help="Results per query")
+    quantization_parser.add_argument("--rescore-factor", type=int, default=10, help="Binary candidates rescored per result")
+    quantization_parser.set_defaults(func=benchmark_quantization)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
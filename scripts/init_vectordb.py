@@ -15,6 +15,14 @@ from src.utils import setup_logger
 logger = setup_logger(name="init_vectordb", level="INFO")
 
 
+def log_progress(progress):
+    """Log ingestion progress after each committed batch."""
+    logger.info(
+        f"Progress: {progress.files_done}/{progress.files_total} files, "
+        f"{progress.chunks_indexed} chunks in {progress.batches_committed} batches"
+    )
+
+
 def main():
     """Initialize vector database with documents."""
     logger.info("Starting vector database initialization...")
@@ -31,9 +39,9 @@ def main():
         stats = rag_manager.get_stats()
         logger.info(f"Current stats: {stats}")
         
-        # Load and index documents
+        # Load and index new or changed documents
         logger.info("Loading and indexing documents...")
-        count = rag_manager.initialize_documents()
+        count = rag_manager.initialize_documents(progress_callback=log_progress)
         
         if count > 0:
             logger.info(f"Successfully indexed {count} document chunks")
@@ -43,6 +51,8 @@ def main():
             logger.info(f"Updated stats: {stats}")
             
             logger.info("✅ Vector database initialization complete!")
+        elif rag_manager.get_stats().get('document_count', 0) > 0:
+            logger.info("✅ Vector database is already up to date")
         else:
             logger.warning("No documents found to index. Add documents to the configured document path.")
             logger.info("You can still run the chatbot without RAG.")
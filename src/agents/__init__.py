@@ -1,7 +1,20 @@
 """Agent module for managing chatbot agents with LangGraph + ReAct."""
 
-from .base_agent import BaseAgent, Message, AgentState
+from .base_agent import BaseAgent, Message, AgentState, StreamEvent
 from .agent_manager import AgentManager
+from .conversation_store import (
+    ConversationStore,
+    InMemoryConversationStore,
+    SQLiteConversationStore,
+    create_conversation_store,
+    create_checkpointer
+)
+from .response_cache import ResponseCache, create_response_cache
 from .tools import get_available_tools, create_rag_search_tool
 
-__all__ = ['BaseAgent', 'Message', 'AgentState', 'AgentManager', 'get_available_tools', 'create_rag_search_tool']
+__all__ = [
+    'BaseAgent', 'Message', 'AgentState', 'StreamEvent', 'AgentManager',
+    'ConversationStore', 'InMemoryConversationStore', 'SQLiteConversationStore',
+    'create_conversation_store', 'create_checkpointer', 'ResponseCache', 'create_response_cache',
+    'get_available_tools', 'create_rag_search_tool'
+]
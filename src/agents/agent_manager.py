@@ -3,31 +3,76 @@ Agent Manager
 Manages multiple agents and handles agent selection.
 """
 
-from typing import Dict, Optional, Any
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
 from ..utils import get_config, get_logger
-from .base_agent import BaseAgent
+from .base_agent import BaseAgent, StreamEvent
+from .conversation_store import ConversationStore, create_conversation_store, create_checkpointer, DEFAULT_SESSION_ID
+from .response_cache import ResponseCache, create_response_cache
 
 logger = get_logger(__name__)
 
 
 class AgentManager:
-    """Manages multiple chatbot agents."""
+    """
+    Manages multiple chatbot agents.
     
-    def __init__(self, rag_retriever: Optional[Any] = None):
+    Agents are shared by all sessions; each session's history is kept in
+    the conversation store under its session ID.
+    """
+    
+    def __init__(
+        self,
+        rag_retriever: Optional[Any] = None,
+        conversation_store: Optional[ConversationStore] = None,
+        kb_version: Optional[Callable[[], Any]] = None
+    ):
         """
         Initialize the agent manager.
         
         Args:
             rag_retriever: Optional RAG retriever instance for agents
+            conversation_store: Optional history store (built from the
+                               `conversation` config section if None)
+            kb_version: Optional callable returning the knowledge-base version,
+                       used to invalidate cached responses when the index changes
         """
         self.config = get_config()
         self.rag_retriever = rag_retriever
+        conversation_config = self.config.get('conversation', {})
+        self.conversation_store = conversation_store or create_conversation_store(conversation_config)
+        # Agent graphs share one checkpointer; thread IDs are scoped per agent
+        self.checkpointer = create_checkpointer(conversation_config)
+        # Checkpoints live exactly as long as their conversation threads
+        self.conversation_store.add_eviction_listener(self._delete_checkpoints)
+        self._delete_orphaned_checkpoints()
+        
+        self.cache_config = self.config.get('response_cache', {})
+        self.response_cache: Optional[ResponseCache] = create_response_cache(self.cache_config, kb_version)
         self.agents: Dict[str, BaseAgent] = {}
         self.current_agent_name: str = "default"
         
         # Load all agents from configuration
         self._load_agents()
     
+    def _delete_checkpoints(self, thread_ids: List[str]):
+        """Delete the checkpoints of threads evicted from the conversation store."""
+        for thread_id in thread_ids:
+            self.checkpointer.delete_thread(thread_id)
+        logger.debug(f"Deleted checkpoints of {len(thread_ids)} evicted threads")
+    
+    def _delete_orphaned_checkpoints(self):
+        """Delete checkpoints of threads the store expired or lost while the app was down."""
+        thread_ids = {
+            checkpoint.config['configurable']['thread_id']
+            for checkpoint in self.checkpointer.list(None)
+        }
+        orphaned = [thread_id for thread_id in thread_ids if not self.conversation_store.has_thread(thread_id)]
+        for thread_id in orphaned:
+            self.checkpointer.delete_thread(thread_id)
+        if orphaned:
+            logger.info(f"Deleted checkpoints of {len(orphaned)} expired threads")
+    
     def _load_agents(self):
         """Load all agents from configuration."""
         agents_config = self.config.get_all_agents()
@@ -62,7 +107,9 @@ class AgentManager:
                 agent = BaseAgent(
                     name=agent_config.get('name', agent_name),
                     config=agent_config,
-                    rag_retriever=retriever
+                    rag_retriever=retriever,
+                    conversation_store=self.conversation_store,
+                    checkpointer=self.checkpointer
                 )
                 
                 self.agents[agent_name] = agent
@@ -133,34 +180,229 @@ class AgentManager:
             for name, agent in self.agents.items()
         }
     
-    def chat(self, message: str, agent_name: Optional[str] = None) -> str:
+    def chat(
+        self,
+        message: str,
+        agent_name: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> str:
         """
         Send a message to an agent and get response.
         
         Args:
             message: User message
             agent_name: Optional agent name (uses current if None)
+            session_id: Session the message belongs to
             
         Returns:
             Agent response
         """
         agent = self.get_agent(agent_name)
-        return agent.chat(message)
+        
+        scope = self._get_cache_scope(agent, session_id)
+        if scope is None:
+            return agent.chat(message, session_id=session_id)
+        
+        cached, vector = self.response_cache.lookup(message, scope)
+        if cached is not None:
+            agent.record_turn(session_id, message, cached, cached=True)
+            return cached
+        
+        response = agent.chat(message, session_id=session_id)
+        self._cache_response(agent, session_id, message, response, scope, vector)
+        return response
+    
+    def stream_chat(
+        self,
+        message: str,
+        agent_name: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> Iterator[StreamEvent]:
+        """
+        Send a message to an agent and stream the response.
+        
+        Args:
+            message: User message
+            agent_name: Optional agent name (uses current if None)
+            session_id: Session the message belongs to
+            
+        Yields:
+            StreamEvent objects with tokens and tool calls
+        """
+        agent = self.get_agent(agent_name)
+        
+        scope = self._get_cache_scope(agent, session_id)
+        if scope is None:
+            yield from agent.stream_chat(message, session_id=session_id)
+            return
+        
+        cached, vector = self.response_cache.lookup(message, scope)
+        if cached is not None:
+            agent.record_turn(session_id, message, cached, cached=True)
+            yield StreamEvent(type='token', content=cached, metadata={"cached": True})
+            return
+        
+        parts = []
+        for event in agent.stream_chat(message, session_id=session_id):
+            if event.type == 'token':
+                parts.append(event.content)
+            elif event.type == 'retract':
+                parts.clear()
+            yield event
+        self._cache_response(agent, session_id, message, ''.join(parts), scope, vector)
+    
+    async def achat(
+        self,
+        message: str,
+        agent_name: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> str:
+        """
+        Send a message to an agent and get the response without blocking the event loop.
+        
+        Cache lookups embed the message, so they run in a thread like the
+        other blocking steps of the turn.
+        
+        Args:
+            message: User message
+            agent_name: Optional agent name (uses current if None)
+            session_id: Session the message belongs to
+        
+        Returns:
+            Agent response
+        """
+        agent = self.get_agent(agent_name)
+        
+        scope = await asyncio.to_thread(self._get_cache_scope, agent, session_id)
+        if scope is None:
+            return await agent.achat(message, session_id=session_id)
+        
+        cached, vector = await asyncio.to_thread(self.response_cache.lookup, message, scope)
+        if cached is not None:
+            await asyncio.to_thread(agent.record_turn, session_id, message, cached, cached=True)
+            return cached
+        
+        response = await agent.achat(message, session_id=session_id)
+        await asyncio.to_thread(self._cache_response, agent, session_id, message, response, scope, vector)
+        return response
     
-    def clear_history(self, agent_name: Optional[str] = None):
+    async def astream_chat(
+        self,
+        message: str,
+        agent_name: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Send a message to an agent and stream the response without blocking the event loop.
+        
+        Args:
+            message: User message
+            agent_name: Optional agent name (uses current if None)
+            session_id: Session the message belongs to
+        
+        Yields:
+            StreamEvent objects with tokens and tool calls
+        """
+        agent = self.get_agent(agent_name)
+        
+        scope = await asyncio.to_thread(self._get_cache_scope, agent, session_id)
+        if scope is None:
+            async for event in agent.astream_chat(message, session_id=session_id):
+                yield event
+            return
+        
+        cached, vector = await asyncio.to_thread(self.response_cache.lookup, message, scope)
+        if cached is not None:
+            await asyncio.to_thread(agent.record_turn, session_id, message, cached, cached=True)
+            yield StreamEvent(type='token', content=cached, metadata={"cached": True})
+            return
+        
+        parts = []
+        async for event in agent.astream_chat(message, session_id=session_id):
+            if event.type == 'token':
+                parts.append(event.content)
+            elif event.type == 'retract':
+                parts.clear()
+            yield event
+        await asyncio.to_thread(self._cache_response, agent, session_id, message, ''.join(parts), scope, vector)
+    
+    def _get_cache_scope(self, agent: BaseAgent, session_id: str) -> Optional[str]:
+        """
+        Get the response cache scope for a turn, or None if it must not be cached.
+        
+        By default only the first turn of a conversation is cached, since
+        later answers depend on the conversation so far. The scope includes
+        the agent's enabled tools, so toggling a tool doesn't serve answers
+        produced with the old tool set.
+        """
+        if self.response_cache is None:
+            return None
+        if not self.cache_config.get('cache_with_history', False) and agent.get_history(session_id):
+            return None
+        
+        model = getattr(agent.llm, 'model_name', None) or getattr(agent.llm, 'model', '')
+        tools = [tool.name for tool in agent.tools]
+        return self.response_cache.make_scope(agent.name, agent.system_prompt, str(model), tools)
+    
+    def _cache_response(
+        self,
+        agent: BaseAgent,
+        session_id: str,
+        message: str,
+        response: str,
+        scope: str,
+        vector: Optional[Any]
+    ):
+        """Cache a fresh answer unless it failed or came from a tool with side effects."""
+        history = agent.get_history(session_id)
+        if not history or history[-1].role != 'assistant' or history[-1].content != response:
+            # Errors are returned without being stored in the history
+            return
+        
+        uncacheable = set(self.cache_config.get('uncacheable_tools', ['send_email']))
+        tools_used = {summary.split(':', 1)[0] for summary in history[-1].metadata.get('tools_executed', [])}
+        if tools_used & uncacheable:
+            return
+        
+        self.response_cache.store(message, scope, response, vector=vector)
+    
+    def get_cache_stats(self) -> Optional[Dict[str, Any]]:
+        """Get response cache statistics, or None if caching is disabled."""
+        return self.response_cache.get_stats() if self.response_cache else None
+    
+    def clear_history(
+        self,
+        agent_name: Optional[str] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ):
         """
         Clear conversation history for an agent.
         
         Args:
             agent_name: Optional agent name (uses current if None)
+            session_id: Session whose history is cleared
         """
         agent = self.get_agent(agent_name)
-        agent.clear_history()
+        agent.clear_history(session_id)
     
-    def clear_all_histories(self):
-        """Clear conversation history for all agents."""
-        for agent in self.agents.values():
-            agent.clear_history()
+    def clear_all_histories(self, session_id: Optional[str] = None):
+        """
+        Clear conversation history for all agents.
+        
+        Args:
+            session_id: Session whose histories are cleared (all sessions if None)
+        """
+        if session_id is None:
+            self.conversation_store.clear_all()
+            thread_ids = {
+                checkpoint.config['configurable']['thread_id']
+                for checkpoint in self.checkpointer.list(None)
+            }
+            for thread_id in thread_ids:
+                self.checkpointer.delete_thread(thread_id)
+        else:
+            for agent in self.agents.values():
+                agent.clear_history(session_id)
         logger.info("Cleared all agent histories")
     
     def update_agent_tools(self, use_tools: bool, enable_web_search: bool):
@@ -180,26 +422,30 @@ class AgentManager:
         enable_calculator: bool,
         enable_rag_search: bool,
         enable_web_search: bool,
-        enable_email: bool
+        enable_email: bool,
+        agent_name: Optional[str] = None
     ):
         """
-        Update individual tool configurations for the current agent.
+        Update individual tool configurations of an agent.
+        
+        The agent is shared, so the change applies to every session using it.
         
         Args:
             enable_calculator: Whether to enable calculator tool
             enable_rag_search: Whether to enable RAG search tool
             enable_web_search: Whether to enable web search tool
             enable_email: Whether to enable email tool
+            agent_name: Agent to update (current agent if None)
         """
-        current_agent = self.get_current_agent()
-        current_agent.update_tools_individual(
+        agent = self.get_agent(agent_name)
+        agent.update_tools_individual(
             enable_calculator=enable_calculator,
             enable_rag_search=enable_rag_search,
             enable_web_search=enable_web_search,
             enable_email=enable_email
         )
         logger.info(
-            f"Updated individual tools for {self.current_agent_name}: "
+            f"Updated individual tools for {agent_name or self.current_agent_name}: "
             f"calculator={enable_calculator}, rag={enable_rag_search}, "
             f"web={enable_web_search}, email={enable_email}"
         )
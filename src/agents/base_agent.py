@@ -3,45 +3,73 @@ Base Agent Class - LangGraph + ReAct Implementation
 Uses LangGraph for orchestration and ReAct framework for reasoning and acting.
 """
 
-from typing import List, Dict, Any, Optional, TypedDict, Annotated, Sequence
+from typing import List, Dict, Any, AsyncIterator, Iterator, Optional, Tuple, TypedDict, Annotated, Sequence
 from dataclasses import dataclass, field
-from datetime import datetime
-import operator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import asyncio
+import re
+import time
+import uuid
 
-from langgraph.graph import StateGraph, END
-from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
-from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.config import get_stream_writer
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    AIMessage,
+    SystemMessage,
+    ToolMessage,
+    RemoveMessage,
+    message_chunk_to_message
+)
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 
 from ..llm import get_llm
 from ..utils import get_logger
-from .tools import get_available_tools
+from .tools import KNOWLEDGE_BASE_TOOL, get_available_tools
+from .conversation_store import ConversationStore, InMemoryConversationStore, Message, DEFAULT_SESSION_ID
 
 logger = get_logger(__name__)
 
+EMPTY_RESPONSE = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+
 
 @dataclass
-class Message:
-    """Represents a chat message."""
-    role: str  # 'user', 'assistant', 'system'
-    content: str
-    timestamp: datetime = field(default_factory=datetime.now)
+class StreamEvent:
+    """An event emitted while a response is streamed."""
+    type: str  # 'token', 'retract', 'tool_start', 'tool_end'
+    content: str = ""
     metadata: Dict[str, Any] = field(default_factory=dict)
 
 
 class AgentState(TypedDict):
-    """State for the agent graph."""
-    messages: Annotated[Sequence[BaseMessage], operator.add]
-    intermediate_steps: List[tuple]
+    """State for the agent graph, checkpointed per conversation thread."""
+    messages: Annotated[Sequence[BaseMessage], add_messages]
+    intermediate_steps: List[tuple]  # (tool name, result) of the current turn
+    iterations: int  # LLM calls in the current turn
 
 
 class BaseAgent:
-    """Base class for all chatbot agents using LangGraph + ReAct."""
+    """
+    Base class for all chatbot agents using LangGraph + ReAct.
+    
+    Conversation history lives in a ConversationStore keyed by session, so
+    one agent instance can serve many sessions concurrently. Every turn
+    also has an async variant (achat, astream_chat) that awaits the LLM,
+    retriever and async-capable tools, and runs sync tools on the tool
+    thread pool, so one event loop can serve many conversations at once.
+    """
     
     def __init__(
         self,
         name: str,
         config: Dict[str, Any],
-        rag_retriever: Optional[Any] = None
+        rag_retriever: Optional[Any] = None,
+        conversation_store: Optional[ConversationStore] = None,
+        checkpointer: Optional[BaseCheckpointSaver] = None
     ):
         """
         Initialize the agent with LangGraph and ReAct framework.
@@ -50,10 +78,14 @@ class BaseAgent:
             name: Agent name
             config: Agent configuration dictionary
             rag_retriever: Optional RAG retriever instance
+            conversation_store: Store for per-session history (in-memory if None)
+            checkpointer: LangGraph checkpointer for thread state (in-memory if None)
         """
         self.name = name
         self.config = config
         self.rag_retriever = rag_retriever
+        self.conversation_store = conversation_store or InMemoryConversationStore()
+        self.checkpointer = checkpointer or InMemorySaver()
         
         # Extract configuration
         self.description = config.get('description', '')
@@ -62,41 +94,84 @@ class BaseAgent:
         self.max_history = config.get('max_history', 10)
         self.use_tools = config.get('use_tools', True)
         
+        # ReAct loop limits
+        self.max_iterations = config.get('max_iterations', 5)
+        self.tool_timeout = config.get('tool_timeout', 30)
+        
+        # Speculative knowledge-base search for the user message: 'prefetch'
+        # runs it alongside the first LLM call, 'inject' before it
+        self.speculative_retrieval = config.get('speculative_retrieval', 'off')
+        self.speculative_min_overlap = config.get('speculative_min_overlap', 0.5)
+        self._prefetches: Dict[str, Tuple[str, Any]] = {}
+        
         # Initialize LLM
         self.llm = get_llm(agent_config=config)
         
+        # Independent tool calls from one LLM turn run concurrently
+        self._tool_executor = ThreadPoolExecutor(
+            max_workers=config.get('max_tool_workers', 4),
+            thread_name_prefix=f"tools-{name}"
+        )
+        
         # Initialize tools
-        self.tools = []
+        tools = []
         if self.use_tools:
             # Get email config from agent config or None
             email_config = config.get('email_config')
             
-            self.tools = get_available_tools(
+            tools = get_available_tools(
                 rag_retriever=self.rag_retriever if self.use_rag else None,
                 include_web_search=config.get('enable_web_search', False),
                 email_config=email_config
             )
         
-        # Initialize conversation history
-        self.conversation_history: List[Message] = []
-        
         # Bind tools to LLM if available
+        self.set_tools(tools)
+        
+        # Nodes read tools and LLMs from the instance, so rebinding needs no rebuild
+        self.graph = self._build_graph()
+        
+        logger.info(f"Initialized agent: {name} with {len(self.tools)} tools")
+    
+    def set_tools(self, tools: List[Any]):
+        """
+        Replace the agent's tools and bind them to the LLM.
+        
+        Args:
+            tools: Tool instances
+        """
+        self.tools = tools
+        self._tools_by_name = {tool.name: tool for tool in tools}
+        
         if self.tools:
             try:
                 self.llm_with_tools = self.llm.bind_tools(self.tools)
-                logger.info(f"Bound {len(self.tools)} tools to LLM for {name}")
+                logger.info(f"Bound {len(self.tools)} tools to LLM for {self.name}")
             except Exception as e:
                 logger.warning(f"Could not bind tools to LLM: {e}. Tools will not be available.")
                 self.llm_with_tools = self.llm
         else:
             self.llm_with_tools = self.llm
+    
+    def get_thread_id(self, session_id: str) -> str:
+        """
+        Get the conversation store thread for a session.
         
-        logger.info(f"Initialized agent: {name} with {len(self.tools)} tools")
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Thread identifier scoped to this agent
+        """
+        return f"{session_id}/{self.name}"
     
-    def _build_messages_for_history(self) -> List[BaseMessage]:
+    def _build_messages_for_history(self, session_id: str = DEFAULT_SESSION_ID) -> List[BaseMessage]:
         """
         Build message history for context.
         
+        Args:
+            session_id: Session whose history is used
+        
         Returns:
             List of BaseMessage objects
         """
@@ -106,7 +181,10 @@ class BaseAgent:
         messages.append(SystemMessage(content=self.system_prompt))
         
         # Add conversation history (limit to max_history)
-        history_to_include = self.conversation_history[-(self.max_history * 2):]
+        history_to_include = self.conversation_store.get_messages(
+            self.get_thread_id(session_id),
+            limit=self.max_history * 2
+        )
         for msg in history_to_include:
             if msg.role == 'user':
                 messages.append(HumanMessage(content=msg.content))
@@ -115,115 +193,828 @@ class BaseAgent:
         
         return messages
     
+    def _execute_tool_call(self, tool_call: Dict[str, Any]) -> Tuple[ToolMessage, Optional[str]]:
+        """
+        Execute one tool call requested by the LLM.
+        
+        Args:
+            tool_call: Tool call dictionary with name, args and id
+        
+        Returns:
+            Tuple of (ToolMessage for the LLM, summary string if the tool ran or None)
+        """
+        tool = self._tools_by_name.get(tool_call.get('name', ''))
+        if tool is None:
+            return self._tool_result(tool_call, None)
+        
+        try:
+            args, kwargs = self._tool_arguments(tool_call)
+            return self._tool_result(tool_call, tool.func(*args, **kwargs))
+        except Exception as e:
+            return self._tool_result(tool_call, None, error=e)
+    
+    async def _aexecute_tool_call(self, tool_call: Dict[str, Any]) -> Tuple[ToolMessage, Optional[str]]:
+        """
+        Execute one tool call requested by the LLM without blocking the event loop.
+        
+        Tools with a coroutine are awaited; sync tools run on the tool
+        thread pool.
+        
+        Args:
+            tool_call: Tool call dictionary with name, args and id
+        
+        Returns:
+            Tuple of (ToolMessage for the LLM, summary string if the tool ran or None)
+        """
+        tool = self._tools_by_name.get(tool_call.get('name', ''))
+        if tool is None or getattr(tool, 'coroutine', None) is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._tool_executor, self._execute_tool_call, tool_call)
+        
+        try:
+            args, kwargs = self._tool_arguments(tool_call)
+            return self._tool_result(tool_call, await tool.coroutine(*args, **kwargs))
+        except Exception as e:
+            return self._tool_result(tool_call, None, error=e)
+    
+    @staticmethod
+    def _tool_arguments(tool_call: Dict[str, Any]) -> Tuple[tuple, Dict[str, Any]]:
+        """Get the positional and keyword arguments of a tool call."""
+        tool_args = tool_call.get('args', {})
+        if isinstance(tool_args, dict) and len(tool_args) == 1:
+            # Single argument, pass directly
+            return (list(tool_args.values())[0],), {}
+        # Multiple or no arguments
+        return (), (tool_args or {})
+    
+    def _tool_result(
+        self,
+        tool_call: Dict[str, Any],
+        tool_result: Any,
+        error: Optional[Exception] = None
+    ) -> Tuple[ToolMessage, Optional[str]]:
+        """
+        Build the message and summary for the outcome of a tool call.
+        
+        Args:
+            tool_call: Tool call dictionary with name, args and id
+            tool_result: Value returned by the tool
+            error: Exception raised by the tool, if any
+        
+        Returns:
+            Tuple of (ToolMessage for the LLM, summary string if the tool ran or None)
+        """
+        tool_name = tool_call.get('name', '')
+        executed = None
+        
+        if error is not None:
+            tool_result = f"Error executing {tool_name}: {str(error)}"
+            logger.error(f"Tool execution error: {error}")
+        elif tool_name not in self._tools_by_name:
+            tool_result = f"Tool {tool_name} not found"
+        else:
+            executed = f"{tool_name}: {tool_result}"
+            logger.info(f"Executed tool {tool_name} with result: {tool_result[:100] if tool_result else 'None'}")
+        
+        # Add tool result with proper tool_call_id
+        return ToolMessage(content=str(tool_result), tool_call_id=tool_call.get('id', '')), executed
+    
+    def _run_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        prefetch: Optional[Tuple[str, Any]] = None
+    ) -> Iterator[Tuple[int, ToolMessage, Optional[str]]]:
+        """
+        Run the tool calls of one LLM turn concurrently.
+        
+        All calls share one deadline of tool_timeout seconds, so a turn takes
+        as long as its slowest tool rather than the sum of all of them.
+        Calls still running at the deadline get a timeout message.
+        
+        Args:
+            tool_calls: Tool calls requested by the LLM
+            prefetch: (query, future) of a speculative knowledge-base search,
+                      which answers the first matching call
+        
+        Yields:
+            Tuples of (index in tool_calls, ToolMessage, summary or None) in completion order
+        """
+        served = self._prefetch_index(tool_calls, prefetch)
+        futures = {
+            (prefetch[1] if index == served else self._tool_executor.submit(self._execute_tool_call, tool_call)): index
+            for index, tool_call in enumerate(tool_calls)
+        }
+        deadline = time.monotonic() + self.tool_timeout
+        pending = set(futures)
+        
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for future in done:
+                tool_message, executed = future.result()
+                yield futures[future], self._retarget(tool_message, tool_calls[futures[future]]), executed
+        
+        for future in pending:
+            # The thread can't be interrupted; its result is discarded
+            future.cancel()
+            yield futures[future], self._timeout_message(tool_calls[futures[future]]), None
+    
+    async def _arun_tool_calls(
+        self,
+        tool_calls: List[Dict[str, Any]],
+        prefetch: Optional[Tuple[str, Any]] = None
+    ) -> AsyncIterator[Tuple[int, ToolMessage, Optional[str]]]:
+        """
+        Run the tool calls of one LLM turn concurrently on the event loop.
+        
+        Same contract as _run_tool_calls; async tools still running at the
+        deadline are cancelled.
+        
+        Args:
+            tool_calls: Tool calls requested by the LLM
+            prefetch: (query, task) of a speculative knowledge-base search,
+                      which answers the first matching call
+        
+        Yields:
+            Tuples of (index in tool_calls, ToolMessage, summary or None) in completion order
+        """
+        loop = asyncio.get_running_loop()
+        served = self._prefetch_index(tool_calls, prefetch)
+        tasks = {
+            (prefetch[1] if index == served else asyncio.ensure_future(self._aexecute_tool_call(tool_call))): index
+            for index, tool_call in enumerate(tool_calls)
+        }
+        deadline = loop.time() + self.tool_timeout
+        pending = set(tasks)
+        
+        while pending:
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=max(0.0, deadline - loop.time()),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+            for task in done:
+                tool_message, executed = task.result()
+                yield tasks[task], self._retarget(tool_message, tool_calls[tasks[task]]), executed
+        
+        for task in pending:
+            task.cancel()
+            yield tasks[task], self._timeout_message(tool_calls[tasks[task]]), None
+    
+    def _speculative_call(self, state: AgentState) -> Optional[Dict[str, Any]]:
+        """
+        Get a knowledge-base tool call for the user message of a new turn.
+        
+        Args:
+            state: Graph state before an LLM call
+        
+        Returns:
+            Tool call dictionary, or None if speculative retrieval doesn't apply
+        """
+        if self.speculative_retrieval not in ('prefetch', 'inject') or state.get('iterations', 0):
+            return None
+        if KNOWLEDGE_BASE_TOOL not in self._tools_by_name:
+            return None
+        
+        message = state['messages'][-1]
+        if not isinstance(message, HumanMessage) or not isinstance(message.content, str):
+            return None
+        return {'name': KNOWLEDGE_BASE_TOOL, 'args': {'query': message.content}, 'id': f"prefetch_{uuid.uuid4().hex}"}
+    
+    def _start_prefetch(self, thread_id: str, tool_call: Dict[str, Any], future: Any):
+        """Remember the running speculative search of a thread, cancelling an unused older one."""
+        self._drop_prefetch(thread_id)
+        self._prefetches[thread_id] = (tool_call['args']['query'], future)
+    
+    def _drop_prefetch(self, thread_id: str, response: Optional[BaseMessage] = None):
+        """Discard the speculative search of a thread unless the response has tool calls it may answer."""
+        if response is not None and getattr(response, 'tool_calls', None):
+            return
+        prefetch = self._prefetches.pop(thread_id, None)
+        if prefetch is not None:
+            prefetch[1].cancel()
+    
+    def _prefetch_index(self, tool_calls: List[Dict[str, Any]], prefetch: Optional[Tuple[str, Any]]) -> Optional[int]:
+        """
+        Find the tool call that a speculative search can answer.
+        
+        The LLM usually rewrites the message into a shorter query, so a call
+        matches if at least speculative_min_overlap of its query words
+        occur in the searched message. An unused search is cancelled.
+        
+        Args:
+            tool_calls: Tool calls requested by the LLM
+            prefetch: (query, future) of the speculative search
+        
+        Returns:
+            Index of the first matching knowledge-base call, or None
+        """
+        if prefetch is None:
+            return None
+        
+        searched = set(re.findall(r'\w+', prefetch[0].lower()))
+        for index, tool_call in enumerate(tool_calls):
+            if tool_call.get('name') != KNOWLEDGE_BASE_TOOL:
+                continue
+            args, kwargs = self._tool_arguments(tool_call)
+            words = set(re.findall(r'\w+', str(args[0] if args else kwargs.get('query', '')).lower()))
+            if words and len(words & searched) / len(words) >= self.speculative_min_overlap:
+                logger.info(f"Answering {KNOWLEDGE_BASE_TOOL} call from the speculative search")
+                return index
+        
+        prefetch[1].cancel()
+        return None
+    
+    @staticmethod
+    def _retarget(tool_message: ToolMessage, tool_call: Dict[str, Any]) -> ToolMessage:
+        """Address a tool result (possibly of a speculative search) to the call it answers."""
+        if tool_message.tool_call_id == tool_call.get('id', ''):
+            return tool_message
+        return ToolMessage(content=tool_message.content, tool_call_id=tool_call.get('id', ''))
+    
+    def _timeout_message(self, tool_call: Dict[str, Any]) -> ToolMessage:
+        """Get the message for a tool call that missed the tool_timeout deadline."""
+        tool_name = tool_call.get('name', '')
+        logger.warning(f"Tool {tool_name} timed out after {self.tool_timeout}s")
+        return ToolMessage(
+            content=f"Error executing {tool_name}: timed out after {self.tool_timeout} seconds",
+            tool_call_id=tool_call.get('id', '')
+        )
+    
+    def _call_model(self, model: Any, messages: List[BaseMessage], config: RunnableConfig) -> BaseMessage:
+        """
+        Call the LLM from a graph node.
+        
+        When the run was started by stream_chat, the completion is streamed
+        and each text chunk is emitted as a 'token' event; otherwise it is
+        generated in one call. Once the completion starts requesting tools
+        it is an intermediate step: the text it already streamed is
+        withdrawn with a 'retract' event and its remaining text is not
+        emitted.
+        """
+        if not config.get('configurable', {}).get('stream_tokens'):
+            return model.invoke(messages)
+        
+        writer = get_stream_writer()
+        aggregated = None
+        streamed: List[str] = []
+        for chunk in model.stream(messages):
+            aggregated = chunk if aggregated is None else aggregated + chunk
+            event = self._stream_event(chunk, aggregated, streamed)
+            if event is not None:
+                writer(event)
+        return message_chunk_to_message(aggregated) if aggregated is not None else AIMessage(content='')
+    
+    @staticmethod
+    def _stream_event(chunk: Any, aggregated: Any, streamed: List[str]) -> Optional[StreamEvent]:
+        """
+        Get the event to emit for a streamed chunk, if any.
+        
+        Args:
+            chunk: Latest chunk of the completion
+            aggregated: All chunks of the completion so far
+            streamed: Text emitted for this completion, updated in place
+        
+        Returns:
+            A 'token' event with the chunk's text, a 'retract' event with
+            the text streamed before the first tool-call chunk, or None
+        """
+        if getattr(aggregated, 'tool_call_chunks', None):
+            if not streamed:
+                return None
+            # Providers send a tool-calling step's text before its tool calls
+            text = ''.join(streamed)
+            streamed.clear()
+            return StreamEvent(type='retract', content=text)
+        
+        text = chunk.content if isinstance(chunk.content, str) else ''
+        if not text:
+            return None
+        streamed.append(text)
+        return StreamEvent(type='token', content=text)
+    
+    async def _acall_model(self, model: Any, messages: List[BaseMessage], config: RunnableConfig) -> BaseMessage:
+        """Call the LLM from an async graph node; see _call_model."""
+        if not config.get('configurable', {}).get('stream_tokens'):
+            return await model.ainvoke(messages)
+        
+        writer = get_stream_writer()
+        aggregated = None
+        streamed: List[str] = []
+        async for chunk in model.astream(messages):
+            aggregated = chunk if aggregated is None else aggregated + chunk
+            event = self._stream_event(chunk, aggregated, streamed)
+            if event is not None:
+                writer(event)
+        return message_chunk_to_message(aggregated) if aggregated is not None else AIMessage(content='')
+    
+    def _select_context(self, messages: Sequence[BaseMessage]) -> Tuple[List[BaseMessage], List[BaseMessage]]:
+        """
+        Split thread state into the messages sent to the LLM and those to drop.
+        
+        The current turn is kept whole. Earlier turns are limited to the last
+        max_history exchanges and reduced to user messages and final answers,
+        so old tool calls and results don't bloat prompts or checkpoints.
+        
+        Args:
+            messages: Messages in the thread state
+            
+        Returns:
+            Tuple of (context messages, messages to remove from the state)
+        """
+        human_indexes = [i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)]
+        if not human_indexes:
+            return list(messages), []
+        
+        current = human_indexes[-1]
+        window_start = human_indexes[max(0, len(human_indexes) - 1 - self.max_history)]
+        
+        context = [
+            msg for msg in messages[window_start:current]
+            if isinstance(msg, HumanMessage) or (isinstance(msg, AIMessage) and not msg.tool_calls)
+        ]
+        kept = {id(msg) for msg in context}
+        removed = [msg for msg in messages[:current] if id(msg) not in kept]
+        
+        return context + list(messages[current:]), removed
+    
+    def _agent_node(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Graph node: let the LLM reason and possibly request tools."""
+        thread_id = config['configurable']['thread_id']
+        injected = []
+        speculative_call = self._speculative_call(state)
+        if speculative_call is not None and self.speculative_retrieval == 'inject':
+            writer = get_stream_writer()
+            self._emit_tool_starts(writer, [speculative_call])
+            injected.append(self._injected(writer, speculative_call, *self._execute_tool_call(speculative_call)))
+        elif speculative_call is not None:
+            future = self._tool_executor.submit(self._execute_tool_call, speculative_call)
+            self._start_prefetch(thread_id, speculative_call, future)
+        
+        context, removed = self._select_context(state['messages'])
+        response = None
+        try:
+            response = self._call_model(
+                self.llm_with_tools,
+                [SystemMessage(content=self.system_prompt)] + context + self._injected_messages(injected),
+                config
+            )
+        finally:
+            self._drop_prefetch(thread_id, response)
+        return self._agent_update(state, removed, response, injected)
+    
+    async def _aagent_node(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Async graph node: let the LLM reason and possibly request tools."""
+        thread_id = config['configurable']['thread_id']
+        injected = []
+        speculative_call = self._speculative_call(state)
+        if speculative_call is not None and self.speculative_retrieval == 'inject':
+            writer = get_stream_writer()
+            self._emit_tool_starts(writer, [speculative_call])
+            injected.append(self._injected(writer, speculative_call, *await self._aexecute_tool_call(speculative_call)))
+        elif speculative_call is not None:
+            task = asyncio.ensure_future(self._aexecute_tool_call(speculative_call))
+            self._start_prefetch(thread_id, speculative_call, task)
+        
+        context, removed = self._select_context(state['messages'])
+        response = None
+        try:
+            response = await self._acall_model(
+                self.llm_with_tools,
+                [SystemMessage(content=self.system_prompt)] + context + self._injected_messages(injected),
+                config
+            )
+        finally:
+            self._drop_prefetch(thread_id, response)
+        return self._agent_update(state, removed, response, injected)
+    
+    def _injected(
+        self,
+        writer: Any,
+        tool_call: Dict[str, Any],
+        tool_message: ToolMessage,
+        executed: Optional[str]
+    ) -> Tuple[Dict[str, Any], ToolMessage, Optional[Tuple[str, str]]]:
+        """Emit the 'tool_end' event of a speculative search and get its (call, message, step)."""
+        _, tool_message, step = self._tool_finished(writer, tool_call, 0, tool_message, executed)
+        return tool_call, tool_message, step
+    
+    @staticmethod
+    def _injected_messages(injected: List[Tuple[Dict[str, Any], ToolMessage, Any]]) -> List[BaseMessage]:
+        """Present speculative searches to the LLM as a tool round it already made."""
+        if not injected:
+            return []
+        return [AIMessage(content='', tool_calls=[tool_call for tool_call, _, _ in injected])] + [
+            tool_message for _, tool_message, _ in injected
+        ]
+    
+    def _agent_update(
+        self,
+        state: AgentState,
+        removed: List[BaseMessage],
+        response: BaseMessage,
+        injected: List[Tuple[Dict[str, Any], ToolMessage, Optional[Tuple[str, str]]]]
+    ) -> Dict[str, Any]:
+        """Get the state update of an agent node, recording injected searches as a tool round."""
+        update = {
+            "messages": [RemoveMessage(id=msg.id) for msg in removed if msg.id],
+            "iterations": state.get('iterations', 0) + 1
+        }
+        if injected:
+            update["messages"] += self._injected_messages(injected)
+            update["intermediate_steps"] = list(state.get('intermediate_steps', [])) + [
+                step for _, _, step in injected if step
+            ]
+        update["messages"].append(response)
+        return update
+    
+    def _tools_node(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Graph node: run the tool calls of the last LLM turn concurrently."""
+        writer = get_stream_writer()
+        tool_calls = state['messages'][-1].tool_calls
+        self._emit_tool_starts(writer, tool_calls)
+        
+        prefetch = self._prefetches.pop(config['configurable']['thread_id'], None)
+        results = []
+        for index, tool_message, executed in self._run_tool_calls(tool_calls, prefetch):
+            results.append(self._tool_finished(writer, tool_calls[index], index, tool_message, executed))
+        return self._tools_update(state, results)
+    
+    async def _atools_node(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Async graph node: run the tool calls of the last LLM turn concurrently."""
+        writer = get_stream_writer()
+        tool_calls = state['messages'][-1].tool_calls
+        self._emit_tool_starts(writer, tool_calls)
+        
+        prefetch = self._prefetches.pop(config['configurable']['thread_id'], None)
+        results = []
+        async for index, tool_message, executed in self._arun_tool_calls(tool_calls, prefetch):
+            results.append(self._tool_finished(writer, tool_calls[index], index, tool_message, executed))
+        return self._tools_update(state, results)
+    
+    @staticmethod
+    def _emit_tool_starts(writer: Any, tool_calls: List[Dict[str, Any]]):
+        """Emit a 'tool_start' event per tool call."""
+        for tool_call in tool_calls:
+            writer(StreamEvent(
+                type='tool_start',
+                content=tool_call.get('name', ''),
+                metadata={"args": tool_call.get('args', {})}
+            ))
+    
+    @staticmethod
+    def _tool_finished(
+        writer: Any,
+        tool_call: Dict[str, Any],
+        index: int,
+        tool_message: ToolMessage,
+        executed: Optional[str]
+    ) -> Tuple[int, ToolMessage, Optional[Tuple[str, str]]]:
+        """Emit the 'tool_end' event of a finished call and get its (index, message, step)."""
+        tool_name = tool_call.get('name', '')
+        writer(StreamEvent(
+            type='tool_end',
+            content=tool_name,
+            metadata={"result": tool_message.content}
+        ))
+        return index, tool_message, (tool_name, tool_message.content) if executed else None
+    
+    @staticmethod
+    def _tools_update(
+        state: AgentState,
+        results: List[Tuple[int, ToolMessage, Optional[Tuple[str, str]]]]
+    ) -> Dict[str, Any]:
+        """Get the state update of a tools node from its results in completion order."""
+        steps = list(state.get('intermediate_steps', []))
+        steps.extend(step for _, _, step in results if step)
+        
+        # Tool results go back in the order the LLM requested them
+        return {
+            "messages": [tool_message for _, tool_message, _ in sorted(results, key=lambda item: item[0])],
+            "intermediate_steps": steps
+        }
+    
+    def _final_node(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Graph node: answer without tools once max_iterations is reached."""
+        logger.warning(f"Agent {self.name} reached max_iterations={self.max_iterations}; forcing a final answer")
+        context, _ = self._select_context(state['messages'])
+        response = self._call_model(self.llm, [SystemMessage(content=self.system_prompt)] + context, config)
+        return {"messages": [response]}
+    
+    async def _afinal_node(self, state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
+        """Async graph node: answer without tools once max_iterations is reached."""
+        logger.warning(f"Agent {self.name} reached max_iterations={self.max_iterations}; forcing a final answer")
+        context, _ = self._select_context(state['messages'])
+        response = await self._acall_model(self.llm, [SystemMessage(content=self.system_prompt)] + context, config)
+        return {"messages": [response]}
+    
+    @staticmethod
+    def _route_after_agent(state: AgentState) -> str:
+        """Go to the tools node if the LLM requested tools, otherwise finish."""
+        return "tools" if getattr(state['messages'][-1], 'tool_calls', None) else END
+    
+    def _route_after_tools(self, state: AgentState) -> str:
+        """Return to the LLM unless the iteration budget is spent."""
+        return "final" if state.get('iterations', 0) >= self.max_iterations else "agent"
+    
+    def _build_graph(self):
+        """
+        Build and compile the ReAct graph.
+        
+        agent -> tools -> agent ... until the LLM answers without tools, or
+        -> final after max_iterations rounds of tool calls. Each node has a
+        sync and an async implementation; invoke/stream use the first and
+        ainvoke/astream the second.
+        
+        Returns:
+            Compiled graph using the agent's checkpointer
+        """
+        graph = StateGraph(AgentState)
+        graph.add_node("agent", RunnableLambda(self._agent_node, afunc=self._aagent_node))
+        graph.add_node("tools", RunnableLambda(self._tools_node, afunc=self._atools_node))
+        graph.add_node("final", RunnableLambda(self._final_node, afunc=self._afinal_node))
+        
+        graph.add_edge(START, "agent")
+        graph.add_conditional_edges("agent", self._route_after_agent, {"tools": "tools", END: END})
+        graph.add_conditional_edges("tools", self._route_after_tools, {"agent": "agent", "final": "final"})
+        graph.add_edge("final", END)
+        
+        return graph.compile(checkpointer=self.checkpointer)
+    
+    def _run_config(self, session_id: str, stream_tokens: bool = False) -> Dict[str, Any]:
+        """Get the graph run configuration for a session."""
+        return {
+            "configurable": {
+                "thread_id": self.get_thread_id(session_id),
+                "stream_tokens": stream_tokens
+            },
+            # Each tool round takes two graph steps
+            "recursion_limit": self.max_iterations * 2 + 5
+        }
+    
+    def _turn_input(self, message: str, session_id: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the graph input for a new user message.
+        
+        Checkpointed threads only need the new message. Threads without a
+        checkpoint (e.g. after a restart with the in-memory checkpointer)
+        are seeded once from the conversation store. A checkpoint whose
+        thread the store has forgotten (idle TTL, eviction or a restart of
+        the in-memory store) is dropped, so the LLM never sees history that
+        get_history no longer shows.
+        """
+        state = self.graph.get_state(config)
+        return self._new_turn(message, session_id, bool(state.values.get('messages')))
+    
+    async def _aturn_input(self, message: str, session_id: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the graph input for a new user message; see _turn_input."""
+        state = await self.graph.aget_state(config)
+        return await asyncio.to_thread(
+            self._new_turn, message, session_id, bool(state.values.get('messages'))
+        )
+    
+    def _new_turn(self, message: str, session_id: str, checkpointed: bool) -> Dict[str, Any]:
+        """Get the graph input for a message, seeded from the conversation store if not checkpointed."""
+        thread_id = self.get_thread_id(session_id)
+        if checkpointed and not self.conversation_store.has_thread(thread_id):
+            self.checkpointer.delete_thread(thread_id)
+            checkpointed = False
+        
+        messages: List[BaseMessage] = [HumanMessage(content=message)]
+        if not checkpointed:
+            messages = self._build_messages_for_history(session_id)[1:] + messages
+        return {"messages": messages, "iterations": 0, "intermediate_steps": []}
+    
+    @staticmethod
+    def _summarize_turn(state: Dict[str, Any]) -> Tuple[str, List[str]]:
+        """
+        Extract the response text and executed tools of the latest turn.
+        
+        The response is the turn's final answer only: text the LLM wrote
+        alongside tool calls ("Let me look that up") is not part of it.
+        
+        Returns:
+            Tuple of (response text, tool summaries)
+        """
+        messages = state.get('messages', [])
+        last_human = max((i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=-1)
+        answers = [
+            msg for msg in messages[last_human + 1:]
+            if isinstance(msg, AIMessage) and not msg.tool_calls and isinstance(msg.content, str)
+        ]
+        response_text = answers[-1].content if answers else ''
+        tool_calls_made = [f"{name}: {result}" for name, result in state.get('intermediate_steps', [])]
+        return response_text, tool_calls_made
+    
+    def record_turn(
+        self,
+        session_id: str,
+        message: str,
+        response_text: str,
+        tool_calls_made: Optional[List[str]] = None,
+        cached: bool = False
+    ):
+        """
+        Store a completed user/assistant exchange in the conversation store.
+        
+        Args:
+            session_id: Session the exchange belongs to
+            message: User's message
+            response_text: Agent's response
+            tool_calls_made: Summaries of the tools executed for the response
+            cached: Whether the response was served from the response cache
+        """
+        thread_id = self.get_thread_id(session_id)
+        tool_calls_made = tool_calls_made or []
+        metadata = {
+            "used_tools": len(tool_calls_made) > 0,
+            "tools_executed": tool_calls_made,
+            "cached": cached
+        }
+        
+        self.conversation_store.append(
+            thread_id,
+            [
+                Message(role="user", content=message),
+                Message(
+                    role="assistant",
+                    content=response_text,
+                    metadata=metadata
+                )
+            ]
+        )
+        if not cached:
+            self._prune_checkpoints(thread_id)
+        
+        logger.info(f"Generated response for: {message[:50]}... (tools: {metadata.get('used_tools', False)})")
+    
+    def _prune_checkpoints(self, thread_id: str):
+        """
+        Keep only the latest checkpoint of a thread.
+        
+        Each checkpoint holds the thread's full state, so without pruning the
+        checkpointer grows by a copy of the conversation every graph step.
+        """
+        try:
+            self.checkpointer.prune([thread_id], strategy="keep_latest")
+        except NotImplementedError:
+            # The in-memory checkpointer is bounded by store eviction instead
+            pass
+    
     def chat(
         self,
         message: str,
-        use_rag: Optional[bool] = None
+        use_rag: Optional[bool] = None,
+        session_id: str = DEFAULT_SESSION_ID
     ) -> str:
         """
         Process a user message and return a response.
         
+        The agent keeps no per-call state, so concurrent calls for different
+        sessions are safe.
+        
         Args:
             message: User's message
             use_rag: Override RAG usage for this message (deprecated, use tools instead)
+            session_id: Session whose conversation this message belongs to
             
         Returns:
             Agent's response
         """
         try:
-            # Build conversation context
-            history_messages = self._build_messages_for_history()
+            config = self._run_config(session_id)
+            state = self.graph.invoke(self._turn_input(message, session_id, config), config)
+            response_text, tool_calls_made = self._summarize_turn(state)
             
-            # Add current user message
-            history_messages.append(HumanMessage(content=message))
+            # If response is still empty, provide default
+            if not response_text.strip():
+                response_text = EMPTY_RESPONSE
             
-            # Use LLM (with tools if available)
-            response = self.llm_with_tools.invoke(history_messages)
+            self.record_turn(session_id, message, response_text, tool_calls_made)
+            return response_text
+        
+        except Exception as e:
+            logger.error(f"Error generating response: {e}", exc_info=True)
+            return f"I apologize, but I encountered an error: {str(e)}"
+    
+    async def achat(
+        self,
+        message: str,
+        use_rag: Optional[bool] = None,
+        session_id: str = DEFAULT_SESSION_ID
+    ) -> str:
+        """
+        Process a user message on the event loop and return a response.
+        
+        Same behaviour as chat, but the LLM and async tools are awaited and
+        sync tools and conversation-store writes run in threads, so other
+        conversations progress while this one waits.
+        
+        Args:
+            message: User's message
+            use_rag: Override RAG usage for this message (deprecated, use tools instead)
+            session_id: Session whose conversation this message belongs to
+        
+        Returns:
+            Agent's response
+        """
+        try:
+            config = self._run_config(session_id)
+            state = await self.graph.ainvoke(await self._aturn_input(message, session_id, config), config)
+            response_text, tool_calls_made = self._summarize_turn(state)
             
-            # Handle tool calls if present
-            tool_calls_made = []
-            if hasattr(response, 'tool_calls') and response.tool_calls:
-                # LLM wants to use tools - add the AI response first
-                history_messages.append(response)
-                
-                # Execute each tool call
-                for tool_call in response.tool_calls:
-                    tool_name = tool_call.get('name', '')
-                    tool_args = tool_call.get('args', {})
-                    tool_call_id = tool_call.get('id', '')
-                    
-                    # Find and execute the tool
-                    tool_result = None
-                    for tool in self.tools:
-                        if tool.name == tool_name:
-                            try:
-                                # Execute tool with arguments
-                                if isinstance(tool_args, dict) and len(tool_args) == 1:
-                                    # Single argument, pass directly
-                                    arg_value = list(tool_args.values())[0]
-                                    tool_result = tool.func(arg_value)
-                                else:
-                                    # Multiple or no arguments
-                                    tool_result = tool.func(**tool_args) if tool_args else tool.func()
-                                
-                                tool_calls_made.append(f"{tool_name}: {tool_result}")
-                                logger.info(f"Executed tool {tool_name} with result: {tool_result[:100] if tool_result else 'None'}")
-                            except Exception as e:
-                                tool_result = f"Error executing {tool_name}: {str(e)}"
-                                logger.error(f"Tool execution error: {e}")
-                            break
-                    
-                    # If tool wasn't found, provide error message
-                    if tool_result is None:
-                        tool_result = f"Tool {tool_name} not found"
-                    
-                    # Add tool result with proper tool_call_id
-                    history_messages.append(
-                        ToolMessage(
-                            content=str(tool_result),
-                            tool_call_id=tool_call_id
-                        )
-                    )
-                
-                # Get final response after tool execution
-                if tool_calls_made:
-                    response = self.llm_with_tools.invoke(history_messages)
+            if not response_text.strip():
+                response_text = EMPTY_RESPONSE
             
-            # Extract response text
-            if hasattr(response, 'content'):
-                response_text = response.content
-            else:
-                response_text = str(response)
+            await asyncio.to_thread(self.record_turn, session_id, message, response_text, tool_calls_made)
+            return response_text
+        
+        except Exception as e:
+            logger.error(f"Error generating response: {e}", exc_info=True)
+            return f"I apologize, but I encountered an error: {str(e)}"
+    
+    def stream_chat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> Iterator[StreamEvent]:
+        """
+        Process a user message, streaming the response as it is generated.
+        
+        Text from the LLM is yielded as 'token' events the moment it arrives,
+        and each tool call is reported with 'tool_start' and 'tool_end'
+        events. When a step turns out to call tools, the text streamed for
+        it is withdrawn with a 'retract' event, so consumers should drop all
+        token text received so far. The complete exchange is stored in the
+        conversation store once the stream finishes.
+        
+        Args:
+            message: User's message
+            session_id: Session whose conversation this message belongs to
             
-            # If response is still empty, provide default
-            if not response_text or response_text.strip() == "":
-                response_text = "I apologize, but I couldn't generate a response. Please try rephrasing your question."
+        Yields:
+            StreamEvent objects
+        """
+        try:
+            config = self._run_config(session_id, stream_tokens=True)
+            turn_input = self._turn_input(message, session_id, config)
+            yield from self.graph.stream(turn_input, config, stream_mode="custom")
             
-            metadata = {
-                "used_tools": len(tool_calls_made) > 0,
-                "tools_executed": tool_calls_made
-            }
+            response_text, tool_calls_made = self._summarize_turn(self.graph.get_state(config).values)
+            if not response_text.strip():
+                response_text = EMPTY_RESPONSE
+                yield StreamEvent(type='token', content=response_text)
             
-            # Store in conversation history
-            self.conversation_history.append(Message(role="user", content=message))
-            self.conversation_history.append(
-                Message(
-                    role="assistant",
-                    content=response_text,
-                    metadata=metadata
-                )
-            )
+            self.record_turn(session_id, message, response_text, tool_calls_made)
+        
+        except Exception as e:
+            logger.error(f"Error generating response: {e}", exc_info=True)
+            yield StreamEvent(type='token', content=f"I apologize, but I encountered an error: {str(e)}")
+    
+    async def astream_chat(self, message: str, session_id: str = DEFAULT_SESSION_ID) -> AsyncIterator[StreamEvent]:
+        """
+        Process a user message on the event loop, streaming the response.
+        
+        Async counterpart of stream_chat with the same events.
+        
+        Args:
+            message: User's message
+            session_id: Session whose conversation this message belongs to
+        
+        Yields:
+            StreamEvent objects
+        """
+        try:
+            config = self._run_config(session_id, stream_tokens=True)
+            turn_input = await self._aturn_input(message, session_id, config)
+            async for event in self.graph.astream(turn_input, config, stream_mode="custom"):
+                yield event
             
-            logger.info(f"Generated response for: {message[:50]}... (tools: {metadata.get('used_tools', False)})")
-            return response_text
+            state = await self.graph.aget_state(config)
+            response_text, tool_calls_made = self._summarize_turn(state.values)
+            if not response_text.strip():
+                response_text = EMPTY_RESPONSE
+                yield StreamEvent(type='token', content=response_text)
+            
+            await asyncio.to_thread(self.record_turn, session_id, message, response_text, tool_calls_made)
         
         except Exception as e:
             logger.error(f"Error generating response: {e}", exc_info=True)
-            return f"I apologize, but I encountered an error: {str(e)}"
+            yield StreamEvent(type='token', content=f"I apologize, but I encountered an error: {str(e)}")
     
-    def clear_history(self):
-        """Clear conversation history."""
-        self.conversation_history = []
+    def clear_history(self, session_id: str = DEFAULT_SESSION_ID):
+        """
+        Clear conversation history for a session.
+        
+        Args:
+            session_id: Session whose history is cleared
+        """
+        thread_id = self.get_thread_id(session_id)
+        self.conversation_store.clear(thread_id)
+        self.checkpointer.delete_thread(thread_id)
         logger.info(f"Cleared conversation history for agent: {self.name}")
     
     def update_tools(self, use_tools: bool, enable_web_search: bool):
@@ -241,25 +1032,17 @@ class BaseAgent:
         self.config['enable_web_search'] = enable_web_search
         
         # Reload tools
-        self.tools = []
+        tools = []
         if use_tools:
             email_config = self.config.get('email_config')
-            self.tools = get_available_tools(
+            tools = get_available_tools(
                 rag_retriever=self.rag_retriever if self.use_rag else None,
                 include_web_search=enable_web_search,
                 email_config=email_config
             )
         
         # Rebind tools to LLM
-        if self.tools:
-            try:
-                self.llm_with_tools = self.llm.bind_tools(self.tools)
-                logger.info(f"Rebound {len(self.tools)} tools to LLM for {self.name}")
-            except Exception as e:
-                logger.warning(f"Could not bind tools to LLM: {e}")
-                self.llm_with_tools = self.llm
-        else:
-            self.llm_with_tools = self.llm
+        self.set_tools(tools)
         
         logger.info(f"Updated tools for {self.name}: {len(self.tools)} tools active")
     
@@ -293,10 +1076,10 @@ class BaseAgent:
         self.config['use_tools'] = any_tools_enabled
         
         # Reload tools with individual selections
-        self.tools = []
+        tools = []
         if any_tools_enabled:
             email_config = self.config.get('email_config')
-            self.tools = get_individual_tools(
+            tools = get_individual_tools(
                 rag_retriever=self.rag_retriever if self.use_rag else None,
                 enable_calculator=enable_calculator,
                 enable_rag_search=enable_rag_search,
@@ -306,27 +1089,38 @@ class BaseAgent:
             )
         
         # Rebind tools to LLM
-        if self.tools:
-            try:
-                self.llm_with_tools = self.llm.bind_tools(self.tools)
-                logger.info(f"Rebound {len(self.tools)} tools to LLM for {self.name}")
-            except Exception as e:
-                logger.warning(f"Could not bind tools to LLM: {e}")
-                self.llm_with_tools = self.llm
-        else:
-            self.llm_with_tools = self.llm
+        self.set_tools(tools)
         
         logger.info(
             f"Updated individual tools for {self.name}: {len(self.tools)} tools active "
             f"(calc={enable_calculator}, rag={enable_rag_search}, web={enable_web_search}, email={enable_email})"
         )
     
-    def get_history(self) -> List[Message]:
-        """Get conversation history."""
-        return self.conversation_history.copy()
+    def get_tool_settings(self) -> Dict[str, bool]:
+        """
+        Get which of the individually toggled tools the agent has bound.
+        
+        Agents are shared by every session, so this is what all sessions
+        use. A tool that could not be created (e.g. web search without an
+        API key) reports as disabled.
+        
+        Returns:
+            Dictionary with enable_calculator, enable_rag_search,
+            enable_web_search and enable_email
+        """
+        return {
+            'enable_calculator': 'calculator' in self._tools_by_name,
+            'enable_rag_search': KNOWLEDGE_BASE_TOOL in self._tools_by_name,
+            'enable_web_search': 'web_search' in self._tools_by_name,
+            'enable_email': 'send_email' in self._tools_by_name
+        }
+    
+    def get_history(self, session_id: str = DEFAULT_SESSION_ID) -> List[Message]:
+        """Get conversation history for a session."""
+        return self.conversation_store.get_messages(self.get_thread_id(session_id))
     
-    def get_info(self) -> Dict[str, Any]:
-        """Get agent information."""
+    def get_info(self, session_id: str = DEFAULT_SESSION_ID) -> Dict[str, Any]:
+        """Get agent information, with the message count of a session."""
         return {
             "name": self.name,
             "description": self.description,
@@ -335,5 +1129,5 @@ class BaseAgent:
             "tools": [tool.name for tool in self.tools],
             "use_rag": self.use_rag,
             "max_history": self.max_history,
-            "message_count": len(self.conversation_history)
+            "message_count": len(self.get_history(session_id))
         }
@@ -0,0 +1,595 @@
+"""
+Conversation Store
+Keeps per-session conversation history outside of the agents.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_SESSION_ID = "default"
+
+
+@dataclass
+class Message:
+    """Represents a chat message."""
+    role: str  # 'user', 'assistant', 'system'
+    content: str
+    timestamp: datetime = field(default_factory=datetime.now)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class ConversationStore(ABC):
+    """
+    Stores conversation history per thread.
+    
+    A thread is one conversation, usually a session ID scoped to an agent.
+    Agents read and append to the store on every turn instead of keeping
+    history on the instance, so one agent can serve many threads at once.
+    """
+    
+    def __init__(self, ttl_seconds: Optional[float] = 3600, max_messages: int = 200):
+        """
+        Initialize the store.
+        
+        Args:
+            ttl_seconds: Idle time after which a thread is evicted (None keeps threads forever)
+            max_messages: Maximum number of messages kept per thread
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._eviction_listeners: List[Callable[[List[str]], None]] = []
+    
+    def add_eviction_listener(self, listener: Callable[[List[str]], None]):
+        """
+        Register a callable that receives the IDs of evicted threads.
+        
+        Listeners run after idle or capacity eviction, outside the store's
+        lock, so state kept elsewhere for a thread (such as its agent
+        checkpoints) can be dropped together with its history.
+        
+        Args:
+            listener: Callable taking the list of evicted thread IDs
+        """
+        self._eviction_listeners.append(listener)
+    
+    def _notify_evicted(self, thread_ids: List[str]):
+        """Pass evicted thread IDs to the eviction listeners."""
+        if not thread_ids:
+            return
+        for listener in self._eviction_listeners:
+            try:
+                listener(thread_ids)
+            except Exception as e:
+                logger.warning(f"Conversation eviction listener failed: {e}")
+    
+    @abstractmethod
+    def get_messages(self, thread_id: str, limit: Optional[int] = None) -> List[Message]:
+        """
+        Get the messages of a thread, oldest first.
+        
+        Args:
+            thread_id: Thread identifier
+            limit: Optional number of most recent messages to return
+        
+        Returns:
+            List of messages (empty for unknown or expired threads)
+        """
+    
+    @abstractmethod
+    def append(self, thread_id: str, messages: List[Message]):
+        """
+        Append messages to a thread, creating it if needed.
+        
+        Args:
+            thread_id: Thread identifier
+            messages: Messages to append
+        """
+    
+    @abstractmethod
+    def has_thread(self, thread_id: str) -> bool:
+        """Check whether a thread is live, without counting it as used."""
+    
+    @abstractmethod
+    def clear(self, thread_id: str):
+        """Remove a thread."""
+    
+    @abstractmethod
+    def clear_all(self):
+        """Remove all threads."""
+    
+    @abstractmethod
+    def count_threads(self) -> int:
+        """Get the number of live threads."""
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get store statistics."""
+        return {
+            "backend": type(self).__name__,
+            "threads": self.count_threads(),
+            "ttl_seconds": self.ttl_seconds,
+            "max_messages": self.max_messages
+        }
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Process-local store with LRU eviction and idle TTL."""
+    
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl_seconds: Optional[float] = 3600,
+        max_messages: int = 200
+    ):
+        """
+        Initialize the store.
+        
+        Args:
+            max_sessions: Maximum number of threads kept; least recently used are evicted
+            ttl_seconds: Idle time after which a thread is evicted
+            max_messages: Maximum number of messages kept per thread
+        """
+        super().__init__(ttl_seconds, max_messages)
+        self.max_sessions = max_sessions
+        self._threads: "OrderedDict[str, List[Message]]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def _evict(self, now: float) -> List[str]:
+        """Drop expired threads and the least recently used ones over capacity."""
+        evicted = []
+        if self.ttl_seconds is not None:
+            # Threads are ordered by last use, so expired ones are at the front
+            while self._threads:
+                thread_id = next(iter(self._threads))
+                if now - self._last_used[thread_id] <= self.ttl_seconds:
+                    break
+                self._drop(thread_id)
+                evicted.append(thread_id)
+        
+        while len(self._threads) > self.max_sessions:
+            thread_id = next(iter(self._threads))
+            self._drop(thread_id)
+            evicted.append(thread_id)
+        return evicted
+    
+    def _drop(self, thread_id: str):
+        """Remove a thread without locking."""
+        self._threads.pop(thread_id, None)
+        self._last_used.pop(thread_id, None)
+    
+    def get_messages(self, thread_id: str, limit: Optional[int] = None) -> List[Message]:
+        """Get the messages of a thread, oldest first."""
+        now = time.time()
+        with self._lock:
+            evicted = self._evict(now)
+            messages = self._threads.get(thread_id)
+            if messages is not None:
+                self._threads.move_to_end(thread_id)
+                self._last_used[thread_id] = now
+                messages = list(messages[-limit:] if limit else messages)
+        self._notify_evicted(evicted)
+        return messages or []
+    
+    def append(self, thread_id: str, messages: List[Message]):
+        """Append messages to a thread, creating it if needed."""
+        now = time.time()
+        with self._lock:
+            thread = self._threads.setdefault(thread_id, [])
+            thread.extend(messages)
+            if len(thread) > self.max_messages:
+                del thread[:-self.max_messages]
+            self._threads.move_to_end(thread_id)
+            self._last_used[thread_id] = now
+            evicted = self._evict(now)
+        self._notify_evicted(evicted)
+    
+    def has_thread(self, thread_id: str) -> bool:
+        """Check whether a thread is live, without counting it as used."""
+        with self._lock:
+            last_used = self._last_used.get(thread_id)
+        return last_used is not None and (
+            self.ttl_seconds is None or time.time() - last_used <= self.ttl_seconds
+        )
+    
+    def clear(self, thread_id: str):
+        """Remove a thread."""
+        with self._lock:
+            self._drop(thread_id)
+    
+    def clear_all(self):
+        """Remove all threads."""
+        with self._lock:
+            self._threads.clear()
+            self._last_used.clear()
+    
+    def count_threads(self) -> int:
+        """Get the number of live threads."""
+        with self._lock:
+            evicted = self._evict(time.time())
+            count = len(self._threads)
+        self._notify_evicted(evicted)
+        return count
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Store persisted in SQLite so history survives restarts and is shared by processes."""
+    
+    def __init__(
+        self,
+        path: str = "./data/conversations.sqlite",
+        ttl_seconds: Optional[float] = 3600,
+        max_messages: int = 200
+    ):
+        """
+        Initialize the store.
+        
+        Args:
+            path: Path of the SQLite database file
+            ttl_seconds: Idle time after which a thread is evicted
+            max_messages: Maximum number of messages kept per thread
+        """
+        super().__init__(ttl_seconds, max_messages)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_thread ON messages (thread_id, id);
+            CREATE INDEX IF NOT EXISTS idx_threads_last_used ON threads (last_used);
+            """
+        )
+        self._conn.commit()
+        logger.info(f"Opened conversation store at {self.path}")
+    
+    def _evict(self, now: float) -> List[str]:
+        """Delete threads idle for longer than the TTL."""
+        if self.ttl_seconds is None:
+            return []
+        cutoff = now - self.ttl_seconds
+        evicted = [
+            row[0] for row in self._conn.execute(
+                "SELECT thread_id FROM threads WHERE last_used < ?", (cutoff,)
+            )
+        ]
+        if evicted:
+            self._conn.execute(
+                "DELETE FROM messages WHERE thread_id IN (SELECT thread_id FROM threads WHERE last_used < ?)",
+                (cutoff,)
+            )
+            self._conn.execute("DELETE FROM threads WHERE last_used < ?", (cutoff,))
+        return evicted
+    
+    def get_messages(self, thread_id: str, limit: Optional[int] = None) -> List[Message]:
+        """Get the messages of a thread, oldest first."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_used FROM threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+            if row is None or (self.ttl_seconds is not None and now - row[0] > self.ttl_seconds):
+                return []
+            
+            rows = self._conn.execute(
+                "SELECT role, content, timestamp, metadata FROM messages "
+                "WHERE thread_id = ? ORDER BY id DESC LIMIT ?",
+                (thread_id, limit or self.max_messages)
+            ).fetchall()
+            self._conn.execute(
+                "UPDATE threads SET last_used = ? WHERE thread_id = ?", (now, thread_id)
+            )
+            self._conn.commit()
+        
+        return [
+            Message(
+                role=role,
+                content=content,
+                timestamp=datetime.fromisoformat(timestamp),
+                metadata=json.loads(metadata)
+            )
+            for role, content, timestamp, metadata in reversed(rows)
+        ]
+    
+    def append(self, thread_id: str, messages: List[Message]):
+        """Append messages to a thread, creating it if needed."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO threads (thread_id, last_used) VALUES (?, ?)",
+                (thread_id, now)
+            )
+            self._conn.executemany(
+                "INSERT INTO messages (thread_id, role, content, timestamp, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        thread_id,
+                        message.role,
+                        message.content,
+                        message.timestamp.isoformat(),
+                        json.dumps(message.metadata, default=str)
+                    )
+                    for message in messages
+                ]
+            )
+            # Trim the thread to its newest max_messages
+            self._conn.execute(
+                "DELETE FROM messages WHERE thread_id = ? AND id NOT IN "
+                "(SELECT id FROM messages WHERE thread_id = ? ORDER BY id DESC LIMIT ?)",
+                (thread_id, thread_id, self.max_messages)
+            )
+            evicted = self._evict(now)
+            self._conn.commit()
+        self._notify_evicted(evicted)
+    
+    def has_thread(self, thread_id: str) -> bool:
+        """Check whether a thread is live, without counting it as used."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_used FROM threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return row is not None and (
+            self.ttl_seconds is None or time.time() - row[0] <= self.ttl_seconds
+        )
+    
+    def clear(self, thread_id: str):
+        """Remove a thread."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+    
+    def clear_all(self):
+        """Remove all threads."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages")
+            self._conn.execute("DELETE FROM threads")
+            self._conn.commit()
+    
+    def count_threads(self) -> int:
+        """Get the number of live threads."""
+        with self._lock:
+            evicted = self._evict(time.time())
+            self._conn.commit()
+            count = self._conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+        self._notify_evicted(evicted)
+        return count
+
+
+def create_conversation_store(config: Optional[Dict[str, Any]] = None) -> ConversationStore:
+    """
+    Create a conversation store from the `conversation` configuration section.
+    
+    Args:
+        config: Conversation configuration dictionary
+    
+    Returns:
+        ConversationStore instance
+    """
+    config = config or {}
+    backend = config.get('backend', 'memory')
+    ttl_seconds = config.get('ttl_seconds', 3600)
+    max_messages = config.get('max_messages', 200)
+    
+    if backend == 'memory':
+        return InMemoryConversationStore(
+            max_sessions=config.get('max_sessions', 1000),
+            ttl_seconds=ttl_seconds,
+            max_messages=max_messages
+        )
+    elif backend == 'sqlite':
+        return SQLiteConversationStore(
+            path=config.get('sqlite_path', './data/conversations.sqlite'),
+            ttl_seconds=ttl_seconds,
+            max_messages=max_messages
+        )
+    else:
+        raise ValueError(f"Unsupported conversation backend: {backend}")
+
+
+class ThreadedCheckpointer(BaseCheckpointSaver):
+    """
+    Gives a sync-only checkpointer (such as SqliteSaver) async methods.
+    
+    The async methods run the sync ones in worker threads, so the same
+    checkpointer serves both graph.invoke and graph.ainvoke without
+    blocking the event loop on disk I/O.
+    """
+    
+    def __init__(self, saver: BaseCheckpointSaver):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            saver: Checkpointer whose sync methods do the work
+        """
+        super().__init__(serde=saver.serde)
+        self.saver = saver
+    
+    # Sync methods delegate to the wrapped checkpointer
+    
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.saver.get_tuple(config)
+    
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> Iterator[CheckpointTuple]:
+        return self.saver.list(config, filter=filter, before=before, limit=limit)
+    
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return self.saver.put(config, checkpoint, metadata, new_versions)
+    
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ''
+    ) -> None:
+        self.saver.put_writes(config, writes, task_id, task_path)
+    
+    def delete_thread(self, thread_id: str) -> None:
+        self.saver.delete_thread(thread_id)
+    
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = 'keep_latest') -> None:
+        """
+        Prune the checkpoints of threads.
+        
+        SqliteSaver does not implement prune, so "keep_latest" is done here
+        with SQL: every checkpoint holds the full channel values of the
+        agent graphs, so older ones are only needed for time travel.
+        
+        Args:
+            thread_ids: Threads to prune
+            strategy: "keep_latest" to keep only the newest checkpoint per
+                namespace, or "delete" to remove the threads entirely
+        """
+        if strategy == 'delete':
+            for thread_id in thread_ids:
+                self.saver.delete_thread(thread_id)
+            return
+        try:
+            self.saver.prune(thread_ids, strategy=strategy)
+            return
+        except NotImplementedError:
+            if strategy != 'keep_latest' or not hasattr(self.saver, 'cursor'):
+                raise
+        
+        with self.saver.cursor() as cur:
+            for thread_id in thread_ids:
+                for table in ('checkpoints', 'writes'):
+                    cur.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_id < "
+                        "(SELECT MAX(checkpoint_id) FROM checkpoints AS latest "
+                        f"WHERE latest.thread_id = {table}.thread_id "
+                        f"AND latest.checkpoint_ns = {table}.checkpoint_ns)",
+                        (str(thread_id),)
+                    )
+    
+    def get_next_version(self, current: Any, channel: None) -> Any:
+        return self.saver.get_next_version(current, channel)
+    
+    # Async methods run the sync ones in worker threads
+    
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.saver.get_tuple, config)
+    
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None
+    ) -> AsyncIterator[CheckpointTuple]:
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.saver.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+    
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.saver.put, config, checkpoint, metadata, new_versions)
+    
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = ''
+    ) -> None:
+        await asyncio.to_thread(self.saver.put_writes, config, writes, task_id, task_path)
+    
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.saver.delete_thread, thread_id)
+    
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = 'keep_latest') -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+
+def create_checkpointer(config: Optional[Dict[str, Any]] = None) -> BaseCheckpointSaver:
+    """
+    Create the LangGraph checkpointer that holds agent thread state.
+    
+    Args:
+        config: Conversation configuration dictionary
+    
+    Returns:
+        SQLite checkpointer (with async methods run in worker threads), or
+        an in-memory one if configured or if langgraph-checkpoint-sqlite is
+        not installed
+    """
+    config = config or {}
+    backend = config.get('checkpointer', 'sqlite')
+    
+    if backend == 'memory':
+        return InMemorySaver()
+    elif backend != 'sqlite':
+        raise ValueError(f"Unsupported checkpointer: {backend}")
+    
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        logger.warning("langgraph-checkpoint-sqlite not installed; using in-memory checkpoints")
+        return InMemorySaver()
+    
+    path = Path(config.get('checkpoint_path', './data/checkpoints.sqlite'))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), check_same_thread=False)
+    logger.info(f"Using SQLite checkpoints at {path}")
+    return ThreadedCheckpointer(SqliteSaver(conn))
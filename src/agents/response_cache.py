@@ -0,0 +1,264 @@
+"""
+Response Cache
+Serves repeated questions from cached answers instead of running the agent.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    """A cached answer and the data needed to expire or match it."""
+    response: str
+    scope: str
+    expires_at: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    vector: Optional[np.ndarray] = None
+
+
+class ResponseCache:
+    """
+    Two-tier cache of agent answers.
+    
+    The exact tier is keyed by the normalized prompt plus a scope made of
+    the agent name, a hash of its system prompt, the model, the enabled
+    tools and the knowledge-base version. The optional semantic tier embeds the prompt
+    and reuses an answer from the same scope whose prompt embedding is
+    within max_distance cosine distance. Because the KB version is part of
+    the scope, re-indexing invalidates every earlier answer.
+    """
+    
+    def __init__(
+        self,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000,
+        embeddings: Optional[Any] = None,
+        max_distance: float = 0.08,
+        kb_version: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            ttl_seconds: Time after which an answer expires
+            max_entries: Maximum number of answers; least recently used are evicted
+            embeddings: Embeddings used by the semantic tier (disabled if None)
+            max_distance: Maximum cosine distance for a semantic hit
+            kb_version: Callable returning the current knowledge-base version
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.embeddings = embeddings
+        self.max_distance = max_distance
+        self.kb_version = kb_version
+        
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._last_kb_version = None
+        self._lock = threading.Lock()
+        
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Normalize a prompt: lowercase, collapse whitespace, drop trailing punctuation."""
+        return re.sub(r'\s+', ' ', prompt.lower()).strip().rstrip('?!.').strip()
+    
+    def make_scope(self, agent_name: str, system_prompt: str, model: str, tools: Iterable[str] = ()) -> str:
+        """
+        Build the scope an answer is valid in.
+        
+        Args:
+            agent_name: Agent that produced the answer
+            system_prompt: The agent's system prompt
+            model: LLM model name
+            tools: Names of the tools bound to the agent
+        
+        Returns:
+            Scope string
+        """
+        system_hash = hashlib.sha256(system_prompt.encode('utf-8')).hexdigest()[:16]
+        version = self.kb_version() if self.kb_version else None
+        return json.dumps([agent_name, system_hash, model, sorted(tools), version])
+    
+    @staticmethod
+    def _key(scope: str, normalized: str) -> str:
+        """Get the exact-tier key of a normalized prompt within a scope."""
+        return hashlib.sha256(f"{scope}\n{normalized}".encode('utf-8')).hexdigest()
+    
+    def _embed(self, normalized: str) -> Optional[np.ndarray]:
+        """Embed a prompt as a unit vector, or None if the semantic tier is off or fails."""
+        if self.embeddings is None:
+            return None
+        try:
+            vector = np.asarray(self.embeddings.embed_query(normalized), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Response cache could not embed prompt: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+    
+    def _purge(self, now: float):
+        """Drop expired answers and, if the KB changed, every answer from older versions."""
+        if self.kb_version is not None:
+            version = self.kb_version()
+            if version != self._last_kb_version:
+                if self._last_kb_version is not None and self._entries:
+                    logger.info(f"Knowledge base changed; dropping {len(self._entries)} cached responses")
+                    self._entries.clear()
+                self._last_kb_version = version
+        
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+    
+    def lookup(self, prompt: str, scope: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Look up a cached answer.
+        
+        Args:
+            prompt: User prompt
+            scope: Scope from make_scope
+        
+        Returns:
+            Tuple of (cached answer or None, prompt embedding to pass to store)
+        """
+        normalized = self.normalize(prompt)
+        key = self._key(scope, normalized)
+        now = time.time()
+        
+        with self._lock:
+            self._purge(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry.response, None
+            
+            candidates = [
+                (entry_key, entry) for entry_key, entry in self._entries.items()
+                if entry.scope == scope and entry.vector is not None
+            ]
+        
+        vector = self._embed(normalized)
+        if vector is not None and candidates:
+            matrix = np.stack([entry.vector for _, entry in candidates])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if 1.0 - float(similarities[best]) <= self.max_distance:
+                entry_key, entry = candidates[best]
+                with self._lock:
+                    if entry_key in self._entries:
+                        self._entries.move_to_end(entry_key)
+                    self.semantic_hits += 1
+                return entry.response, vector
+        
+        with self._lock:
+            self.misses += 1
+        return None, vector
+    
+    def store(
+        self,
+        prompt: str,
+        scope: str,
+        response: str,
+        vector: Optional[np.ndarray] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Cache an answer.
+        
+        Args:
+            prompt: User prompt
+            scope: Scope from make_scope
+            response: Answer to cache
+            vector: Prompt embedding returned by lookup (computed if None)
+            metadata: Optional metadata kept with the answer
+        """
+        normalized = self.normalize(prompt)
+        if vector is None:
+            vector = self._embed(normalized)
+        
+        entry = CachedResponse(
+            response=response,
+            scope=scope,
+            expires_at=time.time() + self.ttl_seconds,
+            metadata=metadata or {},
+            vector=vector
+        )
+        
+        with self._lock:
+            key = self._key(scope, normalized)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Remove all cached answers."""
+        with self._lock:
+            self._entries.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            hits = self.exact_hits + self.semantic_hits
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "semantic_enabled": self.embeddings is not None
+            }
+
+
+def create_response_cache(
+    config: Optional[Dict[str, Any]] = None,
+    kb_version: Optional[Callable[[], Any]] = None
+) -> Optional[ResponseCache]:
+    """
+    Create a response cache from the `response_cache` configuration section.
+    
+    Args:
+        config: Response cache configuration dictionary
+        kb_version: Callable returning the current knowledge-base version
+    
+    Returns:
+        ResponseCache instance, or None if caching is disabled
+    """
+    config = config or {}
+    if not config.get('enabled', False):
+        return None
+    
+    embeddings = None
+    semantic_config = config.get('semantic', {})
+    if semantic_config.get('enabled', False):
+        try:
+            from ..rag import EmbeddingsManager
+            embeddings = EmbeddingsManager().get_embeddings()
+        except Exception as e:
+            logger.warning(f"Semantic response cache disabled: {e}")
+    
+    return ResponseCache(
+        ttl_seconds=config.get('ttl_seconds', 3600),
+        max_entries=config.get('max_entries', 1000),
+        embeddings=embeddings,
+        max_distance=semantic_config.get('max_distance', 0.08),
+        kb_version=kb_version
+    )
@@ -23,6 +23,9 @@ from ..utils import get_logger
 
 logger = get_logger(__name__)
 
+# Name of the knowledge-base tool, which agents can also run speculatively
+KNOWLEDGE_BASE_TOOL = "search_knowledge_base"
+
 
 def create_rag_search_tool(rag_retriever) -> Optional[Tool]:
     """
@@ -37,27 +40,39 @@ def create_rag_search_tool(rag_retriever) -> Optional[Tool]:
     if not rag_retriever:
         return None
     
+    def format_results(docs: List[Document]) -> str:
+        """Format retrieved documents for the LLM."""
+        if not docs:
+            return "No relevant information found in the knowledge base."
+        
+        # Format results
+        results = []
+        for i, doc in enumerate(docs, 1):
+            results.append(f"[Result {i}]\n{doc.page_content}\n")
+        
+        return "\n".join(results)
+    
     def search_knowledge_base(query: str) -> str:
         """Search the knowledge base for relevant information."""
         try:
-            docs = rag_retriever.invoke(query)
-            if not docs:
-                return "No relevant information found in the knowledge base."
-            
-            # Format results
-            results = []
-            for i, doc in enumerate(docs, 1):
-                results.append(f"[Result {i}]\n{doc.page_content}\n")
-            
-            return "\n".join(results)
+            return format_results(rag_retriever.invoke(query))
+        except Exception as e:
+            logger.error(f"Error searching knowledge base: {e}")
+            return f"Error searching knowledge base: {str(e)}"
+    
+    async def asearch_knowledge_base(query: str) -> str:
+        """Search the knowledge base without blocking the event loop."""
+        try:
+            return format_results(await rag_retriever.ainvoke(query))
         except Exception as e:
             logger.error(f"Error searching knowledge base: {e}")
             return f"Error searching knowledge base: {str(e)}"
     
     return Tool(
-        name="search_knowledge_base",
+        name=KNOWLEDGE_BASE_TOOL,
         description="Search the internal knowledge base for information about products, policies, documentation, and other company information. Use this when you need specific information from company documents.",
-        func=search_knowledge_base
+        func=search_knowledge_base,
+        coroutine=asearch_knowledge_base
     )
 
 
@@ -82,7 +97,8 @@ def create_web_search_tool() -> Optional[Tool]:
         return Tool(
             name="web_search",
             description="Search the internet for current information, news, or facts not in the knowledge base. Use this for up-to-date information or topics outside the internal documentation.",
-            func=tavily_search.run
+            func=tavily_search.run,
+            coroutine=tavily_search.arun
         )
     except Exception as e:
         logger.error(f"Error creating web search tool: {e}")
@@ -0,0 +1,5 @@
+"""HTTP API for headless access to the agents and knowledge base."""
+
+from .server import ServerState, build_managers, create_app
+
+__all__ = ['ServerState', 'build_managers', 'create_app']
@@ -0,0 +1,300 @@
+"""
+Chat API Server
+Headless HTTP/SSE interface to the agents and the knowledge base.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from ..agents import AgentManager, StreamEvent
+from ..llm import get_http_client_registry, get_rate_limiter
+from ..rag import RAGManager
+from ..utils import get_config, get_logger
+
+logger = get_logger(__name__)
+
+
+class ChatRequest(BaseModel):
+    """Body of /chat and /chat/stream."""
+    message: str = Field(..., min_length=1)
+    session_id: Optional[str] = None
+    agent: Optional[str] = None
+
+
+class ChatResponse(BaseModel):
+    """Body returned by /chat."""
+    response: str
+    session_id: str
+    agent: str
+
+
+class SearchRequest(BaseModel):
+    """Body of /search."""
+    query: str = Field(..., min_length=1)
+    k: Optional[int] = Field(None, ge=1, le=50)
+
+
+class SearchResult(BaseModel):
+    """One retrieved chunk."""
+    content: str
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+@dataclass
+class ServerState:
+    """Components of a server process and how far their startup got."""
+    rag_manager: Optional[RAGManager] = None
+    agent_manager: Optional[AgentManager] = None
+    retriever: Optional[Any] = None
+    initialized: bool = False
+    warm: bool = False
+    error: Optional[str] = None
+    started_at: float = field(default_factory=time.time)
+    warmup_ms: Optional[float] = None
+
+
+def build_managers(state: Optional[ServerState] = None) -> ServerState:
+    """
+    Create the RAG and agent managers the way the Streamlit app does.
+    
+    Args:
+        state: State to fill in (a new one if None)
+    
+    Returns:
+        ServerState holding the managers and the default retriever
+    """
+    state = state or ServerState()
+    rag_manager = RAGManager()
+    state.rag_manager = rag_manager
+    state.retriever = rag_manager.get_retriever() if rag_manager.enabled else None
+    
+    # Cached answers are invalidated whenever the index changes
+    state.agent_manager = AgentManager(
+        rag_retriever=state.retriever,
+        kb_version=lambda: rag_manager.index_generation
+    )
+    return state
+
+
+async def warm_up(state: ServerState, query: str):
+    """
+    Run one retrieval so the first user request doesn't pay for cold caches.
+    
+    It pages the memory-mapped vectors into the OS page cache (shared by
+    all workers on the host) and opens the embeddings connection.
+    
+    Args:
+        state: Server state to update
+        query: Query to retrieve with
+    """
+    if state.retriever is None or not query:
+        state.warm = True
+        return
+    
+    start = time.perf_counter()
+    try:
+        await state.retriever.ainvoke(query)
+        state.warmup_ms = (time.perf_counter() - start) * 1000
+        state.warm = True
+        logger.info(f"Index warm-up took {state.warmup_ms:.0f}ms")
+    except Exception as e:
+        logger.warning(f"Index warm-up failed: {e}")
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def create_app(
+    state: Optional[ServerState] = None,
+    config: Optional[Dict[str, Any]] = None
+) -> FastAPI:
+    """
+    Create the API application.
+    
+    Each worker process builds its own managers in the background after
+    start-up, so /health answers at once and /ready reports 503 until the
+    managers are loaded (and warmed up, if api.require_warm is set).
+    The server only reads the indexes; the NumPy store memory-maps its
+    vectors, so workers on one host share a single copy in the page cache.
+    Conversations must be shared across workers, so more than one worker
+    requires the sqlite conversation backend (see get_worker_count).
+    
+    Args:
+        state: Prebuilt components (built with build_managers if None)
+        config: API configuration (the `api` section of config.yaml if None)
+    
+    Returns:
+        FastAPI application
+    """
+    config = config if config is not None else get_config().get('api', {})
+    warmup_query = config.get('warmup_query', 'warmup')
+    require_warm = config.get('require_warm', False)
+    
+    async def start(app: FastAPI):
+        """Build the components and warm the index."""
+        try:
+            if app.state.server.agent_manager is None:
+                await asyncio.to_thread(build_managers, app.state.server)
+            app.state.server.initialized = True
+            logger.info("API components initialized")
+        except Exception as e:
+            logger.error(f"Error initializing API components: {e}", exc_info=True)
+            app.state.server.error = str(e)
+            return
+        await warm_up(app.state.server, warmup_query)
+    
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.server = state or ServerState()
+        task = asyncio.create_task(start(app))
+        yield
+        task.cancel()
+        await get_http_client_registry().aclose()
+    
+    app = FastAPI(title="Chat Assistant API", lifespan=lifespan)
+    
+    def get_state() -> ServerState:
+        """Get the server state, failing with 503 while components load."""
+        server = app.state.server
+        if not server.initialized or server.agent_manager is None:
+            raise HTTPException(status_code=503, detail=server.error or "Server is starting")
+        return server
+    
+    def get_agent_name(server: ServerState, agent: Optional[str]) -> str:
+        """Resolve the requested agent key, failing with 404 if unknown."""
+        name = agent or server.agent_manager.current_agent_name
+        if name not in server.agent_manager.agents:
+            raise HTTPException(status_code=404, detail=f"Agent not found: {name}")
+        return name
+    
+    @app.get("/health")
+    async def health() -> Dict[str, Any]:
+        """Liveness: the process is serving requests."""
+        return {"status": "ok", "uptime_s": round(time.time() - app.state.server.started_at, 1)}
+    
+    @app.get("/ready")
+    async def ready() -> JSONResponse:
+        """Readiness: components are loaded, with the index warm state, HTTP pool use and rate limiting."""
+        server = app.state.server
+        body: Dict[str, Any] = {
+            "ready": server.initialized and (server.warm or not require_warm),
+            "initialized": server.initialized,
+            "warm": server.warm,
+            "warmup_ms": server.warmup_ms,
+            "error": server.error,
+        }
+        if server.rag_manager is not None and server.initialized:
+            rag_stats = await asyncio.to_thread(server.rag_manager.get_stats)
+            body["index"] = {
+                "enabled": rag_stats.get("enabled", False),
+                "document_count": rag_stats.get("document_count"),
+                "generation": server.rag_manager.index_generation if server.rag_manager.enabled else None,
+            }
+        body["http_clients"] = get_http_client_registry().get_stats()
+        body["rate_limits"] = get_rate_limiter().get_stats()
+        return JSONResponse(body, status_code=200 if body["ready"] else 503)
+    
+    @app.post("/chat", response_model=ChatResponse)
+    async def chat(request: ChatRequest) -> ChatResponse:
+        """Answer a message in a conversation (a new one if session_id is omitted)."""
+        server = get_state()
+        agent = get_agent_name(server, request.agent)
+        session_id = request.session_id or uuid.uuid4().hex
+        response = await server.agent_manager.achat(request.message, agent_name=agent, session_id=session_id)
+        return ChatResponse(response=response, session_id=session_id, agent=agent)
+    
+    @app.post("/chat/stream")
+    async def chat_stream(request: ChatRequest) -> StreamingResponse:
+        """
+        Stream an answer as Server-Sent Events.
+        
+        Events are 'session' (first, with the session_id), then 'token',
+        'retract', 'tool_start' and 'tool_end' as produced by the agent,
+        then 'done'. A 'retract' event withdraws all token text sent so far.
+        """
+        server = get_state()
+        agent = get_agent_name(server, request.agent)
+        session_id = request.session_id or uuid.uuid4().hex
+        
+        async def events() -> AsyncIterator[str]:
+            yield format_sse("session", {"session_id": session_id, "agent": agent})
+            event: StreamEvent
+            async for event in server.agent_manager.astream_chat(
+                request.message, agent_name=agent, session_id=session_id
+            ):
+                yield format_sse(event.type, {"content": event.content, "metadata": event.metadata})
+            yield format_sse("done", {})
+        
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            # Proxies must pass tokens through as they arrive
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    @app.post("/search", response_model=List[SearchResult])
+    async def search(request: SearchRequest) -> List[SearchResult]:
+        """Retrieve knowledge-base chunks with the agents' retrieval pipeline."""
+        server = get_state()
+        if server.rag_manager is None or not server.rag_manager.enabled or server.retriever is None:
+            raise HTTPException(status_code=404, detail="Knowledge base is not available")
+        
+        retriever = server.retriever
+        if request.k is not None:
+            retriever = await asyncio.to_thread(server.rag_manager.get_retriever, k=request.k)
+        docs = await retriever.ainvoke(request.query)
+        return [SearchResult(content=doc.page_content, metadata=doc.metadata) for doc in docs]
+    
+    return app
+
+
+def get_worker_count(api_config: Dict[str, Any], conversation_config: Dict[str, Any]) -> int:
+    """
+    Get the number of worker processes to run.
+    
+    With the in-memory conversation backend each worker would keep its own
+    history, and would delete the checkpoints of threads only the other
+    workers know, so the server then runs a single worker.
+    
+    Args:
+        api_config: The `api` configuration section
+        conversation_config: The `conversation` configuration section
+    
+    Returns:
+        Number of workers
+    """
+    workers = max(1, int(api_config.get('workers', 1)))
+    backend = conversation_config.get('backend', 'memory')
+    if workers > 1 and backend != 'sqlite':
+        logger.warning(
+            f"api.workers is {workers} but conversation.backend is '{backend}'; "
+            f"running 1 worker (use the sqlite backend to share conversations across workers)"
+        )
+        return 1
+    return workers
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    
+    api_config = get_config().get('api', {})
+    uvicorn.run(
+        "src.api.server:app",
+        host=api_config.get('host', '0.0.0.0'),
+        port=api_config.get('port', 8000),
+        workers=get_worker_count(api_config, get_config().get('conversation', {}))
+    )
@@ -1,5 +1,11 @@
 """LLM module for creating and managing language model instances."""
 
 from .llm_factory import LLMFactory, get_llm
+from .http_clients import HTTPClientRegistry, get_http_client_registry, get_http_clients
+from .rate_limiter import RateLimiter, RateLimitTimeout, TokenBucket, get_rate_limiter
 
-__all__ = ['LLMFactory', 'get_llm']
+__all__ = [
+    'LLMFactory', 'get_llm',
+    'HTTPClientRegistry', 'get_http_client_registry', 'get_http_clients',
+    'RateLimiter', 'RateLimitTimeout', 'TokenBucket', 'get_rate_limiter'
+]
@@ -0,0 +1,244 @@
+"""
+Shared HTTP Clients
+Pooled keep-alive httpx clients shared by all LLM and embeddings instances.
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from ..utils import get_config, get_logger
+from .rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport, RateLimiter, get_rate_limiter
+
+try:
+    import h2  # noqa: F401  (enables httpx's HTTP/2 support)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+
+class HTTPClientRegistry:
+    """
+    Hands out one sync and one async httpx client per endpoint.
+    
+    The OpenAI SDK otherwise builds a client, and a connection pool, for
+    every LangChain model object, so each agent pays its own TLS handshakes
+    and keeps its own idle sockets. Clients here are keyed by (provider,
+    base URL, API key variable): every LLM and embeddings object talking to
+    the same endpoint with the same credentials reuses the same
+    connections. Requests and error responses are counted with event hooks.
+    
+    With a rate limiter, every client's transport is wrapped so that its
+    requests wait for the provider/model budgets and are retried (and
+    hedged) by the limiter instead of the SDK.
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None, rate_limiter: Optional[RateLimiter] = None):
+        """
+        Initialize the registry.
+        
+        Args:
+            config: Pool configuration (the `http_client` section of config.yaml)
+            rate_limiter: Rate limiter applied to every client (none if None or disabled)
+        """
+        self.config = config or {}
+        self.rate_limiter = rate_limiter if rate_limiter is not None and rate_limiter.enabled else None
+        self._clients: Dict[Tuple[str, str, str, bool], Any] = {}
+        self._counters: Dict[Tuple[str, str, str, bool], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        
+        self.http2 = self.config.get('http2', True)
+        if self.http2 and not HTTP2_AVAILABLE:
+            logger.info("h2 is not installed; shared HTTP clients use HTTP/1.1. Install with: pip install httpx[http2]")
+            self.http2 = False
+        
+        self.limits = httpx.Limits(
+            max_connections=self.config.get('max_connections', 100),
+            max_keepalive_connections=self.config.get('max_keepalive_connections', 20),
+            keepalive_expiry=self.config.get('keepalive_expiry', 30.0)
+        )
+        timeout_config = self.config.get('timeout', {})
+        self.timeout = httpx.Timeout(
+            connect=timeout_config.get('connect', 5.0),
+            read=timeout_config.get('read', 60.0),
+            write=timeout_config.get('write', 30.0),
+            pool=timeout_config.get('pool', 10.0)
+        )
+    
+    def get_client(
+        self,
+        provider: str,
+        base_url: Optional[str] = None,
+        api_key_env: str = '',
+        asynchronous: bool = False
+    ) -> Any:
+        """
+        Get the shared client for an endpoint, creating it on first use.
+        
+        Args:
+            provider: Provider name, e.g. 'openai'
+            base_url: API base URL (provider default if None)
+            api_key_env: Environment variable holding the API key
+            asynchronous: Return an httpx.AsyncClient instead of an httpx.Client
+        
+        Returns:
+            Shared httpx client
+        """
+        key = (provider, base_url or '', api_key_env, asynchronous)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None or client.is_closed:
+                client = self._create_client(key)
+                self._clients[key] = client
+                logger.info(f"Created shared {'async ' if asynchronous else ''}HTTP client for {provider} {base_url or ''}")
+            return client
+    
+    def _create_client(self, key: Tuple[str, str, str, bool]) -> Any:
+        """Create a pooled client whose requests are counted under key."""
+        counters = self._counters.setdefault(key, {"requests": 0, "errors": 0})
+        
+        def on_request(request: httpx.Request):
+            with self._lock:
+                counters["requests"] += 1
+        
+        def on_response(response: httpx.Response):
+            if response.status_code >= 400:
+                with self._lock:
+                    counters["errors"] += 1
+        
+        if key[3]:
+            async def on_async_request(request: httpx.Request):
+                on_request(request)
+            
+            async def on_async_response(response: httpx.Response):
+                on_response(response)
+            
+            transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+            if self.rate_limiter is not None:
+                transport = AsyncRateLimitedTransport(transport, self.rate_limiter, key[0])
+            return httpx.AsyncClient(
+                transport=transport,
+                timeout=self.timeout,
+                event_hooks={"request": [on_async_request], "response": [on_async_response]}
+            )
+        
+        transport = httpx.HTTPTransport(http2=self.http2, limits=self.limits)
+        if self.rate_limiter is not None:
+            transport = RateLimitedTransport(transport, self.rate_limiter, key[0])
+        return httpx.Client(
+            transport=transport,
+            timeout=self.timeout,
+            event_hooks={"request": [on_request], "response": [on_response]}
+        )
+    
+    @staticmethod
+    def _pool_connections(client: Any) -> Tuple[int, int]:
+        """Get the (open, idle) connection counts of a client's pool, or zeros if unknown."""
+        transport = getattr(client, '_transport', None)
+        transport = getattr(transport, 'transport', transport)  # unwrap the rate limiter
+        pool = getattr(transport, '_pool', None)
+        connections = list(getattr(pool, 'connections', []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return len(connections), idle
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get pool utilization per shared client.
+        
+        Returns:
+            Dictionary with pool limits and, per client, request and error
+            response counts, open and idle connections and utilization
+            (busy connections / max_connections)
+        """
+        with self._lock:
+            items = list(self._clients.items())
+            counters = {key: dict(value) for key, value in self._counters.items()}
+        
+        clients = []
+        for key, client in items:
+            provider, base_url, api_key_env, asynchronous = key
+            open_connections, idle_connections = self._pool_connections(client)
+            stats = counters.get(key, {})
+            clients.append({
+                "provider": provider,
+                "base_url": base_url or "default",
+                "api_key_env": api_key_env,
+                "async": asynchronous,
+                **stats,
+                "open_connections": open_connections,
+                "idle_connections": idle_connections,
+                "utilization": (open_connections - idle_connections) / self.limits.max_connections
+            })
+        
+        return {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "clients": clients
+        }
+    
+    async def aclose(self):
+        """Close all clients (for ASGI shutdown)."""
+        with self._lock:
+            clients = list(self._clients.items())
+            self._clients.clear()
+        for key, client in clients:
+            if key[3]:
+                await client.aclose()
+            else:
+                client.close()
+
+
+# Global registry instance
+_http_client_registry: Optional[HTTPClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_http_client_registry() -> HTTPClientRegistry:
+    """
+    Get the global HTTP client registry.
+    
+    Returns:
+        HTTPClientRegistry configured from the `http_client` section of config.yaml
+    """
+    global _http_client_registry
+    if _http_client_registry is None:
+        with _registry_lock:
+            if _http_client_registry is None:
+                _http_client_registry = HTTPClientRegistry(get_config().get('http_client', {}), get_rate_limiter())
+    return _http_client_registry
+
+
+def get_http_clients(provider: str, base_url: Optional[str] = None, api_key_env: str = '') -> Dict[str, Any]:
+    """
+    Get the shared clients of an endpoint as keyword arguments for LangChain's OpenAI classes.
+    
+    The configured timeout is passed along too: the OpenAI SDK sends every
+    request with the model object's own timeout, which would otherwise
+    replace the client's. With rate limiting, the SDK's own retries are
+    turned off so they don't stack on the limiter's.
+    
+    Args:
+        provider: Provider name
+        base_url: API base URL (provider default if None)
+        api_key_env: Environment variable holding the API key
+    
+    Returns:
+        Dictionary with http_client, http_async_client, timeout and (with
+        rate limiting) max_retries, or empty if sharing is disabled in
+        configuration
+    """
+    registry = get_http_client_registry()
+    if not registry.config.get('shared', True):
+        return {}
+    options = {
+        "http_client": registry.get_client(provider, base_url, api_key_env),
+        "http_async_client": registry.get_client(provider, base_url, api_key_env, asynchronous=True),
+        "timeout": registry.timeout
+    }
+    if registry.rate_limiter is not None:
+        options["max_retries"] = 0
+    return options
@@ -25,7 +25,9 @@ try:
 except ImportError:
     HUGGINGFACE_AVAILABLE = False
 
-from ..utils import get_config, get_logger
+from ..utils import get_config, get_logger, get_resource_registry
+from .http_clients import get_http_clients
+from .rate_limiter import get_rate_limiter
 
 logger = get_logger(__name__)
 
@@ -39,7 +41,14 @@ class LLMFactory:
         override_params: Optional[Dict[str, Any]] = None
     ) -> Any:
         """
-        Create an LLM instance based on configuration.
+        Get an LLM instance based on configuration.
+        
+        LLM clients are shared process-wide: every caller whose merged
+        configuration is identical receives the same instance. OpenAI and
+        Azure OpenAI instances with different settings still share the
+        HTTP connection pool of their endpoint (see http_clients), and
+        every instance's requests go through the provider/model rate
+        limits of the `rate_limits` configuration (see rate_limiter).
         
         Args:
             agent_config: Agent-specific configuration (may contain llm_override)
@@ -59,6 +68,24 @@ class LLMFactory:
         if override_params:
             llm_config.update(override_params)
         
+        return get_resource_registry().get_or_create(
+            'llm',
+            llm_config,
+            lambda: LLMFactory._create_llm(llm_config, config)
+        )
+    
+    @staticmethod
+    def _create_llm(llm_config: Dict[str, Any], config: Any) -> Any:
+        """
+        Create a new LLM instance for a merged configuration.
+        
+        Args:
+            llm_config: Merged LLM configuration
+            config: Global configuration loader
+            
+        Returns:
+            LLM instance
+        """
         provider = llm_config.get('provider', 'openai')
         
         logger.info(f"Creating LLM instance for provider: {provider}")
@@ -85,7 +112,14 @@ class LLMFactory:
     @staticmethod
     def _create_openai(llm_config: Dict[str, Any], config: Any) -> ChatOpenAI:
         """Create OpenAI LLM instance."""
-        api_key = config.get_api_key(llm_config.get('api_key_env', 'OPENAI_API_KEY'))
+        api_key_env = llm_config.get('api_key_env', 'OPENAI_API_KEY')
+        api_key = config.get_api_key(api_key_env)
+        
+        # Without base_url, ChatOpenAI reads OPENAI_API_BASE or uses the default
+        base_url = llm_config.get('base_url')
+        http_options = get_http_clients('openai', base_url, api_key_env)
+        if base_url:
+            http_options['base_url'] = base_url
         
         return ChatOpenAI(
             model=llm_config.get('model', 'gpt-4'),
@@ -94,13 +128,15 @@ class LLMFactory:
             top_p=llm_config.get('top_p', 1.0),
             frequency_penalty=llm_config.get('frequency_penalty', 0.0),
             presence_penalty=llm_config.get('presence_penalty', 0.0),
-            openai_api_key=api_key
+            openai_api_key=api_key,
+            **http_options
         )
     
     @staticmethod
     def _create_azure_openai(llm_config: Dict[str, Any], config: Any) -> AzureChatOpenAI:
         """Create Azure OpenAI LLM instance."""
-        api_key = config.get_api_key(llm_config.get('api_key_env', 'AZURE_OPENAI_API_KEY'))
+        api_key_env = llm_config.get('api_key_env', 'AZURE_OPENAI_API_KEY')
+        api_key = config.get_api_key(api_key_env)
         azure_config = llm_config.get('azure', {})
         
         return AzureChatOpenAI(
@@ -109,35 +145,40 @@ class LLMFactory:
             api_version=azure_config.get('api_version', '2024-02-15-preview'),
             temperature=llm_config.get('temperature', 0.7),
             max_tokens=llm_config.get('max_tokens', 2000),
-            openai_api_key=api_key
+            openai_api_key=api_key,
+            **get_http_clients('azure_openai', azure_config.get('endpoint'), api_key_env)
         )
     
     @staticmethod
-    def _create_anthropic(llm_config: Dict[str, Any], config: Any) -> ChatAnthropic:
+    def _create_anthropic(llm_config: Dict[str, Any], config: Any) -> "ChatAnthropic":
         """Create Anthropic (Claude) LLM instance."""
         api_key = config.get_api_key(llm_config.get('api_key_env', 'ANTHROPIC_API_KEY'))
+        model = llm_config.get('model', 'claude-3-sonnet-20240229')
         
         return ChatAnthropic(
-            model=llm_config.get('model', 'claude-3-sonnet-20240229'),
+            model=model,
             temperature=llm_config.get('temperature', 0.7),
             max_tokens=llm_config.get('max_tokens', 2000),
-            anthropic_api_key=api_key
+            anthropic_api_key=api_key,
+            rate_limiter=get_rate_limiter().chat_model_limiter('anthropic', model)
         )
     
     @staticmethod
-    def _create_cohere(llm_config: Dict[str, Any], config: Any) -> ChatCohere:
+    def _create_cohere(llm_config: Dict[str, Any], config: Any) -> "ChatCohere":
         """Create Cohere LLM instance."""
         api_key = config.get_api_key(llm_config.get('api_key_env', 'COHERE_API_KEY'))
+        model = llm_config.get('model', 'command')
         
         return ChatCohere(
-            model=llm_config.get('model', 'command'),
+            model=model,
             temperature=llm_config.get('temperature', 0.7),
             max_tokens=llm_config.get('max_tokens', 2000),
-            cohere_api_key=api_key
+            cohere_api_key=api_key,
+            rate_limiter=get_rate_limiter().chat_model_limiter('cohere', model)
         )
     
     @staticmethod
-    def _create_huggingface(llm_config: Dict[str, Any], config: Any) -> HuggingFaceHub:
+    def _create_huggingface(llm_config: Dict[str, Any], config: Any) -> "HuggingFaceHub":
         """Create HuggingFace LLM instance."""
         api_key = config.get_api_key(llm_config.get('api_key_env', 'HUGGINGFACE_API_KEY'))
         hf_config = llm_config.get('huggingface', {})
@@ -0,0 +1,633 @@
+"""
+Rate Limiting
+Client-side token buckets, deadline-aware retries and hedged requests for
+LLM and embeddings calls.
+"""
+
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.rate_limiters import BaseRateLimiter
+
+from ..utils import get_config, get_logger
+
+logger = get_logger(__name__)
+
+# Rough size of a token in request bytes, used to charge the tokens-per-minute bucket
+BYTES_PER_TOKEN = 4
+
+# Timeouts, lock conflicts and rate limiting; status codes >= 500 are retried too
+RETRY_STATUS_CODES = {408, 409, 429}
+
+LimitKey = Tuple[str, str]
+
+
+class RateLimitTimeout(httpx.TimeoutException):
+    """Raised when a request would wait for the rate limiter past its deadline."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+    
+    Callers reserve capacity up front and are told how long to wait for it,
+    so concurrent callers are served in arrival order instead of polling.
+    """
+    
+    def __init__(self, per_minute: float, burst_seconds: float = 10.0):
+        """
+        Initialize the bucket, full.
+        
+        Args:
+            per_minute: Refill rate per minute
+            burst_seconds: Bucket size, in seconds of refill
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        """Add the tokens accrued since the last update (lock held)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def reserve(self, amount: float) -> float:
+        """
+        Take tokens from the bucket, going into debt if it is short.
+        
+        Args:
+            amount: Tokens to take (capped at the bucket size)
+        
+        Returns:
+            Seconds until the debt is repaid and the tokens may be used
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= min(amount, self.capacity)
+            return max(0.0, -self.tokens / self.rate)
+    
+    def try_take(self, amount: float) -> bool:
+        """Take tokens only if they are available now."""
+        with self._lock:
+            self._refill()
+            amount = min(amount, self.capacity)
+            if self.tokens < amount:
+                return False
+            self.tokens -= amount
+            return True
+    
+    def refund(self, amount: float):
+        """Return tokens from a reservation that was not used."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class RateLimiter:
+    """
+    Request and token budgets, retry policy and latency history per provider/model.
+    
+    Every (provider, model) gets a requests-per-minute and a tokens-per-minute
+    bucket sized from the `limits` configuration. Retries back off with full
+    jitter (honouring Retry-After) and give up when the next attempt could
+    not finish within the request's deadline. With hedging enabled, a request
+    still waiting for response headers after the configured percentile of
+    recent latencies gets a duplicate, and the first response wins.
+    """
+    
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the rate limiter.
+        
+        Args:
+            config: Rate limit configuration (the `rate_limits` section of config.yaml)
+        """
+        self.config = config or {}
+        self.enabled = self.config.get('enabled', True)
+        self.limits = self.config.get('limits', {}) or {}
+        self.burst_seconds = self.config.get('burst_seconds', 10.0)
+        
+        retry_config = self.config.get('retry', {})
+        self.max_retries = retry_config.get('max_retries', 4)
+        self.base_delay = retry_config.get('base_delay', 0.5)
+        self.max_delay = retry_config.get('max_delay', 8.0)
+        self.deadline = retry_config.get('deadline', 60.0)
+        
+        hedging_config = self.config.get('hedging', {})
+        self.hedging = hedging_config.get('enabled', False)
+        self.hedge_percentile = hedging_config.get('percentile', 95)
+        self.hedge_min_samples = hedging_config.get('min_samples', 20)
+        self.hedge_workers = hedging_config.get('max_workers', 32)
+        
+        self._buckets: Dict[LimitKey, Tuple[Optional[TokenBucket], Optional[TokenBucket]]] = {}
+        self._latencies: Dict[LimitKey, Deque[float]] = {}
+        self._counters: Dict[LimitKey, Dict[str, float]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+    
+    def _limits_for(self, key: LimitKey) -> Dict[str, Any]:
+        """Get the most specific limits entry: provider/model, then provider."""
+        provider, model = key
+        return self.limits.get(f"{provider}/{model}") or self.limits.get(provider) or {}
+    
+    def _buckets_for(self, key: LimitKey) -> Tuple[Optional[TokenBucket], Optional[TokenBucket]]:
+        """Get the (requests, tokens) buckets of a provider/model, creating them on first use."""
+        with self._lock:
+            buckets = self._buckets.get(key)
+            if buckets is None:
+                limits = self._limits_for(key)
+                buckets = tuple(
+                    TokenBucket(limits[name], self.burst_seconds) if limits.get(name) else None
+                    for name in ('rpm', 'tpm')
+                )
+                self._buckets[key] = buckets
+            return buckets
+    
+    def _count(self, key: LimitKey, name: str, amount: float = 1):
+        """Add to a per-key counter."""
+        with self._lock:
+            counters = self._counters.setdefault(key, {})
+            counters[name] = counters.get(name, 0) + amount
+    
+    @staticmethod
+    def describe(provider: str, request: httpx.Request) -> Tuple[LimitKey, int]:
+        """
+        Get the limit key and estimated token cost of an API request.
+        
+        Prompt tokens are estimated from the body size (or counted, for
+        embeddings sent as token ids) and the completion budget is added,
+        as providers charge max_tokens against the per-minute limit.
+        
+        Args:
+            provider: Provider name
+            request: Request with a JSON body
+        
+        Returns:
+            ((provider, model), estimated tokens)
+        """
+        try:
+            body = json.loads(request.content or b'{}')
+        except ValueError:
+            body = {}
+        if not isinstance(body, dict):
+            body = {}
+        
+        model = body.get('model')
+        if not model:
+            # Azure names the deployment in the path instead
+            match = re.search(r'/deployments/([^/]+)/', request.url.path)
+            model = match.group(1) if match else ''
+        
+        inputs = body.get('input')
+        if isinstance(inputs, list) and inputs and isinstance(inputs[0], list):
+            prompt_tokens = sum(len(ids) for ids in inputs)
+        else:
+            prompt_tokens = len(request.content) // BYTES_PER_TOKEN
+        completion_tokens = body.get('max_completion_tokens') or body.get('max_tokens') or 0
+        return (provider, model), prompt_tokens + completion_tokens
+    
+    def acquire(self, key: LimitKey, tokens: int, deadline: float) -> float:
+        """
+        Reserve one request and the estimated tokens.
+        
+        Args:
+            key: (provider, model)
+            tokens: Estimated tokens
+            deadline: time.monotonic() by which the request must be sent
+        
+        Returns:
+            Seconds to wait before sending
+        
+        Raises:
+            RateLimitTimeout: If the wait would run past the deadline
+        """
+        requests_bucket, tokens_bucket = self._buckets_for(key)
+        delay = 0.0
+        if requests_bucket is not None:
+            delay = requests_bucket.reserve(1)
+        if tokens_bucket is not None:
+            delay = max(delay, tokens_bucket.reserve(tokens))
+        
+        if time.monotonic() + delay > deadline:
+            if requests_bucket is not None:
+                requests_bucket.refund(1)
+            if tokens_bucket is not None:
+                tokens_bucket.refund(tokens)
+            self._count(key, 'rejected')
+            raise RateLimitTimeout(f"Rate limit for {key[0]}/{key[1]} needs {delay:.1f}s, past the request deadline")
+        
+        self._count(key, 'requests')
+        if delay > 0:
+            self._count(key, 'wait_seconds', delay)
+        return delay
+    
+    def try_acquire(self, key: LimitKey, tokens: int) -> bool:
+        """Reserve a request and tokens only if both are available now (for hedges)."""
+        requests_bucket, tokens_bucket = self._buckets_for(key)
+        if requests_bucket is not None and not requests_bucket.try_take(1):
+            return False
+        if tokens_bucket is not None and not tokens_bucket.try_take(tokens):
+            if requests_bucket is not None:
+                requests_bucket.refund(1)
+            return False
+        return True
+    
+    def retry_delay(
+        self,
+        key: LimitKey,
+        attempt: int,
+        response: Optional[httpx.Response],
+        deadline: float
+    ) -> Optional[float]:
+        """
+        Decide whether to retry a failed attempt.
+        
+        Args:
+            key: (provider, model)
+            attempt: Number of the attempt that failed, from 0
+            response: Response, or None if the attempt raised a transport error
+            deadline: time.monotonic() by which the request must finish
+        
+        Returns:
+            Seconds to back off before the next attempt, or None to give up
+        """
+        if response is not None and response.status_code < 500 and response.status_code not in RETRY_STATUS_CODES:
+            return None
+        if attempt >= self.max_retries:
+            return None
+        
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        
+        # A retry is only worth it if it has time left to get an answer
+        if time.monotonic() + delay >= deadline:
+            return None
+        self._count(key, 'retries')
+        return delay
+    
+    def record_latency(self, key: LimitKey, seconds: float):
+        """Record the time an attempt took to get response headers."""
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=500)).append(seconds)
+    
+    def latency_percentile(self, key: LimitKey, percentile: float) -> Optional[float]:
+        """Get a percentile of the recent latencies, or None without any."""
+        with self._lock:
+            latencies = sorted(self._latencies.get(key, ()))
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, math.ceil(percentile / 100 * len(latencies)) - 1)]
+    
+    def hedge_after(self, key: LimitKey) -> Optional[float]:
+        """Get the delay after which a request is hedged, or None if it is not."""
+        if not self.hedging:
+            return None
+        with self._lock:
+            samples = len(self._latencies.get(key, ()))
+        if samples < self.hedge_min_samples:
+            return None
+        return self.latency_percentile(key, self.hedge_percentile)
+    
+    def hedge_started(self, key: LimitKey):
+        """Count a hedged duplicate request."""
+        self._count(key, 'hedges')
+    
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Thread pool running hedged synchronous requests."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix="llm-hedge")
+            return self._executor
+    
+    def chat_model_limiter(self, provider: str, model: str) -> Optional["ChatModelRateLimiter"]:
+        """
+        Get a LangChain rate limiter for chat models without a shared HTTP client.
+        
+        Args:
+            provider: Provider name
+            model: Model name
+        
+        Returns:
+            Limiter drawing on the provider/model request bucket, or None if disabled
+        """
+        if not self.enabled:
+            return None
+        return ChatModelRateLimiter(self, (provider, model))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get rate limiting statistics per provider/model.
+        
+        Returns:
+            Dictionary keyed by "provider/model" with the configured limits,
+            requests, rejections, retries, hedges, seconds spent waiting
+            and p50/p95/p99 latency to response headers in ms
+        """
+        with self._lock:
+            keys = set(self._counters) | set(self._latencies)
+            counters = {key: dict(value) for key, value in self._counters.items()}
+        
+        stats = {}
+        for key in sorted(keys):
+            limits = self._limits_for(key)
+            latency = {
+                f"p{percentile}_ms": round(value * 1000, 1) if value is not None else None
+                for percentile in (50, 95, 99)
+                for value in [self.latency_percentile(key, percentile)]
+            }
+            stats[f"{key[0]}/{key[1]}"] = {
+                "rpm": limits.get('rpm'),
+                "tpm": limits.get('tpm'),
+                "requests": 0,
+                "rejected": 0,
+                "retries": 0,
+                "hedges": 0,
+                "wait_seconds": 0.0,
+                **counters.get(key, {}),
+                **latency
+            }
+        return stats
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Get the server's requested back-off from retry-after-ms or Retry-After, if any."""
+    value = response.headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+def _attempt_request(request: httpx.Request, deadline: float) -> httpx.Request:
+    """Copy a request for one attempt, with its timeouts capped at the time left."""
+    remaining = max(0.001, deadline - time.monotonic())
+    timeout = {
+        name: remaining if value is None else min(value, remaining)
+        for name, value in request.extensions.get('timeout', {}).items()
+    }
+    return httpx.Request(
+        request.method,
+        request.url,
+        headers=request.headers,
+        content=request.content,
+        extensions={**request.extensions, 'timeout': timeout}
+    )
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """Sync httpx transport applying a RateLimiter around another transport."""
+    
+    def __init__(self, transport: httpx.BaseTransport, limiter: RateLimiter, provider: str):
+        """
+        Initialize the transport.
+        
+        Args:
+            transport: Transport sending the requests
+            limiter: Rate limiter
+            provider: Provider name, for the limit keys
+        """
+        self.transport = transport
+        self.limiter = limiter
+        self.provider = provider
+    
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request within its rate limits, retrying until its deadline."""
+        request.read()
+        key, tokens = self.limiter.describe(self.provider, request)
+        deadline = time.monotonic() + self.limiter.deadline
+        attempt = 0
+        while True:
+            time.sleep(self.limiter.acquire(key, tokens, deadline))
+            try:
+                response = self._send(key, tokens, request, deadline)
+            except httpx.TransportError:
+                delay = self.limiter.retry_delay(key, attempt, None, deadline)
+                if delay is None:
+                    raise
+            else:
+                delay = self.limiter.retry_delay(key, attempt, response, deadline)
+                if delay is None:
+                    return response
+                response.close()
+            
+            logger.info(f"Retrying {key[0]}/{key[1]} request in {delay:.2f}s (attempt {attempt + 1} failed)")
+            attempt += 1
+            time.sleep(delay)
+    
+    def _send(self, key: LimitKey, tokens: int, request: httpx.Request, deadline: float) -> httpx.Response:
+        """Send one attempt, hedging it if it is slower than usual."""
+        start = time.monotonic()
+        hedge_after = self.limiter.hedge_after(key)
+        if hedge_after is None:
+            response = self.transport.handle_request(_attempt_request(request, deadline))
+            self.limiter.record_latency(key, time.monotonic() - start)
+            return response
+        
+        primary = self.limiter.executor.submit(self.transport.handle_request, _attempt_request(request, deadline))
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self.limiter.try_acquire(key, tokens):
+            response = primary.result()
+            self.limiter.record_latency(key, time.monotonic() - start)
+            return response
+        
+        self.limiter.hedge_started(key)
+        hedge = self.limiter.executor.submit(self.transport.handle_request, _attempt_request(request, deadline))
+        response = self._first([primary, hedge])
+        self.limiter.record_latency(key, time.monotonic() - start)
+        return response
+    
+    @staticmethod
+    def _first(futures: List[Future]) -> httpx.Response:
+        """Get the first successful response and close the others when they arrive."""
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in futures:
+                        if other is not future:
+                            other.add_done_callback(_close_response)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+    
+    def close(self):
+        """Close the wrapped transport."""
+        self.transport.close()
+
+
+def _close_response(future: Future):
+    """Close the response of a losing hedged attempt."""
+    if future.exception() is None:
+        future.result().close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async httpx transport applying a RateLimiter around another transport."""
+    
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: RateLimiter, provider: str):
+        """
+        Initialize the transport.
+        
+        Args:
+            transport: Transport sending the requests
+            limiter: Rate limiter
+            provider: Provider name, for the limit keys
+        """
+        self.transport = transport
+        self.limiter = limiter
+        self.provider = provider
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request within its rate limits, retrying until its deadline."""
+        await request.aread()
+        key, tokens = self.limiter.describe(self.provider, request)
+        deadline = time.monotonic() + self.limiter.deadline
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.limiter.acquire(key, tokens, deadline))
+            try:
+                response = await self._send(key, tokens, request, deadline)
+            except httpx.TransportError:
+                delay = self.limiter.retry_delay(key, attempt, None, deadline)
+                if delay is None:
+                    raise
+            else:
+                delay = self.limiter.retry_delay(key, attempt, response, deadline)
+                if delay is None:
+                    return response
+                await response.aclose()
+            
+            logger.info(f"Retrying {key[0]}/{key[1]} request in {delay:.2f}s (attempt {attempt + 1} failed)")
+            attempt += 1
+            await asyncio.sleep(delay)
+    
+    async def _send(self, key: LimitKey, tokens: int, request: httpx.Request, deadline: float) -> httpx.Response:
+        """Send one attempt, hedging it if it is slower than usual."""
+        start = time.monotonic()
+        hedge_after = self.limiter.hedge_after(key)
+        if hedge_after is None:
+            response = await self.transport.handle_async_request(_attempt_request(request, deadline))
+            self.limiter.record_latency(key, time.monotonic() - start)
+            return response
+        
+        primary = asyncio.ensure_future(self.transport.handle_async_request(_attempt_request(request, deadline)))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if not done and self.limiter.try_acquire(key, tokens):
+                self.limiter.hedge_started(key)
+                tasks.append(asyncio.ensure_future(
+                    self.transport.handle_async_request(_attempt_request(request, deadline))
+                ))
+            response = await self._first(tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        self.limiter.record_latency(key, time.monotonic() - start)
+        return response
+    
+    @staticmethod
+    async def _first(tasks: List["asyncio.Task"]) -> httpx.Response:
+        """Get the first successful response and cancel the other attempts."""
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in tasks:
+                        if other is not task:
+                            other.cancel()
+                            if other.done() and not other.cancelled() and other.exception() is None:
+                                await other.result().aclose()
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    
+    async def aclose(self):
+        """Close the wrapped transport."""
+        await self.transport.aclose()
+
+
+class ChatModelRateLimiter(BaseRateLimiter):
+    """
+    LangChain rate limiter drawing on a RateLimiter's request bucket.
+    
+    For chat models that don't take a shared HTTP client: their requests
+    are counted against the provider/model requests-per-minute limit, while
+    tokens and retries are left to the model itself.
+    """
+    
+    def __init__(self, limiter: RateLimiter, key: LimitKey):
+        """
+        Initialize the limiter.
+        
+        Args:
+            limiter: Rate limiter
+            key: (provider, model)
+        """
+        self.limiter = limiter
+        self.key = key
+    
+    def acquire(self, *, blocking: bool = True) -> bool:
+        """Take a request from the bucket, waiting for it if blocking."""
+        if not blocking:
+            return self.limiter.try_acquire(self.key, 0)
+        time.sleep(self.limiter.acquire(self.key, 0, time.monotonic() + self.limiter.deadline))
+        return True
+    
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        """Take a request from the bucket, awaiting it if blocking."""
+        if not blocking:
+            return self.limiter.try_acquire(self.key, 0)
+        await asyncio.sleep(self.limiter.acquire(self.key, 0, time.monotonic() + self.limiter.deadline))
+        return True
+
+
+# Global rate limiter instance
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Get the global rate limiter.
+    
+    Returns:
+        RateLimiter configured from the `rate_limits` section of config.yaml
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(get_config().get('rate_limits', {}))
+    return _rate_limiter
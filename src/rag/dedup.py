@@ -0,0 +1,388 @@
+"""
+Deduplication
+Exact and near-duplicate detection for chunks (hashing plus MinHash/LSH).
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+# Mersenne prime for the MinHash permutations; products stay below 2**62
+_PRIME = (1 << 31) - 1
+
+
+class ChunkDeduplicator:
+    """
+    Detects chunks that repeat already indexed content.
+    
+    Exact duplicates are found by hashing the normalized text. Near
+    duplicates (a re-uploaded resume with a changed date, two versions of
+    an FAQ) are found with MinHash signatures over word shingles: the
+    signatures are split into LSH bands, chunks sharing a band become
+    candidates, and a candidate is a duplicate if the fraction of equal
+    signature values (an estimate of the Jaccard similarity) reaches the
+    threshold. The state can be saved next to the vector store and records
+    the index-manifest generation it matches, like the lexical index.
+    """
+    
+    VERSION = 1
+    
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        threshold: float = 0.85,
+        num_perm: int = 64,
+        shingle_size: int = 5,
+        near_duplicates: bool = True
+    ):
+        """
+        Initialize the deduplicator.
+        
+        Args:
+            path: Path of the .npz file (in memory only if None)
+            threshold: Minimum estimated Jaccard similarity of near duplicates
+            num_perm: Number of MinHash permutations
+            shingle_size: Words per shingle
+            near_duplicates: Also detect near duplicates (exact only if False)
+        """
+        self.path = Path(path) if path else None
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.near_duplicates = near_duplicates
+        self.generation: Optional[int] = None
+        self._lock = threading.RLock()
+        
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self.rows = self._choose_rows(threshold, num_perm)
+        self.bands = num_perm // self.rows
+        
+        self._clear()
+        self.load()
+    
+    @staticmethod
+    def _choose_rows(threshold: float, num_perm: int) -> int:
+        """
+        Get the rows per LSH band.
+        
+        Pairs with Jaccard similarity s share a band with probability
+        1 - (1 - s**rows)**bands, which rises steeply around
+        (1 / bands) ** (1 / rows). The largest band size whose
+        threshold is still at or below the target is used, so few true
+        duplicates are missed and few false candidates need checking.
+        """
+        rows = 1
+        for candidate in range(1, num_perm + 1):
+            if num_perm % candidate == 0 and (candidate / num_perm) ** (1 / candidate) <= threshold:
+                rows = candidate
+        return rows
+    
+    def _clear(self):
+        """Reset to an empty state."""
+        self._hashes: Dict[str, str] = {}
+        self._by_hash: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(self.bands)]
+    
+    def __len__(self) -> int:
+        """Number of registered chunks."""
+        return len(self._hashes)
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase text and collapse whitespace."""
+        return re.sub(r'\s+', ' ', text.lower()).strip()
+    
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Compute the MinHash signature of a text.
+        
+        Args:
+            text: Chunk text
+        
+        Returns:
+            Array of num_perm minimum hash values
+        """
+        words = re.findall(r'\w+', text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode('utf-8')) % _PRIME for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        # One (permutation x shingle) matrix instead of a loop per permutation
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+    
+    def _bands(self, signature: np.ndarray) -> List[bytes]:
+        """Split a signature into LSH band keys."""
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+    
+    def find(self, text: str, signature: Optional[np.ndarray] = None) -> Optional[str]:
+        """
+        Find a registered chunk that the text duplicates.
+        
+        Args:
+            text: Chunk text
+            signature: Precomputed MinHash signature
+        
+        Returns:
+            Key of the duplicated chunk, or None
+        """
+        with self._lock:
+            key = self._by_hash.get(self._hash(text))
+            if key is not None or not self.near_duplicates:
+                return key
+            
+            if signature is None:
+                signature = self.signature(text)
+            candidates: Set[str] = set()
+            for bucket, band in zip(self._buckets, self._bands(signature)):
+                candidates |= bucket.get(band, set())
+            
+            best, best_similarity = None, self.threshold
+            for candidate in candidates:
+                similarity = float(np.mean(self._signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = candidate, similarity
+            return best
+    
+    def add(self, key: str, text: str, signature: Optional[np.ndarray] = None):
+        """
+        Register a chunk.
+        
+        Args:
+            key: Chunk ID
+            text: Chunk text
+            signature: Precomputed MinHash signature
+        """
+        with self._lock:
+            self.remove([key])
+            content_hash = self._hash(text)
+            self._hashes[key] = content_hash
+            self._by_hash.setdefault(content_hash, key)
+            if self.near_duplicates:
+                if signature is None:
+                    signature = self.signature(text)
+                self._register_signature(key, signature)
+    
+    def _register_signature(self, key: str, signature: np.ndarray):
+        """Add a signature to the LSH buckets."""
+        self._signatures[key] = signature
+        for bucket, band in zip(self._buckets, self._bands(signature)):
+            bucket.setdefault(band, set()).add(key)
+    
+    def check(self, key: str, text: str) -> Optional[str]:
+        """
+        Register a chunk unless it duplicates a registered one.
+        
+        Args:
+            key: Chunk ID
+            text: Chunk text
+        
+        Returns:
+            Key of the duplicated chunk, or None if the chunk was registered
+        """
+        signature = self.signature(text) if self.near_duplicates else None
+        with self._lock:
+            duplicate_of = self.find(text, signature)
+            if duplicate_of is None or duplicate_of == key:
+                self.add(key, text, signature)
+                return None
+            return duplicate_of
+    
+    def remove(self, keys: List[str]):
+        """
+        Forget chunks; unknown keys are ignored.
+        
+        Args:
+            keys: Chunk IDs
+        """
+        with self._lock:
+            for key in keys:
+                content_hash = self._hashes.pop(key, None)
+                if content_hash is None:
+                    continue
+                if self._by_hash.get(content_hash) == key:
+                    del self._by_hash[content_hash]
+                
+                signature = self._signatures.pop(key, None)
+                if signature is not None:
+                    for bucket, band in zip(self._buckets, self._bands(signature)):
+                        members = bucket.get(band)
+                        if members is not None:
+                            members.discard(key)
+                            if not members:
+                                del bucket[band]
+    
+    def clear(self):
+        """Forget all chunks."""
+        with self._lock:
+            self._clear()
+    
+    def _hash(self, text: str) -> str:
+        """Get the exact-duplicate hash of a text."""
+        return hashlib.sha1(self.normalize(text).encode('utf-8')).hexdigest()
+    
+    def _settings(self) -> Dict[str, Any]:
+        """Settings a saved state must match to be reused."""
+        return {
+            'version': self.VERSION,
+            'num_perm': self.num_perm,
+            'shingle_size': self.shingle_size,
+            'near_duplicates': self.near_duplicates,
+        }
+    
+    def load(self):
+        """Load the state from disk (starts empty if missing, unreadable or built with other settings)."""
+        if self.path is None or not self.path.exists():
+            return
+        
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+                if meta.get('settings') != self._settings():
+                    logger.info(f"Ignoring dedup index built with other settings: {self.path}")
+                    return
+                signatures = data['signatures']
+            
+            for key, content_hash in zip(meta['keys'], meta['hashes']):
+                self._hashes[key] = content_hash
+                self._by_hash.setdefault(content_hash, key)
+            if self.near_duplicates:
+                for key, signature in zip(meta['keys'], signatures):
+                    self._register_signature(key, signature)
+            self.generation = meta.get('generation')
+            logger.info(f"Loaded dedup index with {len(self._hashes)} chunks from {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not read dedup index {self.path}: {e}. Starting fresh.")
+            self._clear()
+            self.generation = None
+    
+    def save(self, generation: Optional[int] = None):
+        """
+        Atomically write the state to disk.
+        
+        Args:
+            generation: Index-manifest generation the saved state matches
+        """
+        with self._lock:
+            self.generation = generation
+            if self.path is None:
+                return
+            
+            keys = list(self._hashes)
+            meta = {
+                'settings': self._settings(),
+                'generation': generation,
+                'keys': keys,
+                'hashes': [self._hashes[key] for key in keys],
+            }
+            if self.near_duplicates and keys:
+                signatures = np.stack([self._signatures[key] for key in keys])
+            else:
+                signatures = np.zeros((0, self.num_perm), dtype=np.uint64)
+            
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    meta=np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+                    signatures=signatures
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get deduplicator statistics."""
+        return {
+            "chunks": len(self._hashes),
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows": self.rows,
+            "generation": self.generation
+        }
+
+
+def deduplicate_documents(
+    documents: List[Document],
+    deduplicator: ChunkDeduplicator
+) -> Tuple[List[Document], int]:
+    """
+    Drop chunks that duplicate earlier chunks.
+    
+    The kept chunk records where its dropped copies came from in the
+    duplicate_sources (sources joined with "; ") and duplicate_count
+    metadata fields.
+    
+    Args:
+        documents: Chunks in order
+        deduplicator: Deduplicator holding the chunks to compare against
+    
+    Returns:
+        Tuple of (kept chunks, number of dropped chunks)
+    """
+    kept: Dict[str, Document] = {}
+    dropped = 0
+    for i, document in enumerate(documents):
+        key = document.id or f"chunk-{i}"
+        duplicate_of = deduplicator.check(key, document.page_content)
+        if duplicate_of is None:
+            kept[key] = document
+            continue
+        
+        dropped += 1
+        original = kept.get(duplicate_of)
+        if original is None:
+            continue
+        sources = [s for s in original.metadata.get('duplicate_sources', '').split('; ') if s]
+        source = str(document.metadata.get('source', ''))
+        if source and source not in sources:
+            sources.append(source)
+        original.metadata['duplicate_sources'] = '; '.join(sources)
+        original.metadata['duplicate_count'] = original.metadata.get('duplicate_count', 0) + 1
+    
+    return list(kept.values()), dropped
+
+
+def create_deduplicator(
+    config: Optional[Dict[str, Any]] = None,
+    path: Optional[str] = None
+) -> Optional[ChunkDeduplicator]:
+    """
+    Create a deduplicator from the `rag.dedup` configuration section.
+    
+    Args:
+        config: Dedup configuration dictionary
+        path: Path of the saved state (in memory only if None)
+    
+    Returns:
+        ChunkDeduplicator instance, or None if deduplication is disabled
+    """
+    config = config or {}
+    if not config.get('enabled', True):
+        return None
+    
+    return ChunkDeduplicator(
+        path=path,
+        threshold=config.get('threshold', 0.85),
+        num_perm=config.get('num_perm', 64),
+        shingle_size=config.get('shingle_size', 5),
+        near_duplicates=config.get('near_duplicates', True)
+    )
@@ -4,8 +4,10 @@ Handles loading and processing documents for RAG.
 """
 
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import (
     TextLoader,
@@ -15,11 +17,81 @@ from langchain_community.document_loaders import (
 )
 from langchain_core.documents import Document
 
+from .dedup import create_deduplicator, deduplicate_documents
 from ..utils import get_config, get_logger
 
 logger = get_logger(__name__)
 
 
+def iter_single_file(file_path: str) -> Iterator[Document]:
+    """
+    Lazily load a single file based on its extension, one page at a time.
+    
+    Args:
+        file_path: Path to the file
+    
+    Yields:
+        Document objects
+    """
+    file_ext = Path(file_path).suffix.lower()
+    
+    # Select appropriate loader
+    if file_ext == '.txt':
+        loader = TextLoader(file_path, encoding='utf-8')
+    elif file_ext == '.pdf':
+        loader = PyPDFLoader(file_path)
+    elif file_ext == '.docx':
+        loader = Docx2txtLoader(file_path)
+    elif file_ext == '.md':
+        loader = UnstructuredMarkdownLoader(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {file_ext}")
+    
+    for doc in loader.lazy_load():
+        # Add metadata
+        doc.metadata['source'] = file_path
+        doc.metadata['file_type'] = file_ext
+        yield doc
+
+
+def load_single_file(file_path: str) -> List[Document]:
+    """
+    Load a single file based on its extension.
+    
+    Defined at module level so it can run in worker processes.
+    
+    Args:
+        file_path: Path to the file
+    
+    Returns:
+        List of Document objects
+    """
+    return list(iter_single_file(file_path))
+
+
+def _replay_result(documents: List[Document], error: Optional[str]) -> Iterator[Document]:
+    """Yield documents loaded in a worker process, re-raising its error."""
+    if error is not None:
+        raise RuntimeError(error)
+    yield from documents
+
+
+def _load_file_isolated(file_path: str) -> Tuple[str, List[Document], Optional[str]]:
+    """
+    Load a file, returning the error instead of raising it.
+    
+    Args:
+        file_path: Path to the file
+    
+    Returns:
+        Tuple of (file path, documents, error message or None)
+    """
+    try:
+        return file_path, load_single_file(file_path), None
+    except Exception as e:
+        return file_path, [], str(e)
+
+
 class DocumentLoader:
     """Loads and processes documents for RAG."""
     
@@ -32,6 +104,8 @@ class DocumentLoader:
         self.supported_formats = self.rag_config.get('supported_formats', ['.txt', '.pdf', '.docx', '.md'])
         self.chunk_size = self.rag_config.get('chunk_size', 1000)
         self.chunk_overlap = self.rag_config.get('chunk_overlap', 200)
+        self.loader_workers = self._resolve_loader_workers(self.rag_config.get('loader_workers', 1))
+        self.dedup_config = self.rag_config.get('dedup', {})
         
         # Initialize text splitter
         self.text_splitter = RecursiveCharacterTextSplitter(
@@ -40,34 +114,111 @@ class DocumentLoader:
             length_function=len,
         )
     
-    def load_documents(self, file_paths: Optional[List[str]] = None) -> List[Document]:
+    @staticmethod
+    def _resolve_loader_workers(value) -> int:
+        """
+        Resolve the rag.loader_workers setting to a process count.
+        
+        Args:
+            value: Configured value (int, or "auto"/0 for one per CPU core)
+        
+        Returns:
+            Number of worker processes (1 means load serially)
+        """
+        if value in (None, 'auto', 0):
+            return os.cpu_count() or 1
+        return max(1, int(value))
+    
+    def load_documents(
+        self,
+        file_paths: Optional[List[str]] = None,
+        workers: Optional[int] = None
+    ) -> List[Document]:
         """
         Load documents from files.
         
+        With more than one worker, files are parsed in a process pool. A file
+        that fails to load is logged and skipped without affecting the others,
+        and documents are always returned in the order of file_paths.
+        
         Args:
             file_paths: Optional list of specific file paths to load.
                        If None, loads all supported files from document_path.
+            workers: Number of worker processes (defaults to rag.loader_workers)
         
         Returns:
             List of Document objects
         """
         if file_paths is None:
-            file_paths = self._get_all_document_files()
+            file_paths = self.get_document_files()
+        
+        workers = min(workers or self.loader_workers, len(file_paths))
         
         documents = []
         
-        for file_path in file_paths:
-            try:
-                docs = self._load_single_file(file_path)
-                documents.extend(docs)
-                logger.info(f"Loaded {len(docs)} documents from {file_path}")
-            except Exception as e:
-                logger.error(f"Error loading file {file_path}: {e}")
+        if workers > 1:
+            logger.info(f"Loading {len(file_paths)} files with {workers} worker processes")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # map() yields results in submission order
+                results = list(executor.map(_load_file_isolated, file_paths))
+        else:
+            results = map(_load_file_isolated, file_paths)
+        
+        for file_path, docs, error in results:
+            if error is not None:
+                logger.error(f"Error loading file {file_path}: {error}")
+                continue
+            documents.extend(docs)
+            logger.info(f"Loaded {len(docs)} documents from {file_path}")
         
         logger.info(f"Total documents loaded: {len(documents)}")
         return documents
     
-    def _get_all_document_files(self) -> List[str]:
+    def iter_documents(
+        self,
+        file_paths: List[str],
+        workers: Optional[int] = None
+    ) -> Iterator[Tuple[str, Iterable[Document]]]:
+        """
+        Stream documents file by file.
+        
+        Serially, each file's pages are produced lazily as they are parsed.
+        With a process pool, only a bounded number of files are parsed ahead
+        of the consumer so memory stays flat. Load errors surface when the
+        file's pages are iterated.
+        
+        Args:
+            file_paths: Files to load
+            workers: Number of worker processes (defaults to rag.loader_workers)
+        
+        Yields:
+            Tuples of (file path, iterable of Document pages)
+        """
+        workers = min(workers or self.loader_workers, len(file_paths))
+        
+        if workers <= 1:
+            for file_path in file_paths:
+                yield file_path, iter_single_file(file_path)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            paths = iter(file_paths)
+            
+            # Keep at most two files per worker in flight
+            for file_path in paths:
+                pending.append(executor.submit(_load_file_isolated, file_path))
+                if len(pending) >= workers * 2:
+                    break
+            
+            while pending:
+                file_path, docs, error = pending.popleft().result()
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending.append(executor.submit(_load_file_isolated, next_path))
+                yield file_path, _replay_result(docs, error)
+    
+    def get_document_files(self) -> List[str]:
         """Get all supported document files from the document path."""
         doc_path = Path(self.document_path)
         
@@ -83,52 +234,65 @@ class DocumentLoader:
         logger.info(f"Found {len(files)} document files")
         return files
     
+    def save_upload(self, filename: str, content: bytes) -> str:
+        """
+        Store an uploaded file under document_path/uploads.
+        
+        Uploads are indexed from there rather than from a temporary file,
+        so the index manifest records a path that still exists on the next
+        scan and chunk indexes can be rebuilt from it. A second upload with
+        the same name replaces the first.
+        
+        Args:
+            filename: Name of the uploaded file (directories are ignored)
+            content: File contents
+        
+        Returns:
+            Path of the stored file
+        """
+        upload_dir = Path(self.document_path) / 'uploads'
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        path = upload_dir / Path(filename).name
+        path.write_bytes(content)
+        return str(path)
+    
     def _load_single_file(self, file_path: str) -> List[Document]:
         """
         Load a single file based on its extension.
         
         Args:
             file_path: Path to the file
-            
+        
         Returns:
             List of Document objects
         """
-        file_ext = Path(file_path).suffix.lower()
-        
-        # Select appropriate loader
-        if file_ext == '.txt':
-            loader = TextLoader(file_path, encoding='utf-8')
-        elif file_ext == '.pdf':
-            loader = PyPDFLoader(file_path)
-        elif file_ext == '.docx':
-            loader = Docx2txtLoader(file_path)
-        elif file_ext == '.md':
-            loader = UnstructuredMarkdownLoader(file_path)
-        else:
-            raise ValueError(f"Unsupported file format: {file_ext}")
-        
-        # Load documents
-        documents = loader.load()
-        
-        # Add metadata
-        for doc in documents:
-            doc.metadata['source'] = file_path
-            doc.metadata['file_type'] = file_ext
-        
-        return documents
+        return load_single_file(file_path)
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
         """
         Split documents into chunks.
         
+        Unless rag.dedup is disabled, exact and near-duplicate chunks are
+        dropped; the kept copy lists their sources in its
+        duplicate_sources metadata.
+        
         Args:
             documents: List of documents to split
-            
+        
         Returns:
             List of document chunks
         """
         chunks = self.text_splitter.split_documents(documents)
-        logger.info(f"Split {len(documents)} documents into {len(chunks)} chunks")
+        
+        deduplicator = create_deduplicator(self.dedup_config)
+        dropped = 0
+        if deduplicator is not None:
+            chunks, dropped = deduplicate_documents(chunks, deduplicator)
+        
+        logger.info(
+            f"Split {len(documents)} documents into {len(chunks)} chunks"
+            + (f" ({dropped} duplicates dropped)" if dropped else "")
+        )
         return chunks
     
     def process_documents(self, file_paths: Optional[List[str]] = None) -> List[Document]:
@@ -137,7 +301,7 @@ class DocumentLoader:
         
         Args:
             file_paths: Optional list of specific file paths to load
-            
+        
         Returns:
             List of processed document chunks
         """
@@ -0,0 +1,227 @@
+"""
+Embedding Cache
+Persistent on-disk cache of embedding vectors backed by SQLite.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed store of embedding vectors with LRU eviction.
+    
+    Vectors are keyed by a namespace (provider, model, normalize flag) and
+    the SHA-256 of the text, and stored as float32 blobs.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 200000):
+        """
+        Initialize the cache.
+        
+        Args:
+            path: Path of the SQLite database file
+            max_entries: Maximum number of vectors kept before evicting
+                         the least recently used ones
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                namespace TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Opened embedding cache at {self.path} with {self._count} vectors")
+    
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """Get the cache key for a text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def get_many(self, namespace: str, text_hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        Look up vectors.
+        
+        Args:
+            namespace: Cache namespace
+            text_hashes: Text hashes to look up
+        
+        Returns:
+            Dictionary of text hash to vector for the hashes that were found
+        """
+        found: Dict[str, List[float]] = {}
+        if not text_hashes:
+            return found
+        
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        now = time.time()
+        
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE namespace = ? AND text_hash IN ({placeholders})",
+                    [namespace, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+            
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE namespace = ? AND text_hash = ?",
+                    [(now, namespace, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+            
+            self.hits += sum(1 for text_hash in text_hashes if text_hash in found)
+            self.misses += sum(1 for text_hash in text_hashes if text_hash not in found)
+        
+        return found
+    
+    def put_many(self, namespace: str, items: Dict[str, Sequence[float]]):
+        """
+        Store vectors, evicting the least recently used ones if the cache is full.
+        
+        Args:
+            namespace: Cache namespace
+            items: Dictionary of text hash to vector
+        """
+        if not items:
+            return
+        
+        now = time.time()
+        rows = [
+            (namespace, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text_hash, vector in items.items()
+        ]
+        
+        with self._lock:
+            # Count new rows from the changes instead of re-counting the table
+            changes = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (namespace, text_hash, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            inserted = self._conn.total_changes - changes
+            self._count += inserted
+            
+            if inserted < len(rows):
+                # Already cached (e.g. embedded by another process meanwhile): same vector, refresh use
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE namespace = ? AND text_hash = ?",
+                    [(now, namespace, text_hash) for namespace, text_hash, _, now in rows]
+                )
+            
+            if self._count > self.max_entries:
+                # Evict down to 90% so eviction doesn't run on every insert
+                evict = self._count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (evict,)
+                )
+                self._count -= evict
+                logger.info(f"Evicted {evict} least recently used embeddings from cache")
+            
+            self._conn.commit()
+    
+    def clear(self):
+        """Remove all cached vectors."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+    
+    def get_stats(self) -> dict:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves repeated texts from an EmbeddingCache."""
+    
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, namespace: str):
+        """
+        Initialize the wrapper.
+        
+        Args:
+            embeddings: Underlying embeddings instance
+            cache: Cache to read from and write to
+            namespace: Cache namespace, e.g. "openai|text-embedding-ada-002|normalize=False"
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, calling the provider only for texts not in the cache."""
+        text_hashes = [EmbeddingCache.hash_text(text) for text in texts]
+        vectors = self.cache.get_many(self.namespace, text_hashes)
+        
+        # Embed each missing text once, even if it appears several times
+        missing: Dict[str, str] = {}
+        for text, text_hash in zip(texts, text_hashes):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+        
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.namespace, computed)
+            vectors.update(computed)
+        
+        return [vectors[text_hash] for text_hash in text_hashes]
+    
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, serving it from the cache when possible."""
+        # Some providers embed queries differently from documents
+        text_hash = "query:" + EmbeddingCache.hash_text(text)
+        cached = self.cache.get_many(self.namespace, [text_hash])
+        if text_hash in cached:
+            return cached[text_hash]
+        
+        vector = self.embeddings.embed_query(text)
+        self.cache.put_many(self.namespace, {text_hash: vector})
+        return vector
@@ -3,11 +3,13 @@ Embeddings Manager
 Handles creation of embeddings for documents.
 """
 
-from typing import Any, List
+from typing import Any, List, Optional
 from langchain_openai import OpenAIEmbeddings
 from langchain_community.embeddings import HuggingFaceEmbeddings
 
-from ..utils import get_config, get_logger
+from .embedding_cache import EmbeddingCache, CachedEmbeddings
+from ..llm.http_clients import get_http_clients
+from ..utils import get_config, get_logger, get_resource_registry
 
 logger = get_logger(__name__)
 
@@ -21,7 +23,23 @@ class EmbeddingsManager:
         self.rag_config = self.config.get_rag_config()
         self.embeddings_config = self.rag_config.get('embeddings', {})
         
-        self.embeddings = self._create_embeddings()
+        self.provider = self.embeddings_config.get('provider', 'openai')
+        self.model_name = self._get_model_name()
+        
+        # One embeddings client (and cache) is shared per configuration
+        self.embeddings = get_resource_registry().get_or_create(
+            'embeddings',
+            self.embeddings_config,
+            lambda: self._wrap_with_cache(self._create_embeddings())
+        )
+        self.cache: Optional[EmbeddingCache] = getattr(self.embeddings, 'cache', None)
+    
+    def _get_model_name(self) -> str:
+        """Get the name of the configured embedding model."""
+        if self.provider in ['huggingface', 'sentence-transformers']:
+            hf_config = self.embeddings_config.get('huggingface', {})
+            return hf_config.get('model_id', 'sentence-transformers/all-MiniLM-L6-v2')
+        return self.embeddings_config.get('model', 'text-embedding-ada-002')
     
     def _create_embeddings(self) -> Any:
         """
@@ -30,7 +48,7 @@ class EmbeddingsManager:
         Returns:
             Embeddings instance
         """
-        provider = self.embeddings_config.get('provider', 'openai')
+        provider = self.provider
         
         logger.info(f"Creating embeddings with provider: {provider}")
         
@@ -41,24 +59,45 @@ class EmbeddingsManager:
         else:
             raise ValueError(f"Unsupported embeddings provider: {provider}")
     
-    def _create_openai_embeddings(self) -> OpenAIEmbeddings:
-        """Create OpenAI embeddings."""
-        api_key = self.config.get_api_key(
-            self.embeddings_config.get('api_key_env', 'OPENAI_API_KEY')
+    def _wrap_with_cache(self, embeddings: Any) -> Any:
+        """
+        Wrap embeddings with the persistent embedding cache if enabled.
+        
+        Args:
+            embeddings: Provider embeddings instance
+            
+        Returns:
+            Cached embeddings, or the instance unchanged if caching is disabled
+        """
+        cache_config = self.embeddings_config.get('cache', {})
+        if not cache_config.get('enabled', True):
+            return embeddings
+        
+        cache = EmbeddingCache(
+            path=cache_config.get('path', './data/embedding_cache.sqlite'),
+            max_entries=cache_config.get('max_entries', 200000)
         )
         
+        normalize = self.provider in ['huggingface', 'sentence-transformers']
+        namespace = f"{self.provider}|{self.model_name}|normalize={normalize}"
+        
+        return CachedEmbeddings(embeddings, cache, namespace)
+    
+    def _create_openai_embeddings(self) -> OpenAIEmbeddings:
+        """Create OpenAI embeddings, sharing the connection pool of the OpenAI LLMs."""
+        api_key_env = self.embeddings_config.get('api_key_env', 'OPENAI_API_KEY')
+        api_key = self.config.get_api_key(api_key_env)
+        
         return OpenAIEmbeddings(
-            model=self.embeddings_config.get('model', 'text-embedding-ada-002'),
-            openai_api_key=api_key
+            model=self.model_name,
+            openai_api_key=api_key,
+            **get_http_clients('openai', None, api_key_env)
         )
     
     def _create_huggingface_embeddings(self) -> HuggingFaceEmbeddings:
         """Create HuggingFace/Sentence-Transformers embeddings."""
-        hf_config = self.embeddings_config.get('huggingface', {})
-        model_name = hf_config.get('model_id', 'sentence-transformers/all-MiniLM-L6-v2')
-        
         return HuggingFaceEmbeddings(
-            model_name=model_name,
+            model_name=self.model_name,
             model_kwargs={'device': 'cpu'},
             encode_kwargs={'normalize_embeddings': True}
         )
@@ -67,6 +106,10 @@ class EmbeddingsManager:
         """Get the embeddings instance."""
         return self.embeddings
     
+    def get_cache_stats(self) -> Optional[dict]:
+        """Get embedding cache statistics, or None if caching is disabled."""
+        return self.cache.get_stats() if self.cache else None
+    
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
         """
         Embed a list of documents.
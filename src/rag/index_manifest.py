@@ -0,0 +1,291 @@
+"""
+Index Manifest
+Tracks which source files are indexed so re-indexing only touches what changed.
+"""
+
+import os
+import json
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class ManifestDiff:
+    """Result of comparing files on disk against the manifest."""
+    new: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    partial: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    hashes: Dict[str, str] = field(default_factory=dict)
+    
+    @property
+    def has_changes(self) -> bool:
+        """Whether anything needs to be (re-)indexed or deleted."""
+        return bool(self.new or self.changed or self.partial or self.removed)
+
+
+class IndexManifest:
+    """
+    Persistent record of indexed files stored next to the vector store.
+    
+    Each entry holds the file size, mtime, content hash, the IDs of the
+    chunks it produced and the embedding model used. Files whose ingestion
+    was interrupted are kept as incomplete entries listing the chunks that
+    were committed, so the next run can resume them. The manifest also
+    keeps an index signature (embedding model and chunking settings) and a
+    generation counter that is bumped whenever the index is mutated.
+    """
+    
+    VERSION = 1
+    
+    def __init__(self, path: str):
+        """
+        Initialize the manifest.
+        
+        Args:
+            path: Path of the manifest JSON file
+        """
+        self.path = Path(path)
+        self.signature: Dict[str, Any] = {}
+        self.generation: int = 0
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        
+        self.load()
+    
+    @staticmethod
+    def normalize_path(file_path: str) -> str:
+        """Normalize a file path so it can be used as a manifest key."""
+        return os.path.normpath(file_path)
+    
+    @staticmethod
+    def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+        """
+        Compute the SHA-256 of a file's contents.
+        
+        Args:
+            file_path: Path to the file
+            block_size: Read block size in bytes
+        
+        Returns:
+            Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def chunk_id(file_path: str, content_hash: str, index: int) -> str:
+        """
+        Build a deterministic chunk ID.
+        
+        The ID depends on the file path, its content hash and the chunk's
+        position, so re-indexing identical content yields identical IDs.
+        """
+        key = f"{file_path}:{content_hash}:{index}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+    
+    def load(self):
+        """Load the manifest from disk (starts empty if missing or unreadable)."""
+        if not self.path.exists():
+            return
+        
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            
+            if data.get('version') != self.VERSION:
+                logger.warning(f"Ignoring manifest with unsupported version: {self.path}")
+                return
+            
+            self.signature = data.get('signature', {})
+            self.generation = data.get('generation', 0)
+            self.files = data.get('files', {})
+            logger.info(f"Loaded index manifest with {len(self.files)} files from {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not read index manifest {self.path}: {e}. Starting fresh.")
+            self.signature = {}
+            self.generation = 0
+            self.files = {}
+    
+    def save(self):
+        """Atomically write the manifest to disk, bumping the generation if it changed."""
+        if self._dirty:
+            self.generation += 1
+            self._dirty = False
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': self.VERSION,
+            'signature': self.signature,
+            'generation': self.generation,
+            'files': self.files,
+        }
+        
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+    
+    def matches_signature(self, signature: Dict[str, Any]) -> bool:
+        """Check whether the index was built with the given signature."""
+        return self.signature == signature
+    
+    def reset(self, signature: Optional[Dict[str, Any]] = None):
+        """
+        Forget all indexed files.
+        
+        Args:
+            signature: New index signature to record
+        """
+        self.files = {}
+        if signature is not None:
+            self.signature = signature
+        self._dirty = True
+    
+    def diff(self, file_paths: Iterable[str], prune_under: Optional[str] = None) -> ManifestDiff:
+        """
+        Compare files on disk against the manifest.
+        
+        Size and mtime are checked first; the content hash is only computed
+        when they differ, so an unchanged corpus costs one stat per file.
+        
+        Args:
+            file_paths: Files that should be indexed
+            prune_under: If set, manifest entries under this directory that
+                         are not in file_paths are reported as removed, as
+                         are entries elsewhere whose file no longer exists
+        
+        Returns:
+            ManifestDiff describing the changes
+        """
+        result = ManifestDiff()
+        seen = set()
+        
+        for file_path in file_paths:
+            path = self.normalize_path(file_path)
+            if path in seen:
+                continue
+            seen.add(path)
+            
+            entry = self.files.get(path)
+            if entry is None:
+                result.new.append(path)
+                continue
+            
+            try:
+                stat = os.stat(path)
+            except OSError:
+                result.removed.append(path)
+                continue
+            
+            complete = entry.get('complete', True)
+            if complete and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime:
+                result.unchanged.append(path)
+                continue
+            
+            # Metadata differs or ingestion was interrupted - check the content hash
+            content_hash = self.hash_file(path)
+            result.hashes[path] = content_hash
+            if entry.get('sha256') != content_hash:
+                result.changed.append(path)
+            elif not complete:
+                result.partial.append(path)
+            else:
+                entry['size'] = stat.st_size
+                entry['mtime'] = stat.st_mtime
+                result.unchanged.append(path)
+        
+        if prune_under is not None:
+            root = self.normalize_path(os.path.abspath(prune_under))
+            for path in self.files:
+                if path in seen:
+                    continue
+                if os.path.abspath(path).startswith(root + os.sep) or not os.path.exists(path):
+                    result.removed.append(path)
+        
+        return result
+    
+    def get_chunk_ids(self, file_path: str) -> List[str]:
+        """Get the chunk IDs recorded for a file."""
+        entry = self.files.get(self.normalize_path(file_path))
+        return list(entry.get('chunk_ids', [])) if entry else []
+    
+    def record(
+        self,
+        file_path: str,
+        chunk_ids: List[str],
+        content_hash: Optional[str] = None,
+        embedding_model: Optional[str] = None,
+        complete: bool = True,
+        duplicates: Optional[List[Dict[str, Any]]] = None
+    ):
+        """
+        Record an indexed file.
+        
+        Args:
+            file_path: Path to the source file
+            chunk_ids: IDs of the chunks stored for the file
+            content_hash: SHA-256 of the file (computed if None)
+            embedding_model: Embedding model used for the chunks
+            complete: False while the file is still being ingested
+            duplicates: Chunks dropped as duplicates, as
+                        {"chunk": index, "duplicate_of": chunk ID} entries
+        """
+        path = self.normalize_path(file_path)
+        stat = os.stat(path)
+        
+        self.files[path] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': content_hash or self.hash_file(path),
+            'chunk_ids': list(chunk_ids),
+            'embedding_model': embedding_model,
+            'complete': complete,
+            'duplicates': list(duplicates or []),
+        }
+        self._dirty = True
+    
+    def get_duplicate_dependents(self, chunk_ids: Iterable[str]) -> List[str]:
+        """
+        Get files that dropped chunks as duplicates of the given chunks.
+        
+        Such files must be re-indexed when the chunks are deleted, or their
+        content would disappear from the index.
+        
+        Args:
+            chunk_ids: IDs of chunks about to be deleted
+        
+        Returns:
+            Normalized paths of the dependent files
+        """
+        chunk_ids = set(chunk_ids)
+        return [
+            path for path, entry in self.files.items()
+            if any(duplicate['duplicate_of'] in chunk_ids for duplicate in entry.get('duplicates', []))
+        ]
+    
+    def remove(self, file_path: str):
+        """Forget a file."""
+        if self.files.pop(self.normalize_path(file_path), None) is not None:
+            self._dirty = True
+    
+    def mark_dirty(self):
+        """Flag the index as mutated so the next save bumps the generation."""
+        self._dirty = True
+    
+    @property
+    def chunk_count(self) -> int:
+        """Total number of chunks recorded in the manifest."""
+        return sum(len(entry.get('chunk_ids', [])) for entry in self.files.values())
@@ -0,0 +1,377 @@
+"""
+Streaming Ingestion Pipeline
+Runs load -> split -> embed/upsert as concurrent stages connected by bounded queues.
+"""
+
+import queue
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from langchain_core.documents import Document
+
+from .document_loader import DocumentLoader
+from .index_manifest import IndexManifest
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class IngestionProgress:
+    """Progress snapshot passed to the progress callback."""
+    files_total: int
+    files_done: int = 0
+    files_failed: int = 0
+    chunks_indexed: int = 0
+    chunks_skipped: int = 0
+    chunks_deduplicated: int = 0
+    batches_committed: int = 0
+
+
+@dataclass
+class _FileDone:
+    """Marker sent downstream after the last chunk of a file."""
+    path: str
+    error: Optional[str] = None
+
+
+@dataclass
+class _Chunk:
+    """A chunk travelling from the splitter to the embedding stage."""
+    path: str
+    chunk_id: str
+    document: Document
+
+
+@dataclass
+class _Duplicate:
+    """A chunk dropped by the splitter as a duplicate of an indexed chunk."""
+    path: str
+    index: int
+    duplicate_of: str
+
+
+@dataclass
+class _FileState:
+    """Bookkeeping for a file whose chunks are being committed."""
+    content_hash: str
+    committed_ids: List[str] = field(default_factory=list)
+    duplicates: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class _StageFailed(Exception):
+    """Raised in a stage thread when the pipeline is shutting down."""
+
+
+_END = object()
+
+
+class IngestionPipeline:
+    """
+    Streams documents into the vector store in token-bounded batches.
+    
+    A loader thread yields pages, a splitter thread turns them into chunks
+    with deterministic IDs, and the calling thread embeds and upserts the
+    chunks batch by batch. Bounded queues between the stages provide
+    backpressure, so peak memory depends on the queue size rather than on
+    the corpus size, and chunks become searchable as soon as their batch is
+    committed. Every committed batch is recorded in the index manifest so an
+    interrupted run resumes where it stopped instead of starting over.
+    """
+    
+    def __init__(
+        self,
+        document_loader: DocumentLoader,
+        vectorstore: Any,
+        manifest: IndexManifest,
+        embedding_model: Optional[str] = None,
+        batch_tokens: int = 20000,
+        max_batch_size: int = 512,
+        queue_size: int = 256,
+        progress_callback: Optional[Callable[[IngestionProgress], None]] = None,
+        lexical_index: Optional[Any] = None,
+        deduplicator: Optional[Any] = None
+    ):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            document_loader: Loader used to read and split files
+            vectorstore: Vector store wrapper with add_documents(documents, ids)
+            manifest: Manifest that records committed chunks
+            embedding_model: Embedding model name stored in the manifest
+            batch_tokens: Approximate token budget of one embedding batch
+            max_batch_size: Maximum number of chunks in one batch
+            queue_size: Capacity of each queue between stages
+            progress_callback: Optional callable receiving IngestionProgress
+            lexical_index: Optional BM25Index that also receives every committed chunk
+            deduplicator: Optional ChunkDeduplicator; chunks duplicating an
+                          indexed or earlier chunk are dropped and recorded
+                          in the manifest entry of their file
+        """
+        self.document_loader = document_loader
+        self.vectorstore = vectorstore
+        self.manifest = manifest
+        self.embedding_model = embedding_model
+        self.batch_tokens = batch_tokens
+        self.max_batch_size = max_batch_size
+        self.queue_size = queue_size
+        self.progress_callback = progress_callback
+        self.lexical_index = lexical_index
+        self.deduplicator = deduplicator
+        
+        self._stop = threading.Event()
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Cheap token estimate (about four characters per token for English)."""
+        return max(1, len(text) // 4)
+    
+    def _put(self, out_queue: queue.Queue, item: Any):
+        """Put an item on a queue, giving up if the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                out_queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise _StageFailed()
+    
+    def _get(self, in_queue: queue.Queue) -> Any:
+        """Get an item from a queue, giving up if the pipeline is stopping."""
+        while not self._stop.is_set():
+            try:
+                return in_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise _StageFailed()
+    
+    def _load_stage(self, file_paths: List[str], out_queue: queue.Queue):
+        """Loader thread: read files and emit (path, page) pairs."""
+        try:
+            for file_path, pages in self.document_loader.iter_documents(file_paths):
+                try:
+                    for page in pages:
+                        self._put(out_queue, (file_path, page))
+                    self._put(out_queue, _FileDone(file_path))
+                except _StageFailed:
+                    raise
+                except Exception as e:
+                    self._put(out_queue, _FileDone(file_path, error=str(e)))
+            self._put(out_queue, _END)
+        except _StageFailed:
+            pass
+        except Exception as e:
+            logger.error(f"Loader stage failed: {e}", exc_info=True)
+            self._stop.set()
+    
+    def _split_stage(
+        self,
+        hashes: Dict[str, str],
+        skip_ids: Dict[str, Set[str]],
+        in_queue: queue.Queue,
+        out_queue: queue.Queue
+    ):
+        """Splitter thread: split pages into chunks with deterministic IDs."""
+        next_index: Dict[str, int] = {}
+        try:
+            while True:
+                item = self._get(in_queue)
+                if item is _END or isinstance(item, _FileDone):
+                    self._put(out_queue, item)
+                    if item is _END:
+                        return
+                    continue
+                
+                file_path, page = item
+                for chunk in self.document_loader.text_splitter.split_documents([page]):
+                    index = next_index.get(file_path, 0)
+                    next_index[file_path] = index + 1
+                    chunk_id = IndexManifest.chunk_id(file_path, hashes[file_path], index)
+                    if chunk_id in skip_ids.get(file_path, ()):
+                        # Committed by an interrupted earlier run
+                        self._put(out_queue, chunk_id)
+                        continue
+                    if self.deduplicator is not None:
+                        duplicate_of = self.deduplicator.check(chunk_id, chunk.page_content)
+                        if duplicate_of is not None:
+                            self._put(out_queue, _Duplicate(file_path, index, duplicate_of))
+                            continue
+                    self._put(out_queue, _Chunk(file_path, chunk_id, chunk))
+        except _StageFailed:
+            pass
+        except Exception as e:
+            logger.error(f"Splitter stage failed: {e}", exc_info=True)
+            self._stop.set()
+    
+    def _commit(
+        self,
+        batch: List[_Chunk],
+        files: Dict[str, _FileState],
+        progress: IngestionProgress
+    ):
+        """Embed and upsert one batch, then record it in the manifest."""
+        if not batch:
+            return
+        
+        documents = [chunk.document for chunk in batch]
+        ids = [chunk.chunk_id for chunk in batch]
+        self.vectorstore.add_documents(documents, ids=ids)
+        if self.lexical_index is not None:
+            self.lexical_index.add(documents, ids)
+        
+        touched = set()
+        for chunk in batch:
+            files[chunk.path].committed_ids.append(chunk.chunk_id)
+            touched.add(chunk.path)
+        
+        # Checkpoint the batch so a crash only loses uncommitted work
+        for path in touched:
+            state = files[path]
+            self.manifest.record(
+                path,
+                state.committed_ids,
+                content_hash=state.content_hash,
+                embedding_model=self.embedding_model,
+                complete=False,
+                duplicates=state.duplicates
+            )
+        self.manifest.save()
+        
+        progress.chunks_indexed += len(batch)
+        progress.batches_committed += 1
+        self._report(progress)
+    
+    def _report(self, progress: IngestionProgress):
+        """Invoke the progress callback, ignoring its errors."""
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(progress)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {e}")
+    
+    def run(
+        self,
+        file_paths: List[str],
+        hashes: Optional[Dict[str, str]] = None,
+        resume: Optional[Dict[str, List[str]]] = None
+    ) -> int:
+        """
+        Ingest files into the vector store.
+        
+        Args:
+            file_paths: Files to ingest
+            hashes: Known content hashes by path (computed when missing)
+            resume: Chunk IDs already committed per path by an interrupted run
+        
+        Returns:
+            Number of chunks embedded and stored
+        """
+        hashes = dict(hashes or {})
+        resume = resume or {}
+        for path in file_paths:
+            if path not in hashes:
+                try:
+                    hashes[path] = IndexManifest.hash_file(path)
+                except OSError as e:
+                    logger.error(f"Error reading file {path}: {e}")
+        file_paths = [path for path in file_paths if path in hashes]
+        
+        files = {
+            path: _FileState(hashes[path], committed_ids=list(resume.get(path, [])))
+            for path in file_paths
+        }
+        skip_ids = {path: set(ids) for path, ids in resume.items()}
+        progress = IngestionProgress(files_total=len(file_paths))
+        
+        self._stop.clear()
+        pages: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        chunks: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        threads = [
+            threading.Thread(target=self._load_stage, args=(file_paths, pages), daemon=True),
+            threading.Thread(target=self._split_stage, args=(hashes, skip_ids, pages, chunks), daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+        
+        batch: List[_Chunk] = []
+        batch_tokens = 0
+        pending_done: List[_FileDone] = []
+        
+        try:
+            while True:
+                try:
+                    item = self._get(chunks)
+                except _StageFailed:
+                    raise RuntimeError("Ingestion pipeline stage failed; see log for details")
+                
+                if isinstance(item, _Chunk):
+                    tokens = self.estimate_tokens(item.document.page_content)
+                    if batch and (batch_tokens + tokens > self.batch_tokens or len(batch) >= self.max_batch_size):
+                        self._commit(batch, files, progress)
+                        batch, batch_tokens = [], 0
+                        self._finish_files(pending_done, files, progress)
+                    batch.append(item)
+                    batch_tokens += tokens
+                elif isinstance(item, str):
+                    progress.chunks_skipped += 1
+                elif isinstance(item, _Duplicate):
+                    files[item.path].duplicates.append({"chunk": item.index, "duplicate_of": item.duplicate_of})
+                    progress.chunks_deduplicated += 1
+                elif isinstance(item, _FileDone):
+                    # Finalize once the file's last batch has been committed
+                    pending_done.append(item)
+                    if not batch:
+                        self._finish_files(pending_done, files, progress)
+                else:
+                    break
+            
+            self._commit(batch, files, progress)
+            self._finish_files(pending_done, files, progress)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=5)
+        
+        logger.info(
+            f"Ingested {progress.files_done} files ({progress.files_failed} failed): "
+            f"{progress.chunks_indexed} chunks in {progress.batches_committed} batches, "
+            f"{progress.chunks_skipped} already committed, "
+            f"{progress.chunks_deduplicated} duplicates dropped"
+        )
+        return progress.chunks_indexed
+    
+    def _finish_files(
+        self,
+        pending_done: List[_FileDone],
+        files: Dict[str, _FileState],
+        progress: IngestionProgress
+    ):
+        """Mark files whose chunks are all committed as complete."""
+        if not pending_done:
+            return
+        
+        for done in pending_done:
+            state = files[done.path]
+            if done.error is not None:
+                # Keep what was committed; the file is retried on the next run
+                logger.error(f"Error loading file {done.path}: {done.error}")
+                progress.files_failed += 1
+                continue
+            
+            # Files whose chunks were all duplicates are recorded too, so they aren't re-read
+            if state.committed_ids or state.duplicates:
+                self.manifest.record(
+                    done.path,
+                    state.committed_ids,
+                    content_hash=state.content_hash,
+                    embedding_model=self.embedding_model,
+                    duplicates=state.duplicates
+                )
+            progress.files_done += 1
+        
+        pending_done.clear()
+        self.manifest.save()
+        self._report(progress)
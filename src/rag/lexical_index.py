@@ -0,0 +1,337 @@
+"""
+Lexical Index
+BM25 inverted index kept next to the vector store for exact-token matches.
+"""
+
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ..utils import get_logger
+
+logger = get_logger(__name__)
+
+# Compound tokens keep emails, phone numbers, versions and names like node.js whole
+_COMPOUND_TOKEN = re.compile(r"\w+(?:[.@+\-']\w+)+")
+_WORD_TOKEN = re.compile(r"\w+")
+
+# Words that don't change what a knowledge-base query is about
+STOPWORDS = frozenset(
+    "a an and are about does do for from has have his her in is it its me of on or "
+    "the their to what which who with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+    
+    Words are indexed on their own, minus stopwords, and compound tokens
+    such as "satish@example.com" or "555-123-4567" are also indexed whole
+    so exact queries for them rank the right chunk first.
+    """
+    text = text.lower()
+    words = [word for word in _WORD_TOKEN.findall(text) if word not in STOPWORDS]
+    return words + _COMPOUND_TOKEN.findall(text)
+
+
+class BM25Index:
+    """
+    Okapi BM25 index over chunk texts.
+    
+    Postings are held in CSR form (one offsets array plus flat arrays of
+    document rows and term frequencies) so a query is a few array slices
+    and one weighted bincount. Chunks added since the last save live in a
+    small per-term delta and deletes are tombstones; save() merges both
+    into new CSR arrays and writes them, with the vocabulary and chunk
+    texts, to a single .npz file that replaces the old one atomically.
+    The file records the index-manifest generation it matches, so a stale
+    index can be detected and rebuilt.
+    """
+    
+    VERSION = 2
+    
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the index.
+        
+        Args:
+            path: Path of the .npz file
+            k1: Term-frequency saturation
+            b: Document-length normalization
+        """
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.generation: Optional[int] = None
+        self._lock = threading.RLock()
+        
+        self._clear()
+        self.load()
+    
+    def _clear(self):
+        """Reset to an empty index."""
+        self._vocab: Dict[str, int] = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.int32)
+        self._tfs = np.zeros(0, dtype=np.float32)
+        self._delta: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._row_by_id: Dict[str, int] = {}
+        self._total_length = 0.0
+    
+    def __len__(self) -> int:
+        """Number of indexed chunks."""
+        return len(self._row_by_id)
+    
+    def load(self):
+        """Load the index from disk (starts empty if missing or unreadable)."""
+        if not self.path.exists():
+            return
+        
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(data['meta'].tobytes().decode('utf-8'))
+                if meta.get('version') != self.VERSION:
+                    logger.warning(f"Ignoring lexical index with unsupported version: {self.path}")
+                    return
+                
+                self._offsets = data['offsets']
+                self._rows = data['rows']
+                self._tfs = data['tfs']
+                self._lengths = data['lengths']
+            
+            self._vocab = {term: i for i, term in enumerate(meta['vocab'])}
+            self._ids = meta['ids']
+            self._texts = meta['texts']
+            self._metadatas = meta['metadatas']
+            self._alive = np.ones(len(self._ids), dtype=bool)
+            self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+            self._total_length = float(self._lengths.sum())
+            self.generation = meta.get('generation')
+            logger.info(f"Loaded lexical index with {len(self._ids)} chunks from {self.path}")
+        except Exception as e:
+            logger.warning(f"Could not read lexical index {self.path}: {e}. Starting fresh.")
+            self._clear()
+            self.generation = None
+    
+    def add(self, documents: List[Document], ids: List[str]):
+        """
+        Index chunks, replacing chunks with the same IDs.
+        
+        Args:
+            documents: Chunks to index
+            ids: Chunk IDs
+        """
+        with self._lock:
+            self.delete([doc_id for doc_id in ids if doc_id in self._row_by_id])
+            
+            start = len(self._ids)
+            lengths = []
+            for offset, (document, doc_id) in enumerate(zip(documents, ids)):
+                row = start + offset
+                counts = Counter(tokenize(document.page_content))
+                for term, count in counts.items():
+                    self._delta[term].append((row, count))
+                
+                self._ids.append(doc_id)
+                self._texts.append(document.page_content)
+                self._metadatas.append(document.metadata)
+                self._row_by_id[doc_id] = row
+                lengths.append(sum(counts.values()))
+            
+            self._lengths = np.concatenate([self._lengths, np.asarray(lengths, dtype=np.float32)])
+            self._alive = np.concatenate([self._alive, np.ones(len(lengths), dtype=bool)])
+            self._total_length += float(sum(lengths))
+    
+    def delete(self, ids: List[str]):
+        """
+        Remove chunks by ID; unknown IDs are ignored.
+        
+        Args:
+            ids: Chunk IDs
+        """
+        with self._lock:
+            for doc_id in ids:
+                row = self._row_by_id.pop(doc_id, None)
+                if row is not None:
+                    self._alive[row] = False
+                    self._total_length -= float(self._lengths[row])
+    
+    def clear(self):
+        """Remove all chunks."""
+        with self._lock:
+            self._clear()
+    
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the rows and term frequencies of a term, including unsaved chunks."""
+        parts_rows, parts_tfs = [], []
+        index = self._vocab.get(term)
+        if index is not None:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            parts_rows.append(self._rows[start:end])
+            parts_tfs.append(self._tfs[start:end])
+        
+        delta = self._delta.get(term)
+        if delta:
+            pairs = np.asarray(delta, dtype=np.int64)
+            parts_rows.append(pairs[:, 0].astype(np.int32))
+            parts_tfs.append(pairs[:, 1].astype(np.float32))
+        
+        if not parts_rows:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        rows = np.concatenate(parts_rows)
+        tfs = np.concatenate(parts_tfs)
+        alive = self._alive[rows]
+        return rows[alive], tfs[alive]
+    
+    def search(self, query: str, k: int = 5) -> List[Tuple[Document, float]]:
+        """
+        Get the k chunks with the highest BM25 score for a query.
+        
+        Args:
+            query: Query text
+            k: Number of results
+        
+        Returns:
+            (chunk, score) pairs, best first; chunks without query terms are omitted
+        """
+        with self._lock:
+            count = len(self._row_by_id)
+            if not count or k <= 0:
+                return []
+            
+            average_length = self._total_length / count
+            all_rows, all_weights = [], []
+            for term in set(tokenize(query)):
+                rows, tfs = self._postings(term)
+                if not len(rows):
+                    continue
+                idf = math.log(1 + (count - len(rows) + 0.5) / (len(rows) + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[rows] / average_length)
+                all_rows.append(rows)
+                all_weights.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+            
+            if not all_rows:
+                return []
+            
+            scores = np.bincount(
+                np.concatenate(all_rows),
+                weights=np.concatenate(all_weights),
+                minlength=len(self._ids)
+            )
+            matched = np.flatnonzero(scores)
+            if k < len(matched):
+                matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            matched = matched[np.argsort(-scores[matched], kind='stable')]
+            
+            return [
+                (
+                    Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row]),
+                    float(scores[row])
+                )
+                for row in matched
+            ]
+    
+    def _compact(self):
+        """Merge the delta into the CSR arrays and drop deleted chunks."""
+        live = np.flatnonzero(self._alive)
+        new_row = np.full(len(self._ids), -1, dtype=np.int64)
+        new_row[live] = np.arange(len(live))
+        
+        # Flatten base and delta postings into (term, row, tf) triples
+        terms = list(self._vocab)
+        term_ids = [np.repeat(np.arange(len(terms)), np.diff(self._offsets))]
+        rows = [self._rows.astype(np.int64)]
+        tfs = [self._tfs]
+        for term, pairs in self._delta.items():
+            index = self._vocab.get(term)
+            if index is None:
+                index = len(terms)
+                terms.append(term)
+            pairs = np.asarray(pairs, dtype=np.int64)
+            term_ids.append(np.full(len(pairs), index))
+            rows.append(pairs[:, 0])
+            tfs.append(pairs[:, 1].astype(np.float32))
+        
+        term_ids = np.concatenate(term_ids)
+        rows = new_row[np.concatenate(rows)]
+        tfs = np.concatenate(tfs)
+        keep = rows >= 0
+        term_ids, rows, tfs = term_ids[keep], rows[keep], tfs[keep]
+        
+        order = np.argsort(term_ids, kind='stable')
+        term_ids, rows, tfs = term_ids[order], rows[order], tfs[order]
+        
+        # Terms whose chunks were all deleted drop out of the vocabulary
+        counts = np.bincount(term_ids, minlength=len(terms))
+        used = np.flatnonzero(counts)
+        self._vocab = {terms[index]: i for i, index in enumerate(used)}
+        self._offsets = np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64)
+        self._rows = rows.astype(np.int32)
+        self._tfs = tfs.astype(np.float32)
+        self._delta = defaultdict(list)
+        
+        self._ids = [self._ids[row] for row in live]
+        self._texts = [self._texts[row] for row in live]
+        self._metadatas = [self._metadatas[row] for row in live]
+        self._lengths = self._lengths[live]
+        self._alive = np.ones(len(live), dtype=bool)
+        self._row_by_id = {doc_id: row for row, doc_id in enumerate(self._ids)}
+    
+    def save(self, generation: Optional[int] = None):
+        """
+        Compact the index and atomically write it to disk.
+        
+        Args:
+            generation: Index-manifest generation the saved index matches
+        """
+        with self._lock:
+            self._compact()
+            self.generation = generation
+            
+            meta = {
+                'version': self.VERSION,
+                'generation': generation,
+                'vocab': list(self._vocab),
+                'ids': self._ids,
+                'texts': self._texts,
+                'metadatas': self._metadatas,
+            }
+            
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.savez(
+                    f,
+                    meta=np.frombuffer(json.dumps(meta, ensure_ascii=False, default=str).encode('utf-8'), dtype=np.uint8),
+                    offsets=self._offsets,
+                    rows=self._rows,
+                    tfs=self._tfs,
+                    lengths=self._lengths
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            logger.info(f"Saved lexical index with {len(self._ids)} chunks to {self.path}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get index statistics."""
+        return {
+            "chunks": len(self._row_by_id),
+            "terms": len(set(self._vocab) | set(self._delta)),
+            "generation": self.generation
+        }
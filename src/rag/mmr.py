@@ -0,0 +1,65 @@
+"""
+MMR
+Maximal marginal relevance selection over candidate embeddings.
+"""
+
+from typing import Any, List
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    query_embedding: Any,
+    embeddings: Any,
+    k: int = 5,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Select diverse candidates that are still relevant to the query.
+    
+    Each step picks the candidate maximizing
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, selected).
+    All pairwise similarities come from one matrix product, and the
+    "most similar selected" vector is updated with one np.maximum per
+    step, so the loop does O(n) vectorized work per selected result
+    instead of recomputing similarities against the selected set.
+    
+    Args:
+        query_embedding: Query vector
+        embeddings: Candidate vectors, one per row
+        k: Number of candidates to select
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+    
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim != 2 or not len(vectors) or k <= 0:
+        return []
+    
+    query = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    query_norm = np.linalg.norm(query)
+    query = query / (query_norm or 1)
+    
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    
+    first = int(np.argmax(relevance))
+    selected = [first]
+    max_similarity = similarity[first].copy()
+    scores = np.empty_like(relevance)
+    taken = np.zeros(len(vectors), dtype=bool)
+    taken[first] = True
+    
+    for _ in range(min(k, len(vectors)) - 1):
+        np.multiply(lambda_mult, relevance, out=scores)
+        scores -= (1 - lambda_mult) * max_similarity
+        scores[taken] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        taken[best] = True
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    
+    return selected
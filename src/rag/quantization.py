@@ -0,0 +1,128 @@
+"""
+Quantization
+Compact storage types for embedding matrices and how to score them.
+"""
+
+from typing import Any, Optional
+
+import numpy as np
+
+# Storage types of the local vector stores, from most to least precise
+DTYPES = ('float32', 'float16', 'int8', 'binary')
+
+# Rows are widened to float32 in blocks of about this many bytes, which
+# stay in the CPU cache; widening everything at once is several times slower
+_BLOCK_BYTES = 1 << 20
+
+# Scale of int8 dimensions that have only held zeros
+_MIN_SCALE = 1e-8
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:  # NumPy < 2.0
+    _POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+    
+    def _popcount(values: np.ndarray) -> np.ndarray:
+        """Count the set bits of every uint8 value."""
+        return _POPCOUNT[values]
+
+
+def bytes_per_vector(dtype: str, dimension: int) -> float:
+    """
+    Get the bytes a vector of a storage type occupies in the searched matrix.
+    
+    Args:
+        dtype: Storage type (one of DTYPES)
+        dimension: Vector dimension
+    
+    Returns:
+        Bytes per vector (binary also keeps float32 vectors for rescoring,
+        which are only read for the candidates)
+    """
+    if dtype == 'binary':
+        return (dimension + 7) // 8
+    return dimension * np.dtype(dtype).itemsize
+
+
+def int8_scales(vectors: Any) -> np.ndarray:
+    """
+    Get symmetric per-dimension int8 scales (largest magnitude / 127).
+    
+    Args:
+        vectors: Float vectors, one per row
+    
+    Returns:
+        float32 scale per dimension (a tiny floor for dimensions that are
+        always zero, so any later value there widens the scale)
+    """
+    scales = np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0) / 127
+    return np.maximum(scales, _MIN_SCALE).astype(np.float32)
+
+
+def quantize_int8(vectors: Any, scales: np.ndarray) -> np.ndarray:
+    """Round vectors to int8 codes, clipping values outside the scales' range."""
+    codes = np.rint(np.asarray(vectors, dtype=np.float32) / scales)
+    return np.clip(codes, -127, 127).astype(np.int8)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    """Convert int8 codes back to float32 vectors."""
+    return codes.astype(np.float32) * scales
+
+
+def matrix_scores(matrix: np.ndarray, query: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Get the inner products of a query with float16 rows or int8 codes.
+    
+    NumPy has no BLAS kernel for these types, so blocks of rows are
+    widened to float32 one at a time and multiplied; int8 scales are
+    folded into the query instead of dequantizing the codes.
+    
+    Args:
+        matrix: float16 rows or int8 codes (may be memory-mapped)
+        query: float32 query vector
+        scales: Per-dimension scales of int8 codes
+    
+    Returns:
+        float32 score per row
+    """
+    if scales is not None:
+        query = query * scales
+    query = np.asarray(query, dtype=np.float32)
+    scores = np.empty(len(matrix), dtype=np.float32)
+    block_rows = max(_BLOCK_BYTES // (4 * max(len(query), 1)), 1)
+    for start in range(0, len(matrix), block_rows):
+        block = matrix[start:start + block_rows]
+        scores[start:start + len(block)] = block.astype(np.float32) @ query
+    return scores
+
+
+def pack_signs(vectors: Any) -> np.ndarray:
+    """Pack the sign bit of every component into uint8 rows (1 = positive)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    return np.packbits(matrix > 0, axis=1)
+
+
+def hamming_distances(bits: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    """
+    Get the Hamming distances between sign-packed rows and a packed query.
+    
+    For normalized vectors the fraction of differing signs tracks the
+    angle between them, so the smallest distances are cheap candidates
+    for an exact rescoring.
+    
+    Args:
+        bits: Packed rows from pack_signs
+        query_bits: Packed query row
+    
+    Returns:
+        Number of differing bits per row
+    """
+    distances = np.empty(len(bits), dtype=np.int32)
+    block_rows = max(_BLOCK_BYTES // max(bits.shape[1], 1), 1)
+    for start in range(0, len(bits), block_rows):
+        block = bits[start:start + block_rows]
+        distances[start:start + len(block)] = _popcount(block ^ query_bits.reshape(-1)).sum(axis=1, dtype=np.int32)
+    return distances
@@ -3,13 +3,27 @@ RAG System Manager
 Manages the complete RAG pipeline.
 """
 
-from typing import Optional, List, Any
+from pathlib import Path
+from typing import Optional, List, Any, Dict, Callable
 from langchain_core.documents import Document
 
 from .document_loader import DocumentLoader
 from .embeddings import EmbeddingsManager
-from .vectordb import ChromaDBStore, FAISSStore
-from ..utils import get_config, get_logger
+from .index_manifest import IndexManifest
+from .ingestion import IngestionPipeline, IngestionProgress
+from .dedup import ChunkDeduplicator, create_deduplicator
+from .lexical_index import BM25Index
+from .reranker import create_reranker
+from .retrievers import (
+    CachingRetriever,
+    HybridRetriever,
+    RerankRetriever,
+    RetrievalCache,
+    ThresholdRetriever,
+    make_search_key
+)
+from .vectordb import ChromaDBStore, FAISSStore, NumpyStore
+from ..utils import get_config, get_logger, get_resource_registry
 
 # Optional import for PineconeStore
 try:
@@ -35,6 +49,11 @@ class RAGManager:
         if not self.enabled:
             logger.info("RAG is disabled in configuration")
             self.vectorstore = None
+            self.manifest = None
+            self.retrieval_cache = None
+            self.lexical_index = None
+            self.deduplicator = None
+            self.reranker = None
             return
         
         # Initialize components
@@ -43,8 +62,69 @@ class RAGManager:
         
         # Initialize vector store
         self.vectorstore = self._create_vectorstore()
+        
+        # Manifest of indexed files, kept next to the vector store
+        self.manifest = IndexManifest(self._get_manifest_path())
+        
+        # BM25 index of the same chunks, fused with dense results by get_retriever
+        self.hybrid_config = self.rag_config.get('hybrid', {})
+        self.lexical_index: Optional[BM25Index] = None
+        if self.hybrid_config.get('enabled', True):
+            self.lexical_index = BM25Index(
+                self.hybrid_config.get('index_path') or str(self._get_store_dir() / 'lexical_index.npz'),
+                k1=self.hybrid_config.get('k1', 1.5),
+                b=self.hybrid_config.get('b', 0.75)
+            )
+        
+        # Exact and near-duplicate detection against the indexed chunks
+        dedup_config = self.rag_config.get('dedup', {})
+        self.deduplicator: Optional[ChunkDeduplicator] = create_deduplicator(
+            dedup_config,
+            path=dedup_config.get('index_path') or str(self._get_store_dir() / 'dedup_index.npz')
+        )
+        self._refresh_chunk_indexes()
+        
+        # Cross-encoder rerank stage (None if disabled)
+        self.rerank_config = self.rag_config.get('rerank', {})
+        self.reranker = create_reranker(self.rerank_config)
+        
+        # Cache of retrieval results shared by this manager's retrievers
+        self.retrieval_cache_config = self.rag_config.get('retrieval_cache', {})
+        self.retrieval_cache: Optional[RetrievalCache] = None
+        if self.retrieval_cache_config.get('enabled', True):
+            self.retrieval_cache = RetrievalCache(
+                max_entries=self.retrieval_cache_config.get('max_entries', 512),
+                ttl_seconds=self.retrieval_cache_config.get('ttl_seconds', 600),
+                order_insensitive=self.retrieval_cache_config.get('order_insensitive', True),
+                max_embeddings=self.retrieval_cache_config.get('max_embeddings', 2048)
+            )
+    
+    def _get_vectorstore_key(self) -> Dict[str, Any]:
+        """Get the configuration that identifies the shared vector store."""
+        vector_db = self.rag_config.get('vector_db', 'chromadb')
+        return {
+            "vector_db": vector_db,
+            "store": self.rag_config.get(vector_db, {}),
+            "embeddings": self.rag_config.get('embeddings', {})
+        }
     
     def _create_vectorstore(self) -> Any:
+        """
+        Get the vector store for the configuration.
+        
+        The store (and its database client) is shared process-wide by every
+        RAGManager with the same configuration.
+        
+        Returns:
+            Vector store instance
+        """
+        return get_resource_registry().get_or_create(
+            'vectorstore',
+            self._get_vectorstore_key(),
+            self._build_vectorstore
+        )
+    
+    def _build_vectorstore(self) -> Any:
         """
         Create vector store based on configuration.
         
@@ -60,6 +140,8 @@ class RAGManager:
             return ChromaDBStore(embeddings)
         elif vector_db == 'faiss':
             return FAISSStore(embeddings)
+        elif vector_db == 'numpy':
+            return NumpyStore(embeddings)
         elif vector_db == 'pinecone':
             if not PINECONE_AVAILABLE:
                 raise ValueError("Pinecone is not installed. Install with: pip install pinecone-client")
@@ -67,13 +149,160 @@ class RAGManager:
         else:
             raise ValueError(f"Unsupported vector database: {vector_db}")
     
-    def initialize_documents(self, file_paths: Optional[List[str]] = None) -> int:
+    def _get_manifest_path(self) -> str:
+        """
+        Get the path of the index manifest.
+        
+        Returns:
+            Manifest path (rag.manifest_path, or a file next to the vector store)
+        """
+        manifest_path = self.rag_config.get('manifest_path')
+        if manifest_path:
+            return manifest_path
+        
+        return str(self._get_store_dir() / 'index_manifest.json')
+    
+    def _get_store_dir(self) -> Path:
+        """Get the directory the vector store keeps its files in."""
+        vector_db = self.rag_config.get('vector_db', 'chromadb')
+        
+        if vector_db == 'chromadb':
+            store_dir = Path(self.rag_config.get('chromadb', {}).get('persist_directory', './data/chromadb'))
+        elif vector_db == 'faiss':
+            store_dir = Path(self.rag_config.get('faiss', {}).get('index_path', './data/faiss/index')).parent
+        elif vector_db == 'numpy':
+            store_dir = Path(self.rag_config.get('numpy', {}).get('persist_directory', './data/numpy'))
+        else:
+            store_dir = Path('./data') / vector_db
+        
+        return store_dir
+    
+    def _chunk_indexes(self) -> List[Any]:
+        """Get the enabled indexes kept in step with the vector store (BM25, dedup)."""
+        return [index for index in (self.lexical_index, self.deduplicator) if index is not None]
+    
+    def _refresh_chunk_indexes(self):
+        """Rebuild the chunk indexes that don't match the manifest generation."""
+        stale = [index for index in self._chunk_indexes() if index.generation != self.manifest.generation]
+        if stale:
+            self._rebuild_chunk_indexes(stale)
+    
+    def _rebuild_chunk_indexes(self, indexes: List[Any]):
         """
-        Load and index documents.
+        Rebuild chunk indexes from the files recorded in the manifest.
+        
+        Files are re-split (not re-embedded), and only the chunks whose IDs
+        the manifest recorded are indexed, so the result matches the vector
+        store.
         
         Args:
-            file_paths: Optional list of specific files to index
+            indexes: Indexes to rebuild (BM25Index or ChunkDeduplicator)
+        """
+        names = ', '.join(type(index).__name__ for index in indexes)
+        logger.info(f"Rebuilding out-of-date {names} from the indexed files")
+        for index in indexes:
+            index.clear()
+        
+        files = {path: entry for path, entry in self.manifest.files.items() if Path(path).exists()}
+        for file_path, pages in self.document_loader.iter_documents(list(files)):
+            entry = files[file_path]
+            recorded = set(entry.get('chunk_ids', []))
+            if not recorded:
+                continue
+            try:
+                chunks = [
+                    chunk for page in pages
+                    for chunk in self.document_loader.text_splitter.split_documents([page])
+                ]
+            except Exception as e:
+                logger.warning(f"Could not re-read {file_path} to rebuild {names}: {e}")
+                continue
             
+            chunk_ids = [IndexManifest.chunk_id(file_path, entry.get('sha256', ''), i) for i in range(len(chunks))]
+            kept = [(chunk, chunk_id) for chunk, chunk_id in zip(chunks, chunk_ids) if chunk_id in recorded]
+            if not kept:
+                continue
+            if self.lexical_index in indexes:
+                self.lexical_index.add([chunk for chunk, _ in kept], [chunk_id for _, chunk_id in kept])
+            if self.deduplicator in indexes:
+                for chunk, chunk_id in kept:
+                    self.deduplicator.add(chunk_id, chunk.page_content)
+        
+        for index in indexes:
+            index.save(self.manifest.generation)
+    
+    def _save_chunk_indexes(self):
+        """Persist the chunk indexes that are behind the manifest."""
+        for index in self._chunk_indexes():
+            if index.generation != self.manifest.generation:
+                index.save(self.manifest.generation)
+    
+    def _clear_chunk_indexes(self):
+        """Empty the chunk indexes (saved by the next _save_chunk_indexes)."""
+        for index in self._chunk_indexes():
+            index.clear()
+            index.generation = None
+    
+    def _get_index_signature(self) -> Dict[str, Any]:
+        """
+        Get the settings that determine chunk contents and vectors.
+        
+        Returns:
+            Dictionary that must match the manifest for its chunks to be reused
+        """
+        return {
+            "vector_db": self.rag_config.get('vector_db', 'chromadb'),
+            "embeddings_provider": self.embeddings_manager.provider,
+            "embedding_model": self.embeddings_manager.model_name,
+            "chunk_size": self.document_loader.chunk_size,
+            "chunk_overlap": self.document_loader.chunk_overlap
+        }
+    
+    def _sync_manifest_with_store(self):
+        """Reset the manifest if it no longer describes the vector store."""
+        signature = self._get_index_signature()
+        
+        if not self.manifest.matches_signature(signature):
+            if self.manifest.files:
+                logger.info("Index settings changed since last run - rebuilding the index")
+                self.vectorstore.delete(
+                    [chunk_id for path in list(self.manifest.files) for chunk_id in self.manifest.get_chunk_ids(path)]
+                )
+            self.manifest.reset(signature)
+            self._clear_chunk_indexes()
+            return
+        
+        document_count = self.vectorstore.get_stats().get('document_count')
+        
+        # The store was wiped (e.g. fresh container) but the manifest survived
+        if self.manifest.chunk_count and document_count == 0:
+            logger.info("Vector store is empty - discarding stale index manifest")
+            self.manifest.reset(signature)
+            self._clear_chunk_indexes()
+        elif not self.manifest.files and document_count:
+            logger.warning(
+                f"Vector store holds {document_count} chunks that are not tracked by the index manifest. "
+                "Clear the vector store once to avoid duplicate chunks."
+            )
+    
+    def initialize_documents(
+        self,
+        file_paths: Optional[List[str]] = None,
+        progress_callback: Optional[Callable[[IngestionProgress], None]] = None
+    ) -> int:
+        """
+        Load and index documents incrementally.
+        
+        Only new or changed files are loaded, split and embedded. Chunks of
+        changed files are replaced, and when scanning the document path the
+        chunks of files that disappeared are deleted. Files are streamed
+        through the ingestion pipeline, so chunks become searchable batch by
+        batch and an interrupted run resumes from its last committed batch.
+        
+        Args:
+            file_paths: Optional list of specific files to index
+            progress_callback: Optional callable receiving IngestionProgress updates
+        
         Returns:
             Number of document chunks indexed
         """
@@ -83,33 +312,224 @@ class RAGManager:
         
         logger.info("Loading and processing documents...")
         
-        # Load and split documents
-        chunks = self.document_loader.process_documents(file_paths)
+        self._sync_manifest_with_store()
+        # A failed earlier run may have left them ahead of the manifest
+        self._refresh_chunk_indexes()
         
-        if not chunks:
-            logger.warning("No documents to index")
+        # Only prune removed files when scanning the whole document path
+        prune_under = None
+        if file_paths is None:
+            file_paths = self.document_loader.get_document_files()
+            prune_under = self.document_loader.document_path
+        
+        diff = self.manifest.diff(file_paths, prune_under=prune_under)
+        logger.info(
+            f"Index manifest: {len(diff.new)} new, {len(diff.changed)} changed, "
+            f"{len(diff.partial)} interrupted, {len(diff.unchanged)} unchanged, "
+            f"{len(diff.removed)} removed"
+        )
+        
+        if not diff.has_changes:
+            self.manifest.save()
+            self._save_chunk_indexes()
+            logger.info("Index is up to date - nothing to do")
             return 0
         
-        # Add to vector store
-        self.vectorstore.add_documents(chunks)
+        # Files that dropped duplicates of chunks about to be deleted must be re-indexed
+        pending = diff.changed + diff.removed
+        while pending:
+            dependents = self.manifest.get_duplicate_dependents(
+                chunk_id for path in pending for chunk_id in self.manifest.get_chunk_ids(path)
+            )
+            pending = [path for path in dependents if path in diff.unchanged and Path(path).exists()]
+            for path in pending:
+                logger.info(f"Re-indexing {path}: it shares content with a changed or removed file")
+                diff.unchanged.remove(path)
+                diff.changed.append(path)
         
-        logger.info(f"Successfully indexed {len(chunks)} document chunks")
-        return len(chunks)
+        # Drop chunks of changed and removed files
+        for path in diff.changed + diff.removed:
+            chunk_ids = self.manifest.get_chunk_ids(path)
+            self.vectorstore.delete(chunk_ids)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(chunk_ids)
+            if self.deduplicator is not None:
+                self.deduplicator.remove(chunk_ids)
+            self.manifest.remove(path)
+        self.manifest.save()
+        if self.retrieval_cache:
+            self.retrieval_cache.clear()
+        
+        # Interrupted files keep their committed chunks and resume after them
+        resume = {path: self.manifest.get_chunk_ids(path) for path in diff.partial}
+        
+        ingestion_config = self.rag_config.get('ingestion', {})
+        pipeline = IngestionPipeline(
+            document_loader=self.document_loader,
+            vectorstore=self.vectorstore,
+            manifest=self.manifest,
+            embedding_model=self.embeddings_manager.model_name,
+            batch_tokens=ingestion_config.get('batch_tokens', 20000),
+            max_batch_size=ingestion_config.get('max_batch_size', 512),
+            queue_size=ingestion_config.get('queue_size', 256),
+            progress_callback=progress_callback,
+            lexical_index=self.lexical_index,
+            deduplicator=self.deduplicator
+        )
+        
+        indexed = pipeline.run(
+            diff.new + diff.changed + diff.partial,
+            hashes=diff.hashes,
+            resume=resume
+        )
+        self._save_chunk_indexes()
+        
+        if self.retrieval_cache:
+            # Results are keyed by generation; this only frees the stale entries
+            self.retrieval_cache.clear()
+        
+        if indexed == 0:
+            logger.warning("No documents to index")
+        else:
+            logger.info(f"Successfully indexed {indexed} document chunks")
+        return indexed
+    
+    @property
+    def index_generation(self) -> int:
+        """Counter that changes whenever the indexed content changes."""
+        return self.manifest.generation if self.manifest else 0
     
     def get_retriever(self, **kwargs) -> Optional[Any]:
         """
         Get a retriever for RAG queries.
         
+        Dense results below rag.similarity_threshold are dropped (see
+        _build_dense_retriever). Unless rag.hybrid is disabled, they are
+        fused with BM25 results by reciprocal rank. If rag.rerank is
+        enabled, a cross-encoder picks the final chunks. Unless
+        rag.retrieval_cache is disabled, the retriever caches results per
+        normalized query and index generation, so they are invalidated
+        whenever initialize_documents or clear_vectorstore changes the index.
+        
         Args:
             **kwargs: Additional arguments for retriever
-            
+        
         Returns:
             Retriever instance or None
         """
         if not self.enabled or not self.vectorstore:
             return None
         
-        return self.vectorstore.as_retriever(**kwargs)
+        build_retriever = lambda: self._build_retriever(**kwargs)
+        if self.retrieval_cache is None:
+            return build_retriever()
+        
+        embeddings = None
+        if self.retrieval_cache_config.get('embedding_tier', True):
+            embeddings = self.embeddings_manager.get_embeddings()
+        
+        return CachingRetriever(
+            # Rebuilt per generation so it follows a cleared and recreated store
+            build_retriever=build_retriever,
+            cache=self.retrieval_cache,
+            generation=lambda: self.index_generation,
+            search_key=make_search_key(kwargs),
+            embeddings=embeddings
+        )
+    
+    def _build_retriever(self, **kwargs) -> Any:
+        """
+        Create the retrieval pipeline: dense or hybrid search, then rerank.
+        
+        Args:
+            **kwargs: Retriever arguments; k is the number of final results
+        
+        Returns:
+            Retriever instance, or None if the vector store has no retriever yet
+        """
+        k = kwargs.get('k', self.rag_config.get('top_k', 5))
+        search_kwargs = kwargs
+        if self.reranker is not None:
+            # Over-fetch so the cross-encoder has candidates to choose from
+            search_kwargs = {**kwargs, 'k': max(k, self.rerank_config.get('candidates', 20))}
+        
+        if self.lexical_index is not None:
+            retriever = self._build_hybrid_retriever(**search_kwargs)
+        else:
+            retriever = self._build_dense_retriever(**search_kwargs)
+        
+        if retriever is None or self.reranker is None:
+            return retriever
+        
+        return RerankRetriever(
+            base_retriever=retriever,
+            reranker=self.reranker,
+            k=k,
+            latency_budget_ms=self.rerank_config.get('latency_budget_ms')
+        )
+    
+    def _build_dense_retriever(self, **kwargs) -> Any:
+        """
+        Create a vector-store retriever.
+        
+        Unless rag.retriever.apply_threshold is disabled, chunks scoring
+        below rag.similarity_threshold are dropped by the store's search,
+        and rag.retriever.adaptive_k cuts results where scores drop off.
+        With rag.retriever.search_type 'mmr', results are diversified by
+        maximal marginal relevance.
+        
+        Args:
+            **kwargs: Retriever arguments (k, score_threshold, adaptive_k,
+                      search_type, fetch_k, lambda_mult)
+        
+        Returns:
+            Retriever instance, or None if the vector store has no retriever yet
+        """
+        if not hasattr(self.vectorstore, 'similarity_search_with_scores'):
+            return self.vectorstore.as_retriever(**kwargs)
+        
+        retriever_config = self.rag_config.get('retriever', {})
+        score_threshold = None
+        if retriever_config.get('apply_threshold', True):
+            score_threshold = self.rag_config.get('similarity_threshold')
+        
+        k = kwargs.get('k', self.rag_config.get('top_k', 5))
+        return ThresholdRetriever(
+            store=self.vectorstore,
+            k=k,
+            score_threshold=kwargs.get('score_threshold', score_threshold),
+            adaptive_k=kwargs.get('adaptive_k', retriever_config.get('adaptive_k', False)),
+            min_k=retriever_config.get('min_k', 1),
+            max_gap=retriever_config.get('max_gap', 0.1),
+            search_type=kwargs.get('search_type', retriever_config.get('search_type', 'similarity')),
+            fetch_k=max(k, kwargs.get('fetch_k', retriever_config.get('fetch_k', 20))),
+            lambda_mult=kwargs.get('lambda_mult', retriever_config.get('lambda_mult', 0.5))
+        )
+    
+    def _build_hybrid_retriever(self, **kwargs) -> Optional[HybridRetriever]:
+        """
+        Create a retriever fusing dense and BM25 rankings.
+        
+        Args:
+            **kwargs: Retriever arguments; k is the number of fused results
+        
+        Returns:
+            HybridRetriever, or None if the vector store has no retriever yet
+        """
+        k = kwargs.get('k', self.rag_config.get('top_k', 5))
+        candidates = max(k, self.hybrid_config.get('candidates', 20))
+        dense_retriever = self._build_dense_retriever(**{**kwargs, 'k': candidates})
+        if dense_retriever is None:
+            return None
+        
+        return HybridRetriever(
+            dense_retriever=dense_retriever,
+            lexical_index=self.lexical_index,
+            k=k,
+            candidates=candidates,
+            rrf_k=self.hybrid_config.get('rrf_k', 60),
+            min_lexical_score=self.hybrid_config.get('min_lexical_score', 1.0)
+        )
     
     def search(
         self,
@@ -124,7 +544,7 @@ class RAGManager:
             query: Search query
             k: Number of results (uses config default if None)
             score_threshold: Minimum similarity score (uses config default if None)
-            
+        
         Returns:
             List of relevant documents
         """
@@ -163,6 +583,22 @@ class RAGManager:
         if self.vectorstore:
             stats.update(self.vectorstore.get_stats())
         
+        cache_stats = self.embeddings_manager.get_cache_stats()
+        if cache_stats:
+            stats["embedding_cache"] = cache_stats
+        
+        if self.retrieval_cache:
+            stats["retrieval_cache"] = self.retrieval_cache.get_stats()
+        
+        if self.lexical_index is not None:
+            stats["lexical_index"] = self.lexical_index.get_stats()
+        
+        if self.deduplicator is not None:
+            stats["dedup"] = self.deduplicator.get_stats()
+        
+        if self.reranker is not None:
+            stats["reranker"] = self.reranker.get_stats()
+        
         return stats
     
     def clear_vectorstore(self):
@@ -175,12 +611,20 @@ class RAGManager:
         
         if vector_db == 'chromadb':
             self.vectorstore.delete_collection()
-        elif vector_db == 'faiss':
+        elif vector_db in ('faiss', 'numpy'):
             self.vectorstore.delete_store()
         elif vector_db == 'pinecone':
             logger.warning("Pinecone index deletion not automatic. Use delete_index() carefully.")
         
+        self.manifest.reset(self._get_index_signature())
+        self.manifest.save()
+        self._clear_chunk_indexes()
+        self._save_chunk_indexes()
+        if self.retrieval_cache:
+            self.retrieval_cache.clear()
+        
         logger.info("Cleared vector store")
         
         # Reinitialize
+        get_resource_registry().discard('vectorstore', self._get_vectorstore_key())
         self.vectorstore = self._create_vectorstore()
@@ -0,0 +1,228 @@
+"""
+Reranker
+Cross-encoder scoring of retrieved chunks against the query.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from ..utils import get_logger, get_resource_registry
+
+logger = get_logger(__name__)
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, chunk) pairs with a sentence-transformers cross-encoder.
+    
+    The model is loaded on first use, on the CPU, optionally through ONNX
+    Runtime with a quantized model file. Scores are cached per query and
+    chunk text, so only unseen pairs reach the model. The average cost of
+    a pair is tracked so callers can skip reranking that would not fit
+    their latency budget; the first (warm-up) model call is not counted.
+    """
+    
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        backend: str = "torch",
+        onnx_file: Optional[str] = None,
+        batch_size: int = 32,
+        max_length: int = 512,
+        cache_size: int = 4096
+    ):
+        """
+        Initialize the reranker.
+        
+        Args:
+            model_name: Cross-encoder model name or path
+            backend: Inference backend ('torch' or 'onnx')
+            onnx_file: ONNX file inside the model repo, e.g. a quantized
+                       "onnx/model_qint8_avx2.onnx" (onnx backend only)
+            batch_size: Pairs scored per model call
+            max_length: Maximum tokens per pair
+            cache_size: Maximum number of cached pair scores
+        """
+        self.model_name = model_name
+        self.backend = backend
+        self.onnx_file = onnx_file
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache_size = cache_size
+        
+        self._model = None
+        self._unavailable = False
+        self._scores: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_lock = threading.Lock()
+        
+        # Moving average of model time per pair, None until the first call after warm-up
+        self.seconds_per_pair: Optional[float] = None
+        self._warmed_up = False
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def available(self) -> bool:
+        """Whether the model could be (or has not yet failed to be) loaded."""
+        return not self._unavailable
+    
+    def _get_model(self) -> Any:
+        """Load the cross-encoder, or return None if it can't be loaded."""
+        with self._model_lock:
+            if self._model is not None or self._unavailable:
+                return self._model
+            
+            try:
+                from sentence_transformers import CrossEncoder
+                
+                kwargs: Dict[str, Any] = {}
+                if self.backend != 'torch':
+                    kwargs['backend'] = self.backend
+                    if self.onnx_file:
+                        kwargs['model_kwargs'] = {'file_name': self.onnx_file}
+                self._model = CrossEncoder(
+                    self.model_name,
+                    max_length=self.max_length,
+                    device='cpu',
+                    **kwargs
+                )
+                logger.info(f"Loaded cross-encoder {self.model_name} ({self.backend})")
+            except Exception as e:
+                # ImportError if sentence-transformers is missing, or a load failure
+                logger.warning(f"Reranking disabled: could not load {self.model_name}: {e}")
+                self._unavailable = True
+            return self._model
+    
+    @staticmethod
+    def _key(query: str, document: Document) -> Tuple[str, str]:
+        """Get the cache key of a (query, chunk) pair."""
+        digest = hashlib.sha1(document.page_content.encode('utf-8')).hexdigest()
+        return query, digest
+    
+    def count_misses(self, query: str, documents: List[Document]) -> int:
+        """Get the number of pairs that are not cached."""
+        with self._lock:
+            return sum(self._key(query, doc) not in self._scores for doc in documents)
+    
+    def estimate_seconds(self, query: str, documents: List[Document]) -> float:
+        """Estimate the model time needed to score the documents (0 if unknown)."""
+        if self.seconds_per_pair is None:
+            return 0.0
+        return self.count_misses(query, documents) * self.seconds_per_pair
+    
+    def decay_estimate(self, factor: float = 0.9):
+        """
+        Shrink the per-pair estimate after a caller skipped reranking.
+        
+        Skipped calls don't measure anything, so without this a single slow
+        call would keep the estimate over budget for good; decaying it lets
+        a later call run and measure the model again.
+        
+        Args:
+            factor: Multiplier applied to the estimate
+        """
+        with self._lock:
+            if self.seconds_per_pair is not None:
+                self.seconds_per_pair *= factor
+    
+    def score(self, query: str, documents: List[Document]) -> Optional[List[float]]:
+        """
+        Score documents against a query.
+        
+        Args:
+            query: Query text
+            documents: Chunks to score
+        
+        Returns:
+            One score per document (higher is more relevant), or None if the
+            model is unavailable
+        """
+        keys = [self._key(query, doc) for doc in documents]
+        scores: Dict[Tuple[str, str], float] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._scores:
+                    scores[key] = self._scores[key]
+                    self._scores.move_to_end(key)
+            self.hits += len(scores)
+        
+        missing = list({key: doc for key, doc in zip(keys, documents) if key not in scores}.items())
+        if missing:
+            model = self._get_model()
+            if model is None:
+                return None
+            
+            start = time.perf_counter()
+            predicted = model.predict(
+                [(query, doc.page_content) for _, doc in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False
+            )
+            elapsed = (time.perf_counter() - start) / len(missing)
+            
+            with self._lock:
+                self.misses += len(missing)
+                # The first call pays for lazy initialization and would inflate the estimate
+                if self._warmed_up:
+                    self.seconds_per_pair = (
+                        elapsed if self.seconds_per_pair is None
+                        else 0.8 * self.seconds_per_pair + 0.2 * elapsed
+                    )
+                self._warmed_up = True
+                for (key, _), value in zip(missing, predicted):
+                    scores[key] = float(value)
+                    self._scores[key] = float(value)
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+        
+        return [scores[key] for key in keys]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get reranker statistics."""
+        with self._lock:
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "available": self.available,
+                "cached_pairs": len(self._scores),
+                "hits": self.hits,
+                "misses": self.misses,
+                "ms_per_pair": self.seconds_per_pair * 1000 if self.seconds_per_pair is not None else None
+            }
+
+
+def create_reranker(config: Optional[Dict[str, Any]] = None) -> Optional[CrossEncoderReranker]:
+    """
+    Get the reranker for the `rag.rerank` configuration section.
+    
+    The reranker (model and score cache) is shared process-wide by every
+    RAGManager with the same configuration.
+    
+    Args:
+        config: Rerank configuration dictionary
+    
+    Returns:
+        CrossEncoderReranker instance, or None if reranking is disabled
+    """
+    config = config or {}
+    if not config.get('enabled', False):
+        return None
+    
+    return get_resource_registry().get_or_create(
+        'reranker',
+        config,
+        lambda: CrossEncoderReranker(
+            model_name=config.get('model', "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+            backend=config.get('backend', 'torch'),
+            onnx_file=config.get('onnx_file'),
+            batch_size=config.get('batch_size', 32),
+            max_length=config.get('max_length', 512),
+            cache_size=config.get('cache_size', 4096)
+        )
+    )
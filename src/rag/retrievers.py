@@ -0,0 +1,476 @@
+"""
+Retrievers
+Retriever wrappers used by the RAG system.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+
+from ..utils import get_logger
+from .lexical_index import STOPWORDS
+
+logger = get_logger(__name__)
+
+
+class RetrievalCache:
+    """
+    LRU + TTL cache of retrieval results, with a tier for query embeddings.
+    
+    Results are keyed by the index generation, the search settings and the
+    normalized query, so any mutation of the index makes earlier results
+    unreachable. Query embeddings don't depend on the index and are kept
+    across generations.
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 600,
+        order_insensitive: bool = True,
+        max_embeddings: int = 2048
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            max_entries: Maximum number of cached result lists
+            ttl_seconds: Time after which cached results expire
+            order_insensitive: Treat queries with the same content words in any
+                               order ("Satish skills", "skills of Satish") as equal
+            max_embeddings: Maximum number of cached query embeddings
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.order_insensitive = order_insensitive
+        self.max_embeddings = max_embeddings
+        
+        self._results: "OrderedDict[Tuple, Tuple[float, List[Document]]]" = OrderedDict()
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.embedding_hits = 0
+        self.embedding_misses = 0
+    
+    @staticmethod
+    def normalize_text(query: str) -> str:
+        """Lowercase a query and collapse whitespace and surrounding punctuation."""
+        return re.sub(r'\s+', ' ', query.lower()).strip(' \t\n?!.,;:"\'')
+    
+    def normalize(self, query: str) -> str:
+        """Get the result-cache form of a query."""
+        text = self.normalize_text(query)
+        if not self.order_insensitive:
+            return text
+        words = set(re.findall(r"\w+", text)) - STOPWORDS
+        return ' '.join(sorted(words)) or text
+    
+    def get_results(self, key: Tuple) -> Optional[List[Document]]:
+        """Get cached results for a key, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._results[key]
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+    
+    def put_results(self, key: Tuple, documents: List[Document]):
+        """Cache results for a key."""
+        with self._lock:
+            self._results[key] = (time.time() + self.ttl_seconds, list(documents))
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+    
+    def get_embedding(self, query: str, embed: Callable[[str], List[float]]) -> List[float]:
+        """
+        Get the embedding of a query, computing it on a miss.
+        
+        Args:
+            query: Query text
+            embed: Function that embeds a query
+        
+        Returns:
+            Query embedding
+        """
+        key = self.normalize_text(query)
+        with self._lock:
+            vector = self._embeddings.get(key)
+            if vector is not None:
+                self._embeddings.move_to_end(key)
+                self.embedding_hits += 1
+                return vector
+            self.embedding_misses += 1
+        
+        vector = embed(query)
+        with self._lock:
+            self._embeddings[key] = vector
+            while len(self._embeddings) > self.max_embeddings:
+                self._embeddings.popitem(last=False)
+        return vector
+    
+    def clear(self, embeddings: bool = False):
+        """
+        Remove cached results.
+        
+        Args:
+            embeddings: Also remove cached query embeddings
+        """
+        with self._lock:
+            self._results.clear()
+            if embeddings:
+                self._embeddings.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._results),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "embedding_entries": len(self._embeddings),
+                "embedding_hits": self.embedding_hits,
+                "embedding_misses": self.embedding_misses
+            }
+
+
+class CachingRetriever(BaseRetriever):
+    """
+    Retriever that serves repeated queries from a RetrievalCache.
+    
+    The wrapped retriever is built by build_retriever and rebuilt whenever
+    the index generation changes, so it never points at a vector store
+    that was cleared and recreated.
+    """
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    build_retriever: Callable[[], Any]
+    """Creates the underlying retriever."""
+    cache: RetrievalCache
+    """Cache shared by the retrievers of one RAG manager."""
+    generation: Callable[[], int]
+    """Returns the current index generation."""
+    search_key: str = ""
+    """Identifies the search settings of the underlying retriever."""
+    embeddings: Optional[Any] = None
+    """Embeddings for the query-embedding tier (disabled if None)."""
+    
+    _base: Any = PrivateAttr(default=None)
+    _base_generation: Optional[int] = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    
+    def _get_base(self, generation: int) -> Any:
+        """Get the underlying retriever for a generation, rebuilding it if needed."""
+        with self._lock:
+            if self._base is None or self._base_generation != generation:
+                self._base = self.build_retriever()
+                self._base_generation = generation
+            return self._base
+    
+    def _search(self, base: Any, query: str) -> List[Document]:
+        """Run the underlying search, reusing the cached query embedding when possible."""
+        if isinstance(base, RerankRetriever):
+            return base.rerank(query, self._search(base.base_retriever, query))
+        
+        if isinstance(base, HybridRetriever):
+            return base.retrieve(query, lambda text: self._search(base.dense_retriever, text))
+        
+        if isinstance(base, ThresholdRetriever):
+            vector = None
+            if self.embeddings is not None:
+                vector = self.cache.get_embedding(query, self.embeddings.embed_query)
+            return base.retrieve(query, vector)
+        
+        vectorstore = getattr(base, 'vectorstore', None)
+        if (
+            self.embeddings is None
+            or vectorstore is None
+            or getattr(base, 'search_type', None) != 'similarity'
+        ):
+            return base.invoke(query)
+        
+        vector = self.cache.get_embedding(query, self.embeddings.embed_query)
+        return vectorstore.similarity_search_by_vector(vector, **base.search_kwargs)
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Get documents relevant to a query."""
+        generation = self.generation()
+        key = (generation, self.search_key, self.cache.normalize(query))
+        
+        documents = self.cache.get_results(key)
+        if documents is not None:
+            return documents
+        
+        base = self._get_base(generation)
+        if base is None:
+            return []
+        
+        documents = self._search(base, query)
+        self.cache.put_results(key, documents)
+        return documents
+
+
+class ThresholdRetriever(BaseRetriever):
+    """
+    Retriever that drops chunks below a similarity score.
+    
+    The threshold is passed into the store's scored search, on the same
+    scale as its similarity_search. With adaptive_k, results are also cut
+    at the first gap between consecutive scores larger than max_gap, so a
+    query with one strong match doesn't pad the prompt with weak ones.
+    With search_type 'mmr', the k results are picked from the fetch_k
+    nearest chunks by maximal marginal relevance instead, which skips
+    near-duplicate overlapping chunks (the adaptive cut doesn't apply).
+    """
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    store: Any
+    """Vector store wrapper providing similarity_search_with_scores."""
+    k: int = 5
+    """Maximum number of results."""
+    score_threshold: Optional[float] = None
+    """Minimum similarity score (no filtering if None)."""
+    adaptive_k: bool = False
+    """Cut results where the scores drop off sharply."""
+    min_k: int = 1
+    """Results always kept by the adaptive cut (the threshold still applies)."""
+    max_gap: float = 0.1
+    """Largest score drop between consecutive results before the adaptive cut."""
+    search_type: str = "similarity"
+    """'similarity' or 'mmr'."""
+    fetch_k: int = 20
+    """MMR candidates selected from."""
+    lambda_mult: float = 0.5
+    """MMR trade-off: 1 ranks by relevance only, 0 by diversity only."""
+    
+    def select(self, scored: List[Tuple[Document, float]]) -> List[Document]:
+        """
+        Apply the threshold and adaptive cut to scored results.
+        
+        Args:
+            scored: (document, score) pairs, best first
+        
+        Returns:
+            Documents kept
+        """
+        if self.score_threshold is not None:
+            scored = [(doc, score) for doc, score in scored if score >= self.score_threshold]
+        
+        keep = len(scored)
+        if self.adaptive_k:
+            for i in range(max(self.min_k, 1), len(scored)):
+                if scored[i - 1][1] - scored[i][1] > self.max_gap:
+                    keep = i
+                    break
+        
+        return [doc for doc, _ in scored[:keep]]
+    
+    def retrieve(self, query: str, embedding: Optional[List[float]] = None) -> List[Document]:
+        """
+        Search the store and select the results.
+        
+        Args:
+            query: Query text
+            embedding: Precomputed query embedding
+        
+        Returns:
+            Selected documents
+        """
+        if self.search_type == 'mmr':
+            scored = self.store.max_marginal_relevance_search(
+                query,
+                k=self.k,
+                fetch_k=self.fetch_k,
+                lambda_mult=self.lambda_mult,
+                score_threshold=self.score_threshold,
+                embedding=embedding
+            )
+            return [doc for doc, _ in scored]
+        
+        scored = self.store.similarity_search_with_scores(
+            query,
+            k=self.k,
+            score_threshold=self.score_threshold,
+            embedding=embedding
+        )
+        return self.select(scored)
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Get documents relevant to a query."""
+        return self.retrieve(query)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses dense and BM25 rankings with reciprocal-rank fusion.
+    
+    Each ranking contributes 1 / (rrf_k + rank) for every chunk it returns,
+    so chunks found by both rise to the top and exact-token matches
+    (names, acronyms, emails) that embeddings miss still make the cut.
+    Fusion only reorders: a fused chunk is kept if the dense retriever
+    returned it (so it passed any score threshold there) or its BM25 score
+    reaches min_lexical_score, and fewer than k chunks may come back.
+    """
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    dense_retriever: Any
+    """Vector-store retriever returning the dense candidates."""
+    lexical_index: Any
+    """BM25Index searched for the lexical candidates."""
+    k: int = 5
+    """Number of fused results."""
+    candidates: int = 20
+    """Number of lexical candidates (the dense retriever sets its own k)."""
+    rrf_k: int = 60
+    """RRF rank offset; larger values flatten the contribution of top ranks."""
+    min_lexical_score: float = 1.0
+    """Minimum BM25 score for a chunk the dense retriever didn't return."""
+    
+    def fuse(self, rankings: List[List[Document]], eligible: Optional[set] = None) -> List[Document]:
+        """
+        Combine rankings with reciprocal-rank fusion.
+        
+        Args:
+            rankings: Ranked document lists, best first
+            eligible: Texts of the chunks that may be returned (all if None)
+        
+        Returns:
+            Up to k eligible documents, best fused score first
+        """
+        scores: Dict[str, float] = {}
+        documents: Dict[str, Document] = {}
+        for ranking in rankings:
+            for rank, document in enumerate(ranking, 1):
+                # Not every store returns IDs, so chunks are matched by text
+                key = document.page_content
+                scores[key] = scores.get(key, 0.0) + 1.0 / (self.rrf_k + rank)
+                documents.setdefault(key, document)
+        
+        if eligible is not None:
+            scores = {key: score for key, score in scores.items() if key in eligible}
+        best = sorted(scores, key=scores.get, reverse=True)[:self.k]
+        return [documents[key] for key in best]
+    
+    def retrieve(self, query: str, dense_search: Callable[[str], List[Document]]) -> List[Document]:
+        """
+        Run both searches and fuse them.
+        
+        Args:
+            query: Query text
+            dense_search: Function running the dense search
+        
+        Returns:
+            Fused documents that passed the dense threshold or the BM25 floor
+        """
+        dense = dense_search(query)
+        lexical = self.lexical_index.search(query, self.candidates)
+        
+        # Weak lexical matches still vote in the fusion but aren't returned on their own
+        eligible = {document.page_content for document in dense}
+        eligible.update(document.page_content for document, score in lexical if score >= self.min_lexical_score)
+        return self.fuse([dense, [document for document, _ in lexical]], eligible)
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Get documents relevant to a query."""
+        return self.retrieve(query, self.dense_retriever.invoke)
+
+
+class RerankRetriever(BaseRetriever):
+    """
+    Retriever that reorders over-fetched candidates with a cross-encoder.
+    
+    The base retriever returns more candidates than needed and the
+    reranker keeps the k it scores highest. If scoring the uncached pairs
+    is expected to exceed latency_budget_ms, or the model is unavailable,
+    the first k candidates are returned in their original order instead.
+    Each skip decays the reranker's latency estimate, so a stale slow
+    measurement is eventually retried.
+    """
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    base_retriever: Any
+    """Retriever returning the candidates."""
+    reranker: Any
+    """CrossEncoderReranker scoring (query, chunk) pairs."""
+    k: int = 5
+    """Number of results kept."""
+    latency_budget_ms: Optional[float] = None
+    """Skip reranking expected to take longer than this (no limit if None)."""
+    
+    def rerank(self, query: str, candidates: List[Document]) -> List[Document]:
+        """
+        Keep the k candidates the reranker scores highest.
+        
+        Args:
+            query: Query text
+            candidates: Candidate documents, best first
+        
+        Returns:
+            Reranked documents
+        """
+        if len(candidates) <= 1:
+            return candidates[:self.k]
+        
+        if self.latency_budget_ms is not None:
+            estimate_ms = self.reranker.estimate_seconds(query, candidates) * 1000
+            if estimate_ms > self.latency_budget_ms:
+                logger.debug(f"Skipping rerank: {estimate_ms:.0f} ms over the {self.latency_budget_ms} ms budget")
+                self.reranker.decay_estimate()
+                return candidates[:self.k]
+        
+        scores = self.reranker.score(query, candidates)
+        if scores is None:
+            return candidates[:self.k]
+        
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order[:self.k]]
+    
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        """Get documents relevant to a query."""
+        return self.rerank(query, self.base_retriever.invoke(query))
+
+
+def make_search_key(search_kwargs: Dict[str, Any]) -> str:
+    """Serialize retriever settings into a cache key component."""
+    return json.dumps(search_kwargs, sort_keys=True, default=str)
@@ -2,10 +2,11 @@
 
 from .chromadb_store import ChromaDBStore
 from .faiss_store import FAISSStore
+from .numpy_store import NumpyStore, NumpyVectorStore
 
 # Optional: Import PineconeStore only if pinecone is installed
 try:
     from .pinecone_store import PineconeStore
-    __all__ = ['ChromaDBStore', 'FAISSStore', 'PineconeStore']
+    __all__ = ['ChromaDBStore', 'FAISSStore', 'NumpyStore', 'NumpyVectorStore', 'PineconeStore']
 except ImportError:
-    __all__ = ['ChromaDBStore', 'FAISSStore']
+    __all__ = ['ChromaDBStore', 'FAISSStore', 'NumpyStore', 'NumpyVectorStore']
@@ -2,11 +2,12 @@
 ChromaDB Vector Database Implementation
 """
 
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from pathlib import Path
 from langchain_community.vectorstores import Chroma
 from langchain_core.documents import Document
 
+from ..mmr import maximal_marginal_relevance
 from ...utils import get_config, get_logger
 
 logger = get_logger(__name__)
@@ -51,13 +52,18 @@ class ChromaDBStore:
             logger.warning(f"Could not load existing store: {e}. Will create new one when documents are added.")
             self.vectorstore = None
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
+    def add_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
         """
         Add documents to the vector store.
         
         Args:
             documents: List of Document objects
-            
+            ids: Optional list of IDs for the documents
+        
         Returns:
             List of document IDs
         """
@@ -70,17 +76,30 @@ class ChromaDBStore:
             self.vectorstore = Chroma.from_documents(
                 documents=documents,
                 embedding=self.embeddings,
+                ids=ids,
                 collection_name=self.collection_name,
                 persist_directory=self.persist_directory
             )
             logger.info(f"Created new ChromaDB store with {len(documents)} documents")
-        else:
-            # Add to existing store
-            ids = self.vectorstore.add_documents(documents)
-            logger.info(f"Added {len(documents)} documents to ChromaDB")
-            return ids
+            return list(ids) if ids else []
         
-        return []
+        # Add to existing store
+        ids = self.vectorstore.add_documents(documents, ids=ids)
+        logger.info(f"Added {len(documents)} documents to ChromaDB")
+        return ids
+    
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by ID.
+        
+        Args:
+            ids: IDs of the documents to delete
+        """
+        if not ids or self.vectorstore is None:
+            return
+        
+        self.vectorstore.delete(ids=ids)
+        logger.info(f"Deleted {len(ids)} documents from ChromaDB")
     
     def similarity_search(
         self,
@@ -95,7 +114,7 @@ class ChromaDBStore:
             query: Search query
             k: Number of results to return
             score_threshold: Minimum similarity score
-            
+        
         Returns:
             List of similar documents
         """
@@ -104,25 +123,110 @@ class ChromaDBStore:
             return []
         
         if score_threshold is not None:
-            results = self.vectorstore.similarity_search_with_relevance_scores(
-                query, k=k
-            )
-            # Filter by threshold
-            filtered_results = [
-                doc for doc, score in results
-                if score >= score_threshold
-            ]
-            return filtered_results
+            results = self.similarity_search_with_scores(query, k=k, score_threshold=score_threshold)
+            return [doc for doc, _ in results]
         else:
             return self.vectorstore.similarity_search(query, k=k)
     
+    def similarity_search_with_scores(
+        self,
+        query: str,
+        k: int = 5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for similar documents and their relevance scores.
+        
+        Args:
+            query: Search query
+            k: Maximum number of results
+            score_threshold: Minimum relevance score (0-1)
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, relevance score) pairs, best first
+        """
+        if self.vectorstore is None:
+            logger.warning("Vector store not initialized")
+            return []
+        
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        results = self.vectorstore.similarity_search_by_vector_with_relevance_scores(embedding, k=k)
+        
+        # Chroma returns distances; convert them like similarity_search_with_relevance_scores
+        relevance = self.vectorstore._select_relevance_score_fn()
+        scored = [(doc, relevance(distance)) for doc, distance in results]
+        if score_threshold is not None:
+            scored = [(doc, score) for doc, score in scored if score >= score_threshold]
+        return scored
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for diverse similar documents (maximal marginal relevance).
+        
+        The fetch_k nearest chunks are queried together with their
+        embeddings and the selection runs on that candidate matrix.
+        
+        Args:
+            query: Search query
+            k: Number of results
+            fetch_k: Number of nearest candidates to select from
+            lambda_mult: 1 ranks by relevance only, 0 by diversity only
+            score_threshold: Minimum relevance score (0-1) of candidates
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, relevance score) pairs in selection order
+        """
+        if self.vectorstore is None:
+            logger.warning("Vector store not initialized")
+            return []
+        
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        results = self.vectorstore._collection.query(
+            query_embeddings=[embedding],
+            n_results=max(k, fetch_k),
+            include=['documents', 'metadatas', 'distances', 'embeddings']
+        )
+        
+        relevance = self.vectorstore._select_relevance_score_fn()
+        candidates = [
+            (Document(id=doc_id, page_content=text, metadata=metadata or {}), relevance(distance), vector)
+            for doc_id, text, metadata, distance, vector in zip(
+                results['ids'][0],
+                results['documents'][0],
+                results['metadatas'][0],
+                results['distances'][0],
+                results['embeddings'][0]
+            )
+            if score_threshold is None or relevance(distance) >= score_threshold
+        ]
+        if not candidates:
+            return []
+        
+        selected = maximal_marginal_relevance(
+            embedding, [vector for _, _, vector in candidates], k, lambda_mult
+        )
+        return [candidates[i][:2] for i in selected]
+    
     def as_retriever(self, **kwargs):
         """
         Get a retriever interface.
         
         Args:
             **kwargs: Additional arguments for retriever
-            
+        
         Returns:
             Retriever instance
         """
@@ -2,19 +2,308 @@
 FAISS Vector Database Implementation
 """
 
-import pickle
-from typing import List, Optional
+import base64
+import json
+import operator
+import os
+import re
+import threading
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from pathlib import Path
+import numpy as np
+from langchain_community.docstore.base import AddableMixin, Docstore
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.faiss import dependable_faiss_import
+from langchain_community.vectorstores.utils import DistanceStrategy
 from langchain_core.documents import Document
 
+from ..mmr import maximal_marginal_relevance
+from ..quantization import DTYPES
 from ...utils import get_config, get_logger
 
 logger = get_logger(__name__)
 
+INDEX_TYPES = ('FlatL2', 'FlatIP', 'HNSW', 'IVF', 'IVFPQ')
+METRICS = ('l2', 'ip', 'cosine')
+
+
+class JSONLDocstore(Docstore, AddableMixin):
+    """
+    Docstore persisted as JSON lines instead of a pickle.
+    
+    The file is only read when a document that isn't in memory is looked
+    up; until then adds and deletes are kept as an overlay, so opening a
+    store and replaying its log don't parse the documents.
+    """
+    
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Initialize the docstore.
+        
+        Args:
+            path: JSONL file to load lazily (None for an empty docstore)
+        """
+        self.path = path
+        self._docs: Optional[Dict[str, Document]] = None if path else {}
+        self._added: Dict[str, Document] = {}
+        self._deleted: set = set()
+    
+    def _load(self) -> Dict[str, Document]:
+        """Get the documents, reading the file and applying the overlay on first use."""
+        if self._docs is None:
+            docs = {}
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record['id'] not in self._deleted:
+                        docs[record['id']] = Document(
+                            id=record['id'],
+                            page_content=record['page_content'],
+                            metadata=record['metadata']
+                        )
+            docs.update(self._added)
+            self._docs = docs
+            self._added = {}
+            self._deleted = set()
+        return self._docs
+    
+    def add(self, texts: Dict[str, Document]) -> None:
+        """Add documents keyed by ID."""
+        docs = self._added if self._docs is None else self._docs
+        overlapping = set(texts).intersection(docs)
+        if overlapping:
+            raise ValueError(f"Tried to add ids that already exist: {overlapping}")
+        docs.update(texts)
+        self._deleted.difference_update(texts)
+    
+    def delete(self, ids: List) -> None:
+        """Delete documents by ID, ignoring unknown IDs."""
+        docs = self._added if self._docs is None else self._docs
+        for doc_id in ids:
+            docs.pop(doc_id, None)
+            if self._docs is None:
+                self._deleted.add(doc_id)
+    
+    def search(self, search: str) -> Union[str, Document]:
+        """Get a document by ID, or an error message if it is unknown."""
+        document = self._added.get(search)
+        if document is None:
+            document = self._load().get(search)
+        return document if document is not None else f"ID {search} not found."
+    
+    def write(self, path: Path, ids: List[str]):
+        """
+        Write the documents to a JSONL file and read from it afterwards.
+        
+        Args:
+            path: Destination file
+            ids: Document IDs in index order
+        """
+        docs = self._load()
+        with open(path, 'w', encoding='utf-8') as f:
+            for doc_id in ids:
+                document = docs[doc_id]
+                f.write(json.dumps(
+                    {"id": doc_id, "page_content": document.page_content, "metadata": document.metadata},
+                    ensure_ascii=False,
+                    default=str
+                ) + "\n")
+        self.path = path
+
+
+class LabeledFAISS(FAISS):
+    """
+    LangChain FAISS store over an index with stable int64 labels.
+    
+    index_to_docstore_id maps the labels the index returns (not positions)
+    to document IDs, so removing vectors never renumbers the others.
+    Indexes that can't remove vectors (HNSW and the binary refine index)
+    keep the labels of deleted vectors as tombstones, which searches skip
+    until the index is compacted.
+    """
+    
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.label_by_docstore_id: Dict[str, int] = {
+            doc_id: label for label, doc_id in self.index_to_docstore_id.items()
+        }
+        self.next_label = max(self.index_to_docstore_id, default=-1) + 1
+        self.tombstones: set = set()
+        self._selector: Optional[Tuple[Any, Any]] = None
+    
+    def set_tombstones(self, labels: Iterable[int]):
+        """Replace the set of labels searches skip."""
+        self.tombstones = set(labels)
+        self._selector = None
+        if self.tombstones:
+            self.next_label = max(self.next_label, max(self.tombstones) + 1)
+    
+    def add_vectors(
+        self,
+        texts: List[str],
+        vectors: np.ndarray,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Add texts with precomputed vectors under new labels.
+        
+        An index that still needs training (e.g. int8 storage with no
+        float32 phase) is trained on the first batch.
+        
+        Args:
+            texts: Texts to add
+            vectors: Their embeddings, one per row
+            metadatas: Optional metadata per text
+            ids: Optional ID per text (random IDs are generated otherwise)
+        
+        Returns:
+            IDs of the added documents
+        """
+        faiss = dependable_faiss_import()
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = np.array(vectors, dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        
+        self.docstore.add({
+            doc_id: Document(id=doc_id, page_content=text, metadata=metadata)
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        })
+        if not self.index.is_trained:
+            logger.info(f"Training FAISS index on its first {len(vectors)} vectors")
+            self.index.train(vectors)
+        labels = np.arange(self.next_label, self.next_label + len(ids), dtype=np.int64)
+        self.index.add_with_ids(vectors, labels)
+        for label, doc_id in zip(labels.tolist(), ids):
+            self.index_to_docstore_id[label] = doc_id
+            self.label_by_docstore_id[doc_id] = label
+        self.next_label += len(ids)
+        return ids
+    
+    def remove(self, ids: List[str], removable: bool):
+        """
+        Remove documents by ID, ignoring unknown IDs.
+        
+        Args:
+            ids: IDs of the documents to remove
+            removable: Whether the index supports remove_ids; otherwise
+                       the labels become tombstones
+        """
+        labels = [self.label_by_docstore_id.pop(doc_id) for doc_id in ids if doc_id in self.label_by_docstore_id]
+        if not labels:
+            return
+        if removable:
+            self.index.remove_ids(np.asarray(labels, dtype=np.int64))
+        else:
+            self.set_tombstones(self.tombstones.union(labels))
+        for label in labels:
+            del self.index_to_docstore_id[label]
+        self.docstore.delete(ids)
+    
+    def search_labels(self, vector: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the index, skipping tombstones.
+        
+        HNSW leaves tombstones out of the graph search itself; other
+        indexes fetch as many extra neighbours as there are tombstones,
+        whose labels are then not in index_to_docstore_id.
+        
+        Args:
+            vector: Query vectors, one per row (already normalized for cosine)
+            k: Number of neighbours
+        
+        Returns:
+            Scores and labels like faiss.Index.search
+        """
+        faiss = dependable_faiss_import()
+        index = self.index
+        tombstones = self.tombstones
+        if not tombstones:
+            return index.search(vector, k)
+        
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap2) else index
+        if not isinstance(inner, faiss.IndexHNSW):
+            return index.search(vector, k + len(tombstones))
+        
+        selector = self._selector
+        if selector is None:
+            # The batch selector must outlive the one negating it
+            batch = faiss.IDSelectorBatch(np.fromiter(tombstones, dtype=np.int64, count=len(tombstones)))
+            selector = self._selector = (batch, faiss.IDSelectorNot(batch))
+        params = faiss.SearchParametersHNSW(sel=selector[1], efSearch=inner.hnsw.efSearch)
+        return index.search(vector, k, params=params)
+    
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Union[Callable, Dict[str, Any]]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Get the documents nearest to a vector, like FAISS but skipping tombstones."""
+        faiss = dependable_faiss_import()
+        vector = np.array([embedding], dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vector)
+        scores, labels = self.search_labels(vector, k if filter is None else fetch_k)
+        filter_func = self._create_filter_func(filter) if filter is not None else None
+        
+        docs = []
+        for score, label in zip(scores[0], labels[0]):
+            # -1 pads missing results; tombstones have no document
+            doc_id = self.index_to_docstore_id.get(int(label))
+            if doc_id is None:
+                continue
+            doc = self.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+            if filter_func is None or filter_func(doc.metadata):
+                docs.append((doc, score))
+        
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            cmp = operator.ge if self.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT else operator.le
+            docs = [(doc, score) for doc, score in docs if cmp(score, score_threshold)]
+        return docs[:k]
+
 
 class FAISSStore:
-    """FAISS vector store implementation."""
+    """
+    FAISS vector store implementation.
+    
+    Builds the index named by rag.faiss.index_type: exact flat search,
+    an HNSW graph, or an inverted file (IVF) with flat or product-quantized
+    (IVFPQ) lists. An IVF index needs training, so it starts as a flat
+    index and is trained and rebuilt once the store holds
+    ivf.train_min_points vectors. With metric 'cosine' vectors are
+    normalized and compared by inner product.
+    
+    With rag.faiss.dtype 'float16' or 'int8' the vectors are stored by a
+    scalar quantizer (int8 with per-dimension ranges learned from the
+    vectors, so it starts as float32 and is trained once the store holds
+    int8_min_points vectors). With 'binary' a flat index scans sign bits
+    and rescores rescore_factor * k candidates with the exact vectors.
+    
+    Vectors carry stable int64 labels: IVF indexes store them natively
+    and the others are wrapped in an IndexIDMap2. Deletes call remove_ids
+    where the index supports it (flat, scalar quantizer and IVF indexes,
+    which are never retrained on delete); HNSW and binary indexes keep the
+    deleted labels as tombstones that searches skip, and once they exceed
+    compact_ratio of the index it is rebuilt without them in a background
+    thread.
+    
+    On disk the store is a generation (index, label to ID mapping and
+    JSONL docstore) named by `<index_path>.json`, plus a write-ahead log
+    of the batches added or deleted since. Writes only append to the log;
+    once it holds wal.max_entries vectors (or on save()) it is compacted
+    into a new generation, which becomes current through an atomic
+    rename. A crash leaves the previous generation and its log intact,
+    and a torn last log record is discarded on load.
+    """
     
     def __init__(self, embeddings):
         """
@@ -29,40 +318,552 @@ class FAISSStore:
         
         self.index_path = self.faiss_config.get('index_path', './data/faiss/index')
         self.index_type = self.faiss_config.get('index_type', 'FlatL2')
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unsupported FAISS index type: {self.index_type}")
+        
+        self.metric = self.faiss_config.get('metric', 'ip' if self.index_type == 'FlatIP' else 'l2')
+        if self.metric not in METRICS:
+            raise ValueError(f"Unsupported FAISS metric: {self.metric}")
+        
+        hnsw_config = self.faiss_config.get('hnsw', {})
+        self.hnsw_m = hnsw_config.get('m', 32)
+        self.ef_construction = hnsw_config.get('ef_construction', 200)
+        self.ef_search = hnsw_config.get('ef_search', 64)
+        
+        ivf_config = self.faiss_config.get('ivf', {})
+        self.nlist = ivf_config.get('nlist', 1024)
+        self.nprobe = ivf_config.get('nprobe', 16)
+        self.pq_m = ivf_config.get('pq_m', 16)
+        self.pq_nbits = ivf_config.get('pq_nbits', 8)
+        # FAISS warns below 39 training points per cluster
+        self.train_min_points = ivf_config.get('train_min_points', 39 * self.nlist)
+        
+        self.dtype = self.faiss_config.get('dtype', 'float32')
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported FAISS dtype: {self.dtype}")
+        if self.dtype == 'binary' and self.index_type not in ('FlatL2', 'FlatIP'):
+            raise ValueError("FAISS dtype 'binary' requires a flat index type")
+        if self.dtype != 'float32' and self.index_type == 'IVFPQ':
+            raise ValueError("IVFPQ already compresses vectors; use dtype 'float32'")
+        self.rescore_factor = self.faiss_config.get('rescore_factor', 10)
+        self.int8_min_points = self.faiss_config.get('int8_min_points', 1000)
+        self.compact_ratio = self.faiss_config.get('compact_ratio', 0.2)
+        
+        wal_config = self.faiss_config.get('wal', {})
+        self.wal_max_entries = wal_config.get('max_entries', 5000)
         
         # Ensure directory exists
         Path(self.index_path).parent.mkdir(parents=True, exist_ok=True)
         
         self.embeddings = embeddings
-        self.vectorstore: Optional[FAISS] = None
+        self.vectorstore: Optional[LabeledFAISS] = None
+        self.generation: Optional[str] = None
+        self.wal_entries = 0
+        # Serializes writes with the background rebuild that drops tombstones
+        self._lock = threading.RLock()
+        self._rebuild_thread: Optional[threading.Thread] = None
         
         # Try to load existing store
         self._load_store()
     
     def _load_store(self):
-        """Load existing vector store."""
-        if Path(self.index_path + ".faiss").exists():
+        """Load the current generation and replay its write-ahead log."""
+        state_path = self._state_path()
+        if state_path.exists():
             try:
-                self.vectorstore = FAISS.load_local(
-                    self.index_path,
-                    self.embeddings,
-                    allow_dangerous_deserialization=True
+                faiss = dependable_faiss_import()
+                self.generation = json.loads(state_path.read_text(encoding='utf-8'))['generation']
+                ids = json.loads(self._generation_file('ids.json').read_text(encoding='utf-8'))
+                if isinstance(ids, dict):
+                    index_to_docstore_id = dict(zip(ids['labels'], ids['ids']))
+                else:
+                    # Generations written before labels are indexed by position
+                    index_to_docstore_id = dict(enumerate(ids))
+                self.vectorstore = LabeledFAISS(
+                    embedding_function=self.embeddings,
+                    index=faiss.read_index(str(self._generation_file('faiss'))),
+                    docstore=JSONLDocstore(self._generation_file('docs.jsonl')),
+                    index_to_docstore_id=index_to_docstore_id
+                )
+                self._configure_vectorstore()
+                self._replay_wal()
+                logger.info(
+                    f"Loaded FAISS store from {self.index_path} "
+                    f"({len(self.vectorstore.index_to_docstore_id)} documents, {self.wal_entries} in log)"
                 )
-                logger.info(f"Loaded FAISS store from {self.index_path}")
             except Exception as e:
                 logger.warning(f"Could not load existing store: {e}")
                 self.vectorstore = None
+        elif (Path(self.index_path) / "index.faiss").exists():
+            self._migrate_pickle_store()
         else:
             logger.info("No existing FAISS store found")
             self.vectorstore = None
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
+    def _legacy_files(self) -> List[Path]:
+        """Get the files of a store written by FAISS.save_local, and their backups after migration."""
+        directory = Path(self.index_path)
+        return [
+            directory / name
+            for base in ("index.faiss", "index.pkl")
+            for name in (base, f"{base}.migrated")
+        ]
+    
+    def _migrate_pickle_store(self):
+        """
+        Convert a store written by FAISS.save_local (pickle docstore) to the current format.
+        
+        The converted files are kept as *.migrated backups, so they are not
+        converted again once the new store is cleared.
+        """
+        try:
+            legacy = FAISS.load_local(
+                self.index_path,
+                self.embeddings,
+                allow_dangerous_deserialization=True
+            )
+        except Exception as e:
+            logger.warning(f"Could not load existing store: {e}")
+            self.vectorstore = None
+            return
+        
+        self.vectorstore = LabeledFAISS(
+            embedding_function=self.embeddings,
+            index=legacy.index,
+            docstore=JSONLDocstore(),
+            index_to_docstore_id=legacy.index_to_docstore_id
+        )
+        self.vectorstore.docstore.add(dict(legacy.docstore._dict))
+        self._configure_vectorstore()
+        self.compact()
+        for path in self._legacy_files():
+            if path.exists() and path.suffix != '.migrated':
+                path.replace(f"{path}.migrated")
+        logger.info(f"Converted pickled FAISS store at {self.index_path} to the JSONL format")
+    
+    def _state_path(self) -> Path:
+        """Get the file naming the current generation."""
+        return Path(f"{self.index_path}.json")
+    
+    def _generation_file(self, suffix: str, generation: Optional[str] = None) -> Path:
+        """Get a file of a generation (the current one by default)."""
+        return Path(f"{self.index_path}.{generation or self.generation}.{suffix}")
+    
+    @staticmethod
+    def _write_atomic(path: Path, write: Callable[[str], None]):
+        """Write a file through a temporary file, fsync it and rename it into place."""
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        fd = os.open(tmp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    
+    def _append_wal(self, record: Dict[str, Any]):
+        """Durably append a record to the write-ahead log, compacting when it is full."""
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with open(self._generation_file('wal.jsonl'), 'a', encoding='utf-8') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.wal_entries += len(record['ids'])
+        if self.wal_max_entries and self.wal_entries >= self.wal_max_entries:
+            self.compact()
+    
+    def _replay_wal(self):
+        """Apply the records of the current log, truncating a torn last record."""
+        wal_path = self._generation_file('wal.jsonl')
+        if not wal_path.exists():
+            return
+        
+        valid_bytes = 0
+        with open(wal_path, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    logger.warning(f"Discarding incomplete record at the end of {wal_path}")
+                    break
+                
+                if record['op'] == 'add':
+                    vectors = np.frombuffer(base64.b64decode(record['vectors']), dtype=np.float32)
+                    vectors = vectors.reshape(len(record['ids']), -1)
+                    self.vectorstore.add_vectors(
+                        record['texts'], vectors, metadatas=record['metadatas'], ids=record['ids']
+                    )
+                    # Train at the same point as the original run did
+                    self._maybe_train()
+                else:
+                    self._remove(record['ids'])
+                self.wal_entries += len(record['ids'])
+                valid_bytes += len(line)
+        
+        if valid_bytes < wal_path.stat().st_size:
+            with open(wal_path, 'r+b') as f:
+                f.truncate(valid_bytes)
+        self._maybe_drop_tombstones()
+    
+    def compact(self):
+        """Write the whole store as a new generation and start an empty log."""
+        with self._lock:
+            self._compact()
+    
+    def _compact(self):
+        """Write the whole store as a new generation; the caller holds the lock."""
+        if self.vectorstore is None:
+            return
+        
+        faiss = dependable_faiss_import()
+        generation = uuid.uuid4().hex[:12]
+        labels = list(self.vectorstore.index_to_docstore_id)
+        ids = [self.vectorstore.index_to_docstore_id[label] for label in labels]
+        
+        self._write_atomic(
+            self._generation_file('faiss', generation),
+            lambda path: faiss.write_index(self.vectorstore.index, path)
+        )
+        self._write_atomic(
+            self._generation_file('ids.json', generation),
+            lambda path: Path(path).write_text(json.dumps({"labels": labels, "ids": ids}), encoding='utf-8')
+        )
+        docs_path = self._generation_file('docs.jsonl', generation)
+        self._write_atomic(docs_path, lambda path: self.vectorstore.docstore.write(Path(path), ids))
+        self.vectorstore.docstore.path = docs_path
+        
+        # The switch to the new generation is this single rename
+        self._write_atomic(
+            self._state_path(),
+            lambda path: Path(path).write_text(
+                json.dumps({"generation": generation, "count": len(ids)}), encoding='utf-8'
+            )
+        )
+        
+        self.generation = generation
+        self.wal_entries = 0
+        self._remove_stale_generations()
+        logger.info(f"Compacted FAISS store to {len(ids)} documents")
+    
+    def _remove_stale_generations(self):
+        """Delete the files of generations other than the current one."""
+        index_file = Path(self.index_path)
+        pattern = re.compile(rf"{re.escape(index_file.name)}\.([0-9a-f]{{12}})\..+")
+        for path in index_file.parent.iterdir():
+            match = pattern.fullmatch(path.name)
+            if match and match.group(1) != self.generation:
+                path.unlink(missing_ok=True)
+    
+    def _configure_vectorstore(self):
+        """Match a loaded store to the configured metric and index type."""
+        faiss = dependable_faiss_import()
+        index = self.vectorstore.index
+        
+        loaded_metric = 'l2' if index.metric_type == faiss.METRIC_L2 else 'ip'
+        if (loaded_metric == 'l2') != (self.metric == 'l2'):
+            logger.warning(
+                f"FAISS index uses the {loaded_metric} metric but {self.metric} is configured; "
+                "clear the vector store to rebuild it with the new metric"
+            )
+            self.metric = loaded_metric
+        self._set_distance(self.vectorstore)
+        
+        if isinstance(index, faiss.IndexIVF) and index.direct_map.type != faiss.DirectMap.Hashtable:
+            # IVF lists already hold the position labels of older generations
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+        
+        if self._needs_rebuild(index):
+            logger.info(
+                f"Rebuilding FAISS index as {self._target_kind(index.ntotal)} "
+                f"({self._target_dtype(index.ntotal)})"
+            )
+            self.vectorstore.index = self._build_index(*self._live_vectors())
+            self.vectorstore.set_tombstones(())
+        else:
+            self._apply_search_params(index)
+            if isinstance(index, faiss.IndexIDMap2):
+                # Labels still in the index but not mapped are deletes waiting for a rebuild
+                labels = faiss.vector_to_array(index.id_map)
+                self.vectorstore.set_tombstones(set(labels.tolist()) - set(self.vectorstore.index_to_docstore_id))
+    
+    def _set_distance(self, vectorstore: FAISS):
+        """Set the distance strategy and normalization of a LangChain FAISS store."""
+        if self.metric == 'l2':
+            vectorstore.distance_strategy = DistanceStrategy.EUCLIDEAN_DISTANCE
+        else:
+            vectorstore.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+        # Set after construction: the constructor warns about normalizing for inner product
+        vectorstore._normalize_L2 = self.metric == 'cosine'
+    
+    def _metric_type(self) -> int:
+        """Get the FAISS metric constant for the configured metric."""
+        faiss = dependable_faiss_import()
+        return faiss.METRIC_L2 if self.metric == 'l2' else faiss.METRIC_INNER_PRODUCT
+    
+    def _target_kind(self, count: int) -> str:
+        """Get the kind of index the store should use for a number of vectors."""
+        if self.index_type == 'HNSW':
+            return 'HNSW'
+        if self.index_type in ('IVF', 'IVFPQ') and count >= self.train_min_points:
+            return self.index_type
+        return 'Flat'
+    
+    def _target_dtype(self, count: int) -> str:
+        """Get the storage type the index should use for a number of vectors."""
+        if self.dtype == 'int8' and count < self.int8_min_points:
+            return 'float32'
+        return self.dtype
+    
+    def _needs_rebuild(self, index: Any) -> bool:
+        """
+        Whether an index lacks stable labels or differs from the kind or storage type it should have.
+        
+        Indexes are only upgraded: a trained IVF or int8 index stays as it
+        is when deletes take the store below the training thresholds.
+        """
+        faiss = dependable_faiss_import()
+        if isinstance(index, faiss.IndexIVF):
+            labeled = index.direct_map.type == faiss.DirectMap.Hashtable
+        else:
+            labeled = isinstance(index, faiss.IndexIDMap2)
+        trained_kind = self._target_kind(max(index.ntotal, self.train_min_points))
+        trained_dtype = self._target_dtype(max(index.ntotal, self.int8_min_points))
+        return (
+            not labeled
+            or self._index_kind(index) not in (self._target_kind(index.ntotal), trained_kind)
+            or self._index_dtype(index) not in (self._target_dtype(index.ntotal), trained_dtype)
+        )
+    
+    @staticmethod
+    def _unwrap(index: Any) -> Any:
+        """Get the index inside an IndexIDMap2 (or the index itself)."""
+        faiss = dependable_faiss_import()
+        if isinstance(index, faiss.IndexIDMap2):
+            return faiss.downcast_index(index.index)
+        return index
+    
+    @classmethod
+    def _index_dtype(cls, index: Any) -> str:
+        """Get the storage type of an existing FAISS index."""
+        faiss = dependable_faiss_import()
+        index = cls._unwrap(index)
+        if isinstance(index, faiss.IndexRefine):
+            return 'binary'
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        sq = getattr(index, 'sq', None)
+        if sq is None:
+            return 'float32'
+        return {
+            faiss.ScalarQuantizer.QT_8bit: 'int8',
+            faiss.ScalarQuantizer.QT_fp16: 'float16',
+        }.get(sq.qtype, 'float32')
+    
+    @classmethod
+    def _index_kind(cls, index: Any) -> str:
+        """Get the kind of an existing FAISS index."""
+        faiss = dependable_faiss_import()
+        index = cls._unwrap(index)
+        if isinstance(index, faiss.IndexHNSW):
+            return 'HNSW'
+        if isinstance(index, faiss.IndexIVFPQ):
+            return 'IVFPQ'
+        if isinstance(index, faiss.IndexIVF):
+            return 'IVF'
+        return 'Flat'
+    
+    def _new_index(self, dimension: int, count: int) -> Any:
+        """
+        Create an empty index of the configured type with stable labels.
+        
+        Args:
+            dimension: Vector dimension
+            count: Number of vectors the index will be built from
+        
+        Returns:
+            Untrained FAISS index
+        """
+        faiss = dependable_faiss_import()
+        metric = self._metric_type()
+        kind = self._target_kind(count)
+        dtype = self._target_dtype(count)
+        qtype = {
+            'int8': faiss.ScalarQuantizer.QT_8bit,
+            'float16': faiss.ScalarQuantizer.QT_fp16,
+        }.get(dtype)
+        
+        if kind == 'HNSW':
+            if qtype is not None:
+                index = faiss.IndexHNSWSQ(dimension, qtype, self.hnsw_m, metric)
+            else:
+                index = faiss.IndexHNSWFlat(dimension, self.hnsw_m, metric)
+            index.hnsw.efConstruction = self.ef_construction
+        elif kind in ('IVF', 'IVFPQ'):
+            quantizer = faiss.IndexFlat(dimension, metric)
+            nlist = min(self.nlist, count)
+            if kind == 'IVF' and qtype is not None:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, qtype, metric)
+            elif kind == 'IVF':
+                index = faiss.IndexIVFFlat(quantizer, dimension, nlist, metric)
+            else:
+                # The vector is split into pq_m sub-vectors, so pq_m must divide the dimension
+                pq_m = max(m for m in range(1, self.pq_m + 1) if dimension % m == 0)
+                index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, self.pq_nbits, metric)
+        elif dtype == 'binary':
+            # One sign bit per dimension (no rotation, zero thresholds); the
+            # candidates' Hamming distances are replaced by exact ones, so
+            # the coarse index takes the metric of the refining flat index
+            coarse = faiss.IndexLSH(dimension, dimension, False, False)
+            coarse.metric_type = metric
+            index = faiss.IndexRefineFlat(coarse)
+            index.k_factor = self.rescore_factor
+        elif qtype is not None:
+            index = faiss.IndexScalarQuantizer(dimension, qtype, metric)
+        else:
+            index = faiss.IndexFlat(dimension, metric)
+        
+        self._apply_search_params(index)
+        return self._with_labels(index)
+    
+    @staticmethod
+    def _with_labels(index: Any) -> Any:
+        """Give an empty index stable labels: natively for IVF, through an IndexIDMap2 otherwise."""
+        faiss = dependable_faiss_import()
+        if isinstance(index, faiss.IndexIVF):
+            # Maps labels to list entries for remove_ids and reconstruct
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return index
+        return faiss.IndexIDMap2(index)
+    
+    def _build_index(self, vectors: np.ndarray, labels: np.ndarray, template: Any = None) -> Any:
+        """
+        Build an index of the configured type holding labeled vectors.
+        
+        Args:
+            vectors: Vectors to add (already normalized for cosine)
+            labels: Label of each vector
+            template: Trained index whose empty copy is filled instead of
+                      training a new one
+        
+        Returns:
+            Populated FAISS index
+        """
+        faiss = dependable_faiss_import()
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if template is not None:
+            empty = faiss.clone_index(self._unwrap(template))
+            empty.reset()
+            index = self._with_labels(empty)
+        else:
+            index = self._new_index(vectors.shape[1], len(vectors))
+        
+        if not index.is_trained:
+            logger.info(f"Training {self._index_kind(index)} index on {len(vectors)} vectors")
+            index.train(vectors)
+        if len(vectors):
+            index.add_with_ids(vectors, np.asarray(labels, dtype=np.int64))
+        return index
+    
+    def _apply_search_params(self, index: Any):
+        """Set query-time parameters (efSearch, nprobe) on an index."""
+        faiss = dependable_faiss_import()
+        index = self._unwrap(index)
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = self.ef_search
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = min(self.nprobe, index.nlist)
+    
+    def _live_vectors(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Get the vectors and labels of the stored documents, skipping tombstones."""
+        faiss = dependable_faiss_import()
+        index = self.vectorstore.index
+        labels = np.fromiter(self.vectorstore.index_to_docstore_id, dtype=np.int64)
+        if isinstance(index, faiss.IndexIVF) and not index.direct_map.type:
+            index.make_direct_map()
+        return index.reconstruct_batch(labels), labels
+    
+    def _removable(self, index: Any) -> bool:
+        """Whether remove_ids works on an index (HNSW and refine indexes can't remove vectors)."""
+        faiss = dependable_faiss_import()
+        inner = self._unwrap(index)
+        return not isinstance(inner, (faiss.IndexHNSW, faiss.IndexRefine))
+    
+    def _create_vectorstore(self, dimension: int):
+        """Create an empty LangChain store around a configured index."""
+        self.vectorstore = LabeledFAISS(
+            embedding_function=self.embeddings,
+            index=self._new_index(dimension, 0),
+            docstore=JSONLDocstore(),
+            index_to_docstore_id={}
+        )
+        self._set_distance(self.vectorstore)
+    
+    def _maybe_train(self):
+        """Train and switch to the configured IVF index once enough vectors are stored."""
+        index = self.vectorstore.index
+        if self._needs_rebuild(index):
+            logger.info(
+                f"FAISS store reached {index.ntotal} vectors; building "
+                f"{self._target_kind(index.ntotal)} ({self._target_dtype(index.ntotal)}) index"
+            )
+            self.vectorstore.index = self._build_index(*self._live_vectors())
+            self.vectorstore.set_tombstones(())
+    
+    def _maybe_drop_tombstones(self):
+        """Start a background rebuild once tombstones exceed compact_ratio of the index."""
+        tombstones = len(self.vectorstore.tombstones)
+        if not tombstones or tombstones <= self.compact_ratio * self.vectorstore.index.ntotal:
+            return
+        if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+            return
+        self._rebuild_thread = threading.Thread(
+            target=self._drop_tombstones, name="faiss-tombstones", daemon=True
+        )
+        self._rebuild_thread.start()
+    
+    def _drop_tombstones(self):
+        """Rebuild the index without its tombstones and swap it in."""
+        try:
+            with self._lock:
+                vectorstore = self.vectorstore
+                index = vectorstore.index
+                next_label = vectorstore.next_label
+                vectors, labels = self._live_vectors()
+                dropped = index.ntotal - len(labels)
+            
+            # Searches and writes continue on the old index meanwhile
+            rebuilt = self._build_index(vectors, labels, template=index)
+            
+            with self._lock:
+                if self.vectorstore is not vectorstore or vectorstore.index is not index:
+                    # Cleared or rebuilt by a write in the meantime
+                    return
+                live = vectorstore.index_to_docstore_id
+                added = np.fromiter((label for label in live if label >= next_label), dtype=np.int64)
+                if len(added):
+                    rebuilt.add_with_ids(index.reconstruct_batch(added), added)
+                vectorstore.index = rebuilt
+                # Documents deleted during the rebuild are still in it
+                vectorstore.set_tombstones(label for label in labels.tolist() if label not in live)
+            logger.info(f"Rebuilt FAISS index without {dropped} deleted vectors")
+        except Exception as e:
+            logger.error(f"Failed to rebuild FAISS index without tombstones: {e}")
+    
+    def add_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
         """
         Add documents to the vector store.
         
         Args:
             documents: List of Document objects
-            
+            ids: Optional list of IDs for the documents
+        
         Returns:
             List of document IDs
         """
@@ -70,22 +871,58 @@ class FAISSStore:
             logger.warning("No documents to add")
             return []
         
-        if self.vectorstore is None:
-            # Create new vector store
-            self.vectorstore = FAISS.from_documents(
-                documents=documents,
-                embedding=self.embeddings
-            )
-            logger.info(f"Created new FAISS store with {len(documents)} documents")
-        else:
-            # Add to existing store
-            self.vectorstore.add_documents(documents)
-            logger.info(f"Added {len(documents)} documents to FAISS")
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        
+        with self._lock:
+            created = self.vectorstore is None
+            if created:
+                self._create_vectorstore(vectors.shape[1])
+            
+            ids = self.vectorstore.add_vectors(texts, vectors, metadatas=metadatas, ids=ids)
+            self._maybe_train()
+            
+            if created:
+                # The first batch becomes the first generation
+                self._compact()
+                logger.info(f"Created new FAISS {self.index_type} store with {len(documents)} documents")
+            else:
+                self._append_wal({
+                    "op": "add",
+                    "ids": ids,
+                    "texts": texts,
+                    "metadatas": metadatas,
+                    "vectors": base64.b64encode(vectors.tobytes()).decode('ascii')
+                })
+                logger.info(f"Added {len(documents)} documents to FAISS")
+        
+        return ids
+    
+    def _remove(self, ids: List[str]):
+        """Remove known IDs from the index (or tombstone them), docstore and label mapping."""
+        self.vectorstore.remove(ids, removable=self._removable(self.vectorstore.index))
+    
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by ID.
         
-        # Save the store
-        self.save()
+        Args:
+            ids: IDs of the documents to delete
+        """
+        if not ids or self.vectorstore is None:
+            return
         
-        return []
+        with self._lock:
+            # Only log the IDs the store holds
+            ids = [doc_id for doc_id in ids if doc_id in self.vectorstore.label_by_docstore_id]
+            if not ids:
+                return
+            
+            self._remove(ids)
+            self._append_wal({"op": "delete", "ids": ids})
+            self._maybe_drop_tombstones()
+        logger.info(f"Deleted {len(ids)} documents from FAISS")
     
     def similarity_search(
         self,
@@ -100,7 +937,7 @@ class FAISSStore:
             query: Search query
             k: Number of results to return
             score_threshold: Minimum similarity score
-            
+        
         Returns:
             List of similar documents
         """
@@ -109,24 +946,119 @@ class FAISSStore:
             return []
         
         if score_threshold is not None:
-            results = self.vectorstore.similarity_search_with_score(query, k=k)
-            # Filter by threshold (FAISS returns distance, lower is better)
-            # Convert to similarity score (1 / (1 + distance))
-            filtered_results = [
-                doc for doc, distance in results
-                if (1 / (1 + distance)) >= score_threshold
-            ]
-            return filtered_results
+            results = self.similarity_search_with_scores(query, k=k, score_threshold=score_threshold)
+            return [doc for doc, _ in results]
         else:
             return self.vectorstore.similarity_search(query, k=k)
     
+    def similarity_search_with_scores(
+        self,
+        query: str,
+        k: int = 5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for similar documents and their similarity scores.
+        
+        Inner-product scores are similarities already; L2 distances are
+        converted to 1 / (1 + distance). The threshold is converted to the
+        index's own scale and applied by the FAISS search itself.
+        
+        Args:
+            query: Search query
+            k: Maximum number of results
+            score_threshold: Minimum similarity score
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, similarity score) pairs, best first
+        """
+        if self.vectorstore is None:
+            logger.warning("Vector store not initialized")
+            return []
+        
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        
+        search_kwargs = {}
+        if score_threshold is not None and (self.metric != 'l2' or score_threshold > 0):
+            # LangChain compares L2 distances with <= and similarities with >=
+            search_kwargs['score_threshold'] = (
+                score_threshold if self.metric != 'l2' else 1 / score_threshold - 1
+            )
+        results = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=k, **search_kwargs)
+        
+        if self.metric != 'l2':
+            return [(doc, float(score)) for doc, score in results]
+        return [(doc, 1 / (1 + float(distance))) for doc, distance in results]
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for diverse similar documents (maximal marginal relevance).
+        
+        The fetch_k nearest vectors are reconstructed from the index in one
+        batch and the selection runs on that candidate matrix.
+        
+        Args:
+            query: Search query
+            k: Number of results
+            fetch_k: Number of nearest candidates to select from
+            lambda_mult: 1 ranks by relevance only, 0 by diversity only
+            score_threshold: Minimum similarity score of candidates
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, similarity score) pairs in selection order
+        """
+        if self.vectorstore is None:
+            logger.warning("Vector store not initialized")
+            return []
+        
+        faiss = dependable_faiss_import()
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        vector = np.asarray([embedding], dtype=np.float32)
+        if self.vectorstore._normalize_L2:
+            faiss.normalize_L2(vector)
+        
+        vectorstore = self.vectorstore
+        index = vectorstore.index
+        raw_scores, labels = vectorstore.search_labels(vector, max(k, fetch_k))
+        found = np.fromiter(
+            (int(label) in vectorstore.index_to_docstore_id for label in labels[0]), dtype=bool, count=labels.shape[1]
+        )
+        labels, raw_scores = labels[0][found][:max(k, fetch_k)], raw_scores[0][found][:max(k, fetch_k)]
+        scores = raw_scores if self.metric != 'l2' else 1 / (1 + raw_scores)
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            labels, scores = labels[keep], scores[keep]
+        if not len(labels):
+            return []
+        
+        candidates = index.reconstruct_batch(labels)
+        
+        results = []
+        for i in maximal_marginal_relevance(vector[0], candidates, k, lambda_mult):
+            doc_id = vectorstore.index_to_docstore_id[int(labels[i])]
+            results.append((vectorstore.docstore.search(doc_id), float(scores[i])))
+        return results
+    
     def as_retriever(self, **kwargs):
         """
         Get a retriever interface.
         
         Args:
             **kwargs: Additional arguments for retriever
-            
+        
         Returns:
             Retriever instance
         """
@@ -142,21 +1074,23 @@ class FAISSStore:
         return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
     
     def save(self):
-        """Save the vector store to disk."""
-        if self.vectorstore:
-            self.vectorstore.save_local(self.index_path)
-            logger.info(f"Saved FAISS store to {self.index_path}")
+        """Save the vector store to disk, folding the write-ahead log into the index."""
+        with self._lock:
+            if self.vectorstore and self.wal_entries:
+                self._compact()
     
     def delete_store(self):
         """Delete the vector store."""
-        if self.vectorstore:
+        with self._lock:
             self.vectorstore = None
-        
-        # Delete files
-        for ext in ['.faiss', '.pkl']:
-            file_path = Path(self.index_path + ext)
-            if file_path.exists():
-                file_path.unlink()
+            
+            # Delete files
+            self._state_path().unlink(missing_ok=True)
+            for path in self._legacy_files():
+                path.unlink(missing_ok=True)
+            self.generation = None
+            self.wal_entries = 0
+            self._remove_stale_generations()
         
         logger.info("Deleted FAISS store")
     
@@ -166,13 +1100,17 @@ class FAISSStore:
             return {"status": "not_initialized", "document_count": 0}
         
         try:
-            # FAISS doesn't have a direct count method
-            # Count from docstore
-            count = len(self.vectorstore.docstore._dict) if hasattr(self.vectorstore, 'docstore') else 0
+            # Count from the position mapping, which doesn't load the docstore
+            count = len(self.vectorstore.index_to_docstore_id)
             return {
                 "status": "active",
                 "document_count": count,
-                "index_type": self.index_type
+                "wal_entries": self.wal_entries,
+                "tombstones": len(self.vectorstore.tombstones),
+                "index_type": self.index_type,
+                "active_index": self._index_kind(self.vectorstore.index),
+                "dtype": self._index_dtype(self.vectorstore.index),
+                "metric": self.metric
             }
         except Exception as e:
             logger.error(f"Error getting stats: {e}")
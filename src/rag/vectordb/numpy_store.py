@@ -0,0 +1,916 @@
+"""
+NumPy Vector Database Implementation
+In-process store that memory-maps a matrix of normalized embeddings.
+"""
+
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from ..mmr import maximal_marginal_relevance
+from ..quantization import (
+    DTYPES,
+    dequantize_int8,
+    hamming_distances,
+    int8_scales,
+    matrix_scores,
+    pack_signs,
+    quantize_int8,
+)
+from ...utils import get_config, get_logger
+
+logger = get_logger(__name__)
+
+_STATE_FILE = "store.json"
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    LangChain vector store backed by a memory-mapped `.npy` matrix.
+    
+    Embeddings are stored L2-normalized, so a search is one matrix-vector
+    product followed by an argpartition top-k, and scores are cosine
+    similarities. A generation of files (the matrix and a columnar JSON
+    sidecar with ids, texts and metadata) is named by `store.json`, which
+    is atomically replaced after each write. Writes append rows to the
+    generation's matrix and a record to its append-only sidecar log;
+    deletes and upserts only log the replaced rows as tombstones, which
+    searches skip. `store.json` holds the committed row count and log size,
+    so readers never see a half-written append. Once tombstones exceed
+    compact_ratio of the rows, the live rows are compacted into a new
+    generation, so the I/O of a run of writes stays linear in its size.
+    Readers only stat `store.json` per search, so several worker processes
+    can map the same matrix and share its pages in the OS page cache,
+    picking up writes from each other without a reload. A store has one
+    writing process at a time.
+    
+    The matrix can be stored as float16, as int8 codes with per-dimension
+    scales (a quarter of float32), or as packed sign bits (1/32) that
+    select rescore_factor * k candidates by Hamming distance before the
+    candidates are rescored exactly against float32 vectors kept on disk.
+    Only the sign bits are scanned per query, so only they need to stay
+    in memory.
+    """
+    
+    def __init__(
+        self,
+        embedding: Embeddings,
+        persist_directory: str = "./data/numpy",
+        dtype: str = "float32",
+        rescore_factor: int = 10,
+        compact_ratio: float = 0.25
+    ):
+        """
+        Initialize the store.
+        
+        Args:
+            embedding: Embeddings used for documents and queries
+            persist_directory: Directory holding the store files
+            dtype: Storage type of the matrix ('float32', 'float16', 'int8'
+                   or 'binary'); a store written with another type is
+                   converted on its next write
+            rescore_factor: Candidates per result rescored exactly (binary only)
+            compact_ratio: Fraction of deleted rows that triggers a compaction
+        """
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported numpy store dtype: {dtype}")
+        
+        self.embedding = embedding
+        self.persist_directory = Path(persist_directory)
+        self.persist_directory.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self.rescore_factor = max(rescore_factor, 1)
+        self.compact_ratio = compact_ratio
+        
+        self._lock = threading.RLock()
+        self._state_stamp: Optional[Tuple[int, int, int]] = None
+        self._generation: Optional[str] = None
+        # Storage type of the current generation and its arrays: the matrix
+        # (float vectors or int8 codes), int8 scales and packed sign bits
+        self._stored_dtype: Optional[str] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._bits: Optional[np.ndarray] = None
+        # Committed rows (live and deleted) and sidecar log bytes of the generation
+        self._count = 0
+        self._deleted_count = 0
+        self._log_size = 0
+        # Byte offset of the rows in each array file, after the .npy header
+        self._offsets: Dict[str, int] = {}
+        self._columns: Optional[Dict[str, Any]] = None
+        self._row_by_id: Optional[Dict[str, int]] = None
+        # Tombstoned rows and how much of the log the columns include
+        self._deleted: set = set()
+        self._deleted_rows: Optional[np.ndarray] = None
+        self._log_offset = 0
+        
+        self._refresh()
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embeddings used by the store."""
+        return self.embedding
+    
+    def _path(self, name: str) -> Path:
+        """Get the path of a store file."""
+        return self.persist_directory / name
+    
+    def _refresh(self):
+        """Re-map the matrix if another writer (or process) published a new generation."""
+        state_path = self._path(_STATE_FILE)
+        try:
+            stat = state_path.stat()
+        except FileNotFoundError:
+            self._state_stamp = None
+            self._generation = None
+            self._stored_dtype = None
+            self._matrix = None
+            self._scales = None
+            self._bits = None
+            self._count = 0
+            self._deleted_count = 0
+            self._log_size = 0
+            self._reset_columns()
+            return
+        
+        # store.json is replaced, never rewritten, so a new inode means a new commit
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if stamp == self._state_stamp:
+            return
+        
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+        generation = state['generation']
+        if generation != self._generation:
+            self._stored_dtype = state.get('dtype', 'float32')
+            self._scales = None
+            self._bits = None
+            if self._stored_dtype == 'int8':
+                self._scales = np.load(self._path(f"scales.{generation}.npy"))
+            self._reset_columns()
+            self._generation = generation
+        
+        # Appends grow the files in place, so map only the committed rows
+        self._count = state['count']
+        self._deleted_count = state.get('deleted', 0)
+        self._log_size = state.get('log_size', 0)
+        self._matrix = self._map('vectors', generation, self._count)
+        if self._stored_dtype == 'binary':
+            self._bits = self._map('bits', generation, self._count)
+        if self._columns is not None:
+            self._read_log()
+        self._state_stamp = stamp
+    
+    def _reset_columns(self):
+        """Forget the loaded sidecar columns and tombstones."""
+        self._columns = None
+        self._row_by_id = None
+        self._deleted = set()
+        self._deleted_rows = None
+        self._log_offset = 0
+    
+    def _map(self, name: str, generation: str, rows: int) -> np.ndarray:
+        """Memory-map the first rows of an array file, ignoring the row count in its header."""
+        path = self._path(f"{name}.{generation}.npy")
+        with open(path, 'rb') as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+            self._offsets[name] = f.tell()
+        
+        if rows == 0:
+            return np.zeros((0,) + shape[1:], dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=self._offsets[name], shape=(rows,) + shape[1:])
+    
+    def _load_columns(self) -> Dict[str, Any]:
+        """Get the sidecar columns of the current generation, loading them on first use."""
+        if self._columns is None:
+            self._reset_columns()
+            if self._generation is None:
+                self._columns = {"ids": [], "texts": [], "metadata": {}}
+            else:
+                sidecar = self._path(f"documents.{self._generation}.json")
+                self._columns = json.loads(sidecar.read_text(encoding='utf-8'))
+                self._read_log()
+        return self._columns
+    
+    def _read_log(self):
+        """Apply the sidecar log records committed since the columns were last updated."""
+        if self._log_offset >= self._log_size:
+            return
+        with open(self._path(f"documents.{self._generation}.log"), 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read(self._log_size - self._log_offset)
+        
+        for line in data.splitlines():
+            record = json.loads(line)
+            deleted = record.get('deleted', [])
+            self._deleted.update(deleted)
+            if self._row_by_id is not None:
+                for row in deleted:
+                    self._row_by_id.pop(self._columns['ids'][row], None)
+            
+            count = len(self._columns['ids'])
+            _append_rows(self._columns, record.get('ids', []), record.get('texts', []), record.get('metadatas', []))
+            if self._row_by_id is not None:
+                for row in range(count, len(self._columns['ids'])):
+                    self._row_by_id[self._columns['ids'][row]] = row
+        
+        self._deleted_rows = None
+        self._log_offset = self._log_size
+    
+    def _get_row_by_id(self) -> Dict[str, int]:
+        """Get the row index of every live document ID."""
+        if self._row_by_id is None:
+            ids = self._load_columns()['ids']
+            self._row_by_id = {
+                doc_id: row for row, doc_id in enumerate(ids) if row not in self._deleted
+            }
+        return self._row_by_id
+    
+    def _get_deleted_rows(self) -> np.ndarray:
+        """Get the tombstoned rows as an array for masking search results."""
+        self._load_columns()
+        if self._deleted_rows is None:
+            self._deleted_rows = np.fromiter(sorted(self._deleted), dtype=np.int64, count=len(self._deleted))
+        return self._deleted_rows
+    
+    def _live_rows(self, exclude: Iterable[int] = ()) -> List[int]:
+        """Get the rows that are neither tombstoned nor excluded."""
+        dropped = self._deleted.union(exclude)
+        return [row for row in range(self._count) if row not in dropped]
+    
+    def _publish(self, arrays: Dict[str, np.ndarray], columns: Dict[str, Any]):
+        """
+        Write a new generation and make it current.
+        
+        The new files are complete before `store.json` is atomically
+        replaced, so a crash leaves either the old or the new generation.
+        
+        Args:
+            arrays: Arrays of the configured storage type from _encode
+            columns: Sidecar columns
+        """
+        generation = uuid.uuid4().hex[:12]
+        matrix = arrays['vectors']
+        
+        for name, array in arrays.items():
+            array_path = self._path(f"{name}.{generation}.npy")
+            with open(str(array_path) + ".tmp", 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(str(array_path) + ".tmp", array_path)
+        
+        sidecar_path = self._path(f"documents.{generation}.json")
+        sidecar_path.with_suffix(".tmp").write_text(
+            json.dumps(columns, ensure_ascii=False, separators=(',', ':'), default=str),
+            encoding='utf-8'
+        )
+        os.replace(sidecar_path.with_suffix(".tmp"), sidecar_path)
+        
+        self._write_state(generation, int(matrix.shape[0]), self.dtype, deleted=0, log_size=0)
+        
+        previous = self._generation
+        self._refresh()
+        self._columns = columns
+        self._remove_generations(keep={generation, previous})
+    
+    def _write_state(self, generation: str, count: int, dtype: str, deleted: int, log_size: int):
+        """Atomically replace `store.json`, committing a generation's rows and log."""
+        state_path = self._path(_STATE_FILE)
+        state_path.with_suffix(".tmp").write_text(
+            json.dumps({
+                "generation": generation,
+                "count": count,
+                "deleted": deleted,
+                "log_size": log_size,
+                "dtype": dtype
+            }),
+            encoding='utf-8'
+        )
+        os.replace(state_path.with_suffix(".tmp"), state_path)
+    
+    def _append(self, arrays: Dict[str, np.ndarray], record: Dict[str, Any]):
+        """
+        Append rows and a sidecar log record to the current generation and commit them.
+        
+        Bytes past the committed sizes are left over from a write that
+        crashed before its commit, so they are truncated first.
+        
+        Args:
+            arrays: Rows to append from _encode (int8 scales are not rewritten)
+            record: Log record with the appended ids, texts and metadatas and
+                    the tombstoned rows
+        """
+        for name, array in arrays.items():
+            if name == 'scales':
+                continue
+            stored = self._matrix if name == 'vectors' else self._bits
+            row_bytes = stored.dtype.itemsize * int(np.prod(stored.shape[1:], dtype=np.int64))
+            with open(self._path(f"{name}.{self._generation}.npy"), 'r+b') as f:
+                f.seek(self._offsets[name] + self._count * row_bytes)
+                f.truncate()
+                f.write(np.ascontiguousarray(array, dtype=stored.dtype).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':'), default=str) + "\n"
+        log_fd = os.open(self._path(f"documents.{self._generation}.log"), os.O_RDWR | os.O_CREAT, 0o644)
+        with open(log_fd, 'r+b') as f:
+            f.seek(self._log_size)
+            f.truncate()
+            f.write(line.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            log_size = f.tell()
+        
+        self._write_state(
+            self._generation,
+            self._count + len(record.get('ids', [])),
+            self._stored_dtype,
+            deleted=self._deleted_count + len(record.get('deleted', [])),
+            log_size=log_size
+        )
+        self._refresh()
+    
+    def _should_compact(self, deleted: int, added: int = 0) -> bool:
+        """Check whether tombstones would exceed compact_ratio of the rows after a write."""
+        return self._deleted_count + deleted > self.compact_ratio * (self._count + added)
+    
+    def _remove_generations(self, keep: set):
+        """Delete files of old generations (the previous one stays for readers mid-switch)."""
+        for pattern in ("vectors.*.npy", "scales.*.npy", "bits.*.npy", "documents.*.json", "documents.*.log"):
+            for path in self.persist_directory.glob(pattern):
+                if path.name.split('.')[1] not in keep:
+                    path.unlink(missing_ok=True)
+    
+    def _normalize(self, vectors: Any) -> np.ndarray:
+        """Convert vectors to float32 rows of unit length."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[np.newaxis, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def _encode(self, vectors: np.ndarray, scales: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Convert normalized float32 vectors to the arrays of the configured storage type.
+        
+        Args:
+            vectors: Normalized vectors, one per row
+            scales: int8 scales to quantize with (computed from the vectors if None)
+        
+        Returns:
+            Arrays to publish, keyed by file name prefix
+        """
+        if self.dtype == 'int8':
+            scales = int8_scales(vectors) if scales is None else scales
+            return {'vectors': quantize_int8(vectors, scales), 'scales': scales}
+        
+        arrays = {'vectors': vectors.astype(np.float16 if self.dtype == 'float16' else np.float32)}
+        if self.dtype == 'binary':
+            arrays['bits'] = pack_signs(vectors)
+        return arrays
+    
+    def _vectors(self, rows: Any = None) -> np.ndarray:
+        """Get stored vectors (all, or the given rows) as float32, dequantizing int8 codes."""
+        matrix = self._matrix if rows is None else self._matrix[rows]
+        if self._stored_dtype == 'int8':
+            return dequantize_int8(matrix, self._scales)
+        return np.asarray(matrix, dtype=np.float32)
+    
+    def _select(self, rows: List[int]) -> Dict[str, np.ndarray]:
+        """Get the stored arrays restricted to rows, converted if the storage type changed."""
+        if self._stored_dtype != self.dtype:
+            return self._encode(self._vectors(rows))
+        
+        everything = len(rows) == self._count
+        arrays = {'vectors': self._matrix if everything else self._matrix[rows]}
+        if self._scales is not None:
+            arrays['scales'] = self._scales
+        if self._bits is not None:
+            arrays['bits'] = self._bits if everything else self._bits[rows]
+        return arrays
+    
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        Embed and add texts, replacing documents whose IDs already exist.
+        
+        Args:
+            texts: Texts to add
+            metadatas: Optional metadata per text
+            ids: Optional ID per text (random IDs are generated otherwise)
+        
+        Returns:
+            IDs of the added documents
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        vectors = self._normalize(self.embedding.embed_documents(texts))
+        
+        with self._lock:
+            self._refresh()
+            columns = self._load_columns()
+            row_by_id = self._get_row_by_id()
+            
+            # Upsert: tombstone rows being replaced, then append the new ones
+            replaced = sorted({row_by_id[doc_id] for doc_id in ids if doc_id in row_by_id})
+            widen = (
+                self.dtype == 'int8' and self._stored_dtype == 'int8'
+                and np.any(int8_scales(vectors) > self._scales)
+            )
+            
+            if self._matrix is not None and self._stored_dtype == self.dtype and not widen \
+                    and not self._should_compact(len(replaced), len(ids)):
+                self._append(
+                    self._encode(vectors, self._scales),
+                    {"ids": ids, "texts": texts, "metadatas": metadatas, "deleted": replaced}
+                )
+                return ids
+            
+            # Write a new generation: the first write, a dtype conversion or a compaction
+            keep = self._live_rows(replaced)
+            if self._matrix is None:
+                arrays = self._encode(vectors)
+            elif widen:
+                # New values exceed the range of the codes: widen the scales and re-quantize
+                scales = np.maximum(self._scales, int8_scales(vectors))
+                arrays = self._encode(np.concatenate([self._vectors(keep), vectors]), scales)
+            else:
+                arrays = self._select(keep)
+                new = self._encode(vectors, arrays.get('scales'))
+                for name in ('vectors', 'bits'):
+                    if name in new:
+                        arrays[name] = np.concatenate([arrays[name], new[name]])
+            
+            new_columns = _select_rows(columns, keep, self._count)
+            _append_rows(new_columns, ids, texts, metadatas)
+            self._publish(arrays, new_columns)
+        
+        return ids
+    
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """
+        Delete documents by ID; unknown IDs are ignored.
+        
+        Args:
+            ids: IDs of the documents to delete
+        
+        Returns:
+            True if any document was deleted
+        """
+        if not ids:
+            return False
+        
+        with self._lock:
+            self._refresh()
+            columns = self._load_columns()
+            row_by_id = self._get_row_by_id()
+            removed = sorted({row_by_id[doc_id] for doc_id in ids if doc_id in row_by_id})
+            if not removed:
+                return False
+            
+            if self._stored_dtype == self.dtype and not self._should_compact(len(removed)):
+                self._append({}, {"deleted": removed})
+            else:
+                keep = self._live_rows(removed)
+                self._publish(self._select(keep), _select_rows(columns, keep, self._count))
+            return True
+    
+    def get_by_ids(self, ids: List[str], /) -> List[Document]:
+        """Get documents by ID, skipping unknown IDs."""
+        with self._lock:
+            self._refresh()
+            row_by_id = self._get_row_by_id()
+            rows = [row_by_id[doc_id] for doc_id in ids if doc_id in row_by_id]
+            return [self._document(row) for row in rows]
+    
+    def delete_all(self):
+        """Delete every generation of the store."""
+        with self._lock:
+            self._path(_STATE_FILE).unlink(missing_ok=True)
+            self._matrix = None
+            self._remove_generations(keep=set())
+            self._refresh()
+    
+    def __len__(self) -> int:
+        """Number of stored documents."""
+        with self._lock:
+            self._refresh()
+            return self._count - self._deleted_count
+    
+    def _document(self, row: int) -> Document:
+        """Rebuild the document stored at a row."""
+        columns = self._load_columns()
+        metadata = {
+            key: values[row]
+            for key, values in columns['metadata'].items()
+            if values[row] is not None
+        }
+        return Document(
+            id=columns['ids'][row],
+            page_content=columns['texts'][row],
+            metadata=metadata
+        )
+    
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Get the k documents most similar to a vector.
+        
+        Args:
+            embedding: Query vector
+            k: Number of results
+            score_threshold: Minimum cosine similarity; rows below it are
+                             dropped before the top-k selection
+        
+        Returns:
+            (document, cosine similarity) pairs, best first
+        """
+        with self._lock:
+            self._refresh()
+            top, scores = self._top_rows(embedding, k, score_threshold)
+            return [(self._document(int(row)), float(score)) for row, score in zip(top, scores)]
+    
+    def _top_rows(
+        self,
+        embedding: List[float],
+        k: int,
+        score_threshold: Optional[float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the best rows for a vector and their cosine similarities, best first.
+        
+        With binary storage only the rescore_factor * k rows nearest in
+        Hamming distance are scored exactly, so the threshold applies to
+        those candidates.
+        """
+        matrix = self._matrix
+        if matrix is None or k <= 0 or len(matrix) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        
+        query = self._normalize(embedding)[0]
+        deleted = self._get_deleted_rows()
+        if self._stored_dtype == 'binary':
+            distances = hamming_distances(self._bits, pack_signs(query))
+            # Tombstoned rows are never candidates
+            distances[deleted] = np.iinfo(distances.dtype).max
+            rows = np.arange(len(distances))
+            candidates = k * self.rescore_factor
+            if candidates < len(rows):
+                # Sorted, so the float rows are read from the mapped file in order
+                rows = np.sort(np.argpartition(distances, candidates - 1)[:candidates])
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        elif self._stored_dtype == 'float32':
+            scores = matrix @ query
+            rows = np.arange(len(scores))
+        else:
+            scores = matrix_scores(matrix, query, self._scales)
+            rows = np.arange(len(scores))
+        
+        if len(deleted):
+            live = ~np.isin(rows, deleted)
+            rows, scores = rows[live], scores[live]
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            rows, scores = rows[keep], scores[keep]
+        if k < len(rows):
+            part = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[part], scores[part]
+        order = np.argsort(-scores)
+        return rows[order], scores[order]
+    
+    def max_marginal_relevance_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Get diverse documents similar to a vector.
+        
+        Args:
+            embedding: Query vector
+            k: Number of results
+            fetch_k: Number of nearest candidates to select from
+            lambda_mult: 1 ranks by relevance only, 0 by diversity only
+            score_threshold: Minimum cosine similarity of candidates
+        
+        Returns:
+            (document, cosine similarity) pairs in selection order
+        """
+        with self._lock:
+            self._refresh()
+            top, scores = self._top_rows(embedding, max(k, fetch_k), score_threshold)
+            if not len(top):
+                return []
+            selected = maximal_marginal_relevance(embedding, self._vectors(top), k, lambda_mult)
+            return [(self._document(int(top[i])), float(scores[i])) for i in selected]
+    
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any
+    ) -> List[Document]:
+        """Get diverse documents similar to a vector."""
+        results = self.max_marginal_relevance_search_with_score_by_vector(embedding, k, fetch_k, lambda_mult)
+        return [doc for doc, _ in results]
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any
+    ) -> List[Document]:
+        """Get diverse documents similar to a query."""
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding.embed_query(query), k, fetch_k, lambda_mult
+        )
+    
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        **kwargs: Any
+    ) -> List[Document]:
+        """Get the k documents most similar to a vector."""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+    
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Get the k documents most similar to a query with their cosine similarities."""
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Get the k documents most similar to a query."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+    
+    def _select_relevance_score_fn(self):
+        """Scores are already cosine similarities."""
+        return lambda score: score
+    
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        """Create a store and add texts to it."""
+        store = cls(embedding, **kwargs)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+
+def _select_rows(columns: Dict[str, Any], rows: List[int], count: int) -> Dict[str, Any]:
+    """Copy the sidecar columns, keeping only the given rows."""
+    if len(rows) == count:
+        return {
+            "ids": list(columns['ids']),
+            "texts": list(columns['texts']),
+            "metadata": {key: list(values) for key, values in columns['metadata'].items()}
+        }
+    return {
+        "ids": [columns['ids'][row] for row in rows],
+        "texts": [columns['texts'][row] for row in rows],
+        "metadata": {
+            key: [values[row] for row in rows]
+            for key, values in columns['metadata'].items()
+        }
+    }
+
+
+def _append_rows(
+    columns: Dict[str, Any],
+    ids: List[str],
+    texts: List[str],
+    metadatas: List[dict]
+):
+    """Append documents to the sidecar columns, padding missing metadata keys with None."""
+    count = len(columns['ids'])
+    metadata_columns = columns['metadata']
+    for metadata in metadatas:
+        for key in metadata:
+            if key not in metadata_columns:
+                metadata_columns[key] = [None] * count
+    
+    for doc_id, text, metadata in zip(ids, texts, metadatas):
+        columns['ids'].append(doc_id)
+        columns['texts'].append(text)
+        for key, values in metadata_columns.items():
+            values.append(metadata.get(key))
+
+
+class NumpyStore:
+    """In-process NumPy vector store implementation."""
+    
+    def __init__(self, embeddings):
+        """
+        Initialize NumPy store.
+        
+        Args:
+            embeddings: Embeddings instance
+        """
+        self.config = get_config()
+        self.rag_config = self.config.get_rag_config()
+        self.numpy_config = self.rag_config.get('numpy', {})
+        
+        self.persist_directory = self.numpy_config.get('persist_directory', './data/numpy')
+        self.dtype = self.numpy_config.get('dtype', 'float32')
+        self.rescore_factor = self.numpy_config.get('rescore_factor', 10)
+        self.compact_ratio = self.numpy_config.get('compact_ratio', 0.25)
+        
+        self.embeddings = embeddings
+        self.vectorstore = NumpyVectorStore(
+            embeddings,
+            persist_directory=self.persist_directory,
+            dtype=self.dtype,
+            rescore_factor=self.rescore_factor,
+            compact_ratio=self.compact_ratio
+        )
+        logger.info(f"Opened NumPy store at {self.persist_directory} ({len(self.vectorstore)} documents)")
+    
+    def add_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Add documents to the vector store.
+        
+        Args:
+            documents: List of Document objects
+            ids: Optional list of IDs for the documents
+        
+        Returns:
+            List of document IDs
+        """
+        if not documents:
+            logger.warning("No documents to add")
+            return []
+        
+        ids = self.vectorstore.add_texts(
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents],
+            ids=ids
+        )
+        logger.info(f"Added {len(documents)} documents to NumPy store")
+        return ids
+    
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by ID.
+        
+        Args:
+            ids: IDs of the documents to delete
+        """
+        if not ids:
+            return
+        
+        if self.vectorstore.delete(ids):
+            logger.info(f"Deleted {len(ids)} documents from NumPy store")
+    
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 5,
+        score_threshold: Optional[float] = None
+    ) -> List[Document]:
+        """
+        Search for similar documents.
+        
+        Args:
+            query: Search query
+            k: Number of results to return
+            score_threshold: Minimum cosine similarity
+        
+        Returns:
+            List of similar documents
+        """
+        results = self.similarity_search_with_scores(query, k=k, score_threshold=score_threshold)
+        return [doc for doc, _ in results]
+    
+    def similarity_search_with_scores(
+        self,
+        query: str,
+        k: int = 5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for similar documents and their cosine similarities.
+        
+        Args:
+            query: Search query
+            k: Maximum number of results
+            score_threshold: Minimum cosine similarity
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, cosine similarity) pairs, best first
+        """
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        return self.vectorstore.similarity_search_with_score_by_vector(
+            embedding, k=k, score_threshold=score_threshold
+        )
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for diverse similar documents (maximal marginal relevance).
+        
+        Args:
+            query: Search query
+            k: Number of results
+            fetch_k: Number of nearest candidates to select from
+            lambda_mult: 1 ranks by relevance only, 0 by diversity only
+            score_threshold: Minimum cosine similarity of candidates
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, cosine similarity) pairs in selection order
+        """
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        return self.vectorstore.max_marginal_relevance_search_with_score_by_vector(
+            embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, score_threshold=score_threshold
+        )
+    
+    def as_retriever(self, **kwargs):
+        """
+        Get a retriever interface.
+        
+        Args:
+            **kwargs: Additional arguments for retriever
+        
+        Returns:
+            Retriever instance
+        """
+        search_kwargs = {
+            'k': self.rag_config.get('top_k', 5)
+        }
+        search_kwargs.update(kwargs)
+        
+        return self.vectorstore.as_retriever(search_kwargs=search_kwargs)
+    
+    def delete_store(self):
+        """Delete the vector store files."""
+        self.vectorstore.delete_all()
+        logger.info("Deleted NumPy store")
+    
+    def get_stats(self) -> dict:
+        """Get statistics about the vector store."""
+        return {
+            "status": "active",
+            "document_count": len(self.vectorstore),
+            "dtype": self.dtype
+        }
@@ -2,11 +2,12 @@
 Pinecone Vector Database Implementation
 """
 
-from typing import List, Optional
+from typing import Any, List, Optional, Tuple
 from langchain_community.vectorstores import Pinecone as LangchainPinecone
 from langchain_core.documents import Document
 import pinecone
 
+from ..mmr import maximal_marginal_relevance
 from ...utils import get_config, get_logger
 
 logger = get_logger(__name__)
@@ -64,12 +65,17 @@ class PineconeStore:
             logger.error(f"Error initializing Pinecone: {e}")
             raise
     
-    def add_documents(self, documents: List[Document]) -> List[str]:
+    def add_documents(
+        self,
+        documents: List[Document],
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
         """
         Add documents to the vector store.
         
         Args:
             documents: List of Document objects
+            ids: Optional list of IDs for the documents
             
         Returns:
             List of document IDs
@@ -84,21 +90,157 @@ class PineconeStore:
                 self.vectorstore = LangchainPinecone.from_documents(
                     documents=documents,
                     embedding=self.embeddings,
+                    ids=ids,
                     index_name=self.index_name
                 )
                 logger.info(f"Created Pinecone store with {len(documents)} documents")
-            else:
-                # Add to existing store
-                ids = self.vectorstore.add_documents(documents)
-                logger.info(f"Added {len(documents)} documents to Pinecone")
-                return ids
+                return list(ids) if ids else []
             
-            return []
+            # Add to existing store
+            ids = self.vectorstore.add_documents(documents, ids=ids)
+            logger.info(f"Added {len(documents)} documents to Pinecone")
+            return ids
         
         except Exception as e:
             logger.error(f"Error adding documents to Pinecone: {e}")
             raise
     
+    def delete(self, ids: List[str]):
+        """
+        Delete documents by ID.
+        
+        Args:
+            ids: IDs of the documents to delete
+        """
+        if not ids:
+            return
+        
+        try:
+            pinecone.Index(self.index_name).delete(ids=ids)
+            logger.info(f"Deleted {len(ids)} documents from Pinecone")
+        except Exception as e:
+            logger.error(f"Error deleting documents from Pinecone: {e}")
+            raise
+    
+    def _get_vectorstore(self) -> LangchainPinecone:
+        """Get the LangChain store, connecting to the existing index on first use."""
+        if self.vectorstore is None:
+            self.vectorstore = LangchainPinecone.from_existing_index(
+                index_name=self.index_name,
+                embedding=self.embeddings
+            )
+        return self.vectorstore
+    
+    def _query(
+        self,
+        embedding: List[float],
+        top_k: int,
+        score_threshold: Optional[float],
+        include_values: bool = False
+    ) -> List[Tuple[Document, float, Any]]:
+        """
+        Query the index by vector.
+        
+        Args:
+            embedding: Query embedding
+            top_k: Number of matches
+            score_threshold: Minimum relevance score (0-1)
+            include_values: Also return the stored vectors
+        
+        Returns:
+            (document, relevance score, vector or None) triples, best first
+        """
+        vectorstore = self._get_vectorstore()
+        response = vectorstore._index.query(
+            vector=embedding,
+            top_k=top_k,
+            include_metadata=True,
+            include_values=include_values
+        )
+        
+        # Pinecone returns similarities; convert them like similarity_search_with_relevance_scores
+        relevance = vectorstore._select_relevance_score_fn()
+        results = []
+        for match in response['matches']:
+            score = relevance(match['score'])
+            if score_threshold is not None and score < score_threshold:
+                continue
+            metadata = dict(match.get('metadata') or {})
+            text = metadata.pop(vectorstore._text_key, '')
+            document = Document(id=match['id'], page_content=text, metadata=metadata)
+            results.append((document, score, match.get('values') if include_values else None))
+        return results
+    
+    def similarity_search_with_scores(
+        self,
+        query: str,
+        k: int = 5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for similar documents and their relevance scores.
+        
+        Args:
+            query: Search query
+            k: Maximum number of results
+            score_threshold: Minimum relevance score (0-1)
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, relevance score) pairs, best first
+        """
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        
+        try:
+            return [(doc, score) for doc, score, _ in self._query(embedding, k, score_threshold)]
+        except Exception as e:
+            logger.error(f"Error searching Pinecone: {e}")
+            return []
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 5,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        score_threshold: Optional[float] = None,
+        embedding: Optional[List[float]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search for diverse similar documents (maximal marginal relevance).
+        
+        The fetch_k nearest chunks are queried together with their vectors
+        and the selection runs on that candidate matrix.
+        
+        Args:
+            query: Search query
+            k: Number of results
+            fetch_k: Number of nearest candidates to select from
+            lambda_mult: 1 ranks by relevance only, 0 by diversity only
+            score_threshold: Minimum relevance score (0-1) of candidates
+            embedding: Precomputed query embedding
+        
+        Returns:
+            (document, relevance score) pairs in selection order
+        """
+        if embedding is None:
+            embedding = self.embeddings.embed_query(query)
+        
+        try:
+            candidates = self._query(embedding, max(k, fetch_k), score_threshold, include_values=True)
+        except Exception as e:
+            logger.error(f"Error searching Pinecone: {e}")
+            return []
+        if not candidates:
+            return []
+        
+        selected = maximal_marginal_relevance(
+            embedding, [vector for _, _, vector in candidates], k, lambda_mult
+        )
+        return [candidates[i][:2] for i in selected]
+    
     def similarity_search(
         self,
         query: str,
@@ -116,12 +258,7 @@ class PineconeStore:
         Returns:
             List of similar documents
         """
-        if self.vectorstore is None:
-            # Initialize vector store for search
-            self.vectorstore = LangchainPinecone.from_existing_index(
-                index_name=self.index_name,
-                embedding=self.embeddings
-            )
+        self._get_vectorstore()
         
         try:
             if score_threshold is not None:
@@ -149,11 +286,7 @@ class PineconeStore:
         Returns:
             Retriever instance
         """
-        if self.vectorstore is None:
-            self.vectorstore = LangchainPinecone.from_existing_index(
-                index_name=self.index_name,
-                embedding=self.embeddings
-            )
+        self._get_vectorstore()
         
         search_kwargs = {
             'k': self.rag_config.get('top_k', 5)
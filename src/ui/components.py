@@ -28,7 +28,9 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
             agent_names = list(agents.keys())
             agent_labels = [agents[name]['name'] for name in agent_names]
             
-            selected_index = agent_names.index(agent_manager.current_agent_name)
+            # The agent manager is shared, so the selection is kept per session
+            current_name = st.session_state.get('agent_name') or agent_manager.current_agent_name
+            selected_index = agent_names.index(current_name)
             
             selected_label = st.selectbox(
                 "Select Agent",
@@ -40,12 +42,12 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
             # Get agent name from label
             selected_name = agent_names[agent_labels.index(selected_label)]
             
-            if selected_name != agent_manager.current_agent_name:
-                agent_manager.set_current_agent(selected_name)
+            if selected_name != current_name:
+                st.session_state.agent_name = selected_name
                 st.rerun()
             
             # Show agent description
-            current_agent = agent_manager.get_current_agent()
+            current_agent = agent_manager.get_agent(current_name)
             st.info(f"**{current_agent.description}**")
         
         st.divider()
@@ -54,15 +56,9 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
         if 'admin_logged_in' not in st.session_state:
             st.session_state.admin_logged_in = False
         
-        # Initialize tool states in session state if not exists (needed for both admin and non-admin)
-        if 'enable_calculator' not in st.session_state:
-            st.session_state.enable_calculator = True
-        if 'enable_rag_search' not in st.session_state:
-            st.session_state.enable_rag_search = True
-        if 'enable_web_search' not in st.session_state:
-            st.session_state.enable_web_search = False
-        if 'enable_email' not in st.session_state:
-            st.session_state.enable_email = False
+        # Agents are shared by all sessions, so tool states are read from the agent itself
+        agent_name = st.session_state.get('agent_name') or agent_manager.current_agent_name
+        tool_settings = agent_manager.get_agent(agent_name).get_tool_settings()
         
         if not st.session_state.admin_logged_in:
             # Show login link and form
@@ -104,65 +100,61 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
             # Tools Configuration (only visible when logged in as admin)
             st.subheader("🛠️ Agent Tools")
             
-            current_agent = agent_manager.get_current_agent()
+            st.caption("Tool changes apply to every session using this agent.")
             
             # Individual tool toggles
             enable_calculator = st.toggle(
                 "🧮 Calculator",
-                value=st.session_state.enable_calculator,
+                value=tool_settings['enable_calculator'],
                 help="Enable calculator for mathematical operations"
             )
             
             enable_rag_search = st.toggle(
                 "📚 RAG Search",
-                value=st.session_state.enable_rag_search,
+                value=tool_settings['enable_rag_search'],
                 help="Enable knowledge base search"
             )
             
             enable_web_search = st.toggle(
                 "🌐 Web Search",
-                value=st.session_state.enable_web_search,
+                value=tool_settings['enable_web_search'],
                 help="Enable web search. Requires TAVILY_API_KEY environment variable"
             )
             
             enable_email = st.toggle(
                 "📧 Email",
-                value=st.session_state.enable_email,
+                value=tool_settings['enable_email'],
                 help="Enable email sending. Requires email configuration in config.yaml"
             )
             
             # Check if any tool settings changed
             tools_changed = (
-                enable_calculator != st.session_state.enable_calculator or
-                enable_rag_search != st.session_state.enable_rag_search or
-                enable_web_search != st.session_state.enable_web_search or
-                enable_email != st.session_state.enable_email
+                enable_calculator != tool_settings['enable_calculator'] or
+                enable_rag_search != tool_settings['enable_rag_search'] or
+                enable_web_search != tool_settings['enable_web_search'] or
+                enable_email != tool_settings['enable_email']
             )
             
             if tools_changed:
-                st.session_state.enable_calculator = enable_calculator
-                st.session_state.enable_rag_search = enable_rag_search
-                st.session_state.enable_web_search = enable_web_search
-                st.session_state.enable_email = enable_email
-                
                 # Update agent tools with individual settings
                 agent_manager.update_agent_tools_individual(
                     enable_calculator=enable_calculator,
                     enable_rag_search=enable_rag_search,
                     enable_web_search=enable_web_search,
-                    enable_email=enable_email
+                    enable_email=enable_email,
+                    agent_name=agent_name
                 )
                 st.rerun()
             
             # Show active tools
             active_tools = []
-            if st.session_state.enable_calculator:
+            if tool_settings['enable_calculator']:
                 active_tools.append("calculator")
-            if st.session_state.enable_rag_search:
+            if tool_settings['enable_rag_search']:
                 active_tools.append("rag_search")
-            if st.session_state.enable_web_search:
+            if tool_settings['enable_web_search']:
                 active_tools.append("web_search")
-            if st.session_state.enable_email:
+            if tool_settings['enable_email']:
                 active_tools.append("send_email")
             
             if active_tools:
@@ -176,7 +168,7 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
             st.subheader("💡 Try Examples")
             
             # Calculator examples
-            if st.session_state.enable_calculator:
+            if tool_settings['enable_calculator']:
                 st.caption("**🧮 Calculator Examples:**")
                 col1, col2 = st.columns(2)
                 with col1:
@@ -189,7 +181,7 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
                         st.rerun()
             
             # RAG Search examples
-            if st.session_state.enable_rag_search:
+            if tool_settings['enable_rag_search']:
                 st.caption("**📚 RAG Search Examples:**")
                 col1, col2 = st.columns(2)
                 with col1:
@@ -202,7 +194,7 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
                         st.rerun()
             
             # Web Search examples
-            if st.session_state.enable_web_search:
+            if tool_settings['enable_web_search']:
                 st.caption("**🌐 Web Search Examples:**")
                 col1, col2 = st.columns(2)
                 with col1:
@@ -215,7 +207,7 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
                         st.rerun()
             
             # Email examples
-            if st.session_state.enable_email:
+            if tool_settings['enable_email']:
                 st.caption("**📧 Email Examples:**")
                 col1, col2 = st.columns(2)
                 with col1:
@@ -245,7 +237,7 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
                     st.caption("Vector DB: Not initialized ⚠️")
                 
                 # Show RAG tool status (whether agent can use it)
-                if st.session_state.enable_rag_search:
+                if tool_settings['enable_rag_search']:
                     st.caption("RAG Search Tool: Active 🟢")
                 else:
                     st.caption("RAG Search Tool: Inactive 🔴")
@@ -260,8 +252,8 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
                 
                 with col1:
                     if st.button("♻️ Reset All", use_container_width=True):
+                        agent_manager.clear_all_histories(st.session_state.session_id)
                         st.session_state.clear()
-                        agent_manager.clear_all_histories()
                         st.rerun()
                 
                 with col2:
@@ -276,7 +268,10 @@ def render_sidebar(agent_manager, rag_manager, config: Dict[str, Any]):
         
         if st.button("🗑️ Clear Chat", use_container_width=True):
             st.session_state.messages = []
-            agent_manager.clear_history()
+            agent_manager.clear_history(
+                agent_name=st.session_state.get('agent_name'),
+                session_id=st.session_state.session_id
+            )
             st.rerun()
         
         # Basic RAG info (visible to everyone)
@@ -327,34 +322,19 @@ def render_file_uploader(rag_manager):
         
         if uploaded_files and st.button("Process Documents"):
             with st.spinner("Processing documents..."):
-                import tempfile
-                import os
-                
-                temp_files = []
                 try:
-                    # Save uploaded files temporarily
-                    for uploaded_file in uploaded_files:
-                        with tempfile.NamedTemporaryFile(
-                            delete=False,
-                            suffix=os.path.splitext(uploaded_file.name)[1]
-                        ) as tmp_file:
-                            tmp_file.write(uploaded_file.getvalue())
-                            temp_files.append(tmp_file.name)
+                    # Keep uploads in the document path so they stay indexed across rebuilds
+                    saved_files = [
+                        rag_manager.document_loader.save_upload(uploaded_file.name, uploaded_file.getvalue())
+                        for uploaded_file in uploaded_files
+                    ]
                     
                     # Process documents
-                    count = rag_manager.initialize_documents(temp_files)
+                    count = rag_manager.initialize_documents(saved_files)
                     st.success(f"Successfully processed {count} document chunks!")
                 
                 except Exception as e:
                     st.error(f"Error processing documents: {e}")
-                
-                finally:
-                    # Clean up temp files
-                    for temp_file in temp_files:
-                        try:
-                            os.unlink(temp_file)
-                        except:
-                            pass
 
 
 def render_chat_input(agent_manager, config: Dict[str, Any]):
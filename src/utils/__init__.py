@@ -2,6 +2,7 @@
 
 from .config_loader import ConfigLoader, get_config, reload_config
 from .logger import setup_logger, get_logger
+from .resource_registry import ResourceRegistry, get_resource_registry
 
 __all__ = [
     'ConfigLoader',
@@ -9,4 +10,6 @@ __all__ = [
     'reload_config',
     'setup_logger',
     'get_logger',
+    'ResourceRegistry',
+    'get_resource_registry',
 ]
@@ -0,0 +1,132 @@
+"""
+Process-wide registry of shared, expensive resources.
+"""
+
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ResourceRegistry:
+    """
+    Holds one instance of each expensive resource per distinct configuration.
+    
+    Resources such as LLM clients, embeddings clients and vector stores are
+    keyed by a kind and their configuration, so every session and agent that
+    asks for the same configuration gets the same object instead of
+    building its own.
+    """
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._resources: Dict[Tuple[str, str], Any] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(kind: str, config: Any) -> Tuple[str, str]:
+        """
+        Build a registry key from a resource kind and its configuration.
+        
+        Args:
+            kind: Resource kind, e.g. 'llm' or 'embeddings'
+            config: JSON-serializable configuration identifying the resource
+        
+        Returns:
+            Hashable registry key
+        """
+        return kind, json.dumps(config, sort_keys=True, default=str)
+    
+    def get_or_create(self, kind: str, config: Any, factory: Callable[[], Any]) -> Any:
+        """
+        Get the resource for a configuration, creating it on first use.
+        
+        Concurrent callers asking for the same key wait for a single
+        construction instead of each building their own instance.
+        
+        Args:
+            kind: Resource kind
+            config: Configuration identifying the resource
+            factory: Callable that creates the resource
+        
+        Returns:
+            Shared resource instance
+        """
+        key = self.make_key(kind, config)
+        
+        with self._lock:
+            if key in self._resources:
+                self.hits += 1
+                return self._resources[key]
+            key_lock = self._locks.setdefault(key, threading.Lock())
+        
+        with key_lock:
+            with self._lock:
+                if key in self._resources:
+                    self.hits += 1
+                    return self._resources[key]
+            
+            resource = factory()
+            
+            with self._lock:
+                self._resources[key] = resource
+                self.misses += 1
+        
+        logger.info(f"Created shared {kind} resource")
+        return resource
+    
+    def discard(self, kind: str, config: Any) -> Optional[Any]:
+        """
+        Remove a resource so the next request creates a new one.
+        
+        Args:
+            kind: Resource kind
+            config: Configuration identifying the resource
+        
+        Returns:
+            The removed resource, or None if it was not registered
+        """
+        key = self.make_key(kind, config)
+        with self._lock:
+            self._locks.pop(key, None)
+            return self._resources.pop(key, None)
+    
+    def clear(self):
+        """Remove all resources."""
+        with self._lock:
+            self._resources.clear()
+            self._locks.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the number of shared resources per kind and lookup counters."""
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for kind, _ in self._resources:
+                counts[kind] = counts.get(kind, 0) + 1
+        return {"resources": counts, "hits": self.hits, "misses": self.misses}
+
+
+# Global registry instance
+_registry_instance: Optional[ResourceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_resource_registry() -> ResourceRegistry:
+    """
+    Get the global resource registry.
+    
+    Returns:
+        ResourceRegistry instance
+    """
+    global _registry_instance
+    if _registry_instance is None:
+        with _registry_lock:
+            if _registry_instance is None:
+                _registry_instance = ResourceRegistry()
+    return _registry_instance
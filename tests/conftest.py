@@ -139,3 +139,16 @@ def pytest_collection_modifyitems(config, items):
         if "requires_api_key" in item.keywords:
             if not os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY").startswith("sk-test"):
                 item.add_marker(skip_api)
+
+
+@pytest.fixture
+def isolated_conversations(monkeypatch, tmp_path):
+    """Keep the conversation store and checkpoints of AgentManager() under tmp_path."""
+    from src.utils import get_config
+    
+    config = get_config().config
+    conversation = dict(config.get('conversation', {}))
+    conversation['sqlite_path'] = str(tmp_path / "conversations.sqlite")
+    conversation['checkpoint_path'] = str(tmp_path / "checkpoints.sqlite")
+    monkeypatch.setitem(config, 'conversation', conversation)
+    return conversation
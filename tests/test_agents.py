@@ -4,12 +4,26 @@ Unit tests for agent functionality.
 
 import pytest
 from pathlib import Path
+import asyncio
 import sys
+import threading
+import time
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.agents import BaseAgent, AgentManager
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.tools import Tool
+
+from src.agents import (
+    BaseAgent,
+    AgentManager,
+    Message,
+    InMemoryConversationStore,
+    SQLiteConversationStore,
+    create_checkpointer,
+    ResponseCache
+)
 
 
 def test_agent_initialization():
@@ -32,7 +46,7 @@ def test_agent_initialization():
         pytest.skip(f"Skipping due to missing API key: {e}")
 
 
-def test_agent_manager_initialization():
+def test_agent_manager_initialization(isolated_conversations):
     """Test that agent manager initializes correctly."""
     try:
         manager = AgentManager()
@@ -42,7 +56,7 @@ def test_agent_manager_initialization():
         pytest.skip(f"Skipping due to initialization error: {e}")
 
 
-def test_list_agents():
+def test_list_agents(isolated_conversations):
     """Test listing available agents."""
     try:
         manager = AgentManager()
@@ -53,5 +67,517 @@ def test_list_agents():
         pytest.skip(f"Skipping due to initialization error: {e}")
 
 
+def test_in_memory_store_evicts_lru_and_idle_threads(monkeypatch):
+    """Test LRU capacity, TTL expiry and per-thread message trimming."""
+    clock = [1000.0]
+    monkeypatch.setattr('src.agents.conversation_store.time.time', lambda: clock[0])
+    store = InMemoryConversationStore(max_sessions=2, ttl_seconds=60, max_messages=3)
+    
+    store.append('a', [Message('user', str(i)) for i in range(5)])
+    store.append('b', [Message('user', 'b')])
+    store.get_messages('a')
+    store.append('c', [Message('user', 'c')])
+    
+    assert [m.content for m in store.get_messages('a')] == ['2', '3', '4']
+    assert store.get_messages('b') == []
+    
+    clock[0] += 61
+    assert store.count_threads() == 0
+
+
+def test_sqlite_store_persists_history(tmp_path):
+    """Test that the SQLite backend keeps history across instances."""
+    path = str(tmp_path / "conversations.sqlite")
+    store = SQLiteConversationStore(path, max_messages=2)
+    store.append('s1', [Message('user', 'hi'), Message('assistant', 'hello', metadata={'used_tools': False})])
+    store.append('s1', [Message('user', 'again')])
+    
+    reopened = SQLiteConversationStore(path, max_messages=2)
+    messages = reopened.get_messages('s1')
+    assert [m.content for m in messages] == ['hello', 'again']
+    assert messages[0].metadata == {'used_tools': False}
+    
+    reopened.clear('s1')
+    assert reopened.get_messages('s1') == []
+
+
+class RecordingChatModel:
+    """Stand-in chat model that records the prompts it receives."""
+    
+    def __init__(self):
+        self.prompts = []
+    
+    def invoke(self, messages):
+        self.prompts.append(list(messages))
+        return AIMessage(content=f"reply {len(self.prompts)}")
+
+
+def test_agent_keeps_sessions_separate(mock_env_vars):
+    """Test that one agent serves several sessions without mixing history."""
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False, 'max_history': 10}
+    agent = BaseAgent('test', config, conversation_store=InMemoryConversationStore())
+    model = RecordingChatModel()
+    agent.llm_with_tools = model
+    
+    agent.chat("first from alice", session_id="alice")
+    agent.chat("first from bob", session_id="bob")
+    agent.chat("second from alice", session_id="alice")
+    
+    # System prompt, alice's earlier turn and the new message
+    assert [m.content for m in model.prompts[2][1:]] == ["first from alice", "reply 1", "second from alice"]
+    assert len(agent.get_history("bob")) == 2
+    
+    agent.clear_history("alice")
+    assert agent.get_history("alice") == []
+    assert len(agent.get_history("bob")) == 2
+
+
+class ScriptedStreamingModel:
+    """Stand-in chat model that streams scripted turns chunk by chunk."""
+    
+    def __init__(self, turns):
+        self.turns = list(turns)
+    
+    def stream(self, messages):
+        yield from self.turns.pop(0)
+
+
+def _shout_turns():
+    """Streamed turns of a model that calls the shout tool, sending text before the tool call like OpenAI."""
+    return [
+        [
+            AIMessageChunk(content='Let me '),
+            AIMessageChunk(content='shout that.'),
+            AIMessageChunk(content='', tool_call_chunks=[
+                {'name': 'shout', 'args': '{"text": "hi"}', 'id': 'call_1', 'index': 0}
+            ]),
+            AIMessageChunk(content=' One moment.'),
+        ],
+        [AIMessageChunk(content='The answer '), AIMessageChunk(content='is HI')],
+    ]
+
+
+def test_stream_chat_yields_tokens_and_tool_events(mock_env_vars, isolated_conversations):
+    """Test that streaming reports tool calls, retracts tool-calling text and streams the final answer."""
+    manager = AgentManager()
+    manager.response_cache = ResponseCache()
+    agent = manager.get_agent()
+    agent.set_tools([Tool(name='shout', func=lambda text: text.upper(), description='Uppercase text')])
+    agent.llm_with_tools = ScriptedStreamingModel(_shout_turns())
+    
+    events = list(manager.stream_chat("shout hi", session_id="s"))
+    
+    assert [(e.type, e.content) for e in events] == [
+        ('token', 'Let me '),
+        ('token', 'shout that.'),
+        ('retract', 'Let me shout that.'),
+        ('tool_start', 'shout'),
+        ('tool_end', 'shout'),
+        ('token', 'The answer '),
+        ('token', 'is HI'),
+    ]
+    assert events[4].metadata['result'] == 'HI'
+    history = agent.get_history("s")
+    assert history[-1].content == 'The answer is HI'
+    assert history[-1].metadata['used_tools'] is True
+    
+    # The streamed answer minus the retracted text matches the history, so it is cached
+    events = list(manager.stream_chat("shout hi", session_id="t"))
+    assert [(e.type, e.content, e.metadata) for e in events] == [('token', 'The answer is HI', {'cached': True})]
+    
+    # Once the tool set changes, answers made with the old tools are not served
+    agent.set_tools([])
+    agent.llm_with_tools = ScriptedStreamingModel([[AIMessageChunk(content='I cannot shout')]])
+    events = list(manager.stream_chat("shout hi", session_id="u"))
+    assert [(e.type, e.content) for e in events] == [('token', 'I cannot shout')]
+
+
+def test_tool_settings_reflect_the_shared_agent(mock_env_vars, monkeypatch):
+    """Test that tool toggles report the tools the agent actually has bound."""
+    monkeypatch.delenv("TAVILY_API_KEY", raising=False)
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False}
+    agent = BaseAgent('test', config, conversation_store=InMemoryConversationStore())
+    assert not any(agent.get_tool_settings().values())
+    
+    # Web search has no API key, so it stays off even when requested
+    agent.update_tools_individual(
+        enable_calculator=True, enable_rag_search=False, enable_web_search=True, enable_email=False
+    )
+    assert agent.get_tool_settings() == {
+        'enable_calculator': True,
+        'enable_rag_search': False,
+        'enable_web_search': False,
+        'enable_email': False
+    }
+
+
+class ScriptedChatModel:
+    """Stand-in chat model that returns scripted messages in order."""
+    
+    def __init__(self, turns):
+        self.turns = list(turns)
+    
+    def invoke(self, messages):
+        return self.turns.pop(0)
+
+
+def _search_call(call_id, query):
+    return {'name': 'search', 'args': {'query': query}, 'id': call_id}
+
+
+def test_react_loop_runs_tool_calls_in_parallel(mock_env_vars):
+    """Test that one turn's tool calls overlap and multi-step loops continue."""
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False, 'tool_timeout': 5}
+    agent = BaseAgent('test', config, conversation_store=InMemoryConversationStore())
+    # The first round's three calls only get past this if they run at the same time
+    first_round = threading.Barrier(3, timeout=2)
+    
+    def search(query):
+        if query != 'd':
+            first_round.wait()
+        return f"result for {query}"
+    
+    agent.set_tools([Tool(name='search', func=search, description='Search')])
+    agent.llm_with_tools = ScriptedChatModel([
+        AIMessage(content='', tool_calls=[_search_call('1', 'a'), _search_call('2', 'b'), _search_call('3', 'c')]),
+        AIMessage(content='', tool_calls=[_search_call('4', 'd')]),
+        AIMessage(content='done'),
+    ])
+    
+    assert agent.chat("look it up") == 'done'
+    # Serial execution would break the barrier and record errors instead of results
+    assert sorted(agent.get_history()[-1].metadata['tools_executed']) == [
+        f"search: result for {query}" for query in 'abcd'
+    ]
+
+
+def test_react_loop_stops_at_max_iterations_and_times_out_tools(mock_env_vars):
+    """Test the iteration bound and the per-tool timeout."""
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False, 'max_iterations': 1, 'tool_timeout': 0.1}
+    agent = BaseAgent('test', config, conversation_store=InMemoryConversationStore())
+    agent.set_tools([Tool(name='search', func=lambda query: time.sleep(1) or 'late', description='Search')])
+    agent.llm_with_tools = ScriptedChatModel([
+        AIMessage(content='Searching first.', tool_calls=[_search_call('1', 'a')]),
+    ])
+    final = RecordingChatModel()
+    agent.llm = final
+    
+    # Text written alongside tool calls is not part of the answer
+    assert agent.chat("look it up") == 'reply 1'
+    tool_message = final.prompts[0][-1]
+    assert 'timed out' in tool_message.content
+
+
+def test_graph_resumes_thread_from_sqlite_checkpoint(mock_env_vars, tmp_path):
+    """Test that a new agent continues a thread from its checkpoint alone."""
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False}
+    checkpoint_config = {'checkpointer': 'sqlite', 'checkpoint_path': str(tmp_path / 'checkpoints.sqlite')}
+    
+    store_path = str(tmp_path / 'conversations.sqlite')
+    agent = BaseAgent(
+        'test', config,
+        conversation_store=SQLiteConversationStore(store_path),
+        checkpointer=create_checkpointer(checkpoint_config)
+    )
+    agent.set_tools([Tool(name='shout', func=lambda text: text.upper(), description='Uppercase text')])
+    agent.llm_with_tools = ScriptedChatModel([
+        AIMessage(content='', tool_calls=[{'name': 'shout', 'args': {'text': 'hi'}, 'id': '1'}]),
+        AIMessage(content='HI'),
+    ])
+    assert agent.chat("shout hi", session_id="s") == 'HI'
+    
+    # Older checkpoints of the thread are pruned after each turn
+    assert len(list(agent.checkpointer.list(agent._run_config("s")))) == 1
+    
+    # Fresh agent: the thread continues from its checkpoint, not the store
+    restarted = BaseAgent(
+        'test', config,
+        conversation_store=SQLiteConversationStore(store_path),
+        checkpointer=create_checkpointer(checkpoint_config)
+    )
+    model = RecordingChatModel()
+    restarted.llm_with_tools = model
+    restarted.chat("and again", session_id="s")
+    
+    # The earlier tool round is dropped from the context and the checkpoint
+    assert [m.content for m in model.prompts[0][1:]] == ["shout hi", "HI", "and again"]
+    state = restarted.graph.get_state(restarted._run_config("s")).values
+    assert not any(isinstance(m, ToolMessage) for m in state['messages'])
+    
+    restarted.clear_history("s")
+    assert restarted.graph.get_state(restarted._run_config("s")).values == {}
+
+
+def test_checkpoints_expire_with_their_conversation_threads(mock_env_vars, isolated_conversations, monkeypatch):
+    """Test that threads the store forgets are forgotten by the LLM too."""
+    clock = [1000.0]
+    monkeypatch.setattr('src.agents.conversation_store.time.time', lambda: clock[0])
+    isolated_conversations.update(backend='memory', ttl_seconds=60)
+    
+    manager = AgentManager()
+    agent = manager.get_agent()
+    agent.llm_with_tools = RecordingChatModel()
+    agent.chat("hello", session_id="s")
+    assert agent.graph.get_state(agent._run_config("s")).values
+    
+    # Idle eviction from the store deletes the checkpoint as well
+    clock[0] += 61
+    assert manager.conversation_store.count_threads() == 0
+    assert agent.graph.get_state(agent._run_config("s")).values == {}
+    
+    # A checkpoint the store does not know about is dropped before the turn
+    agent.chat("hello again", session_id="t")
+    manager.conversation_store.clear(agent.get_thread_id("t"))
+    model = RecordingChatModel()
+    agent.llm_with_tools = model
+    assert agent.get_history("t") == []
+    agent.chat("who am I?", session_id="t")
+    assert [m.content for m in model.prompts[0][1:]] == ["who am I?"]
+    
+    # Checkpoints left behind by expired threads are deleted at startup
+    agent.chat("bye", session_id="u")
+    manager.conversation_store.clear(agent.get_thread_id("u"))
+    restarted = AgentManager(conversation_store=manager.conversation_store)
+    restarted_agent = restarted.get_agent()
+    assert restarted_agent.graph.get_state(restarted_agent._run_config("u")).values == {}
+
+
+class SlowAsyncChatModel:
+    """Stand-in chat model whose async calls wait like a network request."""
+    
+    def __init__(self, turns=None, delay=0.2):
+        self.turns = list(turns or [])
+        self.delay = delay
+    
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        return self.turns.pop(0) if self.turns else AIMessage(content=f"echo {messages[-1].content}")
+    
+    async def astream(self, messages):
+        yield await self.ainvoke(messages)
+
+
+class RendezvousChatModel:
+    """Stand-in chat model whose calls only return once `parties` of them are in flight together."""
+    
+    def __init__(self, parties):
+        self.parties = parties
+        self.waiting = 0
+        self.all_waiting = None
+    
+    async def ainvoke(self, messages):
+        if self.all_waiting is None:
+            self.all_waiting = asyncio.Event()
+        self.waiting += 1
+        if self.waiting == self.parties:
+            self.all_waiting.set()
+        await asyncio.wait_for(self.all_waiting.wait(), 2)
+        return AIMessage(content=f"echo {messages[-1].content}")
+
+
+def test_achat_serves_sessions_concurrently(mock_env_vars, tmp_path):
+    """Test that async turns of different sessions overlap on one event loop."""
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False}
+    checkpoint_config = {'checkpointer': 'sqlite', 'checkpoint_path': str(tmp_path / 'checkpoints.sqlite')}
+    agent = BaseAgent('test', config, checkpointer=create_checkpointer(checkpoint_config))
+    # Serial turns would time out waiting for the others
+    agent.llm_with_tools = RendezvousChatModel(parties=5)
+    
+    async def run():
+        return await asyncio.gather(*(agent.achat(f"hi {i}", session_id=f"s{i}") for i in range(5)))
+    
+    responses = asyncio.run(run())
+    
+    assert responses == [f"echo hi {i}" for i in range(5)]
+    assert [m.content for m in agent.get_history("s3")] == ["hi 3", "echo hi 3"]
+    
+    # The checkpoint written by the async path is read by the sync one
+    model = RecordingChatModel()
+    agent.llm_with_tools = model
+    agent.chat("again", session_id="s3")
+    assert [m.content for m in model.prompts[0][1:]] == ["hi 3", "echo hi 3", "again"]
+
+
+def test_astream_chat_awaits_async_tools_and_offloads_sync_ones(mock_env_vars):
+    """Test that async and sync tools of one turn overlap in the async path."""
+    config = {'system_prompt': 'You are a test agent', 'use_tools': False, 'tool_timeout': 5}
+    agent = BaseAgent('test', config, conversation_store=InMemoryConversationStore())
+    # Each tool waits for the other to start, so running them one after the other fails
+    async_started, sync_started = threading.Event(), threading.Event()
+    
+    async def async_lookup(query):
+        async_started.set()
+        if not await asyncio.to_thread(sync_started.wait, 2):
+            raise TimeoutError("sync tool did not start")
+        return f"async {query}"
+    
+    def sync_lookup(query):
+        sync_started.set()
+        if not async_started.wait(2):
+            raise TimeoutError("async tool did not start")
+        return f"sync {query}"
+    
+    agent.set_tools([
+        Tool(name='lookup', func=None, coroutine=async_lookup, description='Async lookup'),
+        Tool(name='search', func=sync_lookup, description='Sync search'),
+    ])
+    agent.llm_with_tools = SlowAsyncChatModel([
+        AIMessage(content='', tool_calls=[
+            {'name': 'lookup', 'args': {'query': 'a'}, 'id': '1'},
+            _search_call('2', 'b'),
+        ]),
+        AIMessage(content='done'),
+    ], delay=0)
+    
+    async def run():
+        return [event async for event in agent.astream_chat("look it up", session_id="s")]
+    
+    events = asyncio.run(run())
+    
+    assert [e.type for e in events] == ['tool_start', 'tool_start', 'tool_end', 'tool_end', 'token']
+    assert {e.metadata['result'] for e in events if e.type == 'tool_end'} == {'async a', 'sync b'}
+    assert events[-1].content == 'done'
+    assert sorted(agent.get_history("s")[-1].metadata['tools_executed']) == ['lookup: async a', 'search: sync b']
+
+
+class OverlappingChatModel(ScriptedChatModel):
+    """Scripted chat model whose first call waits for a search to start alongside it."""
+    
+    def __init__(self, turns, llm_started, search_started):
+        super().__init__(turns)
+        self.llm_started = llm_started
+        self.search_started = search_started
+    
+    def invoke(self, messages):
+        if not self.llm_started.is_set():
+            self.llm_started.set()
+            if not self.search_started.wait(2):
+                raise TimeoutError("no search ran during the LLM call")
+        return super().invoke(messages)
+
+
+def _knowledge_base_agent(speculative_retrieval, searches, llm_started=None, search_started=None):
+    """Agent whose knowledge-base tool records its queries (and, given the events, waits for an LLM call)."""
+    config = {
+        'system_prompt': 'You are a test agent',
+        'use_tools': False,
+        'speculative_retrieval': speculative_retrieval
+    }
+    agent = BaseAgent('test', config, conversation_store=InMemoryConversationStore())
+    
+    def search_knowledge_base(query):
+        searches.append(query)
+        if search_started is not None:
+            search_started.set()
+            if not llm_started.wait(2):
+                raise TimeoutError("no LLM call ran during the search")
+        return f"results for {query}"
+    
+    agent.set_tools([Tool(name='search_knowledge_base', func=search_knowledge_base, description='Search')])
+    return agent
+
+
+def test_speculative_prefetch_overlaps_search_with_first_llm_call(mock_env_vars):
+    """Test that a prefetched search answers a matching tool call."""
+    searches = []
+    # The search and the first LLM call each wait for the other, so they must overlap
+    llm_started, search_started = threading.Event(), threading.Event()
+    agent = _knowledge_base_agent('prefetch', searches, llm_started, search_started)
+    agent.llm_with_tools = OverlappingChatModel([
+        AIMessage(content='', tool_calls=[{'name': 'search_knowledge_base', 'args': {'query': 'refund policy'}, 'id': 'a'}]),
+        AIMessage(content='30 days'),
+    ], llm_started, search_started)
+    
+    assert agent.chat("What is your refund policy?") == '30 days'
+    assert searches == ["What is your refund policy?"]
+    assert agent.get_history()[-1].metadata['tools_executed'] == ['search_knowledge_base: results for What is your refund policy?']
+    
+    # A query about something else runs its own search
+    agent.llm_with_tools = ScriptedChatModel([
+        AIMessage(content='', tool_calls=[{'name': 'search_knowledge_base', 'args': {'query': 'shipping times'}, 'id': 'b'}]),
+        AIMessage(content='2 days'),
+    ])
+    assert agent.chat("And how fast do you deliver?") == '2 days'
+    assert agent.get_history()[-1].metadata['tools_executed'] == ['search_knowledge_base: results for shipping times']
+    assert agent._prefetches == {}
+
+
+def test_speculative_inject_skips_the_tool_round(mock_env_vars):
+    """Test that injected search results reach the first LLM call."""
+    searches = []
+    agent = _knowledge_base_agent('inject', searches)
+    agent.llm_with_tools = SlowAsyncChatModel(delay=0)
+    
+    async def run():
+        return [event async for event in agent.astream_chat("Where is Satish based?", session_id="s")]
+    
+    events = asyncio.run(run())
+    
+    assert searches == ["Where is Satish based?"]
+    assert [e.type for e in events] == ['tool_start', 'tool_end', 'token']
+    # The stand-in model echoes the last message it saw: the search results
+    assert events[-1].content == "echo results for Where is Satish based?"
+    assert agent.get_history("s")[-1].metadata['used_tools'] is True
+
+
+class BagOfWordsEmbeddings:
+    """Tiny embeddings where questions sharing words are close."""
+    
+    vocabulary = ['what', 'are', 'his', 'skills', 'satish', 'contact', 'info', 'email']
+    
+    def embed_query(self, text):
+        words = text.replace('?', '').split()
+        return [float(words.count(word)) + 0.01 for word in self.vocabulary]
+
+
+def test_response_cache_exact_and_semantic_tiers():
+    """Test normalized exact hits, semantic hits and hit-rate metrics."""
+    cache = ResponseCache(embeddings=BagOfWordsEmbeddings(), max_distance=0.15)
+    scope = cache.make_scope('default', 'You are helpful', 'gpt-3.5-turbo')
+    
+    answer, vector = cache.lookup("What are his skills?", scope)
+    assert answer is None
+    cache.store("What are his skills?", scope, "Python and AWS", vector=vector)
+    
+    assert cache.lookup("  what are HIS skills ", scope)[0] == "Python and AWS"
+    assert cache.lookup("what are his skills satish", scope)[0] == "Python and AWS"
+    assert cache.lookup("contact info email", scope)[0] is None
+    
+    other_scope = cache.make_scope('default', 'A different system prompt', 'gpt-3.5-turbo')
+    assert cache.lookup("What are his skills?", other_scope)[0] is None
+    
+    # Answers made with a different tool set don't match, exactly or semantically
+    tools_scope = cache.make_scope('default', 'You are helpful', 'gpt-3.5-turbo', ['web_search'])
+    assert cache.lookup("What are his skills?", tools_scope)[0] is None
+    assert cache.lookup("what are his skills satish", tools_scope)[0] is None
+    assert cache.make_scope('default', 'p', 'm', ['b', 'a']) == cache.make_scope('default', 'p', 'm', ['a', 'b'])
+    
+    stats = cache.get_stats()
+    assert (stats['exact_hits'], stats['semantic_hits'], stats['misses']) == (1, 1, 5)
+    assert stats['hit_rate'] == pytest.approx(2 / 7)
+
+
+def test_response_cache_expires_and_invalidates_on_kb_change(monkeypatch):
+    """Test TTL expiry and invalidation when the knowledge base version changes."""
+    clock = [1000.0]
+    monkeypatch.setattr('src.agents.response_cache.time.time', lambda: clock[0])
+    version = [1]
+    cache = ResponseCache(ttl_seconds=60, kb_version=lambda: version[0])
+    
+    scope = cache.make_scope('default', 'prompt', 'model')
+    cache.lookup("skills", scope)
+    cache.store("skills", scope, "Python")
+    assert cache.lookup("skills", scope)[0] == "Python"
+    
+    version[0] = 2
+    assert cache.lookup("skills", scope)[0] is None
+    assert cache.get_stats()['entries'] == 0
+    
+    scope = cache.make_scope('default', 'prompt', 'model')
+    cache.store("skills", scope, "Python and Go")
+    clock[0] += 61
+    assert cache.lookup("skills", scope)[0] is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,132 @@
+"""
+Unit tests for the HTTP/SSE API.
+"""
+
+import json
+import time
+from pathlib import Path
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from langchain_core.documents import Document
+
+from src.agents import StreamEvent
+from src.api import ServerState, create_app
+from src.api.server import get_worker_count
+
+
+class StubAgentManager:
+    """Stand-in agent manager that echoes messages."""
+    
+    def __init__(self):
+        self.agents = {'default': object()}
+        self.current_agent_name = 'default'
+        self.calls = []
+    
+    async def achat(self, message, agent_name=None, session_id='default'):
+        self.calls.append((agent_name, session_id))
+        return f"echo {message}"
+    
+    async def astream_chat(self, message, agent_name=None, session_id='default'):
+        yield StreamEvent(type='tool_start', content='search', metadata={'args': {'query': message}})
+        yield StreamEvent(type='token', content='echo ')
+        yield StreamEvent(type='token', content=message)
+
+
+class StubRetriever:
+    """Stand-in retriever returning one chunk per query."""
+    
+    def __init__(self, k=1):
+        self.k = k
+        self.queries = []
+    
+    async def ainvoke(self, query):
+        self.queries.append(query)
+        return [Document(page_content=f"{query} {i}", metadata={'source': 'faq.md'}) for i in range(self.k)]
+
+
+class StubRAGManager:
+    """Stand-in RAG manager with a fixed index."""
+    
+    enabled = True
+    index_generation = 3
+    
+    def get_stats(self):
+        return {"enabled": True, "document_count": 42}
+    
+    def get_retriever(self, **kwargs):
+        return StubRetriever(k=kwargs.get('k', 1))
+
+
+def _wait_ready(client, timeout=2.0):
+    """Poll /ready until the background start-up has finished."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        response = client.get("/ready")
+        if response.status_code == 200:
+            return response
+        time.sleep(0.01)
+    return response
+
+
+def test_api_chat_stream_and_readiness():
+    """Test the chat endpoints, SSE framing and the readiness report."""
+    retriever = StubRetriever()
+    state = ServerState(agent_manager=StubAgentManager(), rag_manager=StubRAGManager(), retriever=retriever)
+    
+    with TestClient(create_app(state, config={'warmup_query': 'warm me'})) as client:
+        assert client.get("/health").json()["status"] == "ok"
+        
+        ready = _wait_ready(client).json()
+        assert ready["ready"] and ready["warm"]
+        assert ready["index"] == {"enabled": True, "document_count": 42, "generation": 3}
+        assert retriever.queries == ['warm me']
+        
+        body = client.post("/chat", json={"message": "hi", "session_id": "s1"}).json()
+        assert body == {"response": "echo hi", "session_id": "s1", "agent": "default"}
+        
+        # A new session is created when none is given
+        assert client.post("/chat", json={"message": "hi"}).json()["session_id"]
+        assert client.post("/chat", json={"message": "hi", "agent": "missing"}).status_code == 404
+        assert client.post("/chat", json={"message": ""}).status_code == 422
+        
+        with client.stream("POST", "/chat/stream", json={"message": "hi", "session_id": "s2"}) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            frames = [frame for frame in response.read().decode().split("\n\n") if frame]
+        
+        events = [(frame.split("\n")[0][len("event: "):], json.loads(frame.split("\n")[1][len("data: "):])) for frame in frames]
+        assert [name for name, _ in events] == ['session', 'tool_start', 'token', 'token', 'done']
+        assert events[0][1]["session_id"] == "s2"
+        assert ''.join(data["content"] for name, data in events if name == 'token') == 'echo hi'
+        
+        results = client.post("/search", json={"query": "refunds", "k": 2}).json()
+        assert [r["content"] for r in results] == ["refunds 0", "refunds 1"]
+        assert results[0]["metadata"] == {"source": "faq.md"}
+
+
+def test_api_reports_not_ready_until_warm():
+    """Test that require_warm keeps /ready at 503 while the warm-up fails."""
+    class FailingRetriever:
+        async def ainvoke(self, query):
+            raise RuntimeError("embeddings unavailable")
+    
+    state = ServerState(agent_manager=StubAgentManager(), retriever=FailingRetriever())
+    
+    with TestClient(create_app(state, config={'require_warm': True})) as client:
+        response = _wait_ready(client, timeout=0.3)
+        assert response.status_code == 503
+        assert response.json()["initialized"] and not response.json()["warm"]
+        
+        # Chat still works; only the load balancer holds traffic back
+        assert client.post("/chat", json={"message": "hi"}).status_code == 200
+        assert client.post("/search", json={"query": "x"}).status_code == 404
+
+
+def test_multiple_workers_require_shared_conversations():
+    """Test that workers are limited to one unless conversations live in SQLite."""
+    assert get_worker_count({}, {}) == 1
+    assert get_worker_count({'workers': 4}, {'backend': 'memory'}) == 1
+    assert get_worker_count({'workers': 4}, {'backend': 'sqlite'}) == 4
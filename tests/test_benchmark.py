@@ -0,0 +1,44 @@
+"""
+Smoke tests for the benchmark script.
+"""
+
+import importlib.util
+import pytest
+from pathlib import Path
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import get_config
+
+SCRIPT = Path(__file__).parent.parent / "scripts" / "benchmark.py"
+
+
+@pytest.fixture
+def benchmark():
+    """The benchmark script loaded as a module."""
+    spec = importlib.util.spec_from_file_location("benchmark", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize("command", [
+    ["loader", "--files", "2", "--pages", "1", "--workers", "2"],
+    ["graph", "--turns", "4"],
+    ["faiss", "--vectors", "400", "--dim", "16", "--queries", "5", "--nlist", "4", "--nprobe", "2"],
+    ["mmr", "--vectors", "200", "--dim", "16", "--queries", "5"],
+    ["quantization", "--vectors", "300", "--dim", "32", "--queries", "5"],
+])
+def test_benchmark_commands_run_on_tiny_inputs(benchmark, command, mock_env_vars, monkeypatch, capsys):
+    """Test that every benchmark command runs end to end and prints a report."""
+    if command[0] in ("faiss", "quantization"):
+        pytest.importorskip("faiss")
+    # The FAISS benchmarks overwrite the faiss section of the shared configuration
+    monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {})
+    monkeypatch.setattr(sys, 'argv', ["benchmark.py", *command])
+    
+    benchmark.main()
+    
+    assert capsys.readouterr().out.strip()
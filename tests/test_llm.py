@@ -0,0 +1,211 @@
+"""
+Unit tests for LLM creation.
+"""
+
+import asyncio
+import pytest
+from pathlib import Path
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import httpx
+
+from src.llm import HTTPClientRegistry, RateLimiter, RateLimitTimeout, get_http_client_registry, get_llm
+from src.llm.rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport
+
+
+def test_llm_instances_are_shared(mock_env_vars):
+    """Test that agents with the same LLM settings share one client."""
+    try:
+        first = get_llm(agent_config={'llm_override': {'temperature': 0.3}})
+        second = get_llm(agent_config={'llm_override': {'temperature': 0.3}})
+        other = get_llm(agent_config={'llm_override': {'temperature': 0.9}})
+    except Exception as e:
+        pytest.skip(f"Skipping due to LLM initialization error: {e}")
+    
+    assert first is second
+    assert first is not other
+
+
+def test_llms_share_http_client_across_settings(mock_env_vars):
+    """Test that LLMs with different settings reuse one connection pool."""
+    try:
+        first = get_llm(agent_config={'llm_override': {'temperature': 0.1}})
+        second = get_llm(agent_config={'llm_override': {'temperature': 0.2}})
+    except Exception as e:
+        pytest.skip(f"Skipping due to LLM initialization error: {e}")
+    
+    registry = get_http_client_registry()
+    assert first is not second
+    assert first.root_client._client is second.root_client._client
+    assert first.root_client._client is registry.get_client('openai', None, 'OPENAI_API_KEY')
+    assert first.root_async_client._client is registry.get_client('openai', None, 'OPENAI_API_KEY', asynchronous=True)
+    assert first.root_client.timeout == registry.timeout
+
+
+class OkHandler(BaseHTTPRequestHandler):
+    """Answers /ok with 200 and everything else with 404, keeping connections alive."""
+    
+    protocol_version = "HTTP/1.1"
+    
+    def do_GET(self):
+        self.send_response(200 if self.path == '/ok' else 404)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+    
+    def log_message(self, *args):
+        pass
+
+
+def test_http_client_registry_reuses_connections_and_reports_use():
+    """Test keying, keep-alive reuse and the pool statistics."""
+    server = HTTPServer(('127.0.0.1', 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    registry = HTTPClientRegistry({'max_connections': 10, 'timeout': {'read': 5}})
+    
+    try:
+        client = registry.get_client('openai', base_url, 'KEY_A')
+        assert registry.get_client('openai', base_url, 'KEY_A') is client
+        assert registry.get_client('openai', base_url, 'KEY_B') is not client
+        assert registry.timeout.read == 5
+        
+        for path in ['/ok', '/ok', '/missing']:
+            client.get(base_url + path)
+        
+        stats = registry.get_stats()
+        assert stats['max_connections'] == 10
+        client_stats = next(c for c in stats['clients'] if c['api_key_env'] == 'KEY_A')
+        assert client_stats['requests'] == 3
+        assert client_stats['errors'] == 1
+        # Keep-alive: all requests went over one connection, now idle
+        assert client_stats['open_connections'] == 1
+        assert client_stats['idle_connections'] == 1
+        assert client_stats['utilization'] == 0.0
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def _chat_request(url="https://api.openai.com/v1/chat/completions"):
+    """Build a chat completion request as the OpenAI SDK sends it."""
+    return httpx.Request("POST", url, json={"model": "gpt-4", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 100})
+
+
+class FakeClock:
+    """Stand-in for the rate limiter's time module where sleeping advances a virtual clock."""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+    
+    def time(self):
+        return time.time()
+
+
+def test_rate_limiter_retries_within_deadline(monkeypatch):
+    """Test token buckets, Retry-After backoff and the request deadline."""
+    clock = FakeClock()
+    monkeypatch.setattr('src.llm.rate_limiter.time', clock)
+    statuses = [429, 503, 200]
+    sent = []
+    
+    def handler(request):
+        sent.append(clock.monotonic())
+        return httpx.Response(statuses[len(sent) - 1], headers={"retry-after-ms": "50"})
+    
+    limiter = RateLimiter({
+        'limits': {'openai': {'rpm': 600}, 'openai/gpt-4': {'rpm': 60, 'tpm': 6000}},
+        'burst_seconds': 1,
+        'retry': {'base_delay': 0.01, 'deadline': 5}
+    })
+    client = httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handler), limiter, 'openai'))
+    
+    # The most specific limits apply: one request per second for gpt-4
+    assert client.send(_chat_request()).status_code == 200
+    assert len(sent) == 3
+    assert sent[1] - sent[0] >= 0.05  # Retry-After is honoured
+    assert sent[2] - sent[1] >= 0.9  # the retries wait for the request bucket
+    
+    stats = limiter.get_stats()['openai/gpt-4']
+    assert stats['rpm'] == 60 and stats['tpm'] == 6000
+    assert stats['requests'] == 3 and stats['retries'] == 2
+    
+    # A request whose wait would run past its deadline fails at once
+    limiter.deadline = 0.5
+    started = clock.monotonic()
+    with pytest.raises(RateLimitTimeout):
+        client.send(_chat_request())
+    assert clock.monotonic() == started
+    assert limiter.get_stats()['openai/gpt-4']['rejected'] == 1
+    
+    # Retries stop at the deadline, returning the last error response
+    statuses[:] = [429] * 100
+    sent.clear()
+    limiter.limits = {}
+    limiter._buckets.clear()
+    limiter.max_retries = 100
+    started = clock.monotonic()
+    assert client.send(_chat_request()).status_code == 429
+    assert 1 < len(sent) < 100
+    assert clock.monotonic() - started <= 0.5
+
+
+def test_rate_limiter_hedges_slow_requests():
+    """Test that a request slower than the latency percentile gets a duplicate."""
+    limiter = RateLimiter({'hedging': {'enabled': True, 'percentile': 95, 'min_samples': 5}})
+    key = ('openai', 'gpt-4')
+    
+    calls = []
+    # The first attempt can't answer before the client has returned, so only the hedge can
+    release = threading.Event()
+    
+    def handler(request):
+        calls.append(request)
+        attempt = len(calls)
+        if attempt == 1:
+            release.wait(5)
+        return httpx.Response(200, json={"attempt": attempt})
+    
+    async def async_handler(request):
+        calls.append(request)
+        attempt = len(calls)
+        if attempt == 1:
+            # Cancelled once the hedge answers
+            await asyncio.sleep(5)
+        return httpx.Response(200, json={"attempt": attempt})
+    
+    async def async_send():
+        transport = AsyncRateLimitedTransport(httpx.MockTransport(async_handler), limiter, 'openai')
+        async with httpx.AsyncClient(transport=transport) as async_client:
+            return await async_client.send(_chat_request())
+    
+    # Too few samples: no hedging yet
+    assert limiter.hedge_after(key) is None
+    for _ in range(5):
+        limiter.record_latency(key, 0.05)
+    assert limiter.hedge_after(key) == 0.05
+    
+    client = httpx.Client(transport=RateLimitedTransport(httpx.MockTransport(handler), limiter, 'openai'))
+    response = client.send(_chat_request())
+    release.set()
+    assert response.json() == {"attempt": 2}
+    
+    calls.clear()
+    assert asyncio.run(async_send()).json() == {"attempt": 2}
+    assert limiter.get_stats()['openai/gpt-4']['hedges'] == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -2,14 +2,34 @@
 Unit tests for RAG functionality.
 """
 
+import json
+import time
 import pytest
 from pathlib import Path
 import sys
 
+from langchain_core.documents import Document
+
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.rag import DocumentLoader, RAGManager
+from src.rag.index_manifest import IndexManifest
+from src.rag.dedup import ChunkDeduplicator
+from src.rag.embedding_cache import EmbeddingCache, CachedEmbeddings
+from src.rag.ingestion import IngestionPipeline
+from src.rag.lexical_index import BM25Index
+from src.rag.mmr import maximal_marginal_relevance
+from src.rag.reranker import CrossEncoderReranker
+from src.rag.retrievers import (
+    CachingRetriever,
+    HybridRetriever,
+    RerankRetriever,
+    RetrievalCache,
+    ThresholdRetriever
+)
+from src.rag.vectordb import FAISSStore, NumpyVectorStore
+from src.utils import get_config
 
 
 def test_document_loader_initialization():
@@ -19,6 +39,21 @@ def test_document_loader_initialization():
     assert loader.chunk_size > 0
 
 
+def test_parallel_loading_keeps_order_and_isolates_errors(tmp_path):
+    """Test that the process pool returns files in order and skips broken ones."""
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"doc_{i}.txt"
+        path.write_text(f"document number {i}", encoding="utf-8")
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / "missing.txt"))
+    
+    loader = DocumentLoader()
+    documents = loader.load_documents(paths, workers=2)
+    
+    assert [doc.page_content for doc in documents] == [f"document number {i}" for i in range(4)]
+
+
 def test_rag_manager_initialization():
     """Test RAG manager initialization."""
     try:
@@ -39,5 +74,863 @@ def test_get_stats():
         pytest.skip(f"Skipping due to initialization error: {e}")
 
 
+def test_index_manifest_diff(tmp_path):
+    """Test that the manifest detects new, changed, unchanged and removed files."""
+    docs_dir = tmp_path / "documents"
+    docs_dir.mkdir()
+    kept = docs_dir / "kept.txt"
+    edited = docs_dir / "edited.txt"
+    deleted = docs_dir / "deleted.txt"
+    for path in (kept, edited, deleted):
+        path.write_text(f"content of {path.name}")
+    
+    manifest_path = tmp_path / "index_manifest.json"
+    manifest = IndexManifest(str(manifest_path))
+    for path in (kept, edited, deleted):
+        manifest.record(str(path), [f"{path.stem}-0"])
+    manifest.save()
+    assert manifest.generation == 1
+    
+    edited.write_text("new content")
+    deleted.unlink()
+    added = docs_dir / "added.txt"
+    added.write_text("brand new")
+    
+    reloaded = IndexManifest(str(manifest_path))
+    diff = reloaded.diff([str(kept), str(edited), str(added)], prune_under=str(docs_dir))
+    
+    assert diff.unchanged == [IndexManifest.normalize_path(str(kept))]
+    assert diff.changed == [IndexManifest.normalize_path(str(edited))]
+    assert diff.new == [IndexManifest.normalize_path(str(added))]
+    assert diff.removed == [IndexManifest.normalize_path(str(deleted))]
+    assert reloaded.get_chunk_ids(str(deleted)) == ["deleted-0"]
+
+
+def test_uploads_are_kept_in_document_path(tmp_path):
+    """Test that uploads survive later scans and stale temp-file entries are pruned."""
+    loader = DocumentLoader()
+    loader.document_path = str(tmp_path / "documents")
+    
+    upload = loader.save_upload("../elsewhere/notes.md", b"# Notes")
+    assert Path(upload) == tmp_path / "documents" / "uploads" / "notes.md"
+    
+    manifest = IndexManifest(str(tmp_path / "index_manifest.json"))
+    manifest.record(upload, ["notes-0"])
+    # Entry left by an upload indexed from a since-deleted temporary file
+    temp_file = tmp_path / "tmpab12cd.md"
+    temp_file.write_text("# Old upload")
+    manifest.record(str(temp_file), ["tmp-0"])
+    temp_file.unlink()
+    
+    diff = manifest.diff(loader.get_document_files(), prune_under=loader.document_path)
+    assert diff.unchanged == [IndexManifest.normalize_path(upload)]
+    assert diff.removed == [IndexManifest.normalize_path(str(temp_file))]
+
+
+def test_index_manifest_chunk_ids_are_deterministic():
+    """Test that identical content yields identical chunk IDs."""
+    first = IndexManifest.chunk_id("docs/a.txt", "abc", 0)
+    assert first == IndexManifest.chunk_id("docs/a.txt", "abc", 0)
+    assert first != IndexManifest.chunk_id("docs/a.txt", "abc", 1)
+    assert first != IndexManifest.chunk_id("docs/b.txt", "abc", 0)
+
+
+class CountingEmbeddings:
+    """Fake embeddings that count how many texts reach the provider."""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+    
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 0.0]
+
+
+def test_cached_embeddings_only_embed_misses(tmp_path):
+    """Test that repeated texts are served from the embedding cache."""
+    provider = CountingEmbeddings()
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+    embeddings = CachedEmbeddings(provider, cache, "fake|model|normalize=False")
+    
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert provider.calls == 2
+    
+    second = embeddings.embed_documents(["alpha", "beta", "gamma"])
+    assert provider.calls == 3
+    assert second[:2] == first[:2]
+    
+    embeddings.embed_query("alpha")
+    embeddings.embed_query("alpha")
+    assert provider.calls == 4
+    
+    stats = cache.get_stats()
+    assert stats["hits"] == 3
+    assert stats["entries"] == 4
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    """Test that the embedding cache stays within its size bound."""
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=10)
+    for i in range(25):
+        cache.put_many("ns", {f"hash-{i}": [float(i)]})
+    
+    assert cache.get_stats()["entries"] <= 10
+    assert "hash-24" in cache.get_many("ns", ["hash-24"])
+    assert "hash-0" not in cache.get_many("ns", ["hash-0"])
+    
+    # The entry count is tracked without re-counting the table; re-storing adds nothing
+    entries = cache.get_stats()["entries"]
+    cache.put_many("ns", {"hash-24": [24.0], "hash-25": [25.0]})
+    assert cache.get_stats()["entries"] == entries + 1
+    assert cache.get_stats()["entries"] == EmbeddingCache(str(tmp_path / "cache.sqlite")).get_stats()["entries"]
+
+
+class FlakyVectorStore:
+    """In-memory vector store that can fail after a number of batches."""
+    
+    def __init__(self, fail_after=None):
+        self.documents = {}
+        self.batches = 0
+        self.fail_after = fail_after
+    
+    def add_documents(self, documents, ids=None):
+        if self.fail_after is not None and self.batches >= self.fail_after:
+            raise RuntimeError("simulated crash")
+        self.batches += 1
+        self.documents.update(zip(ids, documents))
+        return ids
+
+
+def test_ingestion_pipeline_resumes_after_crash(tmp_path):
+    """Test that an interrupted ingestion resumes from its last committed batch."""
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"doc_{i}.txt"
+        path.write_text("\n\n".join(f"Paragraph {j} of document {i}. " * 20 for j in range(6)))
+        paths.append(str(path))
+    
+    manifest = IndexManifest(str(tmp_path / "index_manifest.json"))
+    store = FlakyVectorStore(fail_after=2)
+    pipeline = IngestionPipeline(DocumentLoader(), store, manifest, batch_tokens=400, queue_size=4)
+    
+    with pytest.raises(RuntimeError):
+        pipeline.run(paths)
+    committed = dict(store.documents)
+    assert committed
+    
+    diff = manifest.diff(paths)
+    assert diff.partial
+    
+    resumed_store = FlakyVectorStore()
+    resumed_store.documents.update(committed)
+    pipeline = IngestionPipeline(DocumentLoader(), resumed_store, manifest, batch_tokens=400, queue_size=4)
+    indexed = pipeline.run(
+        diff.new + diff.partial,
+        hashes=diff.hashes,
+        resume={path: manifest.get_chunk_ids(path) for path in diff.partial}
+    )
+    
+    assert indexed == len(resumed_store.documents) - len(committed)
+    assert not manifest.diff(paths).has_changes
+    assert manifest.chunk_count == len(resumed_store.documents)
+
+
+def test_deduplicator_finds_exact_and_near_duplicates(tmp_path):
+    """Test exact and MinHash near-duplicate detection, removal and the saved state."""
+    text = " ".join(f"Satish led project {i} using Python and AWS." for i in range(12))
+    edited = text.replace("project 7", "project seven")
+    other = " ".join(f"Hobby {i}: music, cooking and hiking." for i in range(12))
+    
+    dedup = ChunkDeduplicator(str(tmp_path / "dedup_index.npz"), threshold=0.8)
+    assert dedup.check("a", text) is None
+    assert dedup.check("b", text.upper() + "  ") == "a"
+    assert dedup.check("c", edited) == "a"
+    assert dedup.check("d", other) is None
+    
+    dedup.save(generation=2)
+    reloaded = ChunkDeduplicator(str(tmp_path / "dedup_index.npz"), threshold=0.8)
+    assert (reloaded.generation, len(reloaded)) == (2, 2)
+    assert reloaded.find(edited) == "a"
+    
+    reloaded.remove(["a"])
+    assert reloaded.find(text) is None
+
+
+def test_ingestion_drops_duplicate_chunks_and_records_them(tmp_path):
+    """Test that a re-uploaded file is not embedded again and is tracked as dependent."""
+    content = "\n\n".join(f"Section {j}: Satish worked on system {j} with Python. " * 8 for j in range(4))
+    original = tmp_path / "resume.txt"
+    copy = tmp_path / "resume_copy.txt"
+    original.write_text(content)
+    copy.write_text(content.upper())
+    
+    manifest = IndexManifest(str(tmp_path / "index_manifest.json"))
+    store = FlakyVectorStore()
+    pipeline = IngestionPipeline(
+        DocumentLoader(), store, manifest, deduplicator=ChunkDeduplicator(threshold=0.8)
+    )
+    indexed = pipeline.run([str(original), str(copy)])
+    
+    original_ids = manifest.get_chunk_ids(str(original))
+    assert indexed == len(original_ids) == len(store.documents)
+    assert manifest.get_chunk_ids(str(copy)) == []
+    entry = manifest.files[IndexManifest.normalize_path(str(copy))]
+    assert {duplicate["duplicate_of"] for duplicate in entry["duplicates"]} <= set(original_ids)
+    assert manifest.get_duplicate_dependents(original_ids) == [IndexManifest.normalize_path(str(copy))]
+    
+    # Fully duplicated files are recorded, so the next run has nothing to do
+    assert not manifest.diff([str(original), str(copy)]).has_changes
+
+
+class FakeVectorStore:
+    """Vector store stand-in that counts searches."""
+    
+    def __init__(self):
+        self.searches = 0
+    
+    def similarity_search_by_vector(self, vector, k=5):
+        self.searches += 1
+        return [Document(page_content=f"hit for {vector[0]}")][:k]
+
+
+class FakeVectorStoreRetriever:
+    """Stand-in for a LangChain VectorStoreRetriever."""
+    
+    search_type = 'similarity'
+    
+    def __init__(self, vectorstore):
+        self.vectorstore = vectorstore
+        self.search_kwargs = {'k': 3}
+
+
+def test_caching_retriever_reuses_results_until_index_changes():
+    """Test result and embedding tiers and invalidation by generation."""
+    store = FakeVectorStore()
+    embeddings = CountingEmbeddings()
+    generation = [1]
+    built = []
+    
+    def build():
+        built.append(1)
+        return FakeVectorStoreRetriever(store)
+    
+    retriever = CachingRetriever(
+        build_retriever=build,
+        cache=RetrievalCache(),
+        generation=lambda: generation[0],
+        embeddings=embeddings
+    )
+    
+    first = retriever.invoke("Satish skills")
+    assert retriever.invoke("skills of Satish?") == first
+    assert store.searches == 1
+    
+    # A new generation misses the result tier but reuses the query embedding
+    generation[0] = 2
+    retriever.invoke("Satish skills")
+    assert store.searches == 2
+    assert embeddings.calls == 1
+    assert len(built) == 2
+    
+    stats = retriever.cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['embedding_hits']) == (1, 2, 1)
+
+
+def test_bm25_index_ranks_exact_tokens_and_survives_reload(tmp_path):
+    """Test BM25 ranking of compound tokens, deletes and the saved index."""
+    index = BM25Index(str(tmp_path / "lexical_index.npz"))
+    index.add(
+        [
+            Document(page_content="Contact Satish at satish@example.com for details."),
+            Document(page_content="Satish has worked with Kubernetes and AWS."),
+            Document(page_content="Hobbies include music and cooking."),
+        ],
+        ["contact", "skills", "hobbies"]
+    )
+    
+    results = index.search("satish@example.com", k=2)
+    assert results[0][0].id == "contact"
+    assert index.search("kubernetes")[0][0].id == "skills"
+    
+    index.delete(["skills"])
+    index.save(generation=3)
+    reloaded = BM25Index(str(tmp_path / "lexical_index.npz"))
+    assert reloaded.generation == 3
+    assert len(reloaded) == 2
+    assert reloaded.search("kubernetes") == []
+    assert reloaded.search("cooking")[0][0].page_content == "Hobbies include music and cooking."
+
+
+class FakeDenseRetriever:
+    """Retriever stand-in returning fixed documents."""
+    
+    def __init__(self, documents):
+        self.documents = documents
+    
+    def invoke(self, query):
+        return list(self.documents)
+
+
+def test_hybrid_retriever_fuses_dense_and_lexical_rankings(tmp_path):
+    """Test that reciprocal-rank fusion promotes chunks found by both rankings."""
+    index = BM25Index(str(tmp_path / "lexical_index.npz"))
+    index.add(
+        [Document(page_content="Certified in AWS-SAA"), Document(page_content="Knows Python")],
+        ["cert", "python"]
+    )
+    dense = [
+        Document(page_content="Cloud experience"),
+        Document(page_content="Knows Python"),
+        Document(page_content="Enjoys music"),
+    ]
+    
+    retriever = HybridRetriever(
+        dense_retriever=FakeDenseRetriever(dense),
+        lexical_index=index,
+        k=3
+    )
+    contents = [doc.page_content for doc in retriever.invoke("python aws-saa")]
+    
+    assert contents[0] == "Knows Python"
+    assert "Certified in AWS-SAA" in contents
+    assert len(contents) == 3
+
+
+def test_hybrid_retriever_drops_weak_lexical_only_chunks(tmp_path):
+    """Test that BM25-only chunks below the score floor don't pad the fused results."""
+    index = BM25Index(str(tmp_path / "lexical_index.npz"))
+    documents = [Document(page_content=f"What is in project {i}") for i in range(10)]
+    index.add(documents, [f"project-{i}" for i in range(10)])
+    
+    retriever = HybridRetriever(
+        dense_retriever=FakeDenseRetriever([documents[3]]),
+        lexical_index=index,
+        k=5
+    )
+    # "what" and "is" are stopwords and "project" is in every chunk
+    contents = [doc.page_content for doc in retriever.invoke("what is the project")]
+    
+    assert contents == ["What is in project 3"]
+
+
+class OverlapCrossEncoder:
+    """Cross-encoder stand-in scoring pairs by shared words."""
+    
+    def __init__(self):
+        self.pairs = 0
+    
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.pairs += len(pairs)
+        return [len(set(query.split()) & set(text.split())) for query, text in pairs]
+
+
+def test_rerank_retriever_reorders_caches_scores_and_respects_budget():
+    """Test cross-encoder ordering, the pair score cache and the latency budget."""
+    reranker = CrossEncoderReranker()
+    model = OverlapCrossEncoder()
+    reranker._model = model
+    candidates = [
+        Document(page_content="music theory"),
+        Document(page_content="python cloud deploy"),
+        Document(page_content="python code"),
+    ]
+    
+    retriever = RerankRetriever(
+        base_retriever=FakeDenseRetriever(candidates),
+        reranker=reranker,
+        k=2
+    )
+    contents = [doc.page_content for doc in retriever.invoke("python cloud")]
+    assert contents == ["python cloud deploy", "python code"]
+    
+    retriever.invoke("python cloud")
+    assert model.pairs == 3
+    assert reranker.get_stats()["hits"] == 3
+    
+    # New pairs that would take longer than the budget keep the original order
+    reranker.seconds_per_pair = 1.0
+    retriever.latency_budget_ms = 100
+    contents = [doc.page_content for doc in retriever.invoke("music")]
+    assert contents == ["music theory", "python cloud deploy"]
+    assert model.pairs == 3
+
+
+class ColdStartCrossEncoder(OverlapCrossEncoder):
+    """Cross-encoder stand-in whose first call is slow."""
+    
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        if not self.pairs:
+            time.sleep(0.2)
+        return super().predict(pairs, batch_size, show_progress_bar)
+
+
+def test_rerank_budget_ignores_warm_up_and_retries_after_slow_calls():
+    """Test that one slow call doesn't disable reranking for good."""
+    reranker = CrossEncoderReranker()
+    model = ColdStartCrossEncoder()
+    reranker._model = model
+    candidates = [
+        Document(page_content="music theory"),
+        Document(page_content="python cloud deploy"),
+        Document(page_content="python code"),
+    ]
+    retriever = RerankRetriever(
+        base_retriever=FakeDenseRetriever(candidates),
+        reranker=reranker,
+        k=2,
+        latency_budget_ms=50
+    )
+    
+    # The slow warm-up call isn't counted, so the next query is still reranked
+    retriever.invoke("python cloud")
+    assert reranker.seconds_per_pair is None
+    contents = [doc.page_content for doc in retriever.invoke("python code")]
+    assert contents == ["python code", "python cloud deploy"]
+    assert model.pairs == 6
+    
+    # An over-budget estimate decays with each skip until a call measures again
+    reranker.seconds_per_pair = 1.0
+    calls = 0
+    while model.pairs == 6 and calls < 100:
+        retriever.invoke("music")
+        calls += 1
+    assert 1 < calls < 100
+    assert reranker.seconds_per_pair < 1.0
+
+
+class KeywordEmbeddings:
+    """Fake embeddings with one dimension per known topic word."""
+    
+    vocabulary = ['python', 'cloud', 'music', 'cooking']
+    
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+    
+    def embed_query(self, text):
+        words = text.lower().split()
+        return [float(words.count(word)) + 0.01 for word in self.vocabulary]
+
+
+def test_numpy_store_search_upsert_delete_and_reopen(tmp_path):
+    """Test top-k search, upserts by ID, deletes and sharing files between instances."""
+    store = NumpyVectorStore(KeywordEmbeddings(), persist_directory=str(tmp_path), dtype='float16')
+    store.add_texts(
+        ["python code", "cloud deploy", "music theory", "cooking pasta"],
+        [{"source": "a.txt"}, {"source": "b.txt"}, {"source": "c.txt", "page": 2}, {}],
+        ids=["a", "b", "c", "d"]
+    )
+    
+    # A second instance maps the same files, like another worker process
+    reader = NumpyVectorStore(KeywordEmbeddings(), persist_directory=str(tmp_path), dtype='float16')
+    (doc, score), = reader.similarity_search_with_score("music", k=1)
+    assert (doc.id, doc.metadata) == ("c", {"source": "c.txt", "page": 2})
+    assert score > 0.9
+    
+    store.add_texts(["python cloud"], ids=["a"])
+    store.delete(["d", "missing"])
+    
+    assert len(reader) == 3
+    assert [doc.id for doc in reader.similarity_search("cloud python", k=2)] == ["a", "b"]
+    assert reader.get_by_ids(["a"])[0].metadata == {}
+    assert len(list(tmp_path.glob("vectors.*.npy"))) <= 2
+
+
+def test_numpy_store_appends_writes_and_compacts_tombstones(tmp_path):
+    """Test that writes append to one generation and deletes compact only past compact_ratio."""
+    store = NumpyVectorStore(KeywordEmbeddings(), persist_directory=str(tmp_path), compact_ratio=0.25)
+    reader = NumpyVectorStore(KeywordEmbeddings(), persist_directory=str(tmp_path))
+    topics = ["python", "cloud", "music", "cooking"]
+    for i in range(8):
+        store.add_texts([f"{topics[i % 4]} {i}"], [{"n": i}], ids=[str(i)])
+    (generation,) = {path.name.split('.')[1] for path in tmp_path.glob("vectors.*.npy")}
+    
+    # Upserts and deletes tombstone rows; readers skip them without a new generation
+    store.add_texts(["cooking again"], ids=["2"])
+    store.delete(["1"])
+    assert len(reader) == 7
+    assert [doc.id for doc in reader.similarity_search("music", k=1)] == ["6"]
+    assert reader.get_by_ids(["2", "1"])[0].page_content == "cooking again"
+    assert {path.name.split('.')[1] for path in tmp_path.glob("vectors.*.npy")} == {generation}
+    
+    # Bytes of a write that crashed before its commit are ignored and overwritten
+    with open(tmp_path / f"vectors.{generation}.npy", 'ab') as f:
+        f.write(b"\0" * 64)
+    store.add_texts(["python extra"], ids=["9"])
+    assert reader.get_by_ids(["9"])[0].page_content == "python extra"
+    
+    # A third tombstone out of ten rows passes compact_ratio and compacts
+    store.delete(["0"])
+    assert json.loads((tmp_path / "store.json").read_text())['generation'] != generation
+    assert len(reader) == len(store._matrix) == 7
+    assert sorted(doc.id for doc in reader.similarity_search("python", k=7)) == ["2", "3", "4", "5", "6", "7", "9"]
+
+
+class ScoredStore:
+    """Store stand-in that wraps a NumpyVectorStore like NumpyStore does."""
+    
+    def __init__(self, vectorstore):
+        self.vectorstore = vectorstore
+    
+    def similarity_search_with_scores(self, query, k=5, score_threshold=None, embedding=None):
+        if embedding is None:
+            embedding = self.vectorstore.embedding.embed_query(query)
+        return self.vectorstore.similarity_search_with_score_by_vector(
+            embedding, k=k, score_threshold=score_threshold
+        )
+
+
+def test_threshold_retriever_filters_and_cuts_at_score_gap(tmp_path):
+    """Test that weak chunks are dropped by the threshold and the adaptive cut."""
+    store = NumpyVectorStore(KeywordEmbeddings(), persist_directory=str(tmp_path))
+    store.add_texts(
+        ["python python code", "python cloud", "music theory", "cooking pasta"],
+        ids=["a", "b", "c", "d"]
+    )
+    
+    retriever = ThresholdRetriever(store=ScoredStore(store), k=4, score_threshold=0.5)
+    assert [doc.id for doc in retriever.invoke("python")] == ["a", "b"]
+    
+    retriever.score_threshold = None
+    assert len(retriever.invoke("python")) == 4
+    
+    retriever.adaptive_k = True
+    retriever.max_gap = 0.4
+    assert [doc.id for doc in retriever.invoke("python")] == ["a", "b"]
+    
+    scored = [(Document(page_content=str(i)), score) for i, score in enumerate([0.9, 0.5, 0.45])]
+    retriever.min_k = 2
+    assert [doc.page_content for doc in retriever.select(scored)] == ["0", "1", "2"]
+
+
+def test_mmr_matches_reference_and_skips_near_duplicates(tmp_path):
+    """Test the vectorized MMR against LangChain's implementation and in the NumPy store."""
+    import numpy as np
+    from langchain_community.vectorstores.utils import maximal_marginal_relevance as reference
+    
+    rng = np.random.default_rng(0)
+    candidates = rng.standard_normal((40, 16)).astype(np.float32)
+    query = rng.standard_normal(16).astype(np.float32)
+    for lambda_mult in (0.0, 0.5, 1.0):
+        expected = reference(query, candidates, lambda_mult=lambda_mult, k=6)
+        assert maximal_marginal_relevance(query, candidates, 6, lambda_mult) == expected
+    
+    store = NumpyVectorStore(KeywordEmbeddings(), persist_directory=str(tmp_path))
+    store.add_texts(
+        ["python python code", "python python code again", "python cloud", "music"],
+        ids=["a", "a2", "b", "c"]
+    )
+    assert [doc.id for doc in store.similarity_search("python", k=2)] == ["a", "a2"]
+    assert [doc.id for doc in store.max_marginal_relevance_search("python", k=2, lambda_mult=1.0)] == ["a", "a2"]
+    assert [doc.id for doc in store.max_marginal_relevance_search("python", k=2, lambda_mult=0.3)] == ["a", "c"]
+
+
+class FakePineconeIndex:
+    """In-memory stand-in for a Pinecone index queried by cosine similarity."""
+    
+    def __init__(self, embeddings, texts, ids):
+        import numpy as np
+        
+        self.vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        self.texts = texts
+        self.ids = ids
+    
+    def query(self, vector, top_k, include_metadata=False, include_values=False):
+        import numpy as np
+        
+        query = np.asarray(vector, dtype=np.float32)
+        scores = self.vectors @ query / (np.linalg.norm(self.vectors, axis=1) * np.linalg.norm(query))
+        matches = [
+            {
+                'id': self.ids[row],
+                'score': float(scores[row]),
+                'metadata': {'text': self.texts[row], 'source': 'kb.md'},
+                **({'values': self.vectors[row].tolist()} if include_values else {})
+            }
+            for row in np.argsort(-scores, kind='stable')[:top_k]
+        ]
+        return {'matches': matches}
+
+
+class FakeLangchainPinecone:
+    """Stand-in for LangChain's Pinecone store around a FakePineconeIndex."""
+    
+    _text_key = 'text'
+    
+    def __init__(self, index):
+        self._index = index
+    
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1) / 2
+
+
+def test_pinecone_store_scores_and_mmr():
+    """Test that the Pinecone wrapper supports the threshold retriever and MMR."""
+    pytest.importorskip("pinecone")
+    from src.rag.vectordb.pinecone_store import PineconeStore
+    
+    store = PineconeStore.__new__(PineconeStore)
+    store.embeddings = KeywordEmbeddings()
+    store.vectorstore = FakeLangchainPinecone(FakePineconeIndex(
+        store.embeddings,
+        ["python python code", "python python code again", "python cloud", "music"],
+        ["a", "a2", "b", "c"]
+    ))
+    
+    scored = store.similarity_search_with_scores("python", k=3)
+    assert [doc.id for doc, _ in scored] == ["a", "a2", "b"]
+    assert scored[0][0].page_content == "python python code"
+    assert scored[0][0].metadata == {'source': 'kb.md'}
+    assert [doc.id for doc, _ in store.similarity_search_with_scores("python", k=4, score_threshold=0.9)] == ["a", "a2"]
+    assert [doc.id for doc, _ in store.max_marginal_relevance_search("python", k=2, lambda_mult=1.0)] == ["a", "a2"]
+    assert [doc.id for doc, _ in store.max_marginal_relevance_search("python", k=2, lambda_mult=0.3)] == ["a", "c"]
+
+
+class VectorEmbeddings:
+    """Fake embeddings that embed the text "i" as the i-th row of a matrix."""
+    
+    def __init__(self, vectors):
+        self.vectors = vectors
+    
+    def embed_documents(self, texts):
+        return self.vectors[[int(text) for text in texts]]
+    
+    def embed_query(self, text):
+        return self.vectors[int(text)]
+
+
+def test_quantized_numpy_store_keeps_recall_and_converts(tmp_path):
+    """Test int8 and binary storage against float32 results, and converting a store's dtype."""
+    import numpy as np
+    
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((400, 64)).astype(np.float32)
+    queries = vectors[:20] + 0.1 * rng.standard_normal((20, 64)).astype(np.float32)
+    embeddings = VectorEmbeddings(vectors)
+    ids = [str(i) for i in range(400)]
+    
+    results = {}
+    for dtype in ('float32', 'int8', 'binary'):
+        store = NumpyVectorStore(embeddings, persist_directory=str(tmp_path / dtype), dtype=dtype)
+        store.add_texts(ids[:200], ids=ids[:200])
+        store.add_texts(ids[200:], ids=ids[200:])
+        results[dtype] = [
+            [doc.id for doc, _ in store.similarity_search_with_score_by_vector(query, k=5)]
+            for query in queries
+        ]
+    
+    # 64 sign bits are a coarse sketch, so binary keeps most rather than nearly all results
+    for dtype, min_recall in (('int8', 0.95), ('binary', 0.8)):
+        recall = np.mean([len(set(a) & set(b)) / 5 for a, b in zip(results[dtype], results['float32'])])
+        assert recall >= min_recall
+    assert all(found[0] == str(i) for i, found in enumerate(results['binary']))
+    bits_files = list((tmp_path / 'binary').glob("bits.*.npy"))
+    assert len(bits_files) == len(list((tmp_path / 'binary').glob("vectors.*.npy"))) <= 2
+    
+    # Opening a store with another dtype converts it on the next write
+    converted = NumpyVectorStore(embeddings, persist_directory=str(tmp_path / 'float32'), dtype='int8')
+    converted.delete(["399"])
+    assert len(converted) == 399
+    assert converted._matrix.dtype == np.int8
+    assert [doc.id for doc in converted.max_marginal_relevance_search_by_vector(queries[3], k=1)] == ["3"]
+
+
+def test_faiss_store_trains_ivf_and_removes_on_delete(tmp_path, monkeypatch):
+    """Test that an IVF store starts flat, trains once it has enough vectors and deletes in place."""
+    pytest.importorskip("faiss")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+        'index_path': str(tmp_path / 'index'),
+        'index_type': 'IVF',
+        'metric': 'cosine',
+        'ivf': {'nlist': 4, 'nprobe': 4, 'train_min_points': 100}
+    })
+    store = FAISSStore(DeterministicFakeEmbedding(size=16))
+    documents = [Document(page_content=f"chunk {i}") for i in range(150)]
+    
+    store.add_documents(documents[:50], ids=[f"c{i}" for i in range(50)])
+    assert store.get_stats()['active_index'] == 'Flat'
+    
+    store.add_documents(documents[50:], ids=[f"c{i}" for i in range(50, 150)])
+    assert store.get_stats()['active_index'] == 'IVF'
+    assert store.similarity_search("chunk 120", k=1)[0].page_content == "chunk 120"
+    
+    index = store.vectorstore.index
+    store.delete([f"c{i}" for i in range(100, 150)] + ["unknown"])
+    # Removed from the trained index: no rebuild, and the store stays IVF below train_min_points
+    assert store.vectorstore.index is index
+    assert index.ntotal == store.get_stats()['document_count'] == 100
+    store.delete([f"c{i}" for i in range(50, 100)])
+    assert store.get_stats()['active_index'] == 'IVF'
+    assert FAISSStore(DeterministicFakeEmbedding(size=16)).get_stats()['active_index'] == 'IVF'
+    assert store.similarity_search("chunk 42", k=1)[0].page_content == "chunk 42"
+    assert all(doc.page_content != "chunk 120" for doc in store.similarity_search("chunk 120", k=5))
+
+
+def test_faiss_store_appends_to_log_and_recovers(tmp_path, monkeypatch):
+    """Test that adds go to the write-ahead log, compaction and replay, and torn records."""
+    pytest.importorskip("faiss")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+        'index_path': str(tmp_path / 'index'),
+        'wal': {'max_entries': 30}
+    })
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = FAISSStore(embeddings)
+    
+    store.add_documents([Document(page_content=f"chunk {i}") for i in range(10)], ids=[f"c{i}" for i in range(10)])
+    index_file = store._generation_file('faiss')
+    written = index_file.stat().st_mtime_ns
+    
+    store.add_documents([Document(page_content=f"chunk {i}") for i in range(10, 20)], ids=[f"c{i}" for i in range(10, 20)])
+    store.delete(["c3"])
+    assert index_file.stat().st_mtime_ns == written
+    assert store.get_stats()['wal_entries'] == 11
+    
+    # Simulate a crash in the middle of appending a record
+    with open(store._generation_file('wal.jsonl'), 'a') as f:
+        f.write('{"op": "add", "ids": ["c99"')
+    
+    reopened = FAISSStore(embeddings)
+    assert reopened.get_stats()['document_count'] == 19
+    assert reopened.vectorstore.docstore._docs is None
+    assert reopened.similarity_search("chunk 15", k=1)[0].page_content == "chunk 15"
+    
+    # Filling the log compacts it into a new generation
+    reopened.add_documents([Document(page_content=f"chunk {i}") for i in range(20, 40)], ids=[f"c{i}" for i in range(20, 40)])
+    assert reopened.get_stats()['wal_entries'] == 0
+    assert not index_file.exists()
+    assert FAISSStore(embeddings).get_stats()['document_count'] == 39
+
+
+def test_faiss_store_migrates_pickled_store_once(tmp_path, monkeypatch):
+    """Test that a cleared store doesn't bring back the documents of a migrated pickle store."""
+    pytest.importorskip("faiss")
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    embeddings = DeterministicFakeEmbedding(size=16)
+    index_path = tmp_path / 'index'
+    FAISS.from_texts([f"chunk {i}" for i in range(5)], embeddings).save_local(str(index_path))
+    monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+        'index_path': str(index_path),
+        'index_type': 'FlatL2'
+    })
+    
+    store = FAISSStore(embeddings)
+    assert store.get_stats()['document_count'] == 5
+    assert not (index_path / 'index.faiss').exists()
+    assert (index_path / 'index.faiss.migrated').exists()
+    
+    store.delete_store()
+    assert not (index_path / 'index.faiss.migrated').exists()
+    assert FAISSStore(embeddings).get_stats()['document_count'] == 0
+
+
+def test_faiss_store_quantizes_vectors(tmp_path, monkeypatch):
+    """Test that int8 storage starts as float32 and is trained, and binary storage rescores and deletes."""
+    pytest.importorskip("faiss")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    documents = [Document(page_content=f"chunk {i}") for i in range(120)]
+    ids = [f"c{i}" for i in range(120)]
+    for dtype, before in (('int8', 'float32'), ('binary', 'binary')):
+        monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+            'index_path': str(tmp_path / dtype / 'index'),
+            'index_type': 'FlatIP',
+            'metric': 'cosine',
+            'dtype': dtype,
+            'int8_min_points': 100
+        })
+        store = FAISSStore(DeterministicFakeEmbedding(size=32))
+        store.add_documents(documents[:50], ids=ids[:50])
+        assert store.get_stats()['dtype'] == before
+        
+        store.add_documents(documents[50:], ids=ids[50:])
+        store.delete(["c7", "unknown"])
+        store.save()
+        
+        reopened = FAISSStore(DeterministicFakeEmbedding(size=32))
+        assert reopened.get_stats()['dtype'] == dtype
+        assert reopened.get_stats()['document_count'] == 119
+        # The binary refine index can't remove vectors, so c7 is a tombstone
+        assert reopened.get_stats()['tombstones'] == (1 if dtype == 'binary' else 0)
+        assert reopened.similarity_search("chunk 88", k=1)[0].page_content == "chunk 88"
+        assert all(doc.page_content != "chunk 7" for doc in reopened.similarity_search("chunk 7", k=5))
+    
+    monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+        'index_path': str(tmp_path / 'hnsw' / 'index'),
+        'index_type': 'HNSW',
+        'dtype': 'binary'
+    })
+    with pytest.raises(ValueError):
+        FAISSStore(DeterministicFakeEmbedding(size=32))
+
+
+def test_faiss_store_trains_int8_index_on_first_batch(tmp_path, monkeypatch):
+    """Test that int8 storage with no float32 phase is trained by the first add."""
+    pytest.importorskip("faiss")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    for index_type in ('FlatIP', 'HNSW'):
+        monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+            'index_path': str(tmp_path / index_type / 'index'),
+            'index_type': index_type,
+            'metric': 'cosine',
+            'dtype': 'int8',
+            'int8_min_points': 0
+        })
+        store = FAISSStore(DeterministicFakeEmbedding(size=32))
+        store.add_documents([Document(page_content=f"chunk {i}") for i in range(20)])
+        store.add_documents([Document(page_content="chunk 20")])
+        
+        assert store.get_stats()['dtype'] == 'int8'
+        assert store.get_stats()['document_count'] == 21
+        assert store.similarity_search("chunk 20", k=1)[0].page_content == "chunk 20"
+
+
+def test_faiss_hnsw_tombstones_deletes_and_rebuilds_in_background(tmp_path, monkeypatch):
+    """Test that HNSW deletes are skipped by searches, survive a reload and are dropped by a background rebuild."""
+    pytest.importorskip("faiss")
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    
+    monkeypatch.setitem(get_config().get_rag_config(), 'faiss', {
+        'index_path': str(tmp_path / 'index'),
+        'index_type': 'HNSW',
+        'metric': 'cosine',
+        'compact_ratio': 0.2
+    })
+    embeddings = DeterministicFakeEmbedding(size=16)
+    store = FAISSStore(embeddings)
+    store.add_documents([Document(page_content=f"chunk {i}") for i in range(100)], ids=[f"c{i}" for i in range(100)])
+    index = store.vectorstore.index
+    
+    # One delete per file, as initialize_documents does: no rebuilds below compact_ratio
+    for i in range(10):
+        store.delete([f"c{i}"])
+    assert store.vectorstore.index is index
+    assert store.get_stats()['tombstones'] == 10
+    found = store.similarity_search_with_scores("chunk 3", k=5)
+    assert len(found) == 5 and all(doc.page_content != "chunk 3" for doc, _ in found)
+    assert [doc.page_content for doc, _ in store.max_marginal_relevance_search("chunk 42", k=1)] == ["chunk 42"]
+    
+    # Replaying the deletes from the log only marks tombstones again
+    reopened = FAISSStore(embeddings)
+    assert reopened.get_stats()['tombstones'] == 10
+    assert all(doc.page_content != "chunk 3" for doc in reopened.similarity_search("chunk 3", k=5))
+    
+    # Passing compact_ratio rebuilds the index without them in the background
+    reopened.delete([f"c{i}" for i in range(10, 25)])
+    reopened._rebuild_thread.join(timeout=30)
+    assert reopened.get_stats()['tombstones'] == 0
+    assert reopened.vectorstore.index.ntotal == reopened.get_stats()['document_count'] == 75
+    assert reopened.similarity_search("chunk 60", k=1)[0].page_content == "chunk 60"
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -0,0 +1,61 @@
+"""
+Unit tests for shared utilities.
+"""
+
+import threading
+import pytest
+from pathlib import Path
+import sys
+
+# Add src to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.utils import ResourceRegistry
+
+
+def test_registry_shares_instances_per_config():
+    """Test that identical configurations share one resource."""
+    registry = ResourceRegistry()
+    
+    first = registry.get_or_create('llm', {'model': 'a', 'temperature': 0.5}, object)
+    second = registry.get_or_create('llm', {'temperature': 0.5, 'model': 'a'}, object)
+    other = registry.get_or_create('llm', {'model': 'b'}, object)
+    
+    assert first is second
+    assert first is not other
+    assert registry.get_stats()['resources'] == {'llm': 2}
+
+
+def test_registry_builds_once_under_concurrency():
+    """Test that concurrent requests for one key construct a single instance."""
+    registry = ResourceRegistry()
+    built = []
+    
+    def factory():
+        built.append(1)
+        return object()
+    
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(registry.get_or_create('x', {}, factory)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert len(built) == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_registry_discard_recreates():
+    """Test that a discarded resource is rebuilt on next use."""
+    registry = ResourceRegistry()
+    first = registry.get_or_create('vectorstore', {'db': 'chromadb'}, object)
+    registry.discard('vectorstore', {'db': 'chromadb'})
+    assert registry.get_or_create('vectorstore', {'db': 'chromadb'}, object) is not first
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])